@@ -0,0 +1,43 @@
+"""add dte job backoff
+
+Revision ID: a4c7e9b1d3f6
+Revises: c8e4a6f2b9d1
+Create Date: 2026-03-20
+
+`dte_jobs.available_at`: un trabajo fallido vuelve a PENDING con espera
+exponencial y los workers no lo toman antes de esa hora. NULL = disponible.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a4c7e9b1d3f6'
+down_revision: Union[str, Sequence[str], None] = 'c8e4a6f2b9d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def get_tenant_schemas():
+    bind = op.get_bind()
+    result = bind.execute(sa.text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE 'tenant_%'"))
+    return [row[0] for row in result.fetchall()]
+
+
+def upgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.add_column('dte_jobs', sa.Column('available_at', sa.DateTime(timezone=True), nullable=True), schema=schema)
+        except Exception as e:
+            print(f"Skipping add dte_jobs.available_at across {schema}: {e}")
+
+
+def downgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.drop_column('dte_jobs', 'available_at', schema=schema)
+        except Exception as e:
+            print(f"Skipping drop dte_jobs.available_at across {schema}: {e}")
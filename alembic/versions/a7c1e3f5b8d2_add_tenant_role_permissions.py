@@ -0,0 +1,49 @@
+"""add tenant role permissions projection
+
+Revision ID: a7c1e3f5b8d2
+Revises: c6e8a2b4d7f9
+Create Date: 2026-03-16
+
+Proyección en 'public' de los permisos de los roles de cada inquilino,
+para armar la lista de empresas del login en una sola consulta. Se
+llena con los roles existentes de cada esquema.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a7c1e3f5b8d2'
+down_revision: Union[str, Sequence[str], None] = 'c6e8a2b4d7f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'tenant_role_permissions',
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('role_name', sa.String(length=50), nullable=False),
+        sa.Column('permissions', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['public.tenants.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('tenant_id', 'role_name'),
+        schema='public',
+    )
+
+    bind = op.get_bind()
+    tenants = bind.execute(sa.text("""
+        SELECT t.id, t.schema_name FROM public.tenants t
+        JOIN information_schema.tables it ON it.table_schema = t.schema_name AND it.table_name = 'roles'
+    """)).fetchall()
+    for tenant_id, schema in tenants:
+        op.execute(f"""
+            INSERT INTO public.tenant_role_permissions (tenant_id, role_name, permissions)
+            SELECT {int(tenant_id)}, name, COALESCE(permissions::json, '{{}}'::json)
+            FROM "{schema}".roles
+        """)
+
+
+def downgrade() -> None:
+    op.drop_table('tenant_role_permissions', schema='public')
@@ -0,0 +1,68 @@
+"""add stock takes
+
+Revision ID: a9c3e5f7b1d4
+Revises: f3b8d1e6a2c7
+Create Date: 2026-03-09
+
+Tomas de inventario: foto de stock por producto y cantidades contadas.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a9c3e5f7b1d4'
+down_revision: Union[str, Sequence[str], None] = 'f3b8d1e6a2c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def get_tenant_schemas():
+    bind = op.get_bind()
+    result = bind.execute(sa.text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE 'tenant_%'"))
+    return [row[0] for row in result.fetchall()]
+
+
+def upgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.create_table(
+                'stock_takes',
+                sa.Column('id', sa.Integer(), nullable=False),
+                sa.Column('status', sa.String(length=20), nullable=False, comment='OPEN | APPLIED | CANCELLED'),
+                sa.Column('description', sa.String(length=255), nullable=True),
+                sa.Column('lock_sales', sa.Boolean(), nullable=False),
+                sa.Column('user_id', sa.Integer(), nullable=True),
+                sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+                sa.Column('closed_at', sa.DateTime(timezone=True), nullable=True),
+                sa.ForeignKeyConstraint(['user_id'], [f'{schema}.users.id']),
+                sa.PrimaryKeyConstraint('id'),
+                schema=schema,
+            )
+            op.create_index('ix_stock_takes_id', 'stock_takes', ['id'], schema=schema)
+            op.create_table(
+                'stock_take_lines',
+                sa.Column('stock_take_id', sa.Integer(), nullable=False),
+                sa.Column('product_id', sa.Integer(), nullable=False),
+                sa.Column('expected', sa.Numeric(precision=15, scale=4), nullable=False),
+                sa.Column('counted', sa.Numeric(precision=15, scale=4), nullable=True),
+                sa.ForeignKeyConstraint(['stock_take_id'], [f'{schema}.stock_takes.id'], ondelete='CASCADE'),
+                sa.ForeignKeyConstraint(['product_id'], [f'{schema}.products.id']),
+                sa.PrimaryKeyConstraint('stock_take_id', 'product_id'),
+                schema=schema,
+            )
+            op.create_index('ix_stock_take_lines_product_id', 'stock_take_lines', ['product_id'], schema=schema)
+        except Exception as e:
+            print(f"Skipping create stock_takes across {schema}: {e}")
+
+
+def downgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.drop_table('stock_take_lines', schema=schema)
+            op.drop_table('stock_takes', schema=schema)
+        except Exception as e:
+            print(f"Skipping drop stock_takes across {schema}: {e}")
@@ -0,0 +1,68 @@
+"""add kardex checkpoints
+
+Revision ID: b4d6f8a1c3e5
+Revises: a9c3e5f7b1d4
+Create Date: 2026-03-11
+
+Checkpoints de saldo del kardex e índice (product_id, id) para paginar
+los movimientos de un producto por keyset.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b4d6f8a1c3e5'
+down_revision: Union[str, Sequence[str], None] = 'a9c3e5f7b1d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def get_tenant_schemas():
+    bind = op.get_bind()
+    result = bind.execute(sa.text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE 'tenant_%'"))
+    return [row[0] for row in result.fetchall()]
+
+
+def upgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.create_table(
+                'stock_balance_checkpoints',
+                sa.Column('product_id', sa.Integer(), nullable=False),
+                sa.Column('movement_id', sa.Integer(), autoincrement=False, nullable=False),
+                sa.Column('balance', sa.Numeric(precision=15, scale=4), nullable=False),
+                sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+                sa.ForeignKeyConstraint(['product_id'], [f'{schema}.products.id']),
+                sa.PrimaryKeyConstraint('product_id', 'movement_id'),
+                schema=schema,
+            )
+        except Exception as e:
+            print(f"Skipping create stock_balance_checkpoints across {schema}: {e}")
+
+    with op.get_context().autocommit_block():
+        for schema in schemas:
+            try:
+                op.execute(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_stock_movements_product_id_id '
+                    f'ON "{schema}".stock_movements (product_id, id)'
+                )
+            except Exception as e:
+                print(f"Skipping ix_stock_movements_product_id_id across {schema}: {e}")
+
+
+def downgrade() -> None:
+    schemas = get_tenant_schemas()
+    with op.get_context().autocommit_block():
+        for schema in schemas:
+            try:
+                op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{schema}".ix_stock_movements_product_id_id')
+            except Exception as e:
+                print(f"Skipping drop ix_stock_movements_product_id_id across {schema}: {e}")
+    for schema in schemas:
+        try:
+            op.drop_table('stock_balance_checkpoints', schema=schema)
+        except Exception as e:
+            print(f"Skipping drop stock_balance_checkpoints across {schema}: {e}")
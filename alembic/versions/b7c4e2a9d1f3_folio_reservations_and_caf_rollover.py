@@ -0,0 +1,67 @@
+"""folio reservations and caf rollover
+
+Revision ID: b7c4e2a9d1f3
+Revises: a1b2c3d4e5f6
+Create Date: 2026-03-02
+
+Permite varios CAF por tipo de DTE (rollover al agotarse un rango) y crea
+la tabla de bloques de folios reservados por los workers del POS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b7c4e2a9d1f3'
+down_revision: Union[str, Sequence[str], None] = 'a1b2c3d4e5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def get_tenant_schemas():
+    bind = op.get_bind()
+    result = bind.execute(sa.text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE 'tenant_%'"))
+    return [row[0] for row in result.fetchall()]
+
+
+def upgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.execute(f'ALTER TABLE "{schema}".cafs DROP CONSTRAINT IF EXISTS cafs_tipo_documento_key')
+            op.execute(f'CREATE INDEX IF NOT EXISTS ix_cafs_tipo_documento ON "{schema}".cafs (tipo_documento)')
+        except Exception as e:
+            print(f"Skipping cafs rollover across {schema}: {e}")
+
+        try:
+            op.create_table(
+                'folio_reservations',
+                sa.Column('id', sa.Integer(), nullable=False),
+                sa.Column('caf_id', sa.Integer(), nullable=False),
+                sa.Column('tipo_documento', sa.Integer(), nullable=False),
+                sa.Column('folio_desde', sa.Integer(), nullable=False),
+                sa.Column('folio_hasta', sa.Integer(), nullable=False),
+                sa.Column('next_folio', sa.Integer(), nullable=False),
+                sa.Column('worker_id', sa.String(length=100), nullable=True),
+                sa.Column('status', sa.String(length=20), nullable=False, comment='ACTIVE | RELEASED | EXHAUSTED'),
+                sa.Column('reserved_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+                sa.Column('released_at', sa.DateTime(timezone=True), nullable=True),
+                sa.ForeignKeyConstraint(['caf_id'], [f'{schema}.cafs.id']),
+                sa.PrimaryKeyConstraint('id'),
+                schema=schema,
+            )
+            op.create_index('ix_folio_reservations_id', 'folio_reservations', ['id'], schema=schema)
+            op.create_index('ix_folio_reservations_tipo_status', 'folio_reservations', ['tipo_documento', 'status'], schema=schema)
+        except Exception as e:
+            print(f"Skipping create folio_reservations across {schema}: {e}")
+
+
+def downgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.drop_table('folio_reservations', schema=schema)
+            op.execute(f'DROP INDEX IF EXISTS "{schema}".ix_cafs_tipo_documento')
+        except Exception as e:
+            print(f"Skipping downgrade folio reservations across {schema}: {e}")
@@ -0,0 +1,32 @@
+"""add saas user token version
+
+Revision ID: b9d3f5a7c2e4
+Revises: a7c1e3f5b8d2
+Create Date: 2026-03-18
+
+Versión de token por usuario global: los tokens con claims la llevan y
+dejan de ser válidos al incrementarla (cierre de sesión forzado).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b9d3f5a7c2e4'
+down_revision: Union[str, Sequence[str], None] = 'a7c1e3f5b8d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'saas_users',
+        sa.Column('token_version', sa.Integer(), server_default='0', nullable=False,
+                  comment='Incrementar revoca sus tokens'),
+        schema='public',
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('saas_users', 'token_version', schema='public')
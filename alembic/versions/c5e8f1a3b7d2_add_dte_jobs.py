@@ -0,0 +1,59 @@
+"""add dte jobs
+
+Revision ID: c5e8f1a3b7d2
+Revises: b7c4e2a9d1f3
+Create Date: 2026-03-04
+
+Cola durable del pipeline asíncrono de generación de DTE.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c5e8f1a3b7d2'
+down_revision: Union[str, Sequence[str], None] = 'b7c4e2a9d1f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def get_tenant_schemas():
+    bind = op.get_bind()
+    result = bind.execute(sa.text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE 'tenant_%'"))
+    return [row[0] for row in result.fetchall()]
+
+
+def upgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.create_table(
+                'dte_jobs',
+                sa.Column('id', sa.Integer(), nullable=False),
+                sa.Column('dte_id', sa.Integer(), nullable=False),
+                sa.Column('sale_id', sa.Integer(), nullable=False),
+                sa.Column('status', sa.String(length=20), nullable=False, comment='PENDING | PROCESSING | DONE | ERROR'),
+                sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+                sa.Column('last_error', sa.Text(), nullable=True),
+                sa.Column('worker_id', sa.String(length=100), nullable=True),
+                sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+                sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+                sa.ForeignKeyConstraint(['dte_id'], [f'{schema}.dtes.id']),
+                sa.ForeignKeyConstraint(['sale_id'], [f'{schema}.sales.id']),
+                sa.PrimaryKeyConstraint('id'),
+                schema=schema,
+            )
+            op.create_index('ix_dte_jobs_id', 'dte_jobs', ['id'], schema=schema)
+            op.create_index('ix_dte_jobs_status_id', 'dte_jobs', ['status', 'id'], schema=schema)
+        except Exception as e:
+            print(f"Skipping create dte_jobs across {schema}: {e}")
+
+
+def downgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.drop_table('dte_jobs', schema=schema)
+        except Exception as e:
+            print(f"Skipping drop dte_jobs across {schema}: {e}")
@@ -0,0 +1,63 @@
+"""add cash session totals
+
+Revision ID: c6e8a2b4d7f9
+Revises: b4d6f8a1c3e5
+Create Date: 2026-03-13
+
+Totales acumulados por sesión de caja y medio de pago. Las sesiones
+abiertas al migrar se inicializan recalculando desde sus ventas.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c6e8a2b4d7f9'
+down_revision: Union[str, Sequence[str], None] = 'b4d6f8a1c3e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def get_tenant_schemas():
+    bind = op.get_bind()
+    result = bind.execute(sa.text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE 'tenant_%'"))
+    return [row[0] for row in result.fetchall()]
+
+
+def upgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.create_table(
+                'cash_session_totals',
+                sa.Column('cash_session_id', sa.Integer(), nullable=False),
+                sa.Column('payment_method_id', sa.Integer(), nullable=False),
+                sa.Column('count', sa.Integer(), nullable=False),
+                sa.Column('amount', sa.Numeric(precision=15, scale=2), nullable=False),
+                sa.ForeignKeyConstraint(['cash_session_id'], [f'{schema}.cash_sessions.id'], ondelete='CASCADE'),
+                sa.ForeignKeyConstraint(['payment_method_id'], [f'{schema}.payment_methods.id']),
+                sa.PrimaryKeyConstraint('cash_session_id', 'payment_method_id'),
+                schema=schema,
+            )
+            op.execute(f"""
+                INSERT INTO "{schema}".cash_session_totals (cash_session_id, payment_method_id, count, amount)
+                SELECT cs.id, sp.payment_method_id, count(sp.id),
+                       sum(CASE WHEN s.related_sale_id IS NOT NULL THEN -sp.amount ELSE sp.amount END)
+                FROM "{schema}".cash_sessions cs
+                JOIN "{schema}".sales s ON s.seller_id = cs.user_id AND s.created_at >= cs.start_time
+                JOIN "{schema}".sale_payments sp ON sp.sale_id = s.id
+                WHERE cs.status = 'OPEN'
+                GROUP BY cs.id, sp.payment_method_id
+            """)
+        except Exception as e:
+            print(f"Skipping create cash_session_totals across {schema}: {e}")
+
+
+def downgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.drop_table('cash_session_totals', schema=schema)
+        except Exception as e:
+            print(f"Skipping drop cash_session_totals across {schema}: {e}")
@@ -0,0 +1,62 @@
+"""shard sales rollups
+
+Revision ID: c8e4a6f2b9d1
+Revises: b9d3f5a7c2e4
+Create Date: 2026-03-19
+
+Agrega `shard` a la clave primaria de los rollups de ventas: cada venta
+suma en la fila del shard de su vendedor (`TORN_ROLLUP_SHARDS`), de modo
+que las cajas concurrentes no compiten por la misma fila del día. Las
+filas existentes quedan en el shard 0; las lecturas suman todos.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c8e4a6f2b9d1'
+down_revision: Union[str, Sequence[str], None] = 'b9d3f5a7c2e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (tabla, clave primaria sin shard)
+ROLLUP_KEYS = [
+    ('sales_daily_rollup', ['fecha', 'tipo_dte']),
+    ('sales_hourly_rollup', ['fecha', 'hora', 'tipo_dte']),
+    ('sales_product_daily_rollup', ['fecha', 'tipo_dte', 'product_id']),
+    ('sales_payment_daily_rollup', ['fecha', 'tipo_dte', 'payment_method_id']),
+]
+
+
+def get_tenant_schemas():
+    bind = op.get_bind()
+    result = bind.execute(sa.text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE 'tenant_%'"))
+    return [row[0] for row in result.fetchall()]
+
+
+def upgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        for table, keys in ROLLUP_KEYS:
+            try:
+                op.add_column(table, sa.Column('shard', sa.Integer(), nullable=False, server_default='0'), schema=schema)
+                op.drop_constraint(f'{table}_pkey', table, type_='primary', schema=schema)
+                op.create_primary_key(f'{table}_pkey', table, keys + ['shard'], schema=schema)
+            except Exception as e:
+                print(f"Skipping shard {table} across {schema}: {e}")
+
+
+def downgrade() -> None:
+    # Los shards de una misma clave no se pueden fusionar en el lugar: se
+    # vacían los rollups y se repueblan con `scripts/backfill_sales_rollups.py`.
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        for table, keys in ROLLUP_KEYS:
+            try:
+                op.execute(f'DELETE FROM "{schema}".{table}')
+                op.drop_constraint(f'{table}_pkey', table, type_='primary', schema=schema)
+                op.drop_column(table, 'shard', schema=schema)
+                op.create_primary_key(f'{table}_pkey', table, keys, schema=schema)
+            except Exception as e:
+                print(f"Skipping unshard {table} across {schema}: {e}")
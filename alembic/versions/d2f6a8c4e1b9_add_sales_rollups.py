@@ -0,0 +1,92 @@
+"""add sales rollups
+
+Revision ID: d2f6a8c4e1b9
+Revises: c5e8f1a3b7d2
+Create Date: 2026-03-06
+
+Agregados diarios y por hora de ventas (por tipo de DTE, producto y medio
+de pago). Tras migrar, poblar con `scripts/backfill_sales_rollups.py`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd2f6a8c4e1b9'
+down_revision: Union[str, Sequence[str], None] = 'c5e8f1a3b7d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def get_tenant_schemas():
+    bind = op.get_bind()
+    result = bind.execute(sa.text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE 'tenant_%'"))
+    return [row[0] for row in result.fetchall()]
+
+
+def _totals():
+    return [
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('gross', sa.Numeric(15, 2), nullable=False, server_default='0'),
+        sa.Column('net', sa.Numeric(15, 2), nullable=False, server_default='0'),
+        sa.Column('iva', sa.Numeric(15, 2), nullable=False, server_default='0'),
+        sa.Column('margin', sa.Numeric(15, 2), nullable=False, server_default='0'),
+    ]
+
+
+def upgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        try:
+            op.create_table(
+                'sales_daily_rollup',
+                sa.Column('fecha', sa.Date(), nullable=False),
+                sa.Column('tipo_dte', sa.Integer(), nullable=False),
+                *_totals(),
+                sa.PrimaryKeyConstraint('fecha', 'tipo_dte'),
+                schema=schema,
+            )
+            op.create_table(
+                'sales_hourly_rollup',
+                sa.Column('fecha', sa.Date(), nullable=False),
+                sa.Column('hora', sa.Integer(), nullable=False),
+                sa.Column('tipo_dte', sa.Integer(), nullable=False),
+                *_totals(),
+                sa.PrimaryKeyConstraint('fecha', 'hora', 'tipo_dte'),
+                schema=schema,
+            )
+            op.create_table(
+                'sales_product_daily_rollup',
+                sa.Column('fecha', sa.Date(), nullable=False),
+                sa.Column('tipo_dte', sa.Integer(), nullable=False),
+                sa.Column('product_id', sa.Integer(), nullable=False),
+                sa.Column('quantity', sa.Numeric(15, 4), nullable=False, server_default='0'),
+                sa.Column('net', sa.Numeric(15, 2), nullable=False, server_default='0'),
+                sa.Column('margin', sa.Numeric(15, 2), nullable=False, server_default='0'),
+                sa.PrimaryKeyConstraint('fecha', 'tipo_dte', 'product_id'),
+                schema=schema,
+            )
+            op.create_table(
+                'sales_payment_daily_rollup',
+                sa.Column('fecha', sa.Date(), nullable=False),
+                sa.Column('tipo_dte', sa.Integer(), nullable=False),
+                sa.Column('payment_method_id', sa.Integer(), nullable=False),
+                sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+                sa.Column('amount', sa.Numeric(15, 2), nullable=False, server_default='0'),
+                sa.PrimaryKeyConstraint('fecha', 'tipo_dte', 'payment_method_id'),
+                schema=schema,
+            )
+        except Exception as e:
+            print(f"Skipping create sales rollups across {schema}: {e}")
+
+
+def downgrade() -> None:
+    schemas = get_tenant_schemas()
+    for schema in schemas:
+        for table in ('sales_payment_daily_rollup', 'sales_product_daily_rollup',
+                      'sales_hourly_rollup', 'sales_daily_rollup'):
+            try:
+                op.drop_table(table, schema=schema)
+            except Exception as e:
+                print(f"Skipping drop {table} across {schema}: {e}")
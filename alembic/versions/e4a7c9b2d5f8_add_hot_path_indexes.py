@@ -0,0 +1,60 @@
+"""add hot path indexes
+
+Revision ID: e4a7c9b2d5f8
+Revises: d2f6a8c4e1b9
+Create Date: 2026-03-09
+
+Índices para las consultas de stats, reportes, cierre de caja y kardex.
+Se crean con CONCURRENTLY (fuera de transacción) para no bloquear
+escrituras en inquilinos grandes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e4a7c9b2d5f8'
+down_revision: Union[str, Sequence[str], None] = 'd2f6a8c4e1b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nombre, tabla, columnas)
+HOT_PATH_INDEXES = [
+    ("ix_sales_fecha_emision", "sales", "fecha_emision"),
+    ("ix_sales_tipo_dte_folio", "sales", "tipo_dte, folio"),
+    ("ix_sales_seller_id_created_at", "sales", "seller_id, created_at"),
+    ("ix_sale_details_sale_id", "sale_details", "sale_id"),
+    ("ix_sale_details_product_id", "sale_details", "product_id"),
+    ("ix_sale_payments_sale_id", "sale_payments", "sale_id"),
+    ("ix_stock_movements_product_id_fecha", "stock_movements", "product_id, fecha"),
+    ("ix_cash_sessions_user_id_status", "cash_sessions", "user_id, status"),
+]
+
+
+def get_tenant_schemas():
+    bind = op.get_bind()
+    result = bind.execute(sa.text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE 'tenant_%'"))
+    return [row[0] for row in result.fetchall()]
+
+
+def upgrade() -> None:
+    schemas = get_tenant_schemas()
+    with op.get_context().autocommit_block():
+        for schema in schemas:
+            for name, table, columns in HOT_PATH_INDEXES:
+                try:
+                    op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON "{schema}".{table} ({columns})')
+                except Exception as e:
+                    print(f"Skipping {name} across {schema}: {e}")
+
+
+def downgrade() -> None:
+    schemas = get_tenant_schemas()
+    with op.get_context().autocommit_block():
+        for schema in schemas:
+            for name, _, _ in HOT_PATH_INDEXES:
+                try:
+                    op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{schema}".{name}')
+                except Exception as e:
+                    print(f"Skipping drop {name} across {schema}: {e}")
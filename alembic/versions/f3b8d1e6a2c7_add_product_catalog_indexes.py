@@ -0,0 +1,54 @@
+"""add product catalog indexes
+
+Revision ID: f3b8d1e6a2c7
+Revises: e4a7c9b2d5f8
+Create Date: 2026-03-10
+
+Índices para el listado paginado del catálogo: filtro por marca y carga
+por lotes de variantes (`WHERE parent_id IN (...)`).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f3b8d1e6a2c7'
+down_revision: Union[str, Sequence[str], None] = 'e4a7c9b2d5f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nombre, tabla, columnas)
+CATALOG_INDEXES = [
+    ("ix_products_brand_id", "products", "brand_id"),
+    ("ix_products_parent_id", "products", "parent_id"),
+]
+
+
+def get_tenant_schemas():
+    bind = op.get_bind()
+    result = bind.execute(sa.text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE 'tenant_%'"))
+    return [row[0] for row in result.fetchall()]
+
+
+def upgrade() -> None:
+    schemas = get_tenant_schemas()
+    with op.get_context().autocommit_block():
+        for schema in schemas:
+            for name, table, columns in CATALOG_INDEXES:
+                try:
+                    op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON "{schema}".{table} ({columns})')
+                except Exception as e:
+                    print(f"Skipping {name} across {schema}: {e}")
+
+
+def downgrade() -> None:
+    schemas = get_tenant_schemas()
+    with op.get_context().autocommit_block():
+        for schema in schemas:
+            # ix_products_parent_id ya existía en esquemas creados desde modelo_base_datos.sql
+            for name, _, _ in CATALOG_INDEXES[:1]:
+                try:
+                    op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{schema}".{name}')
+                except Exception as e:
+                    print(f"Skipping drop {name} across {schema}: {e}")
@@ -5,10 +5,18 @@ Lee las credenciales desde variables de entorno para mantener
 la seguridad y portabilidad del proyecto.
 """
 
+import asyncio
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -24,9 +32,26 @@ DB_NAME = os.getenv("TORN_DB_NAME", "torn_db")
 DATABASE_URL = (
     f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
+ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+# ── Pooling ──────────────────────────────────────────────────────────
+DB_POOL_SIZE = int(os.getenv("TORN_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("TORN_DB_MAX_OVERFLOW", "10"))
+TENANT_POOL_SIZE = int(os.getenv("TORN_TENANT_POOL_SIZE", "2"))
+TENANT_MAX_OVERFLOW = int(os.getenv("TORN_TENANT_MAX_OVERFLOW", "3"))
+TENANT_POOL_MAX_TENANTS = int(os.getenv("TORN_TENANT_POOL_MAX_TENANTS", "50"))
+TENANT_POOL_TIMEOUT = float(os.getenv("TORN_TENANT_POOL_TIMEOUT", "10"))
 
 # ── SQLAlchemy engine & session ──────────────────────────────────────
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -40,3 +65,193 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ── Engine async (asyncpg) ───────────────────────────────────────────
+# Para handlers `async def`: las consultas ceden el loop en vez de
+# bloquearlo. El engine se crea con el primer uso (scripts y workers que
+# sólo usan el engine síncrono no cargan asyncpg).
+
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+_async_engine: Optional[AsyncEngine] = None
+_async_engine_lock = threading.Lock()
+
+
+def get_async_engine() -> AsyncEngine:
+    """Retorna (creándolo si no existe) el engine async del esquema `public`."""
+    global _async_engine
+    with _async_engine_lock:
+        if _async_engine is None:
+            _async_engine = create_async_engine(
+                ASYNC_DATABASE_URL,
+                echo=False,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_pre_ping=True,
+            )
+        return _async_engine
+
+
+async def get_async_db():
+    """Generador de sesión async (esquema `public`) para dependencias de FastAPI."""
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
+
+
+# ── Pools por Inquilino ──────────────────────────────────────────────
+
+_SCHEMA_NAME_RE = re.compile(r"^[a-z_][a-z0-9_]{0,62}$")
+
+
+class TenantPoolManager:
+    """Administra un pool de conexiones dedicado por esquema de Inquilino.
+
+    Cada pool abre sus conexiones con `search_path` fijado sólo al esquema
+    del Inquilino (sin `public`: `create_all` deja copias de las tablas
+    operativas en `public` y una tabla faltante en el esquema mezclaría
+    datos entre Inquilinos) y el engine aplica además
+    `schema_translate_map={None: schema}` a las consultas ORM. Los modelos
+    globales ya van calificados con `public`. Las conexiones quedan
+    "tibias" entre requests. Cada Inquilino puede
+    tener como máximo `pool_size + max_overflow` conexiones; cuando hay más
+    de `max_tenants` pools se desaloja el de uso más antiguo que no tenga
+    conexiones en uso (LRU).
+
+    Attributes:
+        url (str): URL de conexión a PostgreSQL.
+        pool_size (int): Conexiones persistentes por Inquilino.
+        max_overflow (int): Conexiones adicionales temporales por Inquilino.
+        max_tenants (int): Cantidad de pools retenidos simultáneamente.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int = TENANT_POOL_SIZE,
+        max_overflow: int = TENANT_MAX_OVERFLOW,
+        max_tenants: int = TENANT_POOL_MAX_TENANTS,
+        pool_timeout: float = TENANT_POOL_TIMEOUT,
+    ):
+        self.url = url
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.max_tenants = max_tenants
+        self.pool_timeout = pool_timeout
+        self._engines: "OrderedDict[str, Engine]" = OrderedDict()
+        self._last_used: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _create_engine(self, schema_name: str):
+        """Crea el engine del Inquilino con `search_path` fijado sólo a su esquema."""
+        return create_engine(
+            self.url,
+            echo=False,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_pre_ping=True,
+            connect_args={"options": f"-csearch_path={schema_name}"},
+        ).execution_options(schema_translate_map={None: schema_name})
+
+    def get_engine(self, schema_name: str) -> Engine:
+        """Retorna (creándolo si no existe) el engine del esquema indicado.
+
+        Raises:
+            ValueError: Si `schema_name` no es un identificador de esquema válido.
+        """
+        if not _SCHEMA_NAME_RE.match(schema_name or ""):
+            raise ValueError(f"Nombre de esquema inválido: {schema_name!r}")
+
+        with self._lock:
+            tenant_engine = self._engines.get(schema_name)
+            if tenant_engine is None:
+                tenant_engine = self._create_engine(schema_name)
+                self._engines[schema_name] = tenant_engine
+            self._engines.move_to_end(schema_name)
+            self._last_used[schema_name] = time.time()
+            self._evict_idle()
+            return tenant_engine
+
+    def _evict_idle(self) -> None:
+        """Desaloja pools ociosos (LRU) mientras se supere `max_tenants`."""
+        if len(self._engines) <= self.max_tenants:
+            return
+        for schema_name in list(self._engines.keys()):
+            if len(self._engines) <= self.max_tenants:
+                break
+            tenant_engine = self._engines[schema_name]
+            # Nunca cerramos un pool con conexiones prestadas a un request
+            if tenant_engine.pool.checkedout() > 0:
+                continue
+            del self._engines[schema_name]
+            self._last_used.pop(schema_name, None)
+            self._dispose_engine(tenant_engine)
+            self.evictions += 1
+
+    def _dispose_engine(self, tenant_engine) -> None:
+        tenant_engine.dispose()
+
+    def dispose(self, schema_name: str | None = None) -> None:
+        """Cierra el pool de un esquema, o todos si no se indica ninguno."""
+        with self._lock:
+            targets = [schema_name] if schema_name else list(self._engines.keys())
+            for name in targets:
+                tenant_engine = self._engines.pop(name, None)
+                self._last_used.pop(name, None)
+                if tenant_engine is not None:
+                    self._dispose_engine(tenant_engine)
+
+    def stats(self) -> dict:
+        """Estadísticas de los pools activos, por Inquilino."""
+        with self._lock:
+            tenants = {}
+            for name, tenant_engine in self._engines.items():
+                pool = tenant_engine.pool
+                tenants[name] = {
+                    "pool_size": pool.size(),
+                    "checked_out": pool.checkedout(),
+                    "checked_in": pool.checkedin(),
+                    "overflow": pool.overflow(),
+                    "last_used": self._last_used.get(name),
+                }
+            return {
+                "tenants_pooled": len(self._engines),
+                "max_tenants": self.max_tenants,
+                "per_tenant_limit": self.pool_size + self.max_overflow,
+                "evictions": self.evictions,
+                "tenants": tenants,
+            }
+
+
+class AsyncTenantPoolManager(TenantPoolManager):
+    """Pools async (asyncpg) por esquema, con las mismas reglas de tamaño y LRU.
+
+    `search_path` (sólo el esquema del Inquilino) se fija con
+    `server_settings` de asyncpg al abrir cada conexión.
+    """
+
+    def _create_engine(self, schema_name: str) -> AsyncEngine:
+        return create_async_engine(
+            self.url,
+            echo=False,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_pre_ping=True,
+            connect_args={"server_settings": {"search_path": schema_name}},
+        ).execution_options(schema_translate_map={None: schema_name})
+
+    def _dispose_engine(self, tenant_engine: AsyncEngine) -> None:
+        # `AsyncEngine.dispose` es una corrutina: se agenda en el loop en curso
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(tenant_engine.dispose())
+        else:
+            loop.create_task(tenant_engine.dispose())
+
+
+tenant_pools = TenantPoolManager(DATABASE_URL)
+async_tenant_pools = AsyncTenantPoolManager(ASYNC_DATABASE_URL)
@@ -2,14 +2,30 @@
 
 Provee la sesión de base de datos enrutada dinámicamente al esquema
 correspondiente al Tenant solicitado, garantizando aislamiento de datos físicos.
+
+La resolución del usuario global y de su membresía (en cada request) usa
+la sesión async de `public`, de modo que un fallo de caché no bloquea el
+loop de eventos. `get_tenant_db` entrega una sesión síncrona (para
+handlers `def`, que FastAPI ejecuta en su threadpool) y
+`get_tenant_async_db` una `AsyncSession` para handlers `async def`.
+
+Con tokens con claims (`TORN_AUTH_CLAIMS`) el usuario y su membresía salen
+del propio token: sólo se verifica su versión contra `token_versions`
+(caché de `TORN_TOKEN_VERSION_TTL` segundos), así que un request típico
+del POS no consulta `public`.
 """
 
+import os
+from dataclasses import dataclass
 from typing import Annotated, Optional
 from fastapi import Depends, HTTPException, Header, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.engine import Connection
 
-from app.database import engine, SessionLocal
+from app.database import AsyncSessionLocal, SessionLocal, async_tenant_pools, get_async_db, tenant_pools
 from app.models.saas import SaaSUser, Tenant, TenantUser
 from app.models.user import User
 from jose import JWTError, jwt
@@ -17,11 +33,145 @@ from jose import JWTError, jwt
 # Importamos variables de seguridad (asumiendo que están en su utils original o auth.py)
 # Importamos variables de seguridad
 from app.utils.security import SECRET_KEY, ALGORITHM
+from app.utils.cache import TTLCache
 from fastapi.security import OAuth2PasswordBearer
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
+# ── Caché de membresías ──────────────────────────────────────────────
+# Evita consultar SaaSUser / TenantUser / Tenant en `public` en cada request.
+# Clave: (sub del token, tenant_id) — tenant_id=None para el usuario global.
+
+@dataclass(frozen=True)
+class CachedGlobalUser:
+    """Snapshot inmutable de un `SaaSUser` resuelto desde el JWT."""
+    id: int
+    email: str
+    full_name: Optional[str]
+    is_active: bool
+    is_superuser: bool
+
+
+@dataclass(frozen=True)
+class CachedMembership:
+    """Snapshot de la membresía resuelta de un usuario en un Inquilino."""
+    membership_id: Optional[int]
+    user_id: int
+    tenant_id: int
+    role_name: str
+    is_active: bool
+    schema_name: Optional[str]
+    tenant_is_active: bool
+
+
+membership_cache = TTLCache(
+    ttl=float(os.getenv("TORN_AUTH_CACHE_TTL", "60")),
+    max_entries=int(os.getenv("TORN_AUTH_CACHE_MAX_ENTRIES", "10000")),
+)
+
+
+# {user_id: (token_version, is_active)} y {tenant_id: is_active} para validar
+# tokens con claims: el token no congela el estado de usuario ni Inquilino
+token_versions = TTLCache(
+    ttl=float(os.getenv("TORN_TOKEN_VERSION_TTL", "30")),
+    max_entries=int(os.getenv("TORN_AUTH_CACHE_MAX_ENTRIES", "10000")),
+)
+tenant_states = TTLCache(
+    ttl=float(os.getenv("TORN_TOKEN_VERSION_TTL", "30")),
+    max_entries=int(os.getenv("TORN_AUTH_CACHE_MAX_ENTRIES", "10000")),
+)
+
+
+def invalidate_membership_cache(tenant_id: Optional[int] = None, subject: Optional[str] = None) -> int:
+    """Invalida entradas de la caché de membresías.
+
+    Debe llamarse tras modificar membresías, roles o el estado de un Inquilino.
+
+    Args:
+        tenant_id: Si se indica, elimina las membresías de ese Inquilino.
+        subject: Si se indica, elimina todas las entradas del usuario (email / sub).
+            Sin argumentos se vacía la caché completa.
+
+    Returns:
+        int: Cantidad de entradas eliminadas.
+    """
+    if tenant_id is None and subject is None:
+        removed = membership_cache.stats()["entries"]
+        membership_cache.clear()
+        tenant_states.clear()
+        return removed
+    if tenant_id is not None:
+        tenant_states.pop(tenant_id)
+
+    def _match(key, _value) -> bool:
+        key_subject, key_tenant = key
+        if subject is not None and key_subject == subject:
+            return True
+        return tenant_id is not None and key_tenant == tenant_id
+
+    return membership_cache.invalidate_where(_match)
+
+
+def revoke_user_tokens(db: Session, user_id: Optional[int] = None, tenant_id: Optional[int] = None) -> int:
+    """Incrementa `token_version` (cierre de sesión forzado; hace commit).
+
+    Los tokens con claims emitidos antes dejan de aceptarse en este worker de
+    inmediato y en los demás al expirar `token_versions` (TTL corto).
+
+    Args:
+        user_id: Usuario a revocar.
+        tenant_id: Revoca a todos los usuarios con membresía en el Inquilino.
+
+    Returns:
+        int: Usuarios afectados.
+    """
+    stmt = update(SaaSUser).values(token_version=SaaSUser.token_version + 1)
+    if user_id is not None:
+        stmt = stmt.where(SaaSUser.id == user_id)
+    elif tenant_id is not None:
+        stmt = stmt.where(SaaSUser.id.in_(select(TenantUser.user_id).where(TenantUser.tenant_id == tenant_id)))
+    else:
+        raise ValueError("Indique user_id o tenant_id")
+    affected = db.execute(stmt.execution_options(synchronize_session=False)).rowcount
+    db.commit()
+    if user_id is not None:
+        token_versions.pop(user_id)
+    else:
+        token_versions.clear()
+    return affected
+
+
+def _user_from_cache(cached: CachedGlobalUser) -> SaaSUser:
+    """Reconstruye un `SaaSUser` transitorio (sin sesión) desde el snapshot."""
+    return SaaSUser(
+        id=cached.id,
+        email=cached.email,
+        full_name=cached.full_name,
+        is_active=cached.is_active,
+        is_superuser=cached.is_superuser,
+    )
+
+
+def _membership_from_cache(cached: CachedMembership, user: SaaSUser) -> TenantUser:
+    """Reconstruye un `TenantUser` transitorio con su `Tenant` y `SaaSUser`."""
+    tenant_user = TenantUser(
+        id=cached.membership_id,
+        tenant_id=cached.tenant_id,
+        user_id=cached.user_id,
+        role_name=cached.role_name,
+        is_active=cached.is_active,
+    )
+    tenant_user.user = user
+    if cached.schema_name is not None:
+        tenant_user.tenant = Tenant(
+            id=cached.tenant_id,
+            schema_name=cached.schema_name,
+            is_active=cached.tenant_is_active,
+        )
+    return tenant_user
+
+
 def get_global_db():
     """Retorna una sesión global sin mapeo de esquema (apunta a public)."""
     db = SessionLocal()
@@ -31,9 +181,61 @@ def get_global_db():
         db.close()
 
 
+async def get_global_async_db():
+    """Retorna una sesión global async (apunta a public)."""
+    async for db in get_async_db():
+        yield db
+
+
+async def get_token_claims(token: Annotated[str, Depends(oauth2_scheme)]) -> dict:
+    """Decodifica el JWT de acceso (los refresh tokens no sirven como acceso)."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        payload = {}
+    # Historicamente en Torn se usaba RUT o Email como sub
+    if payload.get("sub") is None or payload.get("typ", "access") != "access":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No se pudo validar la sesión global",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+
+async def _check_token_version(claims: dict, global_db: AsyncSession) -> None:
+    """401 si el usuario fue desactivado o sus tokens revocados (estado cacheado)."""
+    user_id = claims["uid"]
+    cached = token_versions.get(user_id)
+    if cached is None:
+        row = (await global_db.execute(
+            select(SaaSUser.token_version, SaaSUser.is_active).where(SaaSUser.id == user_id)
+        )).first()
+        cached = (row.token_version or 0, bool(row.is_active)) if row else (None, False)
+        token_versions.set(user_id, cached)
+    version, is_active = cached
+    if not is_active or version != claims.get("ver", 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sesión revocada, inicie sesión nuevamente",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+async def _tenant_is_active(tenant_id: int, global_db: AsyncSession) -> bool:
+    """Estado actual del Inquilino (cacheado `TORN_TOKEN_VERSION_TTL` segundos)."""
+    is_active = tenant_states.get(tenant_id)
+    if is_active is None:
+        is_active = bool((await global_db.execute(
+            select(Tenant.is_active).where(Tenant.id == tenant_id)
+        )).scalar())
+        tenant_states.set(tenant_id, is_active)
+    return is_active
+
+
 async def get_current_global_user(
-    token: Annotated[str, Depends(oauth2_scheme)], 
-    global_db: Session = Depends(get_global_db)
+    claims: Annotated[dict, Depends(get_token_claims)],
+    global_db: AsyncSession = Depends(get_global_async_db)
 ) -> SaaSUser:
     """Valida el JWT y retorna el Usuario Global del SaaS."""
     credentials_exception = HTTPException(
@@ -41,32 +243,82 @@ async def get_current_global_user(
         detail="No se pudo validar la sesión global",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        # Historicamente en Torn se usaba RUT o Email como sub
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-        
-    user = global_db.query(SaaSUser).filter(SaaSUser.email == username).first()
+    username: str = claims["sub"]
+
+    if "uid" in claims:
+        await _check_token_version(claims, global_db)
+        _, is_active = token_versions.get(claims["uid"]) or (None, True)
+        return SaaSUser(
+            id=claims["uid"],
+            email=username,
+            full_name=claims.get("name"),
+            is_active=is_active,
+            is_superuser=bool(claims.get("su")),
+        )
+
+    cached = membership_cache.get((username, None))
+    if cached is not None:
+        return _user_from_cache(cached)
+
+    user = (await global_db.execute(select(SaaSUser).where(SaaSUser.email == username))).scalars().first()
     if user is None:
         raise credentials_exception
+
+    membership_cache.set((username, None), CachedGlobalUser(
+        id=user.id,
+        email=user.email,
+        full_name=user.full_name,
+        is_active=bool(user.is_active),
+        is_superuser=bool(user.is_superuser),
+    ))
     return user
 
 
 async def get_current_tenant_user(
     x_tenant_id: Annotated[int, Header(description="ID del Tenant a consultar")],
     current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
-    global_db: Session = Depends(get_global_db)
+    claims: Annotated[dict, Depends(get_token_claims)],
+    global_db: AsyncSession = Depends(get_global_async_db)
 ) -> TenantUser:
     """Valida y retorna la membresía (TenantUser) del usuario global en el Inquilino solicitado."""
-    tenant_user = global_db.query(TenantUser).filter(
-        TenantUser.user_id == current_user.id,
-        TenantUser.tenant_id == x_tenant_id,
-        TenantUser.is_active == True
-    ).first()
+    tenants = claims.get("tnt")
+    if tenants is not None:
+        entry = tenants.get(str(x_tenant_id))
+        if entry is not None:
+            # El rol viaja en el token (un cambio de rol revoca los tokens);
+            # los estados activos se leen del estado vigente (`get_current_global_user`
+            # ya rechazó al usuario desactivado o revocado)
+            role_name, schema_name = entry
+            return _membership_from_cache(CachedMembership(
+                membership_id=None,
+                user_id=current_user.id,
+                tenant_id=x_tenant_id,
+                role_name=role_name,
+                is_active=bool(current_user.is_active),
+                schema_name=schema_name,
+                tenant_is_active=await _tenant_is_active(x_tenant_id, global_db),
+            ), current_user)
+        if not current_user.is_superuser:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No tienes acceso a este Inquilino / Empresa."
+            )
+
+    cache_key = (current_user.email, x_tenant_id)
+    cached = membership_cache.get(cache_key)
+    if cached is not None:
+        return _membership_from_cache(cached, current_user)
+
+    tenant_user = (await global_db.execute(
+        select(TenantUser).options(
+            joinedload(TenantUser.tenant),
+            joinedload(TenantUser.user),
+        ).where(
+            TenantUser.user_id == current_user.id,
+            TenantUser.tenant_id == x_tenant_id,
+            TenantUser.is_active == True
+        )
+    )).scalars().first()
 
     if not tenant_user and not current_user.is_superuser:
         raise HTTPException(
@@ -78,59 +330,103 @@ async def get_current_tenant_user(
     if not tenant_user and current_user.is_superuser:
         # Mock de admin para el superusuario
         tenant_user = TenantUser(tenant_id=x_tenant_id, user_id=current_user.id, role_name="ADMINISTRADOR")
-        
+        tenant = await global_db.get(Tenant, x_tenant_id)
+    else:
+        tenant = tenant_user.tenant
+
+    if tenant is not None:
+        membership_cache.set(cache_key, CachedMembership(
+            membership_id=tenant_user.id,
+            user_id=current_user.id,
+            tenant_id=x_tenant_id,
+            role_name=tenant_user.role_name,
+            is_active=bool(tenant_user.is_active if tenant_user.is_active is not None else True),
+            schema_name=tenant.schema_name,
+            tenant_is_active=bool(tenant.is_active),
+        ))
+
     return tenant_user
 
 
-async def get_tenant_db(
-    x_tenant_id: Annotated[int, Header()],
-    tenant_user: Annotated[TenantUser, Depends(get_current_tenant_user)],
-    global_db: Session = Depends(get_global_db)
-) -> Session:
-    """Retorna una sesión DB mapeada al esquema del Tenant."""
-    
-    # 2. Obtener la metadata del tenant (el schema_name real)
-    tenant = tenant_user.tenant if hasattr(tenant_user, "tenant") and tenant_user.tenant is not None else global_db.query(Tenant).filter(Tenant.id == x_tenant_id).first()
-    
+async def _active_tenant(tenant_user: TenantUser, x_tenant_id: int, global_db: AsyncSession) -> Tenant:
+    """Tenant de la membresía (o consultado por ID); 404 si no existe o está inactivo."""
+    tenant = getattr(tenant_user, "tenant", None) or await global_db.get(Tenant, x_tenant_id)
     if not tenant or not tenant.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Inquilino no encontrado o inactivo."
         )
+    return tenant
+
+
+async def get_tenant_db(
+    x_tenant_id: Annotated[int, Header()],
+    tenant_user: Annotated[TenantUser, Depends(get_current_tenant_user)],
+    global_db: AsyncSession = Depends(get_global_async_db)
+) -> Session:
+    """Retorna una sesión DB mapeada al esquema del Tenant."""
+    tenant = await _active_tenant(tenant_user, x_tenant_id, global_db)
 
-    # 3. Configurar SQLAlchemy para apuntar la sesión a ese esquema
-    connection = engine.connect()
-    connection.execution_options(schema_translate_map={None: tenant.schema_name})
-    
-    tenant_session = SessionLocal(bind=connection)
+    # Tomar una sesión del pool del Inquilino (conexiones con search_path en su esquema)
+    tenant_session = SessionLocal(bind=tenant_pools.get_engine(tenant.schema_name))
+    tenant_session.info["schema_name"] = tenant.schema_name
+    tenant_session.info["tenant_id"] = tenant.id
     try:
         yield tenant_session
     finally:
-        tenant_session.close()
-        connection.execution_options(schema_translate_map=None)
-        connection.close()
+        # Devolver la conexión al pool hace I/O (rollback): fuera del loop
+        await run_in_threadpool(tenant_session.close)
 
-async def get_current_local_user(
-    current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
-    tenant_db: Session = Depends(get_tenant_db)
-) -> User:
-    """Retorna el usuario operativo local, con bypass para el administrador global SaaS."""
+
+async def get_tenant_async_db(
+    x_tenant_id: Annotated[int, Header()],
+    tenant_user: Annotated[TenantUser, Depends(get_current_tenant_user)],
+    global_db: AsyncSession = Depends(get_global_async_db)
+) -> AsyncSession:
+    """Versión async de `get_tenant_db` (pool asyncpg del esquema del Tenant)."""
+    tenant = await _active_tenant(tenant_user, x_tenant_id, global_db)
+    async with AsyncSessionLocal(bind=async_tenant_pools.get_engine(tenant.schema_name)) as tenant_session:
+        tenant_session.info["schema_name"] = tenant.schema_name
+        tenant_session.info["tenant_id"] = tenant.id
+        yield tenant_session
+
+
+def _local_user_stmt(current_user: SaaSUser):
     if current_user.is_superuser:
-        local_user = tenant_db.query(User).filter(User.is_system_user == True).first()
-        if not local_user:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Usuario de soporte inyectado no encontrado en el inquilino local."
-            )
+        return select(User).where(User.is_system_user == True).limit(1)
+    return select(User).where(User.email == current_user.email).limit(1)
+
+
+def _require_local_user(current_user: SaaSUser, local_user: Optional[User]) -> User:
+    if local_user:
         return local_user
-    
-    local_user = tenant_db.query(User).filter(User.email == current_user.email).first()
-    if not local_user:
+    if current_user.is_superuser:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Usuario local no encontrado en la sucursal actual."
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Usuario de soporte inyectado no encontrado en el inquilino local."
         )
-    return local_user
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Usuario local no encontrado en la sucursal actual."
+    )
+
+
+def get_current_local_user(
+    current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
+    tenant_db: Session = Depends(get_tenant_db)
+) -> User:
+    """Retorna el usuario operativo local, con bypass para el administrador global SaaS."""
+    local_user = tenant_db.execute(_local_user_stmt(current_user)).scalars().first()
+    return _require_local_user(current_user, local_user)
+
+
+async def get_current_local_user_async(
+    current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
+    tenant_db: AsyncSession = Depends(get_tenant_async_db)
+) -> User:
+    """Versión async de `get_current_local_user` (para handlers `async def`)."""
+    local_user = (await tenant_db.execute(_local_user_stmt(current_user))).scalars().first()
+    return _require_local_user(current_user, local_user)
 
 
 async def require_admin(tenant_user: Annotated[TenantUser, Depends(get_current_tenant_user)]):
@@ -3,11 +3,18 @@ Torn - Facturador Electrónico (SII Chile)
 Punto de entrada principal de la aplicación FastAPI.
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 
 from app.database import Base, engine
-from app.routers import customers, health, issuer, products, sales, inventory, cash, reports, brands, providers, purchases, stats, users, config, auth, roles, price_lists
+from app.services.folio_allocator import folio_allocator
+from app.services.dte_pipeline import dte_pipeline
+from app.services.dte_signer import signing_pool
+from app.services import document_renderer
+from app.utils.security import PasswordPoolBusy, password_pool
+from app.routers import customers, health, issuer, products, sales, inventory, cash, reports, brands, providers, purchases, stats, users, config, auth, roles, price_lists, catalog
 
 app = FastAPI(
     title="Torn - Facturador Electrónico",
@@ -31,13 +38,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy_handler(request: Request, exc: PasswordPoolBusy):
+    """Pool de bcrypt saturado (login, alta o cambio de contraseña): 503 reintentable."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Demasiadas operaciones de contraseña simultáneas, reintente en unos segundos"},
+        headers={"Retry-After": "2"},
+    )
 
 
 @app.on_event("startup")
 def on_startup():
-    """Crear tablas en la BD (si no existen) al iniciar la app."""
+    """Crear tablas en la BD (si no existen), compilar plantillas e iniciar el pipeline DTE."""
     Base.metadata.create_all(bind=engine)
+    document_renderer.warm_up()
+    dte_pipeline.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """Detener el pipeline DTE y los pools de firma y contraseñas, y liberar los folios reservados por este worker."""
+    dte_pipeline.stop()
+    signing_pool.stop()
+    password_pool.stop()
+    folio_allocator.release_all()
 
 # ── Routers ──────────────────────────────────────────────────────────
 from app.routers import saas
@@ -60,6 +90,7 @@ from app.routers import auth
 app.include_router(auth.router)
 app.include_router(roles.router)
 app.include_router(price_lists.router)
+app.include_router(catalog.router)
 from app.routers import folios
 app.include_router(folios.router)
 
@@ -4,11 +4,12 @@ from .user import User
 from .issuer import Issuer
 from .sale import Sale, SaleDetail
 from .dte import DTE, CAF
-from .inventory import StockMovement
-from .cash import CashSession
+from .inventory import StockBalanceCheckpoint, StockMovement, StockTake, StockTakeLine
+from .cash import CashSession, CashSessionTotal
 from .payment import PaymentMethod, SalePayment
 from .provider import Provider
 from .purchase import Purchase, PurchaseDetail
 from .tax import Tax
 from .settings import SystemSettings
 from .price_list import PriceList, PriceListProduct
+from .rollup import SalesDailyRollup, SalesHourlyRollup, SalesProductDailyRollup, SalesPaymentDailyRollup
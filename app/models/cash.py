@@ -1,6 +1,6 @@
 """Modelo de Caja (Sesiones)."""
 
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Boolean, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -24,6 +24,9 @@ class CashSession(Base):
         status (str): Estado de la sesión ('OPEN', 'CLOSED').
     """
     __tablename__ = "cash_sessions"
+    __table_args__ = (
+        Index("ix_cash_sessions_user_id_status", "user_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -43,7 +46,35 @@ class CashSession(Base):
 
     # Relaciones
     user = relationship("app.models.user.User", backref="cash_sessions")
+    totals = relationship("CashSessionTotal", back_populates="session", cascade="all, delete-orphan")
 
     def __repr__(self) -> str:
         """Retorna representación string del objeto."""
         return f"<CashSession(user={self.user_id}, status={self.status}, start={self.start_amount})>"
+
+
+class CashSessionTotal(Base):
+    """Total acumulado de una sesión de caja por medio de pago.
+
+    Se actualiza con un upsert atómico (`amount = amount + ...`) al confirmar
+    cada venta o devolución del cajero (`app.services.cash_totals`), de modo
+    que el estado y el cierre de caja no recorren las ventas.
+
+    Attributes:
+        cash_session_id (int): Sesión (PK, FK).
+        payment_method_id (int): Medio de pago (PK, FK).
+        count (int): Cantidad de pagos registrados.
+        amount (Numeric): Monto neto (ventas menos devoluciones).
+    """
+    __tablename__ = "cash_session_totals"
+
+    cash_session_id = Column(Integer, ForeignKey("cash_sessions.id", ondelete="CASCADE"), primary_key=True)
+    payment_method_id = Column(Integer, ForeignKey("payment_methods.id"), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(15, 2), nullable=False, default=0)
+
+    session = relationship("CashSession", back_populates="totals")
+    payment_method = relationship("app.models.payment.PaymentMethod")
+
+    def __repr__(self) -> str:
+        return f"<CashSessionTotal(session={self.cash_session_id}, method={self.payment_method_id}, amount={self.amount})>"
@@ -1,6 +1,6 @@
 """Modelos de Documento Tributario Electrónico (DTE) y Folios (CAF)."""
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -19,7 +19,7 @@ class DTE(Base):
         folio (int): Folio asignado.
         xml_content (str): Contenido XML firmado digitalmente.
         track_id (str): Identificador de envío devuelto por el SII.
-        estado_sii (str): Estado del envío (pendiente, aceptado, rechazado).
+        estado_sii (str): Estado del documento (PENDIENTE, GENERADO, ERROR) y luego del envío al SII.
         created_at (datetime): Fecha de generación.
         updated_at (datetime): Última actualización de estado.
     """
@@ -31,7 +31,7 @@ class DTE(Base):
     folio = Column(Integer, nullable=False)
     xml_content = Column(Text, comment="XML firmado del DTE")
     track_id = Column(String(50), comment="Track ID devuelto por el SII")
-    estado_sii = Column(String(20), default="pendiente", comment="pendiente|enviado|aceptado|rechazado")
+    estado_sii = Column(String(20), default="PENDIENTE", comment="PENDIENTE|GENERADO|ERROR|enviado|aceptado|rechazado")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -43,11 +43,55 @@ class DTE(Base):
         return f"<DTE(tipo={self.tipo_dte}, folio={self.folio}, estado='{self.estado_sii}')>"
 
 
+class DteJob(Base):
+    """Trabajo pendiente del pipeline de DTE.
+
+    La venta se confirma con su DTE en estado PENDIENTE y un `DteJob`; los
+    workers del pipeline (`app.services.dte_pipeline`) toman los trabajos en
+    lotes, generan el XML y actualizan el estado del DTE.
+
+    Attributes:
+        id (int): Identificador único (PK).
+        dte_id (int): DTE a generar (FK).
+        sale_id (int): Venta asociada (FK).
+        status (str): PENDING | PROCESSING | DONE | ERROR.
+        attempts (int): Intentos realizados.
+        last_error (str): Último error registrado.
+        worker_id (str): Worker que tomó el trabajo.
+        available_at (datetime): No se toma antes de esta hora (espera
+            entre reintentos; NULL = disponible).
+        created_at (datetime): Fecha de encolado.
+        updated_at (datetime): Última actualización.
+    """
+    __tablename__ = "dte_jobs"
+    __table_args__ = (
+        Index("ix_dte_jobs_status_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    dte_id = Column(Integer, ForeignKey("dtes.id"), nullable=False)
+    sale_id = Column(Integer, ForeignKey("sales.id"), nullable=False)
+    status = Column(String(20), nullable=False, default="PENDING", comment="PENDING | PROCESSING | DONE | ERROR")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    worker_id = Column(String(100), nullable=True)
+    available_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    dte = relationship("DTE")
+
+    def __repr__(self) -> str:
+        return f"<DteJob(dte_id={self.dte_id}, status='{self.status}', intentos={self.attempts})>"
+
+
 class CAF(Base):
     """Código de Autorización de Folios (CAF).
 
     Almacena los rangos de folios autorizados por el SII mediante un archivo XML
-    que debe ser cargado en el sistema para poder emitir documentos.
+    que debe ser cargado en el sistema para poder emitir documentos. Un mismo
+    tipo de DTE puede tener varios CAF; al agotarse uno se continúa con el
+    siguiente rango (ver `app.services.folio_allocator`).
 
     Attributes:
         id (int): Identificador único (PK).
@@ -61,7 +105,7 @@ class CAF(Base):
     __tablename__ = "cafs"
 
     id = Column(Integer, primary_key=True, index=True)
-    tipo_documento = Column(Integer, unique=True, nullable=False,
+    tipo_documento = Column(Integer, nullable=False, index=True,
                             comment="33=Factura, 34=Exenta, 39=Boleta, 61=NC")
     folio_desde = Column(Integer, nullable=False)
     folio_hasta = Column(Integer, nullable=False)
@@ -75,6 +119,51 @@ class CAF(Base):
         return f"<CAF(tipo={self.tipo_documento}, rango={self.folio_desde}-{self.folio_hasta}, vto={self.fecha_vencimiento})>"
 
 
+class FolioReservation(Base):
+    """Bloque de folios reservado por un worker del POS.
+
+    Cada worker toma un rango contiguo de folios de un CAF para asignarlos en
+    memoria sin bloquear la fila del CAF en cada venta. Al liberarse el bloque
+    se registra `next_folio`, de modo que los folios no usados queden
+    contabilizados y puedan ser reutilizados por otro worker.
+
+    Attributes:
+        id (int): Identificador único (PK).
+        caf_id (int): CAF de origen del rango (FK).
+        tipo_documento (int): Tipo de DTE del rango.
+        folio_desde (int): Primer folio del bloque.
+        folio_hasta (int): Último folio del bloque.
+        next_folio (int): Primer folio aún no usado (al liberar).
+        worker_id (str): Identificador del proceso que tiene el bloque.
+        status (str): ACTIVE | RELEASED | EXHAUSTED.
+        reserved_at (datetime): Fecha de reserva.
+        released_at (datetime): Fecha de liberación.
+    """
+    __tablename__ = "folio_reservations"
+    __table_args__ = (
+        Index("ix_folio_reservations_tipo_status", "tipo_documento", "status"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    caf_id = Column(Integer, ForeignKey("cafs.id"), nullable=False)
+    tipo_documento = Column(Integer, nullable=False)
+    folio_desde = Column(Integer, nullable=False)
+    folio_hasta = Column(Integer, nullable=False)
+    next_folio = Column(Integer, nullable=False)
+    worker_id = Column(String(100), nullable=True)
+    status = Column(String(20), nullable=False, default="ACTIVE", comment="ACTIVE | RELEASED | EXHAUSTED")
+    reserved_at = Column(DateTime(timezone=True), server_default=func.now())
+    released_at = Column(DateTime(timezone=True), nullable=True)
+
+    @property
+    def unused(self) -> int:
+        """Cantidad de folios del bloque que no fueron asignados."""
+        return max(0, self.folio_hasta - self.next_folio + 1)
+
+    def __repr__(self) -> str:
+        return f"<FolioReservation(tipo={self.tipo_documento}, rango={self.folio_desde}-{self.folio_hasta}, status='{self.status}')>"
+
+
 class FolioRequestLog(Base):
     """Registro de solicitudes de folios al SII.
 
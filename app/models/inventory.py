@@ -1,6 +1,6 @@
 """Modelo de Inventario (Movimientos de Stock)."""
 
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Index, Boolean
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -26,6 +26,10 @@ class StockMovement(Base):
         sale_id (int): Venta asociada si corresponde (FK).
     """
     __tablename__ = "stock_movements"
+    __table_args__ = (
+        Index("ix_stock_movements_product_id_fecha", "product_id", "fecha"),
+        Index("ix_stock_movements_product_id_id", "product_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -52,3 +56,85 @@ class StockMovement(Base):
     def __repr__(self) -> str:
         """Retorna representación string del objeto."""
         return f"<StockMovement(prod={self.product_id}, tipo={self.tipo}, cant={self.cantidad})>"
+
+
+class StockBalanceCheckpoint(Base):
+    """Saldo acumulado del kardex de un producto en un movimiento dado.
+
+    Lo escribe la conciliación (`app.services.kardex.reconcile`) cada N
+    movimientos por producto; el kardex calcula los saldos de una página
+    desde el checkpoint anterior en vez de recorrer todo el historial.
+    `movement_id = 0` guarda el saldo de apertura (stock previo al primer
+    movimiento registrado).
+
+    Attributes:
+        product_id (int): Producto (PK, FK).
+        movement_id (int): Último movimiento incluido en el saldo (PK).
+        balance (Numeric): Stock tras `movement_id`.
+        created_at (datetime): Fecha de cálculo.
+    """
+    __tablename__ = "stock_balance_checkpoints"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    movement_id = Column(Integer, primary_key=True, autoincrement=False)
+    balance = Column(Numeric(15, 4), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"<StockBalanceCheckpoint(prod={self.product_id}, mov={self.movement_id}, bal={self.balance})>"
+
+
+class StockTake(Base):
+    """Toma de Inventario (conteo físico).
+
+    Al abrirse guarda una foto (`StockTakeLine.expected`) del stock de los
+    productos incluidos. Al aplicarse, cada producto se ajusta por
+    `counted - expected`, de modo que las ventas ocurridas durante el
+    conteo se conservan. Con `lock_sales` los productos incluidos no pueden
+    moverse (ventas, devoluciones, compras) mientras esté abierta.
+
+    Attributes:
+        id (int): Identificador único (PK).
+        status (str): 'OPEN', 'APPLIED' o 'CANCELLED'.
+        description (str): Glosa (bodega, pasillo, etc.).
+        lock_sales (bool): Bloquea movimientos de los productos incluidos.
+        user_id (int): Usuario que abrió la toma.
+        created_at (datetime): Apertura (momento de la foto).
+        closed_at (datetime): Aplicación o cancelación.
+    """
+    __tablename__ = "stock_takes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), nullable=False, default="OPEN", comment="OPEN | APPLIED | CANCELLED")
+    description = Column(String(255), nullable=True)
+    lock_sales = Column(Boolean, nullable=False, default=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    closed_at = Column(DateTime(timezone=True), nullable=True)
+
+    lines = relationship("StockTakeLine", back_populates="stock_take", cascade="all, delete-orphan")
+
+    def __repr__(self) -> str:
+        return f"<StockTake(id={self.id}, status={self.status})>"
+
+
+class StockTakeLine(Base):
+    """Producto incluido en una toma de inventario.
+
+    Attributes:
+        stock_take_id (int): Toma (PK, FK).
+        product_id (int): Producto (PK, FK).
+        expected (Numeric): Stock del sistema al abrir la toma.
+        counted (Numeric): Cantidad contada (None si aún no se cuenta).
+    """
+    __tablename__ = "stock_take_lines"
+
+    stock_take_id = Column(Integer, ForeignKey("stock_takes.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True, index=True)
+    expected = Column(Numeric(15, 4), nullable=False, default=0)
+    counted = Column(Numeric(15, 4), nullable=True)
+
+    stock_take = relationship("StockTake", back_populates="lines")
+
+    def __repr__(self) -> str:
+        return f"<StockTakeLine(take={self.stock_take_id}, prod={self.product_id}, counted={self.counted})>"
@@ -45,7 +45,7 @@ class SalePayment(Base):
     __tablename__ = "sale_payments"
 
     id = Column(Integer, primary_key=True, index=True)
-    sale_id = Column(Integer, ForeignKey("sales.id"), nullable=False)
+    sale_id = Column(Integer, ForeignKey("sales.id"), nullable=False, index=True)
     payment_method_id = Column(Integer, ForeignKey("payment_methods.id"), nullable=False)
     
     amount = Column(Numeric(15, 2), nullable=False)
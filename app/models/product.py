@@ -54,11 +54,11 @@ class Product(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Variantes (Relación Jerárquica)
-    parent_id = Column(Integer, ForeignKey("products.id"), nullable=True)
+    parent_id = Column(Integer, ForeignKey("products.id"), nullable=True, index=True)
     variants = relationship("Product", backref=backref("parent", remote_side=[id]))
 
     # Marca
-    brand_id = Column(Integer, ForeignKey("brands.id"), nullable=True)
+    brand_id = Column(Integer, ForeignKey("brands.id"), nullable=True, index=True)
     brand = relationship(Brand, back_populates="products")
 
     # Impuesto
@@ -0,0 +1,118 @@
+"""Modelos de agregados precalculados de ventas (rollups).
+
+Se mantienen incrementalmente al confirmar ventas y devoluciones
+(`app.services.sales_rollup`) y alimentan los endpoints de /stats y
+/reports sin recorrer las ventas individuales. Las fechas y horas están
+en hora local de Chile.
+
+Cada agregado se reparte en `shard` filas (por vendedor, ver
+`sales_rollup.shard_for`) para que las ventas concurrentes de distintas
+cajas no compitan por el mismo lock; las lecturas suman todos los shards.
+"""
+
+from sqlalchemy import Column, Integer, Numeric, Date
+
+from app.database import Base
+
+
+class SalesDailyRollup(Base):
+    """Totales de venta por día y tipo de DTE.
+
+    Attributes:
+        fecha (date): Día (hora local).
+        tipo_dte (int): Tipo de documento (33, 39, 61...).
+        shard (int): Partición del contador (sumar todas al leer).
+        count (int): Cantidad de documentos.
+        gross (Numeric): Suma de `monto_total`.
+        net (Numeric): Suma de `monto_neto`.
+        iva (Numeric): Suma de `iva`.
+        margin (Numeric): Suma de cantidad * (precio - costo) de los detalles.
+    """
+    __tablename__ = "sales_daily_rollup"
+
+    fecha = Column(Date, primary_key=True)
+    tipo_dte = Column(Integer, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    count = Column(Integer, nullable=False, default=0)
+    gross = Column(Numeric(15, 2), nullable=False, default=0)
+    net = Column(Numeric(15, 2), nullable=False, default=0)
+    iva = Column(Numeric(15, 2), nullable=False, default=0)
+    margin = Column(Numeric(15, 2), nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<SalesDailyRollup(fecha={self.fecha}, tipo={self.tipo_dte}, count={self.count})>"
+
+
+class SalesHourlyRollup(Base):
+    """Totales de venta por día, hora y tipo de DTE.
+
+    Attributes:
+        fecha (date): Día (hora local).
+        hora (int): Hora del día (0-23).
+        tipo_dte (int): Tipo de documento.
+        shard, count, gross, net, iva, margin: Igual que `SalesDailyRollup`.
+    """
+    __tablename__ = "sales_hourly_rollup"
+
+    fecha = Column(Date, primary_key=True)
+    hora = Column(Integer, primary_key=True)
+    tipo_dte = Column(Integer, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    count = Column(Integer, nullable=False, default=0)
+    gross = Column(Numeric(15, 2), nullable=False, default=0)
+    net = Column(Numeric(15, 2), nullable=False, default=0)
+    iva = Column(Numeric(15, 2), nullable=False, default=0)
+    margin = Column(Numeric(15, 2), nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<SalesHourlyRollup(fecha={self.fecha}, hora={self.hora}, tipo={self.tipo_dte})>"
+
+
+class SalesProductDailyRollup(Base):
+    """Ventas por día, tipo de DTE y producto.
+
+    Attributes:
+        fecha (date): Día (hora local).
+        tipo_dte (int): Tipo de documento.
+        product_id (int): Producto vendido.
+        shard (int): Partición del contador.
+        quantity (Numeric): Suma de cantidades.
+        net (Numeric): Suma de subtotales netos.
+        margin (Numeric): Suma de cantidad * (precio - costo).
+    """
+    __tablename__ = "sales_product_daily_rollup"
+
+    fecha = Column(Date, primary_key=True)
+    tipo_dte = Column(Integer, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    quantity = Column(Numeric(15, 4), nullable=False, default=0)
+    net = Column(Numeric(15, 2), nullable=False, default=0)
+    margin = Column(Numeric(15, 2), nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<SalesProductDailyRollup(fecha={self.fecha}, producto={self.product_id})>"
+
+
+class SalesPaymentDailyRollup(Base):
+    """Pagos por día, tipo de DTE y medio de pago.
+
+    Attributes:
+        fecha (date): Día (hora local).
+        tipo_dte (int): Tipo de documento.
+        payment_method_id (int): Medio de pago.
+        shard (int): Partición del contador.
+        count (int): Cantidad de registros de pago.
+        amount (Numeric): Suma de montos pagados.
+    """
+    __tablename__ = "sales_payment_daily_rollup"
+
+    fecha = Column(Date, primary_key=True)
+    tipo_dte = Column(Integer, primary_key=True)
+    payment_method_id = Column(Integer, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    count = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(15, 2), nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<SalesPaymentDailyRollup(fecha={self.fecha}, medio={self.payment_method_id})>"
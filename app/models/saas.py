@@ -4,7 +4,7 @@ Estos modelos gestionan la infraestructura multi-tenant, usuarios globales
 y los planes de suscripción. Residen exclusivamente en el esquema 'public'.
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Numeric
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Numeric, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -83,6 +83,7 @@ class SaaSUser(Base):
     full_name = Column(String(200))
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False, comment="Admin del SaaS (nosotros)")
+    token_version = Column(Integer, nullable=False, default=0, server_default="0", comment="Incrementar revoca sus tokens")
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -112,3 +113,20 @@ class TenantUser(Base):
     # Relaciones
     tenant = relationship("Tenant", back_populates="users")
     user = relationship("SaaSUser", back_populates="tenants")
+
+
+class TenantRolePermission(Base):
+    """Proyección en 'public' de los permisos de cada rol de cada Tenant.
+
+    Copia de `<schema>.roles.permissions` para armar la lista de empresas
+    del login en una sola consulta. La mantiene `app.services.role_permissions`
+    (aprovisionamiento, edición de roles y resincronización).
+    """
+    __tablename__ = "tenant_role_permissions"
+    __table_args__ = {'schema': 'public'}
+
+    tenant_id = Column(Integer, ForeignKey("public.tenants.id", ondelete="CASCADE"), primary_key=True)
+    role_name = Column(String(50), primary_key=True)
+    permissions = Column(JSON, nullable=False, default={})
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,6 +1,6 @@
 """Modelos de Venta y Detalle de Venta."""
 
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -28,6 +28,10 @@ class Sale(Base):
         related_sale_id (int): ID de venta origen en caso de NC (FK).
     """
     __tablename__ = "sales"
+    __table_args__ = (
+        Index("ix_sales_tipo_dte_folio", "tipo_dte", "folio"),
+        Index("ix_sales_seller_id_created_at", "seller_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False, comment="Legacy Seller ID")
@@ -35,7 +39,7 @@ class Sale(Base):
     folio = Column(Integer, nullable=False)
     tipo_dte = Column(Integer, nullable=False, default=33,
                       comment="33=Factura, 34=Exenta, 39=Boleta, 61=NC")
-    fecha_emision = Column(DateTime(timezone=True), server_default=func.now())
+    fecha_emision = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     monto_neto = Column(Numeric(15, 2), default=0)
     iva = Column(Numeric(15, 2), default=0)
     monto_total = Column(Numeric(15, 2), default=0)
@@ -79,8 +83,8 @@ class SaleDetail(Base):
     __tablename__ = "sale_details"
 
     id = Column(Integer, primary_key=True, index=True)
-    sale_id = Column(Integer, ForeignKey("sales.id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    sale_id = Column(Integer, ForeignKey("sales.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     cantidad = Column(Numeric(15, 4), nullable=False, default=1)
     precio_unitario = Column(Numeric(15, 2), nullable=False)
     descuento = Column(Numeric(15, 2), default=0)
@@ -3,115 +3,162 @@ from typing import Annotated, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
 from jose import JWTError, jwt
 
 from app.database import get_db
-from app.dependencies.tenant import get_global_db, get_current_global_user
-from app.models.saas import SaaSUser, TenantUser
-from app.schemas_saas import SaaSUserLogin, SaaSToken, SaaSUserOut, AvailableTenant
+from app.dependencies.tenant import get_global_async_db, get_current_global_user, token_versions
+from app.models.saas import SaaSUser
+from app.schemas_saas import SaaSUserLogin, SaaSToken, SaaSUserOut, AvailableTenant, TokenRefresh, TokenRefreshOut
+from app.services.role_permissions import user_tenants_stmt
 from app.utils.security import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    ALGORITHM,
+    AUTH_CLAIMS,
+    CLAIMS_TOKEN_EXPIRE_MINUTES,
+    SECRET_KEY,
     create_access_token,
-    verify_password,
+    create_claims_token,
+    create_refresh_token,
+    verify_and_update_async,
 )
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-def _get_user_tenants(global_db: Session, user_id: int) -> list[AvailableTenant]:
-    """Helper to get a list of tenants the user can access."""
-    tenant_users = global_db.query(TenantUser).options(
-        joinedload(TenantUser.tenant)
-    ).filter(
-        TenantUser.user_id == user_id,
-        TenantUser.is_active == True
-    ).all()
-    
-    results = []
-    for tu in tenant_users:
-        perms = {}
-        if tu.tenant and tu.tenant.schema_name and tu.role_name:
-            try:
-                # Query the specific tenant's 'roles' table for this role_name
-                res = global_db.execute(
-                    text(f'SELECT permissions FROM "{tu.tenant.schema_name}".roles WHERE name = :role_name'),
-                    {"role_name": tu.role_name}
-                ).first()
-                if res and res[0]:
-                    perms = res[0]
-            except Exception:
-                pass
-                
-        results.append(AvailableTenant(
+async def _membership_rows(global_db: AsyncSession, user_id: int) -> list:
+    """Membresías activas con Tenant y permisos del rol, en una sola consulta.
+
+    Los permisos salen de la proyección `public.tenant_role_permissions`
+    (ver `app.services.role_permissions`).
+    """
+    return (await global_db.execute(user_tenants_stmt(user_id))).all()
+
+def _available_tenants(rows: list) -> list[AvailableTenant]:
+    return [
+        AvailableTenant(
             id=tu.tenant.id,
             name=tu.tenant.name,
             rut=tu.tenant.rut,
             role_name=tu.role_name,
             is_active=tu.tenant.is_active,
             max_users=tu.tenant.max_users_override or tu.tenant.plan_max_users,
-            permissions=perms
-        ))
-        
-    return results
+            permissions=permissions or {},
+        )
+        for tu, permissions in rows
+    ]
+
+async def _get_user_tenants(global_db: AsyncSession, user_id: int) -> list[AvailableTenant]:
+    """Empresas a las que el usuario tiene acceso, con los permisos de su rol."""
+    return _available_tenants(await _membership_rows(global_db, user_id))
+
+def _claims_tokens(user: SaaSUser, rows: list) -> dict:
+    """Access token con claims (empresas activas) + refresh token."""
+    tenants = {tu.tenant_id: (tu.role_name, tu.tenant.schema_name) for tu, _ in rows if tu.tenant.is_active}
+    return {
+        "access_token": create_claims_token(user, tenants),
+        "refresh_token": create_refresh_token(user),
+        "token_type": "bearer",
+        "expires_in": CLAIMS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+def _login_response(user: SaaSUser, rows: list) -> dict:
+    if AUTH_CLAIMS:
+        tokens = _claims_tokens(user, rows)
+    else:
+        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        tokens = {
+            "access_token": create_access_token(subject=user.email, expires_delta=access_token_expires),
+            "token_type": "bearer",
+        }
+    return {**tokens, "user": user, "available_tenants": _available_tenants(rows)}
+
+async def _authenticate(global_db: AsyncSession, email: str, password: str) -> Optional[SaaSUser]:
+    """Verifica credenciales en el pool de bcrypt; rehace el hash si cambió el costo."""
+    user = (await global_db.execute(select(SaaSUser).where(SaaSUser.email == email))).scalars().first()
+    if not user or not user.hashed_password:
+        return None
+    valid, new_hash = await verify_and_update_async(password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        user.hashed_password = new_hash
+        await global_db.commit()
+    return user
 
 @router.post("/token", response_model=SaaSToken)
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    global_db: Session = Depends(get_global_db),
+    global_db: AsyncSession = Depends(get_global_async_db),
 ):
     """OAuth2 compatible token login for SaaS Users."""
-    user = global_db.query(SaaSUser).filter(SaaSUser.email == form_data.username).first()
-
-    if not user or not user.hashed_password or not verify_password(form_data.password, user.hashed_password):
+    user = await _authenticate(global_db, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
         
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        subject=user.email, expires_delta=access_token_expires
-    )
-    
     # Obtener la lista de empresas a las que tiene acceso para que el Frontend renderice un selector
-    tenants = _get_user_tenants(global_db, user.id)
-    
-    return {
-        "access_token": access_token, 
-        "token_type": "bearer",
-        "user": user,
-        "available_tenants": tenants
-    }
+    return _login_response(user, await _membership_rows(global_db, user.id))
 
 @router.post("/login", response_model=SaaSToken)
 async def login_json(
     login_data: SaaSUserLogin,
-    global_db: Session = Depends(get_global_db)
+    global_db: AsyncSession = Depends(get_global_async_db)
 ):
     """JSON login alternative to OAuth2 form."""
-    user = global_db.query(SaaSUser).filter(SaaSUser.email == login_data.email).first()
-
-    if not user or not user.hashed_password or not verify_password(login_data.password, user.hashed_password):
+    user = await _authenticate(global_db, login_data.email, login_data.password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales incorrectas",
         )
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        subject=user.email, expires_delta=access_token_expires
+    return _login_response(user, await _membership_rows(global_db, user.id))
+
+@router.post("/refresh", response_model=TokenRefreshOut)
+async def refresh_access_token(
+    data: TokenRefresh,
+    global_db: AsyncSession = Depends(get_global_async_db)
+):
+    """Emite un nuevo access token con claims (y rota el refresh token).
+
+    Relee las membresías, así que los cambios de rol se reflejan a más
+    tardar al expirar el access token.
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido o revocado",
+        headers={"WWW-Authenticate": "Bearer"},
     )
+    try:
+        payload = jwt.decode(data.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise invalid
+    if payload.get("typ") != "refresh" or payload.get("uid") is None:
+        raise invalid
 
-    tenants = _get_user_tenants(global_db, user.id)
+    user = await global_db.get(SaaSUser, payload["uid"])
+    if not user or not user.is_active or (user.token_version or 0) != payload.get("ver"):
+        raise invalid
+    token_versions.set(user.id, (user.token_version or 0, True))
 
-    return {
-        "access_token": access_token, 
-        "token_type": "bearer",
-        "user": user,
-        "available_tenants": tenants
-    }
+    return _claims_tokens(user, await _membership_rows(global_db, user.id))
+
+@router.post("/logout-all", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_all_sessions(
+    current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
+    global_db: AsyncSession = Depends(get_global_async_db)
+):
+    """Revoca todos los tokens con claims del usuario (cierra todas sus sesiones)."""
+    await global_db.execute(
+        update(SaaSUser).where(SaaSUser.id == current_user.id).values(token_version=SaaSUser.token_version + 1)
+    )
+    await global_db.commit()
+    token_versions.pop(current_user.id)
+    return None
 
 @router.get("/users/me", response_model=SaaSUserOut)
 async def read_users_me(current_user: Annotated[SaaSUser, Depends(get_current_global_user)]):
@@ -121,10 +168,10 @@ async def read_users_me(current_user: Annotated[SaaSUser, Depends(get_current_gl
 @router.get("/validate")
 async def validate_session(
     current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
-    global_db: Session = Depends(get_global_db)
+    global_db: AsyncSession = Depends(get_global_async_db)
 ):
     """Valida la sesión actual y refresca la lista de empresas disponibles."""
-    tenants = _get_user_tenants(global_db, current_user.id)
+    tenants = await _get_user_tenants(global_db, current_user.id)
     return {
         "user": current_user,
         "available_tenants": tenants
@@ -2,24 +2,29 @@
 
 from datetime import datetime
 from decimal import Decimal
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func, desc
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import desc
 from sqlalchemy.orm import Session, joinedload
 
 from app.models.cash import CashSession
-from app.models.payment import SalePayment, PaymentMethod
-from app.models.sale import Sale
 from app.models.user import User
-from app.schemas import CashSessionCreate, CashSessionClose, CashSessionOut, CashSessionWithUserOut
+from app.schemas import (
+    CashSessionCreate, CashSessionClose, CashSessionOut, CashSessionStatusOut, CashSessionTotalOut,
+    CashSessionWithUserOut, CashTotalsCheckOut, CashierSummaryOut,
+)
+from app.services.cash_totals import cashier_summary, check_consistency, expected_cash
 
-from app.dependencies.tenant import get_tenant_db, get_current_local_user, get_current_global_user
+from app.dependencies.tenant import get_tenant_db, get_current_local_user, get_current_global_user, require_admin
 from app.models.saas import SaaSUser
 from app.utils.dates import get_now
 
 router = APIRouter(prefix="/cash", tags=["cash"])
 
+SESSIONS_PAGE_SIZE = 50
+SESSIONS_MAX_PAGE_SIZE = 200
+
 
 @router.post("/open", response_model=CashSessionOut,
              summary="Abrir Caja",
@@ -85,56 +90,43 @@ def open_session(
     return new_session
 
 
-@router.get("/status", response_model=CashSessionOut,
+@router.get("/status", response_model=CashSessionStatusOut,
              summary="Estado de Caja",
-             description="Consulta el estado actual de la caja del usuario.")
+             description="Consulta el estado actual de la caja del usuario con los totales en vivo "
+                         "por medio de pago y el efectivo esperado en el cajón.")
 def session_status(
     db: Session = Depends(get_tenant_db),
     local_user: User = Depends(get_current_local_user)
 ):
     """Obtiene el estado de la caja actual.
-    
+
+    Los totales se leen de `cash_session_totals`, que las ventas y
+    devoluciones actualizan al confirmarse; no se recorren las ventas.
+
     Args:
-        user_id (int, optional): ID del usuario a consultar. Si no se provee, usa el default.
         db (Session): Sesión DB.
-        
+
     Returns:
-        CashSessionOut: Objeto sesión activa.
-        
+        CashSessionStatusOut: Sesión activa con efectivo esperado y totales.
+
     Raises:
         HTTPException(404): Si no hay caja abierta.
     """
     user_id = local_user.id
-        
-    active_session = db.query(CashSession).filter(
+
+    active_session = db.query(CashSession).options(joinedload(CashSession.totals)).filter(
         CashSession.user_id == user_id,
         CashSession.status == "OPEN"
     ).first()
-    
+
     if not active_session:
         raise HTTPException(status_code=404, detail="No hay caja abierta")
 
-    # Calcular monto actual en sistema (ventas efectivo) de esta sesión
-    # 1. Buscar ventas realizadas por este user desde start_time
-    # 2. Sumar SalePayment donde method='EFECTIVO' y sale_id in (ventas del user)
-    
-    # query_total = db.query(func.sum(SalePayment.amount)).join(Sale).filter(
-    #     Sale.user_id == user_id? No, Sale.user_id es cliente! 
-    #     Necesitamos Sale.created_by? No tenemos created_by en Sale.
-    #     Asumimos que la sesión es global para las ventas que caen en ese rango?
-    #     O necesitamos agregar created_by a Sale.
-    # )
-    
-    # CRITICAL: Sale needs `seller_id` or audit field to link to CashSession user.
-    # For now, we assume single user or we filter by time > start_time.
-    
-    # Simplified approach: Sum all CASH payments created after session start
-    # This assumes single cashier machine logic or logic by time.
-    
-    # To be robust, we need `seller_id` on Sale. I will follow up on this.
-    # For now, let's just return the session object as stored.
-    
-    return active_session
+    return CashSessionStatusOut(
+        **CashSessionOut.model_validate(active_session).model_dump(),
+        expected_cash=expected_cash(db, active_session),
+        totals=[CashSessionTotalOut.model_validate(t) for t in active_session.totals],
+    )
 
 
 @router.post("/close", response_model=CashSessionOut,
@@ -170,21 +162,8 @@ def close_session(
     if not active_session:
         raise HTTPException(status_code=404, detail="No hay caja abierta")
 
-    # Calcular Sistema
-    # Sumar pagos en efectivo desde active_session.start_time
-    total_sales_cash = db.query(func.coalesce(func.sum(SalePayment.amount), 0))\
-        .join(Sale)\
-        .join(PaymentMethod)\
-        .filter(
-            Sale.created_at >= active_session.start_time,
-            Sale.seller_id == user_id,
-            PaymentMethod.code == "EFECTIVO"
-        ).scalar()
-    
-    # Note: This logic assumes all sales after open belong to this session.
-    # In a multi-user environment, we need seller_id.
-    
-    final_system = active_session.start_amount + total_sales_cash
+    # Calcular Sistema: apertura + total acumulado en EFECTIVO (ventas - devoluciones)
+    final_system = expected_cash(db, active_session)
     
     active_session.end_time = get_now()
     active_session.final_cash_system = final_system
@@ -201,13 +180,65 @@ def close_session(
 
 @router.get("/sessions", response_model=List[CashSessionWithUserOut],
              summary="Historial de Sesiones",
-             description="Obtiene el historial de todas las sesiones de caja (arqueos).")
+             description="Historial de sesiones de caja (arqueos), de la más reciente a la más antigua. "
+                         "Paginado por keyset: el cursor siguiente viaja en el header X-Next-Cursor.")
 def list_sessions(
+    response: Response,
+    user_id: Optional[int] = None,
+    status_filter: Optional[str] = Query(None, alias="status", description="OPEN, CLOSED o CLOSED_SYSTEM"),
+    date_from: Optional[datetime] = Query(None, description="Apertura desde"),
+    date_to: Optional[datetime] = Query(None, description="Apertura hasta"),
+    limit: int = Query(SESSIONS_PAGE_SIZE, ge=1, le=SESSIONS_MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
     db: Session = Depends(get_tenant_db)
 ):
-    """Lista todas las sesiones de caja con la información del usuario."""
-    sessions = db.query(CashSession).options(
-        joinedload(CashSession.user)
-    ).order_by(desc(CashSession.start_time)).all()
-    
+    """Lista las sesiones de caja con la información del usuario."""
+    query = db.query(CashSession).options(joinedload(CashSession.user))
+    if user_id is not None:
+        query = query.filter(CashSession.user_id == user_id)
+    if status_filter:
+        query = query.filter(CashSession.status == status_filter)
+    if date_from is not None:
+        query = query.filter(CashSession.start_time >= date_from)
+    if date_to is not None:
+        query = query.filter(CashSession.start_time <= date_to)
+    if cursor is not None:
+        query = query.filter(CashSession.id < cursor)
+
+    sessions = query.order_by(desc(CashSession.id)).limit(limit + 1).all()
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        response.headers["X-Next-Cursor"] = str(sessions[-1].id)
     return sessions
+
+
+@router.get("/sessions/summary", response_model=List[CashierSummaryOut],
+            summary="Resumen de Arqueos por Cajero",
+            description="Cantidad de sesiones, faltantes, sobrantes y diferencia neta por cajero en un "
+                        "período (sesiones cerradas), calculado en la base de datos.")
+def sessions_summary(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_tenant_db),
+):
+    """Estadísticas de diferencias de caja por cajero."""
+    return cashier_summary(db, date_from=date_from, date_to=date_to, user_id=user_id)
+
+
+@router.get("/sessions/{session_id}/check", response_model=CashTotalsCheckOut,
+            dependencies=[Depends(require_admin)],
+            summary="Verificar Totales de Caja",
+            description="Compara los totales acumulados de la sesión con un recálculo completo desde "
+                        "las ventas. Con repair=true reemplaza los totales por el recálculo.")
+def check_session_totals(
+    session_id: int,
+    repair: bool = False,
+    db: Session = Depends(get_tenant_db),
+):
+    """Verifica (y opcionalmente repara) los totales de una sesión."""
+    if not db.query(CashSession.id).filter(CashSession.id == session_id).first():
+        raise HTTPException(status_code=404, detail="Sesión de caja no encontrada")
+    report = check_consistency(db, session_ids=[session_id], repair=repair)
+    differences = report[0]["differences"] if report else []
+    return CashTotalsCheckOut(cash_session_id=session_id, consistent=not report, differences=differences)
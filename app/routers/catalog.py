@@ -0,0 +1,30 @@
+"""Router de sincronización del catálogo para terminales POS (modo offline)."""
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.dependencies.tenant import get_tenant_db
+from app.services.catalog_sync import build_delta, build_snapshot
+
+router = APIRouter(prefix="/catalog", tags=["catalog"])
+
+
+@router.get("/snapshot",
+            summary="Volcado del Catálogo",
+            description="Catálogo vendible completo (productos, impuestos y listas de precio) "
+                        "en formato compacto y versionado. Se comprime con gzip si el cliente lo acepta.")
+def get_catalog_snapshot(db: Session = Depends(get_tenant_db)):
+    """Retorna el volcado completo; el POS guarda `version` para pedir deltas."""
+    return build_snapshot(db)
+
+
+@router.get("/delta",
+            summary="Cambios del Catálogo",
+            description="Cambios desde la versión indicada. Aplicar como upserts y "
+                        "guardar la nueva `version`.")
+def get_catalog_delta(
+    since: int = Query(..., ge=0, description="`version` del último volcado o delta aplicado"),
+    db: Session = Depends(get_tenant_db),
+):
+    """Retorna productos modificados, eliminados y listas de precio cambiadas."""
+    return build_delta(db, since)
@@ -11,6 +11,7 @@ from app.schemas import (
     TaxCreate, TaxUpdate, TaxOut,
     SettingsUpdate, SettingsOut
 )
+from app.services.document_renderer import invalidate_tenant
 
 router = APIRouter(prefix="/config", tags=["config"])
 
@@ -72,5 +73,6 @@ def update_settings(settings_in: SettingsUpdate, db: Session = Depends(get_tenan
         setattr(settings, field, value)
     
     db.commit()
+    invalidate_tenant(db.info.get("schema_name"))
     db.refresh(settings)
     return settings
@@ -2,13 +2,14 @@ import asyncio
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, func
 
-from app.models.dte import CAF, FolioRequestLog
+from app.models.dte import CAF, FolioRequestLog, FolioReservation
 from app.models.user import User
 from app.dependencies.tenant import get_tenant_db, get_current_local_user, require_admin
+from app.services.folio_allocator import FOLIO_BLOCK_MAX_AGE, folio_allocator, reclaim_stale_reservations
 from pydantic import BaseModel, Field
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 
 # --- Schemas Mínimos para Folios ---
 class FolioStockOut(BaseModel):
@@ -33,6 +34,22 @@ class FolioRequestLogOut(BaseModel):
     class Config:
         from_attributes = True
 
+class FolioReservationOut(BaseModel):
+    id: int
+    caf_id: int
+    tipo_documento: int
+    folio_desde: int
+    folio_hasta: int
+    next_folio: int
+    unused: int
+    worker_id: Optional[str] = None
+    status: str
+    reserved_at: Optional[datetime] = None
+    released_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 router = APIRouter(prefix="/folios", tags=["folios"])
 
 @router.get("/status", response_model=List[FolioStockOut], summary="Estado del Stock de Folios")
@@ -47,11 +64,27 @@ def get_folios_status(
     # DTEs objetivos: Nacionales, Ajustes/Logística y Exportación
     target_dtes = [33, 34, 39, 41, 52, 56, 61, 110, 111, 112]
     
+    # Un tipo puede tener varios CAF vigentes: se agregan todos los rangos
+    cafs_by_type = {}
+    for caf in db.query(CAF).filter(CAF.tipo_documento.in_(target_dtes)).order_by(CAF.folio_desde).all():
+        cafs_by_type.setdefault(caf.tipo_documento, []).append(caf)
+
+    # Folios de bloques liberados que aún no se han emitido
+    released = dict(
+        db.query(
+            FolioReservation.tipo_documento,
+            func.sum(FolioReservation.folio_hasta - FolioReservation.next_folio + 1),
+        ).filter(
+            FolioReservation.status == "RELEASED",
+            FolioReservation.next_folio <= FolioReservation.folio_hasta,
+        ).group_by(FolioReservation.tipo_documento).all()
+    )
+
     result = []
     
     for dte_type in target_dtes:
-        caf = db.query(CAF).filter(CAF.tipo_documento == dte_type).first()
-        if not caf:
+        cafs = cafs_by_type.get(dte_type)
+        if not cafs:
             result.append(
                 FolioStockOut(
                     dte_type=dte_type, available=0, total=0,
@@ -60,18 +93,20 @@ def get_folios_status(
                 )
             )
         else:
-            total = caf.folio_hasta - caf.folio_desde + 1
-            available = caf.folio_hasta - caf.ultimo_folio_usado
-            if available < 0: available = 0
+            total = sum(c.folio_hasta - c.folio_desde + 1 for c in cafs)
+            available = sum(
+                max(0, c.folio_hasta - max(c.ultimo_folio_usado, c.folio_desde - 1)) for c in cafs
+            ) + int(released.get(dte_type) or 0)
+            latest = cafs[-1]
             
             result.append(
                 FolioStockOut(
                     dte_type=dte_type,
                     available=available,
                     total=total,
-                    latest_folio_hasta=caf.folio_hasta,
-                    latest_folio_desde=caf.folio_desde,
-                    fecha_vencimiento=caf.fecha_vencimiento
+                    latest_folio_hasta=latest.folio_hasta,
+                    latest_folio_desde=latest.folio_desde,
+                    fecha_vencimiento=latest.fecha_vencimiento
                 )
             )
             
@@ -115,3 +150,42 @@ def get_requests_history(
     """
     logs = db.query(FolioRequestLog).order_by(desc(FolioRequestLog.timestamp)).limit(limit).all()
     return logs
+
+@router.get("/reservations", response_model=List[FolioReservationOut], summary="Bloques de Folios Reservados")
+def get_folio_reservations(
+    status_filter: Optional[str] = None,
+    limit: int = 100,
+    db: Session = Depends(get_tenant_db),
+    admin_user = Depends(require_admin)
+):
+    """
+    Lista los bloques de folios reservados por los workers del POS
+    (ACTIVE, RELEASED o EXHAUSTED) para contabilizar folios no emitidos.
+    """
+    query = db.query(FolioReservation)
+    if status_filter:
+        query = query.filter(FolioReservation.status == status_filter.upper())
+    return query.order_by(desc(FolioReservation.id)).limit(limit).all()
+
+@router.post("/reservations/reclaim", summary="Recuperar Bloques Abandonados")
+def reclaim_folio_reservations(
+    older_than_minutes: int = 60,
+    db: Session = Depends(get_tenant_db),
+    admin_user = Depends(require_admin)
+):
+    """
+    Libera los bloques ACTIVE de workers que terminaron sin liberarlos,
+    dejando sus folios no emitidos disponibles para reutilización.
+
+    El umbral debe superar `TORN_FOLIO_BLOCK_MAX_AGE`: los workers vivos
+    renuevan sus bloques antes de ese plazo, y recuperar un bloque en uso
+    entregaría sus folios dos veces.
+    """
+    min_minutes = FOLIO_BLOCK_MAX_AGE / 60
+    if older_than_minutes <= min_minutes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"older_than_minutes debe ser mayor a {min_minutes:g} (TORN_FOLIO_BLOCK_MAX_AGE)",
+        )
+    reclaimed = reclaim_stale_reservations(db, timedelta(minutes=older_than_minutes))
+    return {"reclaimed": reclaimed, "worker_blocks": folio_allocator.stats()}
@@ -1,32 +1,300 @@
 """Router para gestión de Inventario."""
 
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session, aliased
 
-from app.dependencies.tenant import get_tenant_db
+from app.dependencies.tenant import get_current_local_user, get_tenant_db, require_admin
+from app.models.inventory import StockTake, StockTakeLine
 from app.models.product import Product
-from app.schemas import ProductOut
+from app.models.user import User
+from app.schemas import (
+    KardexEntryOut,
+    KardexReconcileOut,
+    ProductOut,
+    StockTakeCounts,
+    StockTakeCreate,
+    StockTakeLineOut,
+    StockTakeOut,
+    StockTakeSummary,
+)
+from app.services import kardex as kardex_service
+from app.services import stock_take as stock_take_service
+from app.services.product_catalog import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    catalog_query,
+    fetch_page,
+    full_options,
+)
+from app.services.stock_take import StockTakeError
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
 
 @router.get("/", response_model=List[ProductOut],
              summary="Consultar Inventario",
-             description="Obtiene todos los productos activos con sus niveles de stock.")
-def get_inventory(db: Session = Depends(get_tenant_db)):
+             description="Obtiene los productos activos con sus niveles de stock. Con `limit` se "
+                         "pagina por keyset (cursor siguiente en el header X-Next-Cursor).")
+def get_inventory(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página"),
+    cursor: Optional[int] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
+    brand_id: Optional[int] = None,
+    low_stock: bool = False,
+    kind: Optional[str] = Query(None, pattern="^(parents|variants)$"),
+    db: Session = Depends(get_tenant_db),
+):
     """
     Obtiene el estado actual del inventario.
     
-    Retorna una lista de todos los productos activos con sus niveles de stock actuales,
+    Retorna los productos activos con sus niveles de stock actuales,
     incluyendo stock mínimo y bandera de control de stock.
     
     Args:
+        limit (int): Tamaño de página; sin él se retorna el inventario completo.
+        cursor (int): Último `id` de la página anterior.
+        brand_id (int): Filtra por marca.
+        low_stock (bool): Sólo productos bajo su stock mínimo.
+        kind (str): 'parents' o 'variants'.
         db (Session): Sesión DB.
         
     Returns:
         List[ProductOut]: Lista de productos.
     """
-    products = db.query(Product).filter(Product.is_active == True).all()  # noqa: E712
+    query = catalog_query(
+        db, brand_id=brand_id, is_active=True, low_stock=low_stock, kind=kind,
+    ).options(*full_options())
+    if limit is None and cursor is None:
+        return query.order_by(Product.id.desc()).all()
+    products, next_cursor = fetch_page(query, limit or DEFAULT_PAGE_SIZE, cursor)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
     return products
+
+
+# ── Toma de Inventario ────────────────────────────────────────────────
+
+
+def _get_stock_take(db: Session, stock_take_id: int) -> StockTake:
+    take = db.query(StockTake).filter(StockTake.id == stock_take_id).first()
+    if not take:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Toma de inventario {stock_take_id} no encontrada",
+        )
+    return take
+
+
+def _take_out(db: Session, take: StockTake) -> StockTakeOut:
+    out = StockTakeOut.model_validate(take)
+    out.summary = StockTakeSummary(**stock_take_service.summary(db, take.id))
+    return out
+
+
+@router.post("/stock-takes", response_model=StockTakeOut, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(require_admin)],
+             summary="Abrir Toma de Inventario",
+             description="Fotografía el stock de los productos con control de stock (todos, por marca "
+                         "o por lista). Con lock_sales se bloquean sus movimientos hasta cerrar la toma.")
+def open_stock_take(
+    data: StockTakeCreate,
+    db: Session = Depends(get_tenant_db),
+    local_user: User = Depends(get_current_local_user),
+):
+    """Abre una toma de inventario."""
+    try:
+        take = stock_take_service.open_stock_take(
+            db, user_id=local_user.id, description=data.description, lock_sales=data.lock_sales,
+            brand_id=data.brand_id, product_ids=data.product_ids,
+        )
+    except StockTakeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    db.commit()
+    db.refresh(take)
+    return _take_out(db, take)
+
+
+@router.get("/stock-takes", response_model=List[StockTakeOut], summary="Listar Tomas de Inventario")
+def list_stock_takes(
+    status_filter: Optional[str] = Query(None, alias="status", pattern="^(OPEN|APPLIED|CANCELLED)$"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_tenant_db),
+):
+    """Lista las tomas más recientes (sin resumen)."""
+    query = db.query(StockTake)
+    if status_filter:
+        query = query.filter(StockTake.status == status_filter)
+    return query.order_by(StockTake.id.desc()).limit(limit).all()
+
+
+@router.get("/stock-takes/{stock_take_id}", response_model=StockTakeOut, summary="Detalle de Toma de Inventario")
+def get_stock_take(stock_take_id: int, db: Session = Depends(get_tenant_db)):
+    """Retorna la toma con su avance y diferencias."""
+    return _take_out(db, _get_stock_take(db, stock_take_id))
+
+
+@router.put("/stock-takes/{stock_take_id}/counts", summary="Registrar Conteos")
+def record_stock_take_counts(
+    stock_take_id: int,
+    data: StockTakeCounts,
+    db: Session = Depends(get_tenant_db),
+):
+    """Registra cantidades contadas (miles por request) por ID o código de barras."""
+    take = _get_stock_take(db, stock_take_id)
+
+    barcodes = {item.codigo_barras for item in data.items if item.product_id is None and item.codigo_barras}
+    by_barcode = dict(
+        db.query(Product.codigo_barras, Product.id).filter(Product.codigo_barras.in_(barcodes)).all()
+    ) if barcodes else {}
+
+    counts, missing = {}, []
+    for item in data.items:
+        product_id = item.product_id or by_barcode.get(item.codigo_barras)
+        if product_id is None:
+            missing.append(item.codigo_barras)
+            continue
+        counts[product_id] = counts.get(product_id, 0) + item.counted if data.accumulate else item.counted
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Códigos no encontrados: {missing[:20]}",
+        )
+
+    unknown = set(counts) - {r[0] for r in db.query(Product.id).filter(Product.id.in_(list(counts))).all()}
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Productos no encontrados: {sorted(unknown)[:20]}",
+        )
+
+    try:
+        result = stock_take_service.record_counts(db, take, counts, accumulate=data.accumulate)
+    except StockTakeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    db.commit()
+    return result
+
+
+@router.get("/stock-takes/{stock_take_id}/lines", response_model=List[StockTakeLineOut],
+            summary="Líneas de Toma de Inventario",
+            description="Paginado por product_id (cursor en X-Next-Cursor).")
+def list_stock_take_lines(
+    stock_take_id: int,
+    response: Response,
+    only_differences: bool = False,
+    uncounted: bool = False,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+    db: Session = Depends(get_tenant_db),
+):
+    """Lista los productos de la toma con lo esperado, lo contado y la diferencia."""
+    _get_stock_take(db, stock_take_id)
+    Parent = aliased(Product)
+    query = db.query(
+        StockTakeLine.product_id, Product.codigo_interno, Product.nombre,
+        Parent.nombre.label("parent_nombre"), StockTakeLine.expected, StockTakeLine.counted,
+    ).join(Product, Product.id == StockTakeLine.product_id)\
+     .outerjoin(Parent, Product.parent_id == Parent.id)\
+     .filter(StockTakeLine.stock_take_id == stock_take_id)
+    if only_differences:
+        query = query.filter(StockTakeLine.counted.isnot(None),
+                             StockTakeLine.counted != StockTakeLine.expected)
+    if uncounted:
+        query = query.filter(StockTakeLine.counted.is_(None))
+    if cursor is not None:
+        query = query.filter(StockTakeLine.product_id > cursor)
+    rows = query.order_by(StockTakeLine.product_id).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].product_id)
+
+    return [
+        StockTakeLineOut(
+            product_id=r.product_id,
+            codigo_interno=r.codigo_interno,
+            full_name=f"{r.parent_nombre} {r.nombre}" if r.parent_nombre and not r.nombre.startswith(r.parent_nombre) else r.nombre,
+            expected=r.expected,
+            counted=r.counted,
+            difference=r.counted - r.expected if r.counted is not None else None,
+        )
+        for r in rows
+    ]
+
+
+@router.post("/stock-takes/{stock_take_id}/apply", response_model=StockTakeOut,
+             dependencies=[Depends(require_admin)],
+             summary="Aplicar Toma de Inventario",
+             description="Ajusta el stock por (contado - foto) y registra movimientos AJUSTE en una transacción.")
+def apply_stock_take(
+    stock_take_id: int,
+    zero_uncounted: bool = Query(False, description="Tratar los productos no contados como 0"),
+    db: Session = Depends(get_tenant_db),
+    local_user: User = Depends(get_current_local_user),
+):
+    """Aplica los ajustes de la toma y la cierra."""
+    take = _get_stock_take(db, stock_take_id)
+    try:
+        stock_take_service.apply_stock_take(db, take, user_id=local_user.id, zero_uncounted=zero_uncounted)
+    except StockTakeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    db.commit()
+    db.refresh(take)
+    return _take_out(db, take)
+
+
+@router.post("/stock-takes/{stock_take_id}/cancel", response_model=StockTakeOut,
+             dependencies=[Depends(require_admin)], summary="Cancelar Toma de Inventario")
+def cancel_stock_take(stock_take_id: int, db: Session = Depends(get_tenant_db)):
+    """Cancela la toma sin ajustar stock (libera el bloqueo)."""
+    take = _get_stock_take(db, stock_take_id)
+    try:
+        stock_take_service.cancel_stock_take(take)
+    except StockTakeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    db.commit()
+    db.refresh(take)
+    return _take_out(db, take)
+
+
+# ── Kardex ────────────────────────────────────────────────────────────
+
+
+@router.get("/kardex/{product_id}", response_model=List[KardexEntryOut],
+            summary="Kardex de Producto",
+            description="Movimientos del producto del más reciente al más antiguo, con el saldo acumulado "
+                        "de cada uno. Paginado por keyset (cursor siguiente en X-Next-Cursor).")
+def get_kardex(
+    product_id: int,
+    response: Response,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    motivo: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+    db: Session = Depends(get_tenant_db),
+):
+    """Consulta el kardex de un producto en un rango de fechas."""
+    if not db.query(Product.id).filter(Product.id == product_id).first():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Producto no encontrado")
+    entries, next_cursor = kardex_service.kardex_page(
+        db, product_id, date_from=date_from, date_to=date_to, motivo=motivo, limit=limit, cursor=cursor,
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return entries
+
+
+@router.post("/kardex/reconcile", response_model=KardexReconcileOut,
+             dependencies=[Depends(require_admin)],
+             summary="Conciliar Kardex",
+             description="Completa balance_after faltantes, recalcula checkpoints de saldo y reporta los "
+                         "productos cuyo kardex no cuadra con el stock actual.")
+def reconcile_kardex(
+    product_id: Optional[int] = None,
+    db: Session = Depends(get_tenant_db),
+):
+    """Ejecuta la conciliación del kardex (todos los productos o uno)."""
+    return kardex_service.reconcile(db, product_ids=[product_id] if product_id is not None else None)
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from app.dependencies.tenant import get_tenant_db
 from app.models.issuer import Issuer
 from app.schemas import IssuerCreate, IssuerOut, IssuerUpdate
+from app.services.document_renderer import invalidate_tenant
 
 router = APIRouter(prefix="/issuer", tags=["issuer"])
 
@@ -64,5 +65,6 @@ def upsert_issuer(data: IssuerUpdate, db: Session = Depends(get_tenant_db)):
         db.add(issuer)
 
     db.commit()
+    invalidate_tenant(db.info.get("schema_name"))
     db.refresh(issuer)
     return issuer
@@ -4,17 +4,24 @@ CRUD completo para listas de precios, asignación de productos con precios fijos
 asignación de clientes a una lista, y resolución del precio final (lógica del POS).
 """
 
+import codecs
+import csv
 from typing import Optional
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, ConfigDict
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.dependencies.tenant import get_tenant_db
+from app.dependencies.tenant import get_tenant_async_db, get_tenant_db
 from app.models.price_list import PriceList, PriceListProduct
 from app.models.customer import Customer
 from app.models.product import Product
+from app.services.price_index import price_index
+from app.services.price_list_sync import apply_prices, normalize_price
 
 router = APIRouter(prefix="/price-lists", tags=["price-lists"])
 
@@ -46,9 +53,20 @@ class PriceListRead(PriceListBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class PriceListChangeSummary(BaseModel):
+    """Resumen de cambios de una asignación masiva de precios."""
+    price_list_id: int
+    total: int
+    inserted: int
+    updated: int
+    deleted: int
+    unchanged: int
+
+
 class PriceListDetail(PriceListRead):
     """Lista con sus ítems de precios incluidos."""
     items: list[PriceItemSchema] = []
+    changes: Optional[PriceListChangeSummary] = None
 
     @classmethod
     def from_orm_with_items(cls, pl: PriceList) -> "PriceListDetail":
@@ -76,6 +94,23 @@ class ResolvedPriceResponse(BaseModel):
     price_list_id: Optional[int] = None
     resolved_price: Decimal
     source: str  # "price_list" | "base_price"
+    codigo_barras: Optional[str] = None
+
+
+class ResolvePricesRequest(BaseModel):
+    """Payload para resolver precios de varios productos en una sola llamada."""
+    customer_id: Optional[int] = None
+    product_ids: list[int] = []
+    barcodes: list[str] = []
+
+
+class ResolvePricesResponse(BaseModel):
+    """Precios resueltos en el orden solicitado, más los códigos no encontrados."""
+    customer_id: Optional[int] = None
+    price_list_id: Optional[int] = None
+    items: list[ResolvedPriceResponse]
+    missing_product_ids: list[int] = []
+    missing_barcodes: list[str] = []
 
 
 # ── Helper ──────────────────────────────────────────────────────────────────
@@ -142,40 +177,95 @@ def assign_products(
 ):
     """Reemplaza los ítems de precios de la lista por los enviados.
 
-    Opera con un patrón clear-and-reinsert: borra todos los precios existentes
-    en la pivote para esta lista y los recrea, lo que facilita bulk-updates
-    desde el frontend sin necesidad de trackear diferencias.
+    Sólo se aplican las diferencias contra la pivote (inserciones, cambios de
+    precio y eliminaciones por lote); el resumen viene en `changes`.
     """
     pl = _get_or_404(db, price_list_id)
+    changes = _apply_assignment(db, pl, {item.product_id: item.fixed_price for item in data.items})
 
-    # Validar que todos los product_ids existen
-    product_ids = [item.product_id for item in data.items]
-    if product_ids:
-        found = db.query(Product.id).filter(Product.id.in_(product_ids)).all()
-        found_ids = {r[0] for r in found}
-        missing = set(product_ids) - found_ids
+    items = [
+        PriceItemSchema(product_id=product_id, fixed_price=price)
+        for product_id, price in db.query(PriceListProduct.product_id, PriceListProduct.fixed_price)
+        .filter(PriceListProduct.price_list_id == price_list_id)
+        .order_by(PriceListProduct.product_id)
+    ]
+    return PriceListDetail(id=pl.id, name=pl.name, description=pl.description, items=items, changes=changes)
+
+
+@router.put("/{price_list_id}/products/csv", response_model=PriceListChangeSummary,
+            summary="Asignar Productos desde CSV")
+async def assign_products_csv(
+    price_list_id: int,
+    request: Request,
+    db: Session = Depends(get_tenant_db),
+):
+    """Igual que `assign_products`, leyendo el cuerpo como CSV en streaming.
+
+    Formato: `product_id,fixed_price` por línea (encabezado opcional). Si un
+    producto se repite, prevalece la última línea.
+    """
+    desired = await _read_price_csv(request)
+    pl = await run_in_threadpool(_get_or_404, db, price_list_id)
+    return await run_in_threadpool(_apply_assignment, db, pl, desired)
+
+
+def _apply_assignment(db: Session, pl: PriceList, desired: dict) -> PriceListChangeSummary:
+    """Valida los productos nuevos, aplica el diff, confirma y actualiza el índice."""
+    current_ids = {
+        pid for (pid,) in db.query(PriceListProduct.product_id)
+        .filter(PriceListProduct.price_list_id == pl.id)
+    }
+    new_ids = set(desired) - current_ids
+    if new_ids:
+        found_ids = {r[0] for r in db.query(Product.id).filter(Product.id.in_(new_ids)).all()}
+        missing = new_ids - found_ids
         if missing:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Productos no encontrados: {sorted(missing)}"
             )
 
-    # Clear & Reinsert
-    db.query(PriceListProduct).filter(
-        PriceListProduct.price_list_id == price_list_id
-    ).delete(synchronize_session="fetch")
-
-    for item in data.items:
-        assoc = PriceListProduct(
-            price_list_id=price_list_id,
-            product_id=item.product_id,
-            fixed_price=item.fixed_price,
-        )
-        db.add(assoc)
+    diff = apply_prices(db, pl.id, desired)
 
+    # Marca la lista como modificada (delta del catálogo POS e índice de precios)
+    pl.updated_at = func.now()
     db.commit()
-    db.refresh(pl)
-    return PriceListDetail.from_orm_with_items(pl)
+    price_index.patch_list(db, pl.id, {pid: normalize_price(price) for pid, price in desired.items()})
+    return PriceListChangeSummary(price_list_id=pl.id, total=len(desired), **diff.summary())
+
+
+async def _read_price_csv(request: Request) -> dict:
+    """Parsea `product_id,fixed_price` a medida que llegan los bloques del cuerpo."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    desired, pending, line_no = {}, "", 0
+
+    def _parse(line: str) -> None:
+        nonlocal line_no
+        line_no += 1
+        line = line.strip()
+        if not line:
+            return
+        fields = next(csv.reader([line]))
+        if len(fields) < 2:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Línea {line_no}: se esperaba product_id,fixed_price")
+        try:
+            desired[int(fields[0])] = normalize_price(fields[1].strip())
+        except (ValueError, ArithmeticError):
+            if line_no == 1 and not fields[0].strip().isdigit():  # encabezado
+                return
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Línea {line_no}: valor inválido '{line}'")
+
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            _parse(line)
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        _parse(pending)
+    return desired
 
 
 # ── Asignación de Clientes ──────────────────────────────────────────────────
@@ -192,7 +282,7 @@ def assign_customers(
     clientes ya asignados a esta lista que NO aparezcan en la lista nueva
     quedan disociados (price_list_id = NULL).
     """
-    _get_or_404(db, price_list_id)
+    pl = _get_or_404(db, price_list_id)
 
     # Validar que todos los customer_ids existen
     if data.customer_ids:
@@ -217,7 +307,9 @@ def assign_customers(
             Customer.id.in_(data.customer_ids)
         ).update({"price_list_id": price_list_id}, synchronize_session="fetch")
 
+    pl.updated_at = func.now()
     db.commit()
+    price_index.patch_customers(db, price_list_id, data.customer_ids)
     return {"detail": f"{len(data.customer_ids)} cliente(s) asignados a la lista {price_list_id}."}
 
 
@@ -225,10 +317,10 @@ def assign_customers(
 
 @router.get("/resolve-price/{product_id}", response_model=ResolvedPriceResponse,
             summary="Resolver Precio Final para el POS")
-def resolve_price(
+async def resolve_price(
     product_id: int,
     customer_id: Optional[int] = None,
-    db: Session = Depends(get_tenant_db),
+    db: AsyncSession = Depends(get_tenant_async_db),
 ):
     """Calcula el precio final a aplicar para un producto dado un cliente opcional.
 
@@ -240,7 +332,9 @@ def resolve_price(
     Ideal para ser llamado por el terminal POS al escanear un ítem sabiendo el cliente activo.
     """
     # 1. Verify product exists
-    product = db.query(Product).filter(Product.id == product_id, Product.is_active == True).first()
+    product = (await db.execute(
+        select(Product.id, Product.precio_neto).where(Product.id == product_id, Product.is_active == True)
+    )).first()
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -257,36 +351,76 @@ def resolve_price(
             source="base_price",
         )
 
-    # 3. Fetch the customer's price list
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
-    if not customer or customer.price_list_id is None:
+    # 3. Look up the customer's list and fixed price in the in-memory index
+    index = await db.run_sync(price_index.get)
+    price_list_id, fixed_price = index.price_for(customer_id, product_id)
+    if fixed_price is not None:
         return ResolvedPriceResponse(
             product_id=product_id,
             customer_id=customer_id,
-            resolved_price=base_price,
-            source="base_price",
-        )
-
-    # 4. Look up the fixed price in the pivot table
-    assoc = db.query(PriceListProduct).filter(
-        PriceListProduct.price_list_id == customer.price_list_id,
-        PriceListProduct.product_id == product_id,
-    ).first()
-
-    if assoc:
-        return ResolvedPriceResponse(
-            product_id=product_id,
-            customer_id=customer_id,
-            price_list_id=customer.price_list_id,
-            resolved_price=assoc.fixed_price,
+            price_list_id=price_list_id,
+            resolved_price=fixed_price,
             source="price_list",
         )
 
-    # 5. Product not in the list → fallback to base price
+    # 4. No list or product not in the list → fallback to base price
     return ResolvedPriceResponse(
         product_id=product_id,
         customer_id=customer_id,
-        price_list_id=customer.price_list_id,
+        price_list_id=price_list_id,
         resolved_price=base_price,
         source="base_price",
     )
+
+
+@router.post("/resolve-prices", response_model=ResolvePricesResponse,
+             summary="Resolver Precios en Lote para el POS")
+async def resolve_prices(data: ResolvePricesRequest, db: AsyncSession = Depends(get_tenant_async_db)):
+    """Resuelve el precio final de varios productos (por ID o código de barras).
+
+    Misma lógica que `resolve_price`, con una consulta para los productos y
+    el índice en memoria de listas de precios: el costo no depende de la
+    cantidad de líneas (cotizaciones, carga de documentos).
+    """
+    if not data.product_ids and not data.barcodes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Debe indicar product_ids o barcodes.",
+        )
+
+    criteria = []
+    if data.product_ids:
+        criteria.append(Product.id.in_(data.product_ids))
+    if data.barcodes:
+        criteria.append(Product.codigo_barras.in_(data.barcodes))
+    products = (await db.execute(
+        select(Product.id, Product.codigo_barras, Product.precio_neto)
+        .where(Product.is_active == True, or_(*criteria))  # noqa: E712
+    )).all()
+    by_id = {p.id: p for p in products}
+    by_barcode = {p.codigo_barras: p for p in products if p.codigo_barras}
+
+    index = await db.run_sync(price_index.get)
+    price_list_id = index.customers.get(data.customer_id) if data.customer_id is not None else None
+
+    def _resolve(product) -> ResolvedPriceResponse:
+        _, fixed_price = index.price_for(data.customer_id, product.id)
+        return ResolvedPriceResponse(
+            product_id=product.id,
+            customer_id=data.customer_id,
+            price_list_id=price_list_id,
+            resolved_price=fixed_price if fixed_price is not None else product.precio_neto,
+            source="price_list" if fixed_price is not None else "base_price",
+            codigo_barras=product.codigo_barras,
+        )
+
+    items = [_resolve(by_id[pid]) for pid in data.product_ids if pid in by_id]
+    items += [_resolve(by_barcode[code]) for code in data.barcodes if code in by_barcode]
+
+    return ResolvePricesResponse(
+        customer_id=data.customer_id,
+        price_list_id=price_list_id,
+        items=items,
+        missing_product_ids=[pid for pid in data.product_ids if pid not in by_id],
+        missing_barcodes=[code for code in data.barcodes if code not in by_barcode],
+    )
@@ -1,67 +1,45 @@
 """Router para gestión de Productos."""
 
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func as sql_func
 
-from app.dependencies.tenant import get_tenant_db
+from app.dependencies.tenant import get_tenant_async_db, get_tenant_db
 from app.models.product import Product
 from app.schemas import (
     ProductCreate,
     ProductCreateWithVariants,
+    ProductImportResult,
     ProductOut,
+    ProductPOSOut,
     ProductUpdate,
 )
+from app.services.product_catalog import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    catalog_query,
+    fetch_page,
+    full_options,
+    pos_options,
+)
+from app.services.product_io import (
+    DEFAULT_BATCH_SIZE,
+    ProductImporter,
+    export_chunks,
+    generate_ean13,
+    generate_sku,
+    iter_csv_records,
+    iter_ndjson_records,
+)
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 
-# ── Utilidades de auto-generación ─────────────────────────────────────
-
-
-def generate_sku(db: Session, prefix: str = "PROD") -> str:
-    """Genera un SKU único auto-incremental.
-
-    Formato: PROD-00001, PROD-00002, etc.
-    """
-    # Find highest existing numeric suffix for this prefix
-    like_pattern = f"{prefix}-%"
-    last = (
-        db.query(Product.codigo_interno)
-        .filter(Product.codigo_interno.like(like_pattern))
-        .order_by(Product.id.desc())
-        .first()
-    )
-
-    if last and last[0]:
-        try:
-            num = int(last[0].split("-")[-1]) + 1
-        except (ValueError, IndexError):
-            num = db.query(sql_func.count(Product.id)).scalar() + 1
-    else:
-        num = 1
-
-    return f"{prefix}-{num:05d}"
-
-
-def generate_ean13(product_id: int) -> str:
-    """Genera un código EAN-13 para uso interno.
-
-    Usa el prefijo GS1 '200' (reservado para uso interno/in-store).
-    Formato: 200 + 9 dígitos del ID (con padding) + 1 dígito verificador.
-    """
-    body = f"200{product_id:09d}"  # 12 dígitos
-    # Calcular dígito verificador EAN-13
-    total = 0
-    for i, digit in enumerate(body):
-        weight = 1 if i % 2 == 0 else 3
-        total += int(digit) * weight
-    check = (10 - (total % 10)) % 10
-    return f"{body}{check}"
-
-
 # ── Endpoints ─────────────────────────────────────────────────────────
 
 
@@ -177,12 +155,117 @@ def create_product_with_variants(payload: ProductCreateWithVariants, db: Session
     return parent
 
 
-@router.get("/", response_model=List[ProductOut])
-def list_products(db: Session = Depends(get_tenant_db)):
-    """Lista todos los productos activos (no eliminados)."""
-    return db.query(Product).filter(
-        Product.is_deleted == False  # noqa: E712
-    ).order_by(Product.id.desc()).all()
+@router.get("/", response_model=List[ProductOut],
+            summary="Listar Productos",
+            description="Lista productos no eliminados con filtros. Con `limit` se pagina por "
+                        "keyset: el cursor de la página siguiente llega en el header X-Next-Cursor.")
+def list_products(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página"),
+    cursor: Optional[int] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
+    brand_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    low_stock: bool = False,
+    parent_id: Optional[int] = None,
+    kind: Optional[str] = Query(None, pattern="^(parents|variants)$"),
+    q: Optional[str] = Query(None, min_length=1),
+    db: Session = Depends(get_tenant_db),
+):
+    """Lista productos (no eliminados), del más reciente al más antiguo.
+
+    Sin `limit` ni `cursor` retorna el catálogo completo (compatibilidad con
+    clientes antiguos). Las relaciones se cargan por lotes en ambos casos.
+    """
+    query = catalog_query(
+        db, brand_id=brand_id, is_active=is_active, low_stock=low_stock,
+        parent_id=parent_id, kind=kind, q=q,
+    ).options(*full_options())
+    return _paginate(response, query, limit, cursor)
+
+
+@router.get("/pos", response_model=List[ProductPOSOut],
+            summary="Catálogo POS",
+            description="Proyección liviana y paginada de productos activos para el punto de venta.")
+async def list_products_pos(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+    brand_id: Optional[int] = None,
+    q: Optional[str] = Query(None, min_length=1),
+    db: AsyncSession = Depends(get_tenant_async_db),
+):
+    """Retorna sólo los campos que usa el POS (nombre, precio bruto, stock).
+
+    Reutiliza `catalog_query` vía `run_sync`: las consultas van por asyncpg
+    sin bloquear el loop, y la serialización ocurre dentro (sin lazy loads
+    fuera de la sesión).
+    """
+    def _page(session: Session) -> list:
+        query = catalog_query(session, brand_id=brand_id, is_active=True, q=q).options(*pos_options())
+        return [ProductPOSOut.model_validate(p) for p in _paginate(response, query, limit, cursor)]
+
+    return await db.run_sync(_page)
+
+
+@router.post("/import", response_model=ProductImportResult,
+             summary="Importación Masiva de Productos",
+             description="Importa productos y variantes desde CSV (con encabezado) o NDJSON en streaming. "
+                         "Columnas: codigo_interno, nombre, descripcion, precio_neto, costo_unitario, "
+                         "unidad_medida, codigo_barras, controla_stock, stock_actual, stock_minimo, "
+                         "is_active, brand_id, tax_id, parent_codigo (SKU del padre si es variante).")
+async def import_products(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=5000),
+    dry_run: bool = Query(False, description="Validar sin guardar"),
+    db: Session = Depends(get_tenant_db),
+):
+    """Importa el catálogo por lotes; las filas inválidas se reportan y se omiten.
+
+    SKUs (PROD-NNNNN / PADRE-VNN) y EAN-13 faltantes se generan en bloque. Un
+    padre debe aparecer antes que sus variantes (o existir en la base).
+    """
+    importer = await run_in_threadpool(ProductImporter, db, batch_size, dry_run)
+    parse = iter_csv_records if format == "csv" else iter_ndjson_records
+    async for line, record in parse(request.stream()):
+        importer.add(line, record)
+        if importer.full:
+            await run_in_threadpool(importer.flush)
+    result = await run_in_threadpool(importer.finish)
+    return ProductImportResult(**vars(result))
+
+
+@router.get("/export",
+            summary="Exportación Masiva de Productos",
+            description="Exporta el catálogo (no eliminado) en CSV o NDJSON, con las columnas de la importación.")
+def export_products(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_tenant_db),
+):
+    """Transmite el catálogo en bloques, leyendo con un cursor de servidor."""
+    engine = db.get_bind()
+
+    def _stream():
+        # Conexión propia: la sesión de la dependencia se cierra antes de terminar el stream
+        with engine.connect() as conn:
+            yield from export_chunks(conn, format)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="productos.{format}"'},
+    )
+
+
+def _paginate(response: Response, query, limit: Optional[int], cursor: Optional[int]) -> list:
+    """Aplica keyset si se pidió una página y expone el cursor siguiente en headers."""
+    if limit is None and cursor is None:
+        return query.order_by(Product.id.desc()).all()
+    rows, next_cursor = fetch_page(query, limit or DEFAULT_PAGE_SIZE, cursor)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return rows
 
 
 @router.put("/{product_id}", response_model=ProductOut,
@@ -248,12 +331,15 @@ def delete_product(product_id: int, db: Session = Depends(get_tenant_db)):
 @router.get("/{codigo}", response_model=ProductOut,
              summary="Buscar Producto",
              description="Busca un producto por su SKU.")
-def get_product_by_sku(codigo: str, db: Session = Depends(get_tenant_db)):
+async def get_product_by_sku(codigo: str, db: AsyncSession = Depends(get_tenant_async_db)):
     """Busca un producto por su código interno (SKU)."""
-    product = db.query(Product).filter(Product.codigo_interno == codigo).first()
+    product = (await db.execute(
+        select(Product).options(*full_options()).where(Product.codigo_interno == codigo)
+    )).scalars().first()
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No se encontró un producto con código {codigo}",
         )
-    return product
+    # Variantes anidadas más allá de lo precargado se cargan dentro de la sesión
+    return await db.run_sync(lambda _: ProductOut.model_validate(product))
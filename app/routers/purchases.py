@@ -1,38 +1,36 @@
 """Router para gestión de Compras (Ingreso de Mercadería)."""
 
-from pathlib import Path
 from typing import List
 from decimal import Decimal
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import HTMLResponse
-from jinja2 import Environment, FileSystemLoader
 from sqlalchemy.orm import Session, joinedload
 
 from app.dependencies.tenant import get_tenant_db
 from app.models.purchase import Purchase, PurchaseDetail
 from app.models.product import Product
 from app.models.inventory import StockMovement
-from app.models.issuer import Issuer
 from app.schemas import PurchaseCreate, PurchaseOut
-from app.utils.formatters import format_clp, format_number
+from app.services.document_renderer import DocumentError, invalidate_document, render_purchase
+from app.services.stock_take import StockTakeError, ensure_unlocked
 
 router = APIRouter(prefix="/purchases", tags=["purchases"])
 
-# ── Jinja2 para plantillas HTML ──────────────────────────────────────
-_HTML_TEMPLATES = Path(__file__).resolve().parent.parent / "templates" / "html"
-_html_env = Environment(
-    loader=FileSystemLoader(str(_HTML_TEMPLATES)),
-    autoescape=True,
-)
-_html_env.filters["clp"] = format_clp
-_html_env.filters["number"] = format_number
+
+def _ensure_unlocked(db: Session, product_ids) -> None:
+    """409 si algún producto está bloqueado por una toma de inventario."""
+    try:
+        ensure_unlocked(db, product_ids)
+    except StockTakeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
 
 
 @router.post("/", response_model=PurchaseOut, status_code=status.HTTP_201_CREATED)
 def create_purchase(purchase_in: PurchaseCreate, db: Session = Depends(get_tenant_db)):
     """Registra una compra y actualiza stock/costos de forma atómica."""
-    
+    _ensure_unlocked(db, {item.product_id for item in purchase_in.items})
+
     # 1. Crear encabezado
     db_purchase = Purchase(
         provider_id=purchase_in.provider_id,
@@ -133,6 +131,7 @@ def update_purchase(purchase_id: int, purchase_in: PurchaseCreate, db: Session =
 
     # 1. Mapear cantidades actuales para comparar después
     old_items_map = {d.product_id: d.cantidad for d in db_purchase.details}
+    _ensure_unlocked(db, set(old_items_map) | {item.product_id for item in purchase_in.items})
 
     # 2. Reversar stock de los items antiguos antes de aplicar los nuevos
     for product_id, old_qty in old_items_map.items():
@@ -205,6 +204,7 @@ def update_purchase(purchase_id: int, purchase_in: PurchaseCreate, db: Session =
     db_purchase.monto_total = db_purchase.monto_neto + db_purchase.iva
 
     db.commit()
+    invalidate_document(db.info.get("schema_name"), "purchase", purchase_id)
     db.refresh(db_purchase)
     return db_purchase
 
@@ -216,6 +216,8 @@ def delete_purchase(purchase_id: int, db: Session = Depends(get_tenant_db)):
     if not db_purchase:
         raise HTTPException(status_code=404, detail="Compra no encontrada")
 
+    _ensure_unlocked(db, {d.product_id for d in db_purchase.details})
+
     # Reversar stock
     for detail in db_purchase.details:
         product = db.query(Product).filter(Product.id == detail.product_id).first()
@@ -233,6 +235,7 @@ def delete_purchase(purchase_id: int, db: Session = Depends(get_tenant_db)):
 
     db.delete(db_purchase)
     db.commit()
+    invalidate_document(db.info.get("schema_name"), "purchase", purchase_id)
     return None
 
 
@@ -244,29 +247,8 @@ def list_purchases(db: Session = Depends(get_tenant_db)):
 
 @router.get("/{purchase_id}/pdf", response_class=HTMLResponse)
 def get_purchase_pdf(purchase_id: int, db: Session = Depends(get_tenant_db)):
-    """Generat HTML preview of the purchase for printing."""
-    purchase = (
-        db.query(Purchase)
-        .options(
-            joinedload(Purchase.provider),
-            joinedload(Purchase.details).joinedload(PurchaseDetail.product),
-        )
-        .filter(Purchase.id == purchase_id)
-        .first()
-    )
-
-    if not purchase:
-        raise HTTPException(status_code=404, detail="Compra no encontrada")
-
-    issuer = db.query(Issuer).first()
-    if not issuer:
-        raise HTTPException(status_code=404, detail="Emisor no configurado. Use PUT /issuer/ primero.")
-
-    template = _html_env.get_template("purchase_print.html")
-    html_content = template.render(
-        purchase=purchase,
-        issuer=issuer,
-        provider=purchase.provider,
-    )
-
-    return HTMLResponse(content=html_content)
+    """Genera la vista previa HTML de la compra para impresión (cacheada)."""
+    try:
+        return HTMLResponse(content=render_purchase(db, purchase_id))
+    except DocumentError as e:
+        raise HTTPException(status_code=404, detail=str(e))
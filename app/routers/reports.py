@@ -1,6 +1,7 @@
 """
 Endpoint de reportes y análisis para el dashboard.
-Agrega métricas de ventas del día, por hora, top productos y métodos de pago.
+Agrega métricas de ventas del día, por hora, top productos y métodos de pago
+desde los agregados precalculados (`app.models.rollup`).
 """
 
 from datetime import datetime, timedelta, date
@@ -9,69 +10,79 @@ from decimal import Decimal
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import func, desc, case, extract
+from sqlalchemy import func, desc, case
 from sqlalchemy.orm import Session
 
-from app.models.sale import Sale, SaleDetail
 from app.models.product import Product
-from app.models.payment import PaymentMethod, SalePayment
+from app.models.payment import PaymentMethod
+from app.models.rollup import (
+    SalesDailyRollup,
+    SalesHourlyRollup,
+    SalesPaymentDailyRollup,
+    SalesProductDailyRollup,
+)
 from app.models.cash import CashSession
 from app.dependencies.tenant import get_tenant_db, require_admin
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 
+SALES_DTES = (33, 39)  # Facturas y Boletas
+CREDIT_NOTE_DTE = 61
+
+
 @router.get("/dashboard", dependencies=[Depends(require_admin)])
 def get_dashboard(
     fecha: Optional[date] = Query(None, description="Fecha del reporte (default=hoy)"),
     db: Session = Depends(get_tenant_db),
 ):
     """Retorna métricas del dashboard para una fecha específica."""
-    target_date = fecha or get_today().date()
-    start = datetime.combine(target_date, datetime.min.time(), tzinfo=get_now().tzinfo)
-    end = datetime.combine(target_date, datetime.max.time(), tzinfo=get_now().tzinfo)
-
-    # ── KPIs del día ─────────────────────────────────────────────────
-    sales_query = db.query(Sale).filter(
-        Sale.fecha_emision >= start,
-        Sale.fecha_emision <= end,
-        Sale.tipo_dte.in_([33, 39]),  # Facturas y Boletas
-    )
+    return build_dashboard(db, fecha or get_today().date())
 
-    all_sales = sales_query.all()
-    total_ventas = sum(float(s.monto_total) for s in all_sales)
-    total_neto = sum(float(s.monto_neto) for s in all_sales)
-    total_iva = sum(float(s.iva) for s in all_sales)
-    num_ventas = len(all_sales)
-    ticket_promedio = total_ventas / num_ventas if num_ventas > 0 else 0
-
-    # Notas de crédito del día
-    nc_query = db.query(Sale).filter(
-        Sale.fecha_emision >= start,
-        Sale.fecha_emision <= end,
-        Sale.tipo_dte == 61,
-    )
-    num_nc = nc_query.count()
-    total_nc = sum(float(s.monto_total) for s in nc_query.all())
+
+def build_dashboard(db: Session, target_date: date) -> dict:
+    """Arma el dashboard del día con un conjunto fijo de consultas agregadas.
+
+    Todas las sumas se resuelven en SQL sobre los rollups (agregación
+    condicional por tipo de DTE) y se mantienen como `Decimal`.
+    """
+    is_sale = SalesDailyRollup.tipo_dte.in_(SALES_DTES)
+    is_nc = SalesDailyRollup.tipo_dte == CREDIT_NOTE_DTE
+
+    def _sum_if(column, condition):
+        return func.coalesce(func.sum(case((condition, column), else_=0)), 0)
+
+    # ── KPIs del día (una sola fila con agregación condicional) ──────
+    kpis = db.query(
+        _sum_if(SalesDailyRollup.gross, is_sale).label("total_ventas"),
+        _sum_if(SalesDailyRollup.net, is_sale).label("total_neto"),
+        _sum_if(SalesDailyRollup.iva, is_sale).label("total_iva"),
+        _sum_if(SalesDailyRollup.count, is_sale).label("num_ventas"),
+        _sum_if(SalesDailyRollup.count, is_nc).label("num_nc"),
+        _sum_if(SalesDailyRollup.gross, is_nc).label("total_nc"),
+    ).filter(SalesDailyRollup.fecha == target_date).one()
+
+    total_ventas = Decimal(kpis.total_ventas)
+    num_ventas = int(kpis.num_ventas)
+    ticket_promedio = round(total_ventas / num_ventas) if num_ventas > 0 else 0
 
     # ── Ventas por hora ──────────────────────────────────────────────
     hourly = (
         db.query(
-            extract("hour", Sale.fecha_emision).label("hora"),
-            func.count(Sale.id).label("cantidad"),
-            func.sum(Sale.monto_total).label("total"),
+            SalesHourlyRollup.hora.label("hora"),
+            func.sum(SalesHourlyRollup.count).label("cantidad"),
+            func.sum(SalesHourlyRollup.gross).label("total"),
         )
         .filter(
-            Sale.fecha_emision >= start,
-            Sale.fecha_emision <= end,
-            Sale.tipo_dte.in_([33, 39]),
+            SalesHourlyRollup.fecha == target_date,
+            SalesHourlyRollup.tipo_dte.in_(SALES_DTES),
         )
-        .group_by(extract("hour", Sale.fecha_emision))
-        .order_by(extract("hour", Sale.fecha_emision))
+        .group_by(SalesHourlyRollup.hora)
+        .order_by(SalesHourlyRollup.hora)
         .all()
     )
     ventas_por_hora = [
-        {"hora": f"{int(h.hora):02d}:00", "cantidad": h.cantidad, "total": float(h.total)}
+        {"hora": f"{int(h.hora):02d}:00", "cantidad": int(h.cantidad), "total": h.total}
         for h in hourly
     ]
 
@@ -80,18 +91,16 @@ def get_dashboard(
         db.query(
             Product.nombre,
             Product.codigo_interno,
-            func.sum(SaleDetail.cantidad).label("cantidad"),
-            func.sum(SaleDetail.subtotal).label("total"),
+            func.sum(SalesProductDailyRollup.quantity).label("cantidad"),
+            func.sum(SalesProductDailyRollup.net).label("total"),
         )
-        .join(SaleDetail, SaleDetail.product_id == Product.id)
-        .join(Sale, Sale.id == SaleDetail.sale_id)
+        .join(SalesProductDailyRollup, SalesProductDailyRollup.product_id == Product.id)
         .filter(
-            Sale.fecha_emision >= start,
-            Sale.fecha_emision <= end,
-            Sale.tipo_dte.in_([33, 39]),
+            SalesProductDailyRollup.fecha == target_date,
+            SalesProductDailyRollup.tipo_dte.in_(SALES_DTES),
         )
         .group_by(Product.id, Product.nombre, Product.codigo_interno)
-        .order_by(desc(func.sum(SaleDetail.subtotal)))
+        .order_by(desc(func.sum(SalesProductDailyRollup.net)))
         .limit(5)
         .all()
     )
@@ -99,8 +108,8 @@ def get_dashboard(
         {
             "nombre": p.nombre,
             "sku": p.codigo_interno,
-            "cantidad": float(p.cantidad),
-            "total": float(p.total),
+            "cantidad": p.cantidad,
+            "total": p.total,
         }
         for p in top_products
     ]
@@ -110,15 +119,13 @@ def get_dashboard(
         db.query(
             PaymentMethod.name,
             PaymentMethod.code,
-            func.count(SalePayment.id).label("transacciones"),
-            func.sum(SalePayment.amount).label("total"),
+            func.sum(SalesPaymentDailyRollup.count).label("transacciones"),
+            func.sum(SalesPaymentDailyRollup.amount).label("total"),
         )
-        .join(SalePayment, SalePayment.payment_method_id == PaymentMethod.id)
-        .join(Sale, Sale.id == SalePayment.sale_id)
+        .join(SalesPaymentDailyRollup, SalesPaymentDailyRollup.payment_method_id == PaymentMethod.id)
         .filter(
-            Sale.fecha_emision >= start,
-            Sale.fecha_emision <= end,
-            Sale.tipo_dte.in_([33, 39]),
+            SalesPaymentDailyRollup.fecha == target_date,
+            SalesPaymentDailyRollup.tipo_dte.in_(SALES_DTES),
         )
         .group_by(PaymentMethod.id, PaymentMethod.name, PaymentMethod.code)
         .all()
@@ -127,8 +134,8 @@ def get_dashboard(
         {
             "nombre": p.name,
             "codigo": p.code,
-            "transacciones": p.transacciones,
-            "total": float(p.total),
+            "transacciones": int(p.transacciones),
+            "total": p.total,
         }
         for p in payment_dist
     ]
@@ -140,19 +147,19 @@ def get_dashboard(
         caja = {
             "id": active_session.id,
             "inicio": active_session.start_time.isoformat(),
-            "fondo": float(active_session.start_amount),
+            "fondo": active_session.start_amount,
         }
 
     return {
         "fecha": target_date.isoformat(),
         "kpis": {
             "total_ventas": total_ventas,
-            "total_neto": total_neto,
-            "total_iva": total_iva,
+            "total_neto": Decimal(kpis.total_neto),
+            "total_iva": Decimal(kpis.total_iva),
             "num_ventas": num_ventas,
-            "ticket_promedio": round(ticket_promedio),
-            "num_notas_credito": num_nc,
-            "total_notas_credito": total_nc,
+            "ticket_promedio": ticket_promedio,
+            "num_notas_credito": int(kpis.num_nc),
+            "total_notas_credito": Decimal(kpis.total_nc),
         },
         "ventas_por_hora": ventas_por_hora,
         "top_productos": top,
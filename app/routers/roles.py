@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app.models.user import Role
 from app.schemas import RoleOut, RoleUpdate
 from app.dependencies.tenant import require_admin, get_tenant_db
+from app.services import role_permissions
 
 router = APIRouter(prefix="/roles", tags=["roles"])
 
@@ -31,7 +32,9 @@ def update_role(role_id: int, role_in: RoleUpdate, db: Session = Depends(get_ten
     update_data = role_in.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(role, field, value)
-    
+
+    # Misma transacción que el rol: la proyección del login no queda desfasada
+    role_permissions.upsert_role(db, db.info.get("tenant_id"), role.name, role.permissions)
     db.commit()
     db.refresh(role)
     return role
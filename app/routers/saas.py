@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Annotated
 
-from app.database import get_db
-from app.dependencies.tenant import get_global_db, get_current_global_user
+from app.database import get_db, tenant_pools
+from app.dependencies.tenant import get_global_db, get_current_global_user, invalidate_membership_cache, membership_cache, revoke_user_tokens
 from app.models.saas import SaaSUser
 
 # Asumiremos la existencia de schemas Pydantic para el payload, 
@@ -11,8 +12,10 @@ from app.models.saas import SaaSUser
 from app.schemas_saas import TenantCreate, TenantOut, TenantUserOut, TenantUserCreate, TenantUpdate, TenantUserUpdate, ActecoOut
 from app.models.saas import Tenant, TenantUser, SaaSPlan
 from app.models.acteco import Acteco
-from app.utils.security import get_password_hash
+from app.utils.security import get_password_hash_async, password_pool
 from app.services.tenant_service import provision_new_tenant
+from app.services import document_renderer, tenant_runner, tenant_tasks
+from app.services.tenant_runner import TenantTarget
 
 router = APIRouter(prefix="/saas", tags=["SaaS Management"])
 
@@ -39,6 +42,61 @@ async def search_actecos(
     return rows
 
 
+@router.get("/auth-cache/stats")
+async def auth_cache_stats(
+    current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
+):
+    """Contadores de la caché de membresías del worker actual (hits, misses, entradas)."""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return membership_cache.stats()
+
+
+@router.get("/document-cache/stats")
+async def document_cache_stats(
+    current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
+):
+    """Contadores de las cachés de emisor y documentos renderizados del worker actual."""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return document_renderer.stats()
+
+
+@router.get("/pools/stats")
+async def tenant_pool_stats(
+    current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
+):
+    """Estadísticas de los pools de conexión por Inquilino del worker actual."""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return tenant_pools.stats()
+
+
+@router.get("/password-pool/stats")
+async def password_pool_stats(
+    current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
+):
+    """Profundidad de cola y tiempos del pool de bcrypt del worker actual."""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return password_pool.stats()
+
+
+@router.post("/users/{user_id}/revoke-tokens")
+async def revoke_tokens(
+    user_id: int,
+    current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
+    global_db: Session = Depends(get_global_db),
+):
+    """Cierra todas las sesiones de un usuario global (tokens con claims y refresh)."""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if not revoke_user_tokens(global_db, user_id=user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    invalidate_membership_cache(subject=global_db.get(SaaSUser, user_id).email)
+    return {"revoked": True}
+
+
 @router.get("/tenants", response_model=list[TenantOut])
 async def list_tenants(
     current_user: Annotated[SaaSUser, Depends(get_current_global_user)],
@@ -104,6 +162,10 @@ async def update_tenant(
         
     global_db.commit()
     global_db.refresh(tenant)
+    invalidate_membership_cache(tenant_id=tenant.id)
+    if update_data.get("is_active") is False:
+        # Los tokens con claims llevan el acceso al Inquilino: forzar nuevo login
+        revoke_user_tokens(global_db, tenant_id=tenant.id)
 
     # SINCRONIZACIÓN: Si se actualizaron campos DTE, impactar en el esquema local
     dte_fields = {"name", "address", "commune", "city", "giro", "economic_activities"}
@@ -163,6 +225,9 @@ async def delete_tenant(
         
     tenant.is_active = False
     global_db.commit()
+    invalidate_membership_cache(tenant_id=tenant.id)
+    revoke_user_tokens(global_db, tenant_id=tenant.id)
+    tenant_pools.dispose(tenant.schema_name)
     return None
 
 
@@ -229,7 +294,7 @@ async def assign_user_to_tenant(
             
         target_user = SaaSUser(
             email=user_data.email,
-            hashed_password=get_password_hash(user_data.password),
+            hashed_password=await get_password_hash_async(user_data.password),
             full_name=user_data.full_name
         )
         global_db.add(target_user)
@@ -252,6 +317,7 @@ async def assign_user_to_tenant(
     global_db.add(new_tenant_user)
     global_db.commit()
     global_db.refresh(new_tenant_user)
+    invalidate_membership_cache(subject=target_user.email)
     
     # 4. Sincronizar hacia el esquema local (users)
     try:
@@ -311,7 +377,7 @@ async def update_tenant_user(
     # Manejar actualización de contraseña y nombre en la cuenta global
     pwd = data_dict.pop("password", None)
     if pwd:
-        tenant_user.user.hashed_password = get_password_hash(pwd)
+        tenant_user.user.hashed_password = await get_password_hash_async(pwd)
         
     fn = data_dict.pop("full_name", None)
     if fn is not None:
@@ -322,6 +388,10 @@ async def update_tenant_user(
         
     global_db.commit()
     global_db.refresh(tenant_user)
+    invalidate_membership_cache(subject=tenant_user.user.email)
+    # Los tokens con claims llevan el rol: desactivar o cambiar el rol los revoca
+    if update_data.is_active is False or "role_name" in data_dict:
+        revoke_user_tokens(global_db, user_id=user_id)
     
     # 2. Sincronizar hacia el esquema local
     tenant = global_db.query(Tenant).filter(Tenant.id == tenant_id).first()
@@ -388,30 +458,11 @@ async def inject_system_user(
         raise HTTPException(status_code=404, detail="Tenant not found")
 
     try:
-        # Verificar si ya existe
-        existing = global_db.execute(
-            text(f'SELECT id FROM "{tenant.schema_name}".users WHERE is_system_user = true LIMIT 1')
-        ).fetchone()
-
-        if existing:
-            return {"status": "already_exists", "tenant": tenant.name, "schema": tenant.schema_name}
-
-        # Obtener rol ADMINISTRADOR del tenant
-        role_res = global_db.execute(
-            text(f"SELECT id FROM \"{tenant.schema_name}\".roles WHERE name = 'ADMINISTRADOR' LIMIT 1")
-        ).fetchone()
-        admin_role_id = role_res[0] if role_res else 1
-
-        # Insertar usuario de sistema
-        global_db.execute(text(f"""
-            INSERT INTO "{tenant.schema_name}".users
-            (rut, razon_social, email, full_name, is_system_user, is_active, role_id, role, password_hash)
-            VALUES
-            ('0-0', 'Soporte Torn', 'soporte@torn.cl', 'Soporte Sistema', true, true, :role_id, 'ADMIN', 'INVALID_HASH')
-        """), {"role_id": admin_role_id})
+        status_ = tenant_tasks.inject_system_user(
+            global_db.connection(), TenantTarget(tenant.id, tenant.schema_name, tenant.name)
+        )
         global_db.commit()
-
-        return {"status": "injected", "tenant": tenant.name, "schema": tenant.schema_name}
+        return {"status": status_, "tenant": tenant.name, "schema": tenant.schema_name}
 
     except Exception as e:
         global_db.rollback()
@@ -430,35 +481,15 @@ async def inject_system_users_all(
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    tenants = global_db.query(Tenant).filter(Tenant.is_active == True).all()
-    results = []
-
-    for tenant in tenants:
-        try:
-            existing = global_db.execute(
-                text(f'SELECT id FROM "{tenant.schema_name}".users WHERE is_system_user = true LIMIT 1')
-            ).fetchone()
-
-            if existing:
-                results.append({"tenant": tenant.name, "status": "already_exists"})
-                continue
-
-            role_res = global_db.execute(
-                text(f"SELECT id FROM \"{tenant.schema_name}\".roles WHERE name = 'ADMINISTRADOR' LIMIT 1")
-            ).fetchone()
-            admin_role_id = role_res[0] if role_res else 1
-
-            global_db.execute(text(f"""
-                INSERT INTO "{tenant.schema_name}".users
-                (rut, razon_social, email, full_name, is_system_user, is_active, role_id, role, password_hash)
-                VALUES
-                ('0-0', 'Soporte Torn', 'soporte@torn.cl', 'Soporte Sistema', true, true, :role_id, 'ADMIN', 'INVALID_HASH')
-            """), {"role_id": admin_role_id})
-            global_db.commit()
-            results.append({"tenant": tenant.name, "status": "injected"})
-
-        except Exception as e:
-            global_db.rollback()
-            results.append({"tenant": tenant.name, "status": "error", "detail": str(e)})
-
-    return {"results": results}
+    # En paralelo, una transacción por Inquilino: un fallo no afecta al resto
+    tenants = tenant_runner.list_tenants(global_db)
+    report = await run_in_threadpool(
+        tenant_runner.run_tenants, tenant_tasks.inject_system_user, tenants, task_name="inject_system_user"
+    )
+    results = [
+        {"tenant": r.name, "status": r.result}
+        if r.status == "ok" else
+        {"tenant": r.name, "status": "error", "detail": r.error}
+        for r in report.results
+    ]
+    return {"results": results, "summary": report.summary()}
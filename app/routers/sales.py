@@ -1,47 +1,45 @@
 """Router para gestión de Ventas (Facturas)."""
 
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
-from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import HTMLResponse
-from jinja2 import Environment, FileSystemLoader
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 
-from app.models.dte import CAF, DTE
-from app.models.issuer import Issuer
+from app.models.dte import DTE, DteJob
 from app.models.product import Product
 from app.models.sale import Sale, SaleDetail
 from app.models.user import User
 from app.models.customer import Customer
 from app.models.cash import CashSession
-from app.models.settings import SystemSettings
 from app.models.payment import SalePayment, PaymentMethod
-from app.schemas import SaleCreate, SaleOut, ReturnCreate, PaymentMethodOut
-from app.services.xml_generator import render_factura_xml
-from app.utils.formatters import format_clp, format_number
-from app.dependencies.tenant import get_current_tenant_user, get_tenant_db, get_global_db, get_current_local_user, get_current_global_user
+from app.schemas import SaleCreate, SaleOut, ReturnCreate, PaymentMethodOut, DTEStatusOut, DTEQueueStatsOut
+from app.services.cash_totals import record_payments
+from app.services.document_renderer import MAX_BATCH, BatchTooLargeError, DocumentError, render_sale, render_sales_batch
+from app.services.dte_pipeline import enqueue_dte, dte_pipeline, queue_stats
+from app.services.dte_signer import has_certificate, signing_pool
+from app.services.sales_rollup import record_sale
+from app.services.stock_take import StockTakeError, ensure_unlocked
+from app.services.folio_allocator import folio_allocator, allocate_simulated_folio
+from app.utils.dates import CHILE_TZ
+from app.dependencies.tenant import get_current_tenant_user, get_tenant_db, get_tenant_async_db, get_global_db, get_current_local_user, get_current_local_user_async, get_current_global_user
 from app.models.saas import TenantUser, SaaSUser
 
 router = APIRouter(prefix="/sales", tags=["sales"])
 
-# ── Jinja2 para plantillas HTML ──────────────────────────────────────
-_HTML_TEMPLATES = Path(__file__).resolve().parent.parent / "templates" / "html"
-_html_env = Environment(
-    loader=FileSystemLoader(str(_HTML_TEMPLATES)),
-    autoescape=True,
-)
-_html_env.filters["clp"] = format_clp
-_html_env.filters["number"] = format_number
-
 
 @router.get("/payment-methods/", response_model=List[PaymentMethodOut],
             summary="Listar Medios de Pago",
             description="Lista todos los medios de pago activos.")
-def list_payment_methods(db: Session = Depends(get_tenant_db)):
+async def list_payment_methods(db: AsyncSession = Depends(get_tenant_async_db)):
     """Lista todos los medios de pago activos."""
-    return db.query(PaymentMethod).filter(PaymentMethod.is_active == True).all()  # noqa: E712
+    return (await db.execute(
+        select(PaymentMethod).where(PaymentMethod.is_active == True)  # noqa: E712
+    )).scalars().all()
 
 
 @router.get("/", response_model=List[SaleOut],
@@ -86,8 +84,9 @@ def create_sale(
     3. Descuenta inventario y genera movimientos (Kardex).
     4. Procesa pagos (múltiples medios de pago).
     5. Asigna Folio fiscal (CAF).
-    6. Genera XML del DTE (Factura Electrónica/Boleta).
-    7. Persiste todo en una transacción atómica.
+    6. Registra el DTE como PENDIENTE y encola la generación del XML.
+    7. Actualiza los agregados de ventas (rollups).
+    8. Persiste todo en una transacción atómica.
 
     Args:
         sale_in (SaleCreate): Datos de la venta (cliente, items, pagos).
@@ -100,7 +99,7 @@ def create_sale(
         HTTPException(409): Si la caja está cerrada o no hay stock.
         HTTPException(404): Si cliente o producto no existen.
         HTTPException(400): Si los montos no cuadran.
-        HTTPException(500): Si falla la generación del DTE.
+        HTTPException(500): Si falla el registro del DTE.
     """
     # 0. Validar Caja Abierta
     seller_id_to_use = local_user.id
@@ -140,12 +139,15 @@ def create_sale(
                 )
 
     # 2. Validar Productos y Calcular Totales
-    total_neto = Decimal("0")
-    sale_details = []
-    stock_movements = []
+    # Se cargan todos los productos del ticket en una sola consulta IN (...)
+    product_ids = sorted({item.product_id for item in sale_in.items})
+    products = {
+        p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids)).all()
+    } if product_ids else {}
 
+    requested_qty = {}
     for item in sale_in.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
+        product = products.get(item.product_id)
         if not product:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -157,27 +159,56 @@ def create_sale(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Producto {product.nombre} (SKU {product.codigo_interno}) no está activo",
             )
-        
+
+        if product.controla_stock:
+            requested_qty[product.id] = requested_qty.get(product.id, Decimal("0")) + item.cantidad
+
+    try:
+        ensure_unlocked(db, requested_qty)
+    except StockTakeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    # Bloquear filas con control de stock (SELECT ... FOR UPDATE) en orden de ID
+    # para que dos cajas vendiendo el mismo SKU no pierdan actualizaciones ni
+    # entren en deadlock; el stock se lee fresco tras tomar el lock.
+    locked_stock = {}
+    if requested_qty:
+        locked_stock = dict(
+            db.query(Product.id, Product.stock_actual)
+            .filter(Product.id.in_(sorted(requested_qty)))
+            .order_by(Product.id)
+            .with_for_update()
+            .all()
+        )
+
+    total_neto = Decimal("0")
+    sale_details = []
+    stock_movements = []
+    remaining_stock = dict(locked_stock)
+
+    from app.models.inventory import StockMovement
+
+    for item in sale_in.items:
+        product = products[item.product_id]
+
         # Validar Stock
         if product.controla_stock:
-            if product.stock_actual < item.cantidad:
+            available = remaining_stock[product.id] or Decimal("0")
+            if available < item.cantidad:
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT,
-                    detail=f"Stock insuficiente para {product.nombre}. Disponible: {product.stock_actual}, Solicitado: {item.cantidad}"
+                    detail=f"Stock insuficiente para {product.nombre}. Disponible: {available}, Solicitado: {item.cantidad}"
                 )
-            
-            # Descontar Stock y Registrar Movimiento (se guardará al hacer commit de la venta)
-            product.stock_actual -= item.cantidad
-            
-            # Importar localmente para evitar dependencias circulares
-            from app.models.inventory import StockMovement
-            
+            remaining_stock[product.id] = available - item.cantidad
+
+            # Registrar Movimiento (se guardará al hacer commit de la venta)
             movement = StockMovement(
                 product_id=product.id,
                 user_id=seller_id_to_use, # Usuario caja
                 tipo="SALIDA",
                 motivo="VENTA",
                 cantidad=item.cantidad,
+                balance_after=remaining_stock[product.id],
                 description=f"Venta en proceso", 
             )
             # No hacemos db.add(movement) aquí, lo vinculamos a la venta
@@ -197,6 +228,15 @@ def create_sale(
         )
         sale_details.append(detail_obj)
 
+    # Descontar Stock con un único UPDATE masivo sobre las filas bloqueadas
+    if requested_qty:
+        db.execute(
+            update(Product)
+            .where(Product.id.in_(sorted(requested_qty)))
+            .values(stock_actual=Product.stock_actual - case(requested_qty, value=Product.id))
+            .execution_options(synchronize_session=False)
+        )
+
     # 3. Calcular IVA y Total
     iva = total_neto * Decimal("0.19")
     total = total_neto + iva
@@ -213,19 +253,11 @@ def create_sale(
 
     # 4. Asignar Folio (CAF según tipo de DTE)
     tipo = sale_in.tipo_dte
-    caf = db.query(CAF).filter(
-        CAF.tipo_documento == tipo,
-        CAF.ultimo_folio_usado < CAF.folio_hasta,
-    ).order_by(CAF.id.asc()).first()
-
-    if caf:
-        nuevo_folio = caf.ultimo_folio_usado + 1
-        caf.ultimo_folio_usado = nuevo_folio
-        db.add(caf)
-    else:
+    # Asignación atómica (o desde el bloque reservado del worker), con rollover entre CAFs
+    nuevo_folio = folio_allocator.next_folio(db, tipo)
+    if nuevo_folio is None:
         # MODO SIMULACIÓN: Si no hay CAF, usamos correlativo manual basándonos en ventas anteriores
-        last_sale = db.query(Sale).filter(Sale.tipo_dte == tipo).order_by(Sale.folio.desc()).first()
-        nuevo_folio = (last_sale.folio + 1) if last_sale else 1
+        nuevo_folio = allocate_simulated_folio(db, tipo)
 
     # Serializar referencias para columna JSON (solo para Factura)
     referencias_json = None
@@ -249,9 +281,20 @@ def create_sale(
         referencias=referencias_json,
     )
     db.add(new_sale)
-    db.flush()  # Genera new_sale.id sin hacer commit todavía
+    try:
+        db.flush()  # Genera new_sale.id sin hacer commit todavía
+    except Exception:
+        db.rollback()
+        folio_allocator.give_back(db, tipo, nuevo_folio)
+        raise
+
+    # 5.1 Guardar Pagos (medios de pago cargados en una sola consulta)
+    method_ids = {p.payment_method_id for p in sale_in.payments}
+    pay_methods = {
+        m.id: m for m in db.query(PaymentMethod).filter(PaymentMethod.id.in_(method_ids)).all()
+    } if method_ids else {}
 
-    # 5.1 Guardar Pagos
+    sale_payments = []
     for payment_in in sale_in.payments:
         pm = SalePayment(
             sale_id=new_sale.id,
@@ -260,10 +303,11 @@ def create_sale(
             transaction_code=payment_in.transaction_code,
         )
         db.add(pm)
+        sale_payments.append(pm)
 
         # Lógica de Crédito Interno
         # Validamos si el medio de pago es CREDITO_INTERNO para sumar deuda
-        pay_method = db.query(PaymentMethod).get(payment_in.payment_method_id)
+        pay_method = pay_methods.get(payment_in.payment_method_id)
         if pay_method and pay_method.code == "CREDITO_INTERNO":
             customer.current_balance += payment_in.amount
             db.add(customer)
@@ -280,26 +324,21 @@ def create_sale(
     # Just set sale_id on flush? SQLAlchemy handles relationships?
     # If we added `sale.stock_movements.append(movement)`?
     
-    # 6. Generar XML DTE y guardarlo atómicamente
+    # 6. Registrar DTE PENDIENTE y encolar su generación (fuera de la transacción)
     try:
-        issuer = db.query(Issuer).first()
-        xml_content = render_factura_xml(new_sale, issuer, customer) if issuer else ""
-
-        dte = DTE(
-            sale_id=new_sale.id,
-            tipo_dte=tipo,
-            folio=nuevo_folio,
-            xml_content=xml_content,
-            estado_sii="GENERADO",
-        )
-        db.add(dte)
+        enqueue_dte(db, new_sale)
+        # 7. Totales de caja y agregados de ventas (al final, para retener poco los locks)
+        record_payments(db, active_session.id, sale_payments)
+        record_sale(db, new_sale, sale_payments, {pid: p.costo_unitario for pid, p in products.items()})
         db.commit()
     except Exception:
         db.rollback()
+        folio_allocator.give_back(db, tipo, nuevo_folio)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error al generar el DTE. Transacción revertida.",
+            detail="Error al registrar el DTE. Transacción revertida.",
         )
+    dte_pipeline.notify(db.info.get("schema_name"))
 
     # Eager load para respuesta
     sale_loaded = (
@@ -354,15 +393,22 @@ def create_return(
     if not original_sale:
         raise HTTPException(status_code=404, detail="Venta original no encontrada")
 
+    try:
+        ensure_unlocked(db, {item.product_id for item in return_in.items})
+    except StockTakeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
     # 2. Calcular Montos de Devolución
     total_neto = Decimal("0")
     sale_details = []
     stock_movements = []
+    costs = {}
 
     for item in return_in.items:
         product = db.query(Product).get(item.product_id)
         if not product:
             raise HTTPException(status_code=404, detail=f"Producto {item.product_id} no encontrado")
+        costs[product.id] = product.costo_unitario
         
         # Validar que la cantidad no exceda lo vendido? (Omitido por simplicidad, confiamos en operador)
         
@@ -376,6 +422,7 @@ def create_return(
                 tipo="ENTRADA",
                 motivo="DEVOLUCION",
                 cantidad=item.cantidad,
+                balance_after=product.stock_actual,
                 description=f"Devolución venta f.{original_sale.folio}: {return_in.reason}"
             )
             stock_movements.append(movement)
@@ -409,14 +456,15 @@ def create_return(
     if tipo not in ADJUSTMENT_DTES:
         raise HTTPException(status_code=400, detail="El tipo de DTE para ajuste debe ser 56, 61, 111 o 112.")
 
-    caf = db.query(CAF).filter(CAF.tipo_documento == tipo).first()
-    # Si no hay CAF 61, fallamos? O usamos DTE 61 dummy?
-    # Asumimos que hay CAF 61 o usamos logica dummy.
-    nuevo_folio = 1 # Dummy por ahora si no hay CAF
-    if caf:
-        nuevo_folio = caf.ultimo_folio_usado + 1
-        caf.ultimo_folio_usado = nuevo_folio
-        db.add(caf)
+    # Validar medio de devolución antes de consumir un folio
+    method = db.query(PaymentMethod).get(return_in.return_method_id)
+    if not method: 
+         raise HTTPException(status_code=400, detail="Medio de devolución invalido")
+
+    # Si no hay CAF del tipo, usamos folio dummy.
+    nuevo_folio = folio_allocator.next_folio(db, tipo)
+    if nuevo_folio is None:
+        nuevo_folio = 1 # Dummy por ahora si no hay CAF
 
     # Generar la referencia al documento original automáticamente
     referencias_json = [{
@@ -437,6 +485,8 @@ def create_return(
         details=sale_details,
         stock_movements=stock_movements,
         related_sale_id=original_sale.id,
+        seller_id=user_id,
+        user_id=user_id,
         referencias=referencias_json,
         audit_metadata={"saas_admin_email": global_user.email} if local_user.is_system_user else None
     )
@@ -446,10 +496,6 @@ def create_return(
     # 4. Registrar Devolución de Dinero (SalePayment negativo o positivo con metodo Devolucion?)
     # Usamos SalePayment normal linkeado a la NC. 
     # Si es abono a cta cte:
-    method = db.query(PaymentMethod).get(return_in.return_method_id)
-    if not method: 
-         raise HTTPException(status_code=400, detail="Medio de devolución invalido")
-
     # Si es CREDITO_INTERNO (Abono), disminuimos deuda
     if method.code == "CREDITO_INTERNO":
         customer = db.query(Customer).get(original_sale.customer_id)
@@ -467,27 +513,104 @@ def create_return(
         transaction_code="DEVOLUCION"
     )
     db.add(pm)
-    
-    # 5. Commit
-    db.commit()
+
+    # 5. Totales de caja (si quien devuelve tiene turno abierto), agregados y Commit
+    active_session = db.query(CashSession).filter(
+        CashSession.user_id == user_id,
+        CashSession.status == "OPEN"
+    ).first()
+    try:
+        if active_session:
+            record_payments(db, active_session.id, [pm], sign=-1)
+        record_sale(db, nc_sale, [pm], costs)
+        db.commit()
+    except Exception:
+        db.rollback()
+        folio_allocator.give_back(db, tipo, nuevo_folio)
+        raise
     return nc_sale
 
 
 # ── PDF Preview ──────────────────────────────────────────────────────
 
 
+@router.get("/pdf/batch", response_class=HTMLResponse,
+            summary="Reimpresión por Lote",
+            description="Une varias ventas en un único HTML imprimible (salto de página entre "
+                        "documentos). Por IDs o por día de emisión (hora de Chile); un día con más "
+                        f"de {MAX_BATCH} ventas se pagina: el cursor siguiente llega en el header X-Next-Cursor.")
+def get_sales_pdf_batch(
+    ids: Optional[List[int]] = Query(None, description="IDs de venta"),
+    fecha: Optional[date] = Query(None, description="Día de emisión (YYYY-MM-DD)"),
+    tipo_dte: Optional[int] = None,
+    seller_id: Optional[int] = None,
+    cursor: Optional[int] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
+    format: Optional[str] = Query(None, pattern="^(80mm|carta)$", description="Por defecto, el de la configuración"),
+    db: Session = Depends(get_tenant_db),
+):
+    """Genera el HTML de reimpresión de fin de día.
+
+    Raises:
+        HTTPException(400): Si no se indican IDs ni fecha.
+        HTTPException(413): Si el lote supera `MAX_BATCH` documentos.
+        HTTPException(404): Si no hay ventas o falta el emisor.
+    """
+    if not ids and fecha is None:
+        raise HTTPException(status_code=400, detail="Indique ids o fecha")
+    sale_ids = list(dict.fromkeys(ids or []))
+    if len(sale_ids) > MAX_BATCH:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Máximo {MAX_BATCH} documentos por lote")
+
+    next_cursor = None
+    if fecha is not None:
+        start = datetime.combine(fecha, time.min, tzinfo=CHILE_TZ)
+        query = db.query(Sale.id).filter(
+            Sale.fecha_emision >= start, Sale.fecha_emision < start + timedelta(days=1)
+        )
+        if tipo_dte is not None:
+            query = query.filter(Sale.tipo_dte == tipo_dte)
+        if seller_id is not None:
+            query = query.filter(Sale.seller_id == seller_id)
+        if cursor is not None:
+            query = query.filter(Sale.id > cursor)
+        # La página del día completa el lote hasta MAX_BATCH documentos
+        limit = MAX_BATCH - len(sale_ids)
+        day_ids = [r[0] for r in query.order_by(Sale.id).limit(limit + 1).all()]
+        if len(day_ids) > limit:
+            day_ids = day_ids[:limit]
+            next_cursor = day_ids[-1] if day_ids else (cursor or 0)
+        sale_ids += day_ids
+
+    try:
+        response = HTMLResponse(content=render_sales_batch(db, sale_ids, format))
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except DocumentError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return response
+
+
 @router.get("/{sale_id}/pdf", response_class=HTMLResponse,
              summary="Vista Previa Factura",
              description="Genera HTML para impresión de la factura.")
-def get_sale_pdf(sale_id: int, db: Session = Depends(get_tenant_db)):
+def get_sale_pdf(
+    sale_id: int,
+    format: Optional[str] = Query(None, pattern="^(80mm|carta)$", description="Por defecto, el de la configuración"),
+    db: Session = Depends(get_tenant_db),
+):
     """
     Genera una vista previa HTML del documento tributario.
 
-    Renderiza una plantilla Jinja2 con los datos de la venta, el emisor
-    y el cliente, lista para ser impresa o convertida a PDF.
+    Renderiza la plantilla del formato de impresión configurado con los
+    datos de la venta, el emisor y el cliente, lista para ser impresa o
+    convertida a PDF. Las reimpresiones se sirven desde caché.
 
     Args:
         sale_id (int): ID de la venta.
+        format (str): '80mm' o 'carta' (opcional).
         db (Session): Sesión de base de datos.
 
     Returns:
@@ -496,45 +619,64 @@ def get_sale_pdf(sale_id: int, db: Session = Depends(get_tenant_db)):
     Raises:
         HTTPException(404): Si la venta no existe o falta configuración de emisor.
     """
+    try:
+        return HTMLResponse(content=render_sale(db, sale_id, format))
+    except DocumentError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
-    # Cargar venta con relaciones
-    sale = (
-        db.query(Sale)
-        .options(
-            joinedload(Sale.customer),
-            joinedload(Sale.details).joinedload(SaleDetail.product),
-        )
-        .filter(Sale.id == sale_id)
-        .first()
-    )
 
+# ── Estado del pipeline DTE ──────────────────────────────────────────
+
+@router.get("/dte/queue", response_model=DTEQueueStatsOut,
+            summary="Estado de la Cola DTE",
+            description="Trabajos de generación de DTE por estado en el inquilino.")
+def get_dte_queue(
+    db: Session = Depends(get_tenant_db),
+    local_user: User = Depends(get_current_local_user),
+):
+    """Retorna el resumen de la cola de DTE y el estado de los workers y del pool de firma de este proceso."""
+    signing = {**signing_pool.stats(), "certificate": has_certificate(db.info.get("schema_name"))}
+    return DTEQueueStatsOut(**queue_stats(db), workers=dte_pipeline.stats(), signing=signing)
+
+
+@router.get("/{sale_id}/dte", response_model=DTEStatusOut,
+            summary="Estado del DTE",
+            description="Consulta si el XML del DTE de la venta ya fue generado.")
+async def get_sale_dte_status(
+    sale_id: int,
+    db: AsyncSession = Depends(get_tenant_async_db),
+    local_user: User = Depends(get_current_local_user_async),
+):
+    """
+    Retorna el estado de generación del DTE de una venta.
+
+    Raises:
+        HTTPException(404): Si la venta no existe.
+    """
+    sale = (await db.execute(select(Sale.id, Sale.folio, Sale.tipo_dte).where(Sale.id == sale_id))).first()
     if not sale:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Venta ID {sale_id} no encontrada",
         )
 
-    issuer = db.query(Issuer).first()
-    if not issuer:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Emisor no configurado. Use PUT /issuer/ primero.",
-        )
-
-    # Cargar configuración del sistema para el formato de impresión
-    settings = db.query(SystemSettings).first()
-    print_format = settings.print_format if settings else "80mm"
-
-    # Seleccionar plantilla según formato
-    template_name = "factura_80mm.html" if print_format == "80mm" else "factura_carta.html"
-    template = _html_env.get_template(template_name)
-
-    # Renderizar HTML
-    html_content = template.render(
-        sale=sale,
-        issuer=issuer,
-        customer=sale.customer,
+    dte = (await db.execute(
+        select(DTE).where(DTE.sale_id == sale_id).order_by(DTE.id.desc()).limit(1)
+    )).scalars().first()
+    if not dte:
+        return DTEStatusOut(sale_id=sale.id, tipo_dte=sale.tipo_dte, folio=sale.folio, estado_sii="SIN_DTE")
+
+    job = (await db.execute(
+        select(DteJob).where(DteJob.dte_id == dte.id).order_by(DteJob.id.desc()).limit(1)
+    )).scalars().first()
+    return DTEStatusOut(
+        sale_id=sale.id,
+        dte_id=dte.id,
+        tipo_dte=dte.tipo_dte,
+        folio=dte.folio,
+        estado_sii=dte.estado_sii or "PENDIENTE",
+        job_status=job.status if job else None,
+        attempts=job.attempts if job else 0,
+        last_error=job.last_error if job else None,
+        updated_at=(job.updated_at if job else None) or dte.updated_at,
     )
-
-    return HTMLResponse(content=html_content)
-
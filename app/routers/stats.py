@@ -9,30 +9,19 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 
-from app.models.sale import Sale, SaleDetail
 from app.models.product import Product
+from app.models.rollup import SalesProductDailyRollup
 from app.schemas import DashboardSummary, StatPeriod, TopProductsResponse, TopProduct, ReportOut, ReportItem
 from app.dependencies.tenant import get_tenant_db, require_admin
+from app.services.sales_rollup import period_totals
 
 router = APIRouter(prefix="/stats", tags=["stats"])
 
 
 def get_period_stats(db: Session, start_date: datetime) -> StatPeriod:
-    """Calcula totales de venta y margen para un periodo dado."""
+    """Calcula totales de venta y margen para un periodo dado (desde los rollups)."""
     
-    # Ventas en el periodo
-    sales = db.query(Sale).filter(Sale.fecha_emision >= start_date).all()
-    
-    total_sales = sum(s.monto_total for s in sales)
-    count_sales = len(sales)
-    
-    # Calcular margen (Detalle por detalle para mayor precisión)
-    # Margen = Suma(cantidad * (precio_unitario - costo_unitario))
-    margin_total = db.query(
-        func.sum(SaleDetail.cantidad * (SaleDetail.precio_unitario - Product.costo_unitario))
-    ).join(Product, SaleDetail.product_id == Product.id)\
-     .join(Sale, SaleDetail.sale_id == Sale.id)\
-     .filter(Sale.fecha_emision >= start_date).scalar() or Decimal(0)
+    totals = period_totals(db, start_date)
 
     period_name = "Personalizado"
     now = get_now()
@@ -44,9 +33,9 @@ def get_period_stats(db: Session, start_date: datetime) -> StatPeriod:
         period_name = "Mensual"
 
     return StatPeriod(
-        sales_total=total_sales,
-        sales_count=count_sales,
-        margin_total=margin_total,
+        sales_total=totals["gross"],
+        sales_count=totals["count"],
+        margin_total=totals["margin"],
         period=period_name
     )
 
@@ -81,17 +70,16 @@ def get_top_products(days: int = 30, limit: int = 5, db: Session = Depends(get_t
 
     def get_query():
         return db.query(
-            SaleDetail.product_id,
+            SalesProductDailyRollup.product_id,
             Product.nombre.label("product_nombre"),
             ParentProduct.nombre.label("parent_nombre"),
-            func.sum(SaleDetail.cantidad).label("total_qty"),
-            func.sum(SaleDetail.subtotal).label("total_sales"),
-            func.sum(SaleDetail.cantidad * (SaleDetail.precio_unitario - Product.costo_unitario)).label("total_margin")
-        ).join(Product, SaleDetail.product_id == Product.id)\
+            func.sum(SalesProductDailyRollup.quantity).label("total_qty"),
+            func.sum(SalesProductDailyRollup.net).label("total_sales"),
+            func.sum(SalesProductDailyRollup.margin).label("total_margin")
+        ).join(Product, SalesProductDailyRollup.product_id == Product.id)\
          .outerjoin(ParentProduct, Product.parent_id == ParentProduct.id)\
-         .join(Sale, SaleDetail.sale_id == Sale.id)\
-         .filter(Sale.fecha_emision >= start_date)\
-         .group_by(SaleDetail.product_id, Product.nombre, ParentProduct.nombre)
+         .filter(SalesProductDailyRollup.fecha >= start_date.date())\
+         .group_by(SalesProductDailyRollup.product_id, Product.nombre, ParentProduct.nombre)
 
     # 1. Top por Cantidad
     qty_query = get_query().order_by(desc("total_qty")).limit(limit).all()
@@ -160,20 +148,19 @@ def get_report(
     from sqlalchemy.orm import aliased
     ParentProduct = aliased(Product)
 
-    # Consulta principal
+    # Consulta principal (rollup diario por producto)
     items_query = db.query(
-        SaleDetail.product_id,
+        SalesProductDailyRollup.product_id,
         Product.nombre.label("product_nombre"),
         ParentProduct.nombre.label("parent_nombre"),
-        func.sum(SaleDetail.cantidad).label("total_qty"),
-        func.sum(SaleDetail.subtotal).label("total_sales"),
+        func.sum(SalesProductDailyRollup.quantity).label("total_qty"),
+        func.sum(SalesProductDailyRollup.net).label("total_sales"),
         # Utilidad = (Venta Neta - Costo Neta) * Cantidad
-        func.sum(SaleDetail.cantidad * (SaleDetail.precio_unitario - Product.costo_unitario)).label("total_margin")
-    ).join(Product, SaleDetail.product_id == Product.id)\
+        func.sum(SalesProductDailyRollup.margin).label("total_margin")
+    ).join(Product, SalesProductDailyRollup.product_id == Product.id)\
      .outerjoin(ParentProduct, Product.parent_id == ParentProduct.id)\
-     .join(Sale, SaleDetail.sale_id == Sale.id)\
-     .filter(Sale.fecha_emision >= start_date, Sale.fecha_emision <= end_date)\
-     .group_by(SaleDetail.product_id, Product.nombre, ParentProduct.nombre)\
+     .filter(SalesProductDailyRollup.fecha.between(start_date.date(), end_date.date()))\
+     .group_by(SalesProductDailyRollup.product_id, Product.nombre, ParentProduct.nombre)\
      .all()
 
     items = []
@@ -193,8 +180,7 @@ def get_report(
     # En el reporte anterior usabamos sum(s.monto_total), que es bruto.
     # Mantengamos consistencia con el Daily Report anterior: Total Bruto.
     
-    sales_period = db.query(Sale).filter(Sale.fecha_emision >= start_date, Sale.fecha_emision <= end_date).all()
-    total_ventas = sum(s.monto_total for s in sales_period)
+    total_ventas = period_totals(db, start_date, end_date)["gross"]
     total_utilidad = sum(item.utilidad for item in items)
 
     return ReportOut(
@@ -6,7 +6,7 @@ from pydantic import BaseModel
 from app.models.user import User, Role
 from app.models.saas import SaaSUser, TenantUser
 from app.schemas import UserCreate, UserUpdate, UserOut
-from app.dependencies.tenant import get_tenant_db, get_global_db, get_current_tenant_user
+from app.dependencies.tenant import get_tenant_db, get_global_db, get_current_tenant_user, invalidate_membership_cache, revoke_user_tokens
 from app.utils.security import get_password_hash
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -108,6 +108,7 @@ def create_user(
         )
         global_db.add(tenant_user_link)
         global_db.commit()
+        invalidate_membership_cache(subject=saas_user.email)
 
     # 3. Validar RUT único si viene a nivel local
     if user.rut and db.query(User).filter(User.rut == user.rut).first():
@@ -148,6 +149,7 @@ def update_user(
             saas_user.hashed_password = get_password_hash(user_update.password)
         
         global_db.commit()
+        invalidate_membership_cache(subject=saas_user.email)
         
         return UserOut(
             id=saas_user.id,
@@ -189,6 +191,7 @@ def update_user(
             saas_user.hashed_password = db_user.password_hash
             
         # Actualizar Rol Local en TenantUser Global
+        role_changed = False
         if user_update.role_id is not None:
             db_role = db.query(Role).filter(Role.id == user_update.role_id).first()
             if db_role:
@@ -196,10 +199,16 @@ def update_user(
                     TenantUser.user_id == saas_user.id,
                     TenantUser.tenant_id == global_user_info.tenant_id
                 ).first()
-                if tenant_user_link:
+                if tenant_user_link and tenant_user_link.role_name != db_role.name:
                     tenant_user_link.role_name = db_role.name
+                    role_changed = True
                     
         global_db.commit()
+        invalidate_membership_cache(subject=old_email)
+        invalidate_membership_cache(subject=saas_user.email)
+        # Los tokens con claims llevan el rol: un cambio de rol los revoca
+        if role_changed:
+            revoke_user_tokens(global_db, user_id=saas_user.id)
     
     db.commit()
     db.refresh(db_user)
@@ -225,4 +234,6 @@ def delete_user(
     
     db_user.is_active = False
     db.commit()
+    if db_user.email:
+        invalidate_membership_cache(subject=db_user.email)
     return None
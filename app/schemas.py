@@ -281,6 +281,145 @@ class ProductOut(BaseModel):
     variants: List["ProductOut"] = []
 
 
+class ProductImportRow(BaseModel):
+    """Fila de importación masiva de productos (CSV / NDJSON).
+
+    `parent_codigo` es el SKU del producto padre cuando la fila es una variante.
+    """
+
+    codigo_interno: Optional[str] = None  # Auto-generated if empty
+    nombre: str
+    descripcion: Optional[str] = None
+    precio_neto: Decimal
+    costo_unitario: Decimal = Decimal(0)
+    unidad_medida: str = "unidad"
+    codigo_barras: Optional[str] = None  # Auto-generated if empty
+    controla_stock: bool = False
+    stock_actual: Decimal = Decimal(0)
+    stock_minimo: Decimal = Decimal(0)
+    is_active: bool = True
+    brand_id: Optional[int] = None
+    tax_id: Optional[int] = None
+    parent_codigo: Optional[str] = None
+
+
+class ProductImportError(BaseModel):
+    line: int
+    codigo_interno: Optional[str] = None
+    error: str
+
+
+class ProductImportResult(BaseModel):
+    """Resumen de una importación masiva de productos."""
+    created: int
+    failed: int
+    batches: int
+    dry_run: bool
+    errors: List[ProductImportError] = []
+
+
+class ProductPOSOut(BaseModel):
+    """Proyección liviana de un producto para el catálogo del POS."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    codigo_interno: str
+    codigo_barras: Optional[str] = None
+    full_name: str
+    precio_bruto: Decimal
+    unidad_medida: Optional[str] = "unidad"
+    controla_stock: bool
+    stock_actual: Decimal
+    is_active: bool
+    parent_id: Optional[int] = None
+
+
+# ── Toma de Inventario ───────────────────────────────────────────────
+
+
+class StockTakeCreate(BaseModel):
+    """Apertura de una toma de inventario."""
+    description: Optional[str] = None
+    lock_sales: bool = False
+    brand_id: Optional[int] = None
+    product_ids: Optional[List[int]] = None
+
+
+class StockTakeCountItem(BaseModel):
+    """Cantidad contada de un producto (por ID o código de barras)."""
+    product_id: Optional[int] = None
+    codigo_barras: Optional[str] = None
+    counted: Decimal
+
+
+class StockTakeCounts(BaseModel):
+    items: List[StockTakeCountItem]
+    accumulate: bool = False  # Sumar a lo ya contado (conteo por zonas)
+
+
+class StockTakeSummary(BaseModel):
+    products: int
+    counted: int
+    with_difference: int
+    surplus_qty: Decimal
+    shortage_qty: Decimal
+    difference_value: Decimal
+
+
+class StockTakeOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    status: str
+    description: Optional[str] = None
+    lock_sales: bool
+    user_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    closed_at: Optional[datetime] = None
+    summary: Optional[StockTakeSummary] = None
+
+
+class StockTakeLineOut(BaseModel):
+    product_id: int
+    codigo_interno: str
+    full_name: str
+    expected: Decimal
+    counted: Optional[Decimal] = None
+    difference: Optional[Decimal] = None
+
+
+# ── Kardex ───────────────────────────────────────────────────────────
+
+
+class KardexEntryOut(BaseModel):
+    """Movimiento del kardex con su saldo acumulado (calculado) y el registrado."""
+    id: int
+    fecha: Optional[datetime] = None
+    tipo: str
+    motivo: str
+    cantidad: Decimal
+    balance: Optional[Decimal] = None
+    balance_after: Optional[Decimal] = None
+    description: Optional[str] = None
+    sale_id: Optional[int] = None
+    user_id: Optional[int] = None
+
+
+class KardexDriftOut(BaseModel):
+    product_id: int
+    stock_actual: Decimal
+    kardex_balance: Decimal
+    difference: Decimal
+
+
+class KardexReconcileOut(BaseModel):
+    products: int
+    backfilled: int
+    checkpoints: int
+    drift: List[KardexDriftOut] = []
+
+
 # ── Sale (Venta) ─────────────────────────────────────────────────────
 
 
@@ -363,6 +502,32 @@ class SaleOut(BaseModel):
     details: List[SaleDetailOut]
 
 
+class DTEStatusOut(BaseModel):
+    """Estado de generación del DTE de una venta."""
+
+    sale_id: int
+    dte_id: Optional[int] = None
+    tipo_dte: int
+    folio: int
+    estado_sii: str
+    job_status: Optional[str] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+
+class DTEQueueStatsOut(BaseModel):
+    """Resumen de la cola de generación de DTE del inquilino."""
+
+    pending: int
+    processing: int
+    done: int
+    error: int
+    oldest_pending_at: Optional[datetime] = None
+    workers: dict
+    signing: dict = {}
+
+
 class ReturnItem(BaseModel):
     product_id: int
     cantidad: Decimal
@@ -421,6 +586,45 @@ class CashSessionWithUserOut(CashSessionOut):
     user: UserOut
 
 
+class CashSessionTotalOut(BaseModel):
+    payment_method_id: int
+    count: int
+    amount: Decimal
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CashSessionStatusOut(CashSessionOut):
+    """Sesión abierta con sus totales en vivo por medio de pago."""
+    expected_cash: Decimal
+    totals: List[CashSessionTotalOut] = []
+
+
+class CashTotalsDifference(BaseModel):
+    payment_method_id: int
+    running: Decimal
+    recomputed: Decimal
+
+
+class CashTotalsCheckOut(BaseModel):
+    cash_session_id: int
+    consistent: bool
+    differences: List[CashTotalsDifference] = []
+
+
+class CashierSummaryOut(BaseModel):
+    """Estadísticas de arqueo de un cajero en un período."""
+    user_id: int
+    full_name: Optional[str] = None
+    sessions: int
+    shortage_sessions: int
+    surplus_sessions: int
+    shortage_total: Decimal
+    surplus_total: Decimal
+    max_shortage: Decimal
+    net_difference: Decimal
+    expected_total: Decimal
+
+
 # ── Issuer (Emisor) ──────────────────────────────────────────────────
 
 
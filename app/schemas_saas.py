@@ -110,3 +110,15 @@ class SaaSToken(BaseModel):
     token_type: str
     user: SaaSUserOut
     available_tenants: list[AvailableTenant]
+    # Sólo con tokens con claims (TORN_AUTH_CLAIMS)
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
+class TokenRefreshOut(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
+    expires_in: int
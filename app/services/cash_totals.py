@@ -0,0 +1,192 @@
+"""Servicio de Totales de Caja por Medio de Pago.
+
+Cada sesión de caja lleva sus totales acumulados en `cash_session_totals`:
+
+- `record_payments`: suma los pagos de una venta (o resta los de una
+  devolución) con un upsert atómico, dentro de la transacción de la venta.
+- `expected_cash`: efectivo esperado en el cajón (apertura + EFECTIVO) en
+  O(medios de pago), sin recorrer las ventas.
+- `recompute_totals` / `check_consistency`: recálculo completo desde las
+  ventas del cajero en la ventana de la sesión, para auditar o reparar.
+- `cashier_summary`: estadísticas de diferencias de arqueo por cajero en un
+  período, agregadas en SQL.
+
+Las funciones no hacen commit salvo `check_consistency(repair=True)`.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, case, delete, func, or_
+from sqlalchemy.orm import Session
+
+from app.models.cash import CashSession, CashSessionTotal
+from app.models.payment import PaymentMethod, SalePayment
+from app.models.sale import Sale
+from app.models.user import User
+from app.utils.db import dialect_insert
+
+ZERO = Decimal("0")
+CASH_CODE = "EFECTIVO"
+
+
+def record_payments(db: Session, cash_session_id: int, payments: Iterable[SalePayment], sign: int = 1) -> None:
+    """Acumula los pagos en los totales de la sesión (sign=-1 para devoluciones)."""
+    totals = {}
+    for p in payments:
+        count, amount = totals.get(p.payment_method_id, (0, ZERO))
+        totals[p.payment_method_id] = (count + 1, amount + sign * Decimal(p.amount))
+    if not totals:
+        return
+
+    insert = dialect_insert(db)
+    # Orden por medio de pago: mismo orden de locks entre transacciones concurrentes
+    stmt = insert(CashSessionTotal).values([
+        {"cash_session_id": cash_session_id, "payment_method_id": method_id, "count": count, "amount": amount}
+        for method_id, (count, amount) in sorted(totals.items())
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["cash_session_id", "payment_method_id"],
+        set_={
+            "count": CashSessionTotal.count + stmt.excluded.count,
+            "amount": CashSessionTotal.amount + stmt.excluded.amount,
+        },
+    ))
+
+
+def session_totals(db: Session, cash_session_id: int) -> dict:
+    """Totales acumulados: {payment_method_id: (count, amount)}."""
+    rows = db.query(CashSessionTotal.payment_method_id, CashSessionTotal.count, CashSessionTotal.amount)\
+        .filter(CashSessionTotal.cash_session_id == cash_session_id).all()
+    return {r[0]: (r[1], Decimal(r[2])) for r in rows}
+
+
+def expected_cash(db: Session, session: CashSession) -> Decimal:
+    """Efectivo esperado en el cajón: apertura + total neto en EFECTIVO."""
+    cash = db.query(func.coalesce(func.sum(CashSessionTotal.amount), 0))\
+        .join(PaymentMethod, PaymentMethod.id == CashSessionTotal.payment_method_id)\
+        .filter(CashSessionTotal.cash_session_id == session.id, PaymentMethod.code == CASH_CODE)\
+        .scalar()
+    return Decimal(session.start_amount or 0) + Decimal(cash)
+
+
+def recompute_totals(db: Session, session: CashSession) -> dict:
+    """Recalcula los totales desde las ventas (recorre la tabla de ventas).
+
+    Considera las ventas y devoluciones emitidas por el cajero entre la
+    apertura y el cierre de la sesión; las devoluciones restan.
+    """
+    signed = case((Sale.related_sale_id.isnot(None), -SalePayment.amount), else_=SalePayment.amount)
+    query = db.query(SalePayment.payment_method_id, func.count(SalePayment.id), func.sum(signed))\
+        .join(Sale, Sale.id == SalePayment.sale_id)\
+        .join(CashSession, and_(
+            CashSession.id == session.id,
+            Sale.seller_id == CashSession.user_id,
+            Sale.created_at >= CashSession.start_time,
+            or_(CashSession.end_time.is_(None), Sale.created_at <= CashSession.end_time),
+        ))
+    rows = query.group_by(SalePayment.payment_method_id).all()
+    return {r[0]: (r[1], Decimal(r[2] or 0)) for r in rows}
+
+
+def check_consistency(db: Session, session_ids: Optional[list] = None, repair: bool = False) -> list:
+    """Compara los totales acumulados con un recálculo completo.
+
+    Args:
+        db: Sesión del esquema del inquilino.
+        session_ids: Sesiones a revisar (por defecto, las abiertas).
+        repair: Reemplazar los totales inconsistentes por el recálculo (hace commit).
+
+    Returns:
+        list: Un dict por sesión inconsistente con las diferencias por medio de pago.
+    """
+    query = db.query(CashSession)
+    if session_ids is None:
+        query = query.filter(CashSession.status == "OPEN")
+    else:
+        query = query.filter(CashSession.id.in_(session_ids))
+
+    report = []
+    for session in query.order_by(CashSession.id).all():
+        running = session_totals(db, session.id)
+        recomputed = recompute_totals(db, session)
+        differences = [
+            {
+                "payment_method_id": method_id,
+                "running": running.get(method_id, (0, ZERO))[1],
+                "recomputed": recomputed.get(method_id, (0, ZERO))[1],
+            }
+            for method_id in sorted(set(running) | set(recomputed))
+            if running.get(method_id, (0, ZERO)) != recomputed.get(method_id, (0, ZERO))
+        ]
+        if not differences:
+            continue
+        report.append({"cash_session_id": session.id, "differences": differences})
+        if repair:
+            db.execute(delete(CashSessionTotal).where(CashSessionTotal.cash_session_id == session.id))
+            db.add_all(
+                CashSessionTotal(cash_session_id=session.id, payment_method_id=method_id, count=count, amount=amount)
+                for method_id, (count, amount) in recomputed.items()
+            )
+    if repair and report:
+        db.commit()
+    return report
+
+
+def cashier_summary(
+    db: Session,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+) -> list:
+    """Diferencias de arqueo por cajero (sesiones cerradas), agregadas en SQL.
+
+    Args:
+        db: Sesión del esquema del inquilino.
+        date_from / date_to: Rango sobre la apertura de la sesión.
+        user_id: Limitar a un cajero.
+
+    Returns:
+        list: Un dict por cajero, ordenado por faltante total descendente.
+    """
+    diff = CashSession.difference
+    shortage = case((diff < 0, -diff), else_=0)
+    surplus = case((diff > 0, diff), else_=0)
+    query = db.query(
+        CashSession.user_id,
+        User.full_name,
+        func.count(CashSession.id).label("sessions"),
+        func.sum(case((diff < 0, 1), else_=0)).label("shortage_sessions"),
+        func.sum(case((diff > 0, 1), else_=0)).label("surplus_sessions"),
+        func.coalesce(func.sum(shortage), 0).label("shortage_total"),
+        func.coalesce(func.sum(surplus), 0).label("surplus_total"),
+        func.coalesce(func.max(shortage), 0).label("max_shortage"),
+        func.coalesce(func.sum(diff), 0).label("net_difference"),
+        func.coalesce(func.sum(CashSession.final_cash_system), 0).label("expected_total"),
+    ).join(User, User.id == CashSession.user_id)\
+     .filter(CashSession.status != "OPEN")
+    if date_from is not None:
+        query = query.filter(CashSession.start_time >= date_from)
+    if date_to is not None:
+        query = query.filter(CashSession.start_time <= date_to)
+    if user_id is not None:
+        query = query.filter(CashSession.user_id == user_id)
+    rows = query.group_by(CashSession.user_id, User.full_name)\
+        .order_by(func.coalesce(func.sum(shortage), 0).desc(), CashSession.user_id).all()
+
+    return [
+        {
+            "user_id": r.user_id,
+            "full_name": r.full_name,
+            "sessions": r.sessions,
+            "shortage_sessions": int(r.shortage_sessions or 0),
+            "surplus_sessions": int(r.surplus_sessions or 0),
+            "shortage_total": Decimal(r.shortage_total),
+            "surplus_total": Decimal(r.surplus_total),
+            "max_shortage": Decimal(r.max_shortage),
+            "net_difference": Decimal(r.net_difference),
+            "expected_total": Decimal(r.expected_total),
+        }
+        for r in rows
+    ]
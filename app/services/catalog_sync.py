@@ -0,0 +1,155 @@
+"""Servicio de Sincronización del Catálogo para el POS.
+
+Genera un volcado compacto del catálogo vendible (productos activos,
+códigos de barra, tasas de impuesto y precios fijos de las listas) para
+que los terminales resuelvan los escaneos localmente, y deltas con sólo
+lo modificado desde una versión anterior.
+
+La versión es un timestamp en milisegundos (UTC). Los cambios se detectan
+por `updated_at` / `created_at`; como `now()` en Postgres es el inicio de
+la transacción, el delta relee una ventana de solape
+(`TORN_CATALOG_SYNC_OVERLAP` segundos) y el cliente aplica los cambios
+como upserts idempotentes.
+"""
+
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session, aliased
+
+from app.models.price_list import PriceList, PriceListProduct
+from app.models.product import Product
+from app.models.tax import Tax
+
+SYNC_OVERLAP = timedelta(seconds=int(os.getenv("TORN_CATALOG_SYNC_OVERLAP", "120")))
+DEFAULT_TAX_RATE = 0.19  # Igual que Product.precio_bruto cuando no hay impuesto
+
+# Orden de las columnas de cada fila de producto
+PRODUCT_FIELDS = [
+    "id", "codigo_interno", "codigo_barras", "full_name", "precio_neto", "tax_id",
+    "unidad_medida", "controla_stock", "stock_actual", "parent_id",
+]
+
+
+def current_version() -> int:
+    """Versión (ms UTC) a entregar junto a un volcado que se lee ahora."""
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+def version_to_datetime(version: int) -> datetime:
+    return datetime.fromtimestamp(version / 1000, tz=timezone.utc)
+
+
+def _full_name(nombre: str, parent_nombre: Optional[str]) -> str:
+    """Misma regla que `Product.full_name`, sin cargar la relación."""
+    if parent_nombre and not nombre.startswith(parent_nombre):
+        return f"{parent_nombre} {nombre}"
+    return nombre
+
+
+def _product_rows(db: Session, since: Optional[datetime] = None, chunk_size: int = 2000):
+    """Filas de producto; con `since`, sólo las cambiadas (incluye variantes cuyo padre cambió)."""
+    Parent = aliased(Product)
+    query = db.query(
+        Product.id, Product.codigo_interno, Product.codigo_barras, Product.nombre,
+        Parent.nombre.label("parent_nombre"), Product.precio_neto, Product.tax_id,
+        Product.unidad_medida, Product.controla_stock, Product.stock_actual,
+        Product.parent_id, Product.is_active, Product.is_deleted,
+    ).outerjoin(Parent, Product.parent_id == Parent.id)
+
+    if since is None:
+        query = query.filter(Product.is_active == True, Product.is_deleted == False)  # noqa: E712
+    else:
+        query = query.filter(or_(
+            func.coalesce(Product.updated_at, Product.created_at) >= since,
+            func.coalesce(Parent.updated_at, Parent.created_at) >= since,
+        ))
+
+    for row in query.order_by(Product.id).yield_per(chunk_size):
+        yield row
+
+
+def _serialize(row) -> list:
+    return [
+        row.id, row.codigo_interno, row.codigo_barras, _full_name(row.nombre, row.parent_nombre),
+        row.precio_neto, row.tax_id, row.unidad_medida, bool(row.controla_stock),
+        row.stock_actual, row.parent_id,
+    ]
+
+
+def _price_overrides(db: Session, price_list_ids: Optional[list] = None) -> dict:
+    """Precios fijos agrupados por lista: {price_list_id: [[product_id, fixed_price], ...]}."""
+    query = db.query(
+        PriceListProduct.price_list_id, PriceListProduct.product_id, PriceListProduct.fixed_price,
+    )
+    if price_list_ids is not None:
+        if not price_list_ids:
+            return {}
+        query = query.filter(PriceListProduct.price_list_id.in_(price_list_ids))
+    overrides = defaultdict(list)
+    for pl_id, product_id, price in query.order_by(PriceListProduct.price_list_id, PriceListProduct.product_id):
+        overrides[pl_id].append([product_id, price])
+    return dict(overrides)
+
+
+def _taxes(db: Session) -> dict:
+    return {tax_id: rate for tax_id, rate in db.query(Tax.id, Tax.rate).all()}
+
+
+def build_snapshot(db: Session) -> dict:
+    """Volcado completo del catálogo vendible.
+
+    Returns:
+        dict: version, fields, products (filas en el orden de `fields`),
+        taxes ({id: tasa}), default_tax_rate y price_lists
+        ({id: [[product_id, fixed_price], ...]}).
+    """
+    version = current_version()
+    return {
+        "version": version,
+        "fields": PRODUCT_FIELDS,
+        "products": [_serialize(row) for row in _product_rows(db)],
+        "taxes": _taxes(db),
+        "default_tax_rate": DEFAULT_TAX_RATE,
+        "price_lists": _price_overrides(db),
+    }
+
+
+def build_delta(db: Session, since_version: int) -> dict:
+    """Cambios del catálogo desde `since_version`.
+
+    Los productos desactivados o eliminados se informan en `removed`. Las
+    listas de precio modificadas se reenvían completas en `price_lists`, y
+    `price_list_ids` trae las listas vigentes para descartar las borradas.
+    Impuestos se envían siempre (son pocas filas).
+    """
+    version = current_version()
+    since = version_to_datetime(since_version) - SYNC_OVERLAP
+
+    products, removed = [], []
+    for row in _product_rows(db, since):
+        if row.is_active and not row.is_deleted:
+            products.append(_serialize(row))
+        else:
+            removed.append(row.id)
+
+    changed_lists = [
+        pl_id for (pl_id,) in db.query(PriceList.id).filter(
+            func.coalesce(PriceList.updated_at, PriceList.created_at) >= since
+        ).all()
+    ]
+
+    return {
+        "version": version,
+        "since": since_version,
+        "fields": PRODUCT_FIELDS,
+        "products": products,
+        "removed": removed,
+        "taxes": _taxes(db),
+        "default_tax_rate": DEFAULT_TAX_RATE,
+        "price_lists": _price_overrides(db, changed_lists),
+        "price_list_ids": [pl_id for (pl_id,) in db.query(PriceList.id).order_by(PriceList.id).all()],
+    }
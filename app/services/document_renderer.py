@@ -0,0 +1,249 @@
+"""Servicio de Renderizado de Documentos HTML (ventas y compras).
+
+- Las plantillas de `app/templates/html` se compilan una sola vez
+  (`warm_up`, al iniciar la aplicación) y no se revisan en disco en cada
+  request (`auto_reload=False`).
+- Emisor y formato de impresión se cachean por inquilino; `upsert_issuer`
+  y `update_settings` invalidan con `invalidate_tenant`.
+- El HTML renderizado se cachea por (inquilino, tipo, id, formato): una
+  reimpresión no consulta la base de datos ni vuelve a renderizar.
+- `render_sales_batch` une muchos documentos en uno solo imprimible
+  (reimpresión de fin de día).
+
+Cada worker mantiene sus propias cachés; el TTL acota la ventana de datos
+obsoletos entre procesos.
+"""
+
+import os
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Iterable, Optional
+
+from jinja2 import Environment, FileSystemLoader
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.models.issuer import Issuer
+from app.models.purchase import Purchase, PurchaseDetail
+from app.models.sale import Sale, SaleDetail
+from app.models.settings import SystemSettings
+from app.utils.cache import TTLCache
+from app.utils.formatters import format_clp, format_number
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates" / "html"
+SALE_TEMPLATES = {"80mm": "factura_80mm.html", "carta": "factura_carta.html"}
+PURCHASE_TEMPLATE = "purchase_print.html"
+MAX_BATCH = 500
+
+CACHE_TTL = float(os.getenv("TORN_DOCUMENT_CACHE_TTL", "300"))
+CACHE_SIZE = int(os.getenv("TORN_DOCUMENT_CACHE_SIZE", "1000"))
+
+env = Environment(
+    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+    autoescape=True,
+    auto_reload=False,
+    cache_size=-1,
+)
+env.filters["clp"] = format_clp
+env.filters["number"] = format_number
+
+# {schema: (emisor, formato)} y {(schema, tipo, id, formato): html}
+tenant_cache = TTLCache(ttl=CACHE_TTL, max_entries=1000)
+document_cache = TTLCache(ttl=CACHE_TTL, max_entries=CACHE_SIZE)
+
+
+class DocumentError(ValueError):
+    """Documento inexistente o emisor no configurado."""
+
+
+class BatchTooLargeError(ValueError):
+    """Lote de reimpresión con más de `MAX_BATCH` documentos."""
+
+
+def warm_up() -> int:
+    """Compila todas las plantillas HTML. Retorna cuántas se cargaron."""
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def _schema(db: Session) -> Optional[str]:
+    return db.info.get("schema_name")
+
+
+def _snapshot(obj) -> SimpleNamespace:
+    """Copia desacoplada de la sesión (sólo columnas) para cachear entre requests."""
+    return SimpleNamespace(**{attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs})
+
+
+def tenant_context(db: Session) -> tuple:
+    """Emisor (copia) y formato de impresión del inquilino, cacheados.
+
+    Raises:
+        DocumentError: Si el emisor no está configurado.
+    """
+    key = _schema(db)
+    cached = tenant_cache.get(key)
+    if cached is None:
+        issuer = db.query(Issuer).first()
+        if not issuer:
+            raise DocumentError("Emisor no configurado. Use PUT /issuer/ primero.")
+        settings = db.query(SystemSettings.print_format).first()
+        print_format = (settings.print_format if settings else None) or "80mm"
+        cached = (_snapshot(issuer), print_format)
+        tenant_cache.set(key, cached)
+    return cached
+
+
+def invalidate_tenant(schema: Optional[str]) -> None:
+    """Descarta emisor, formato y documentos renderizados de un inquilino."""
+    tenant_cache.pop(schema)
+    document_cache.invalidate_where(lambda k, _: k[0] == schema)
+
+
+def invalidate_document(schema: Optional[str], kind: str, doc_id: int) -> None:
+    """Descarta las versiones renderizadas de un documento (todos los formatos)."""
+    document_cache.invalidate_where(lambda k, _: k[:3] == (schema, kind, doc_id))
+
+
+def _sale_template(print_format: str, fmt: Optional[str]):
+    fmt = fmt or print_format
+    return fmt, env.get_template(SALE_TEMPLATES.get(fmt, SALE_TEMPLATES["carta"]))
+
+
+def _render_sale(sale: Sale, issuer, template) -> str:
+    return template.render(sale=sale, issuer=issuer, customer=sale.customer)
+
+
+def render_sale(db: Session, sale_id: int, fmt: Optional[str] = None) -> str:
+    """HTML imprimible de una venta (desde caché si ya se renderizó).
+
+    Args:
+        db: Sesión del esquema del inquilino.
+        sale_id: Venta.
+        fmt: '80mm' o 'carta' (por defecto, el de la configuración).
+
+    Raises:
+        DocumentError: Si la venta no existe o falta el emisor.
+    """
+    issuer, print_format = tenant_context(db)
+    fmt, template = _sale_template(print_format, fmt)
+    key = (_schema(db), "sale", sale_id, fmt)
+    html = document_cache.get(key)
+    if html is not None:
+        return html
+
+    sale = (
+        db.query(Sale)
+        .options(
+            joinedload(Sale.customer),
+            joinedload(Sale.details).joinedload(SaleDetail.product),
+        )
+        .filter(Sale.id == sale_id)
+        .first()
+    )
+    if not sale:
+        raise DocumentError(f"Venta ID {sale_id} no encontrada")
+
+    html = _render_sale(sale, issuer, template)
+    document_cache.set(key, html)
+    return html
+
+
+def _split_document(html: str) -> tuple:
+    """Separa un documento HTML en (cabecera hasta <body...>, cuerpo)."""
+    start = html.find("<body")
+    start = html.find(">", start) + 1 if start >= 0 else 0
+    end = html.rfind("</body>")
+    return html[:start], html[start:end if end >= 0 else len(html)]
+
+
+def render_sales_batch(db: Session, sale_ids: Iterable[int], fmt: Optional[str] = None) -> str:
+    """Une varias ventas en un único HTML con salto de página entre documentos.
+
+    Las ventas que no están en caché se cargan en dos consultas (ventas +
+    detalles) en vez de una por documento.
+
+    Raises:
+        BatchTooLargeError: Si hay más de `MAX_BATCH` ventas.
+        DocumentError: Si ninguna venta existe.
+    """
+    sale_ids = list(dict.fromkeys(sale_ids))
+    if len(sale_ids) > MAX_BATCH:
+        raise BatchTooLargeError(f"Máximo {MAX_BATCH} documentos por lote")
+
+    issuer, print_format = tenant_context(db)
+    fmt, template = _sale_template(print_format, fmt)
+    schema = _schema(db)
+
+    rendered = {}
+    missing = []
+    for sale_id in sale_ids:
+        html = document_cache.get((schema, "sale", sale_id, fmt))
+        if html is None:
+            missing.append(sale_id)
+        else:
+            rendered[sale_id] = html
+
+    if missing:
+        sales = (
+            db.query(Sale)
+            .options(
+                joinedload(Sale.customer),
+                selectinload(Sale.details).joinedload(SaleDetail.product),
+            )
+            .filter(Sale.id.in_(missing))
+            .all()
+        )
+        for sale in sales:
+            html = _render_sale(sale, issuer, template)
+            document_cache.set((schema, "sale", sale.id, fmt), html)
+            rendered[sale.id] = html
+
+    documents = [rendered[sale_id] for sale_id in sale_ids if sale_id in rendered]
+    if not documents:
+        raise DocumentError("No se encontraron ventas para imprimir")
+
+    head, _ = _split_document(documents[0])
+    bodies = [_split_document(html)[1] for html in documents]
+    page_break = '\n<div style="page-break-after: always; break-after: page;"></div>\n'
+    return head + page_break.join(bodies) + "\n</body>\n</html>\n"
+
+
+def render_purchase(db: Session, purchase_id: int) -> str:
+    """HTML imprimible de una compra (desde caché si ya se renderizó).
+
+    Raises:
+        DocumentError: Si la compra no existe o falta el emisor.
+    """
+    issuer, _ = tenant_context(db)
+    key = (_schema(db), "purchase", purchase_id, "carta")
+    html = document_cache.get(key)
+    if html is not None:
+        return html
+
+    purchase = (
+        db.query(Purchase)
+        .options(
+            joinedload(Purchase.provider),
+            joinedload(Purchase.details).joinedload(PurchaseDetail.product),
+        )
+        .filter(Purchase.id == purchase_id)
+        .first()
+    )
+    if not purchase:
+        raise DocumentError("Compra no encontrada")
+
+    html = env.get_template(PURCHASE_TEMPLATE).render(
+        purchase=purchase,
+        issuer=issuer,
+        provider=purchase.provider,
+    )
+    document_cache.set(key, html)
+    return html
+
+
+def stats() -> dict:
+    """Contadores de las cachés de emisor y documentos."""
+    return {"tenants": tenant_cache.stats(), "documents": document_cache.stats()}
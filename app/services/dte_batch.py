@@ -0,0 +1,301 @@
+"""Generación Masiva de XML DTE y Sobres de Envío (EnvioDTE / EnvioBOLETA).
+
+Pensado para regenerar el historial de un período (auditorías, reenvíos):
+
+1. Las ventas se cargan por bloques de `chunk_size` con sus clientes,
+   detalles y productos en tres consultas por bloque (sin lazy loads).
+2. Cada venta se reduce a un dict serializable (`sale_payload`) y los
+   XML se renderizan en un pool de procesos (`TORN_DTE_RENDER_PROCESSES`),
+   con la misma plantilla que el pipeline en línea.
+3. `iter_envios` agrupa los documentos en sobres EnvioDTE (facturas, notas)
+   y EnvioBOLETA (boletas 39/41) de a lo más `max_docs` documentos.
+
+Los sobres se generan sin firma de envío. Los documentos se timbran y
+firman con `sign_documents` cuando el inquilino tiene certificado;
+`persist_xml` nunca reemplaza un DTE ya firmado por XML sin firmar.
+"""
+
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Iterator, Optional
+from xml.sax.saxutils import escape
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+
+from app.models.dte import CAF, DTE
+from app.models.issuer import Issuer
+from app.models.product import Product
+from app.models.sale import Sale, SaleDetail
+from app.services import dte_signer
+from app.services.xml_generator import render_factura_xml
+from app.utils.dates import CHILE_TZ, get_now
+
+RENDER_PROCESSES = int(os.getenv("TORN_DTE_RENDER_PROCESSES", str(os.cpu_count() or 1)))
+CHUNK_SIZE = 500
+TASK_SIZE = 50
+MAX_DOCS_PER_ENVIO = int(os.getenv("TORN_ENVIO_MAX_DOCS", "500"))
+SII_FCH_RESOL = os.getenv("TORN_SII_FCH_RESOL", "")
+SII_NRO_RESOL = os.getenv("TORN_SII_NRO_RESOL", "0")
+SII_RUT = "60803000-K"
+BOLETA_TYPES = {39, 41}
+
+_SALE_FIELDS = ("id", "folio", "tipo_dte", "fecha_emision", "monto_neto", "iva", "monto_total")
+_CUSTOMER_FIELDS = ("rut", "razon_social", "giro", "direccion", "comuna", "ciudad")
+_ISSUER_FIELDS = ("rut", "razon_social", "giro", "acteco", "direccion", "comuna", "ciudad", "telefono", "email")
+
+
+def sale_payload(sale: Sale) -> dict:
+    """Reduce una venta cargada a un dict serializable con lo que usa la plantilla."""
+    payload = {field: getattr(sale, field) for field in _SALE_FIELDS}
+    customer = sale.customer
+    payload["customer"] = {field: getattr(customer, field, None) for field in _CUSTOMER_FIELDS} if customer else {}
+    payload["details"] = [
+        {
+            "cantidad": d.cantidad,
+            "precio_unitario": d.precio_unitario,
+            "subtotal": d.subtotal,
+            "product": {"nombre": d.product.nombre, "unidad_medida": d.product.unidad_medida},
+        }
+        for d in sorted(sale.details, key=lambda d: d.id)
+    ]
+    return payload
+
+
+def issuer_payload(issuer: Issuer) -> dict:
+    return {field: getattr(issuer, field) for field in _ISSUER_FIELDS}
+
+
+def _render_task(payloads: list, issuer: dict) -> list:
+    """Tarea del pool: renderiza un grupo de ventas. Retorna [(sale_id, tipo, folio, xml)]."""
+    return [
+        (p["id"], p["tipo_dte"], p["folio"], render_factura_xml(p, issuer, p["customer"]))
+        for p in payloads
+    ]
+
+
+def select_sale_ids(
+    db: Session,
+    sale_ids: Optional[Iterable[int]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    tipo_dte: Optional[int] = None,
+) -> list:
+    """IDs de ventas a regenerar (por lista y/o rango de días de emisión, hora de Chile)."""
+    query = db.query(Sale.id)
+    if sale_ids is not None:
+        query = query.filter(Sale.id.in_(list(sale_ids)))
+    if date_from is not None:
+        query = query.filter(Sale.fecha_emision >= datetime.combine(date_from, time.min, tzinfo=CHILE_TZ))
+    if date_to is not None:
+        query = query.filter(
+            Sale.fecha_emision < datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=CHILE_TZ)
+        )
+    if tipo_dte is not None:
+        query = query.filter(Sale.tipo_dte == tipo_dte)
+    return [r[0] for r in query.order_by(Sale.id).all()]
+
+
+def load_payloads(db: Session, sale_ids: list) -> list:
+    """Carga un bloque de ventas con todo lo necesario en tres consultas."""
+    sales = (
+        db.query(Sale)
+        .options(
+            joinedload(Sale.customer),
+            selectinload(Sale.details).joinedload(SaleDetail.product)
+            .options(load_only(Product.nombre, Product.unidad_medida)),
+        )
+        .filter(Sale.id.in_(sale_ids))
+        .order_by(Sale.id)
+        .all()
+    )
+    payloads = [sale_payload(s) for s in sales]
+    # Liberar las instancias del bloque (el mapa de identidad crecería con el período)
+    db.expunge_all()
+    return payloads
+
+
+def render_batch(
+    db: Session,
+    sale_ids: list,
+    processes: int = RENDER_PROCESSES,
+    chunk_size: int = CHUNK_SIZE,
+    executor: Optional[Executor] = None,
+) -> Iterator[tuple]:
+    """Renderiza el XML de las ventas indicadas, en orden de ID.
+
+    Args:
+        db: Sesión del esquema del inquilino.
+        sale_ids: Ventas a renderizar (ver `select_sale_ids`).
+        processes: Procesos del pool (1 = en el proceso actual).
+        chunk_size: Ventas cargadas por bloque.
+        executor: Pool propio (por defecto se crea uno para la llamada).
+
+    Yields:
+        tuple: (sale_id, tipo_dte, folio, xml).
+
+    Raises:
+        ValueError: Si el emisor no está configurado.
+    """
+    issuer = db.query(Issuer).first()
+    if not issuer:
+        raise ValueError("Emisor no configurado")
+    issuer_data = issuer_payload(issuer)
+
+    own_executor = executor is None and processes > 1 and len(sale_ids) > TASK_SIZE
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=processes)
+    try:
+        for start in range(0, len(sale_ids), chunk_size):
+            payloads = load_payloads(db, sale_ids[start:start + chunk_size])
+            tasks = [payloads[i:i + TASK_SIZE] for i in range(0, len(payloads), TASK_SIZE)]
+            if executor is None:
+                results = (_render_task(task, issuer_data) for task in tasks)
+            else:
+                results = executor.map(_render_task, tasks, [issuer_data] * len(tasks))
+            for rendered in results:
+                yield from rendered
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+def is_signed(xml: Optional[str]) -> bool:
+    """True si el XML ya fue timbrado y firmado (`dte_signer.sign_dte`)."""
+    return bool(xml) and "<TED" in xml and "SignatureValue" in xml
+
+
+def sign_documents(db: Session, schema: Optional[str], documents: list) -> tuple:
+    """Timbra y firma documentos regenerados en el pool de firma (como el pipeline).
+
+    Args:
+        schema: Inquilino (selecciona el certificado).
+        documents: [(sale_id, tipo_dte, folio, xml)].
+
+    Returns:
+        tuple: ([(sale_id, tipo_dte, folio, xml firmado)], {sale_id: error}).
+    """
+    if not documents:
+        return [], {}
+    cafs = db.query(CAF).filter(CAF.tipo_documento.in_({doc[1] for doc in documents})).all()
+    jobs, used = [], {}
+    for sale_id, tipo, folio, xml in documents:
+        caf = next((c for c in cafs if c.tipo_documento == tipo and c.folio_desde <= folio <= c.folio_hasta), None)
+        if caf is not None:
+            used[caf.id] = caf.xml_caf
+        jobs.append((sale_id, xml, caf.id if caf else None))
+
+    results = {doc_id: (xml, error) for doc_id, xml, error in dte_signer.signing_pool.sign_many(schema, jobs, used)}
+    signed, errors = [], {}
+    for sale_id, tipo, folio, _ in documents:
+        xml, error = results[sale_id]
+        if xml is None:
+            errors[sale_id] = error or "Firma no realizada"
+        else:
+            signed.append((sale_id, tipo, folio, xml))
+    return signed, errors
+
+
+def persist_xml(db: Session, documents: list) -> int:
+    """Guarda el XML regenerado en el último DTE de cada venta (hace commit).
+
+    Un DTE que ya tiene XML firmado sólo se reemplaza con XML firmado
+    (`sign_documents`): el XML sin firmar de esas ventas se descarta.
+
+    Args:
+        documents: [(sale_id, tipo_dte, folio, xml)].
+
+    Returns:
+        int: DTE actualizados.
+    """
+    xml_by_sale = {doc[0]: doc[3] for doc in documents}
+    if not xml_by_sale:
+        return 0
+    dte_ids = dict(
+        db.query(DTE.sale_id, func.max(DTE.id))
+        .filter(DTE.sale_id.in_(list(xml_by_sale)))
+        .group_by(DTE.sale_id)
+        .all()
+    )
+    unsigned = [dte_id for sale_id, dte_id in dte_ids.items() if not is_signed(xml_by_sale[sale_id])]
+    protected = {
+        row[0] for row in db.query(DTE.id).filter(
+            DTE.id.in_(unsigned), DTE.xml_content.contains("<TED"), DTE.xml_content.contains("SignatureValue"),
+        )
+    } if unsigned else set()
+    rows = [
+        {"id": dte_id, "xml_content": xml_by_sale[sale_id]}
+        for sale_id, dte_id in dte_ids.items() if dte_id not in protected
+    ]
+    if rows:
+        db.execute(update(DTE), rows)
+    db.commit()
+    return len(rows)
+
+
+def _strip_declaration(xml: str) -> str:
+    xml = xml.lstrip()
+    if xml.startswith("<?xml"):
+        xml = xml[xml.index("?>") + 2:].lstrip()
+    return xml
+
+
+def build_envio(
+    documents: list,
+    issuer: dict,
+    rut_envia: Optional[str] = None,
+    fch_resol: str = SII_FCH_RESOL,
+    nro_resol: str = SII_NRO_RESOL,
+) -> str:
+    """Arma un sobre EnvioDTE o EnvioBOLETA (según el tipo del primer documento).
+
+    Args:
+        documents: [(sale_id, tipo_dte, folio, xml)] de una misma familia.
+        issuer: Datos del emisor (`issuer_payload`).
+        rut_envia: RUT del titular del certificado (por defecto, el emisor).
+        fch_resol / nro_resol: Resolución SII del emisor.
+    """
+    boleta = documents[0][1] in BOLETA_TYPES
+    root, xsd = ("EnvioBOLETA", "EnvioBOLETA_v11.xsd") if boleta else ("EnvioDTE", "EnvioDTE_v10.xsd")
+
+    subtotals = {}
+    for doc in documents:
+        subtotals[doc[1]] = subtotals.get(doc[1], 0) + 1
+
+    parts = [
+        '<?xml version="1.0" encoding="iso-8859-1"?>',
+        f'<{root} xmlns="http://www.sii.cl/SiiDte" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        f'xsi:schemaLocation="http://www.sii.cl/SiiDte {xsd}" version="1.0">',
+        '<SetDTE ID="SetDoc">',
+        '<Caratula version="1.0">',
+        f"<RutEmisor>{escape(issuer['rut'])}</RutEmisor>",
+        f"<RutEnvia>{escape(rut_envia or issuer['rut'])}</RutEnvia>",
+        f"<RutReceptor>{SII_RUT}</RutReceptor>",
+        f"<FchResol>{escape(fch_resol)}</FchResol>",
+        f"<NroResol>{escape(str(nro_resol))}</NroResol>",
+        f"<TmstFirmaEnv>{get_now().strftime('%Y-%m-%dT%H:%M:%S')}</TmstFirmaEnv>",
+    ]
+    parts += [f"<SubTotDTE><TpoDTE>{t}</TpoDTE><NroDTE>{n}</NroDTE></SubTotDTE>" for t, n in sorted(subtotals.items())]
+    parts.append("</Caratula>")
+    parts += [_strip_declaration(doc[3]) for doc in documents]
+    parts += ["</SetDTE>", f"</{root}>", ""]
+    return "\n".join(parts)
+
+
+def iter_envios(documents: Iterable[tuple], max_docs: int = MAX_DOCS_PER_ENVIO) -> Iterator[tuple]:
+    """Agrupa documentos en sobres por familia (boletas / resto).
+
+    Yields:
+        tuple: ('EnvioBOLETA' | 'EnvioDTE', [documentos]) con a lo más `max_docs`.
+    """
+    pending = {"EnvioBOLETA": [], "EnvioDTE": []}
+    for doc in documents:
+        kind = "EnvioBOLETA" if doc[1] in BOLETA_TYPES else "EnvioDTE"
+        pending[kind].append(doc)
+        if len(pending[kind]) >= max_docs:
+            yield kind, pending[kind]
+            pending[kind] = []
+    for kind, docs in pending.items():
+        if docs:
+            yield kind, docs
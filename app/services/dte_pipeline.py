@@ -0,0 +1,385 @@
+"""Pipeline Asíncrono de Generación de DTE.
+
+La venta se confirma con su DTE en estado PENDIENTE y un trabajo en
+`dte_jobs` (tabla durable en el esquema del inquilino). Un pool de workers
+toma los trabajos en lotes (`FOR UPDATE SKIP LOCKED`), genera el XML fuera
+de la transacción de la venta y deja el DTE en GENERADO (o ERROR tras
+agotar los reintentos). Si el inquilino tiene certificado instalado, el
+lote se timbra y firma en el pool de `dte_signer` antes de confirmarse;
+un documento sin CAF que cubra su folio cuenta como intento fallido.
+
+Configuración:
+    TORN_DTE_WORKERS: Hilos del pool en este proceso (0 = sin workers
+        embebidos; usar `scripts/run_dte_worker.py`).
+    TORN_DTE_BATCH_SIZE: Trabajos por lote.
+    TORN_DTE_POLL_INTERVAL: Segundos entre barridos de inquilinos con
+        trabajos pendientes (recupera trabajos tras reinicios). El barrido
+        consulta las colas desde la conexión global y sólo agenda los
+        esquemas con trabajos por tomar, sin abrir pools de inquilinos.
+    TORN_DTE_MAX_ATTEMPTS: Reintentos antes de marcar ERROR.
+    TORN_DTE_RETRY_BASE: Segundos de espera tras el primer intento
+        fallido; se duplica en cada reintento (`available_at`).
+"""
+
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, or_, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.dte import CAF, DTE, DteJob
+from app.models.issuer import Issuer
+from app.models.sale import Sale, SaleDetail
+from app.services import dte_signer
+from app.services.xml_generator import render_factura_xml
+
+DTE_WORKERS = int(os.getenv("TORN_DTE_WORKERS", "2"))
+DTE_BATCH_SIZE = int(os.getenv("TORN_DTE_BATCH_SIZE", "50"))
+DTE_POLL_INTERVAL = float(os.getenv("TORN_DTE_POLL_INTERVAL", "30"))
+DTE_MAX_ATTEMPTS = int(os.getenv("TORN_DTE_MAX_ATTEMPTS", "5"))
+DTE_RETRY_BASE = timedelta(seconds=float(os.getenv("TORN_DTE_RETRY_BASE", "30")))
+# Trabajos en PROCESSING por más de este tiempo se consideran huérfanos
+DTE_STALE_AFTER = timedelta(minutes=int(os.getenv("TORN_DTE_STALE_MINUTES", "10")))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+POLL_CHUNK = 200
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_dte(db: Session, sale: Sale) -> DTE:
+    """Registra el DTE de una venta en estado PENDIENTE y encola su generación.
+
+    No hace commit: el DTE y el trabajo se confirman junto con la venta.
+
+    Args:
+        db: Sesión de la transacción de la venta.
+        sale: Venta ya persistida (con `id` asignado vía flush).
+
+    Returns:
+        DTE: Documento creado en estado PENDIENTE.
+    """
+    dte = DTE(
+        sale_id=sale.id,
+        tipo_dte=sale.tipo_dte,
+        folio=sale.folio,
+        xml_content=None,
+        estado_sii="PENDIENTE",
+    )
+    db.add(dte)
+    db.flush()
+    db.add(DteJob(dte_id=dte.id, sale_id=sale.id, status="PENDING", attempts=0))
+    return dte
+
+
+def _claim_jobs(db: Session, batch_size: int, worker_id: str) -> list:
+    """Toma un lote de trabajos en una transacción corta y los marca PROCESSING.
+
+    Omite los trabajos en espera de reintento (`available_at` futuro).
+    """
+    now = datetime.now(timezone.utc)
+    stale_before = now - DTE_STALE_AFTER
+    db.execute(
+        update(DteJob)
+        .where(DteJob.status == "PROCESSING", DteJob.updated_at < stale_before)
+        .values(status="PENDING", worker_id=None)
+        .execution_options(synchronize_session=False)
+    )
+
+    job_ids = [
+        row[0] for row in db.query(DteJob.id)
+        .filter(
+            DteJob.status == "PENDING",
+            or_(DteJob.available_at.is_(None), DteJob.available_at <= now),
+        )
+        .order_by(DteJob.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    ]
+    if job_ids:
+        db.execute(
+            update(DteJob)
+            .where(DteJob.id.in_(job_ids))
+            .values(
+                status="PROCESSING",
+                attempts=DteJob.attempts + 1,
+                worker_id=worker_id,
+                updated_at=func.now(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return job_ids
+
+
+def process_batch(db: Session, batch_size: int = DTE_BATCH_SIZE, worker_id: str = WORKER_ID) -> int:
+    """Procesa un lote de trabajos pendientes del esquema de la sesión.
+
+    Args:
+        db: Sesión ligada al esquema del inquilino.
+        batch_size: Máximo de trabajos a tomar.
+        worker_id: Identificador del worker (auditoría).
+
+    Returns:
+        int: Cantidad de trabajos tomados (0 si la cola está vacía).
+    """
+    job_ids = _claim_jobs(db, batch_size, worker_id)
+    if not job_ids:
+        return 0
+
+    jobs = (
+        db.query(DteJob)
+        .options(
+            joinedload(DteJob.dte)
+            .joinedload(DTE.sale)
+            .options(
+                joinedload(Sale.customer),
+                joinedload(Sale.details).joinedload(SaleDetail.product),
+            )
+        )
+        .filter(DteJob.id.in_(job_ids))
+        .order_by(DteJob.id)
+        .all()
+    )
+    issuer = db.query(Issuer).first()
+
+    rendered = []
+    for job in jobs:
+        dte = job.dte
+        try:
+            sale = dte.sale
+            dte.xml_content = render_factura_xml(sale, issuer, sale.customer) if issuer else ""
+            rendered.append(job)
+        except Exception as e:
+            _fail(job, str(e))
+
+    schema = db.info.get("schema_name")
+    if issuer and rendered and dte_signer.has_certificate(schema):
+        rendered = _sign_jobs(db, schema, rendered)
+
+    for job in rendered:
+        job.dte.estado_sii = "GENERADO"
+        job.status = "DONE"
+        job.last_error = None
+    db.commit()
+    return len(jobs)
+
+
+def _fail(job: DteJob, error: str) -> None:
+    """Registra un intento fallido: reintento diferido, o ERROR al agotar los intentos.
+
+    El reintento queda disponible tras `DTE_RETRY_BASE * 2^(intentos - 1)`;
+    `attempts` ya fue incrementado en SQL al tomar el trabajo.
+    """
+    job.last_error = error[:2000]
+    if job.attempts >= DTE_MAX_ATTEMPTS:
+        job.status = "ERROR"
+        job.dte.estado_sii = "ERROR"
+    else:
+        job.status = "PENDING"
+        job.available_at = datetime.now(timezone.utc) + DTE_RETRY_BASE * 2 ** max(job.attempts - 1, 0)
+
+
+def _covering_caf(cafs: list, tipo: int, folio: int) -> Optional[CAF]:
+    return next((c for c in cafs if c.tipo_documento == tipo and c.folio_desde <= folio <= c.folio_hasta), None)
+
+
+def _sign_jobs(db: Session, schema: Optional[str], jobs: list) -> list:
+    """Timbra y firma el XML de los trabajos en el pool de firma.
+
+    Returns:
+        list: Trabajos firmados (los demás quedan registrados como fallidos).
+    """
+    tipos = {job.dte.tipo_dte for job in jobs}
+    cafs = db.query(CAF).filter(CAF.tipo_documento.in_(tipos)).all()
+
+    documents, used = [], {}
+    for job in jobs:
+        caf = _covering_caf(cafs, job.dte.tipo_dte, job.dte.folio)
+        if caf is not None:
+            used[caf.id] = caf.xml_caf
+        documents.append((job.id, job.dte.xml_content, caf.id if caf else None))
+
+    try:
+        signed_docs = dte_signer.signing_pool.sign_many(schema, documents, used)
+    except Exception as e:
+        signed_docs = [(doc_id, None, f"Error en pool de firma: {e}") for doc_id, _, _ in documents]
+    results = {doc_id: (xml, error) for doc_id, xml, error in signed_docs}
+    signed = []
+    for job in jobs:
+        xml, error = results[job.id]
+        if xml is None:
+            _fail(job, error or "Firma no realizada")
+        else:
+            job.dte.xml_content = xml
+            signed.append(job)
+    return signed
+
+
+def drain_schema(schema_name: str, batch_size: int = DTE_BATCH_SIZE) -> int:
+    """Procesa lotes del esquema indicado hasta vaciar su cola.
+
+    Returns:
+        int: Total de trabajos procesados.
+    """
+    from app.database import SessionLocal, tenant_pools
+
+    total = 0
+    db = SessionLocal(bind=tenant_pools.get_engine(schema_name))
+    db.info["schema_name"] = schema_name
+    try:
+        while True:
+            processed = process_batch(db, batch_size)
+            if not processed:
+                return total
+            total += processed
+    finally:
+        db.close()
+
+
+def schemas_with_pending_jobs(conn: Connection) -> list:
+    """Esquemas de inquilinos activos con trabajos por tomar (PostgreSQL).
+
+    Consulta las colas calificadas por esquema desde una conexión global, en
+    bloques de `POLL_CHUNK` esquemas por sentencia. Cuenta los trabajos
+    PENDING ya disponibles (ver `available_at`) y los PROCESSING huérfanos
+    (ver `DTE_STALE_AFTER`).
+    """
+    schemas = [row[0] for row in conn.execute(text("""
+        SELECT t.schema_name FROM public.tenants t
+        JOIN information_schema.tables i ON i.table_schema = t.schema_name AND i.table_name = 'dte_jobs'
+        WHERE t.is_active
+        ORDER BY t.id
+    """))]
+    now = datetime.now(timezone.utc)
+    stale_before = now - DTE_STALE_AFTER
+    pending = []
+    for start in range(0, len(schemas), POLL_CHUNK):
+        chunk = schemas[start:start + POLL_CHUNK]
+        union = " UNION ALL ".join(
+            f"""SELECT :s{i} WHERE EXISTS (SELECT 1 FROM "{schema}".dte_jobs WHERE (status = 'PENDING'
+                AND (available_at IS NULL OR available_at <= :now))
+                OR (status = 'PROCESSING' AND updated_at < :stale_before))"""
+            for i, schema in enumerate(chunk)
+        )
+        params = {f"s{i}": schema for i, schema in enumerate(chunk)}
+        pending += [row[0] for row in conn.execute(text(union), {**params, "now": now, "stale_before": stale_before})]
+    return pending
+
+
+def queue_stats(db: Session) -> dict:
+    """Resumen de la cola de DTE del esquema: trabajos por estado y antigüedad."""
+    counts = dict(
+        db.query(DteJob.status, func.count(DteJob.id)).group_by(DteJob.status).all()
+    )
+    oldest_pending = db.query(func.min(DteJob.created_at)).filter(
+        DteJob.status.in_(["PENDING", "PROCESSING"])
+    ).scalar()
+    return {
+        "pending": counts.get("PENDING", 0),
+        "processing": counts.get("PROCESSING", 0),
+        "done": counts.get("DONE", 0),
+        "error": counts.get("ERROR", 0),
+        "oldest_pending_at": oldest_pending,
+    }
+
+
+class DTEPipeline:
+    """Pool de workers que vacía las colas de DTE por inquilino.
+
+    `notify(schema)` agenda el vaciado de un esquema (sin duplicar tareas
+    en curso); un hilo de barrido revisa periódicamente las colas de los
+    inquilinos activos y agenda sólo los que tienen trabajos pendientes
+    (p. ej. tras un reinicio).
+    """
+
+    def __init__(self, workers: int = DTE_WORKERS, poll_interval: float = DTE_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._scheduled: dict[str, bool] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._poller: Optional[threading.Thread] = None
+        self.processed = 0
+        self.failures = 0
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        """Inicia el pool y el hilo de barrido (no-op si `workers` es 0)."""
+        if self.workers <= 0 or self._executor is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="dte")
+        if self.poll_interval > 0:
+            self._poller = threading.Thread(target=self._poll_loop, name="dte-poller", daemon=True)
+            self._poller.start()
+
+    def stop(self) -> None:
+        """Detiene el barrido y espera a que terminen los lotes en curso."""
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def notify(self, schema_name: Optional[str]) -> None:
+        """Agenda el procesamiento de la cola del esquema indicado."""
+        if not schema_name or self._executor is None:
+            return
+        with self._lock:
+            if schema_name in self._scheduled:
+                # Hay un vaciado en curso: pedirle una pasada más al terminar
+                self._scheduled[schema_name] = True
+                return
+            self._scheduled[schema_name] = False
+        self._executor.submit(self._run, schema_name)
+
+    def _run(self, schema_name: str) -> None:
+        while True:
+            try:
+                self.processed += drain_schema(schema_name)
+            except Exception:
+                self.failures += 1
+                logger.exception("Error en pipeline DTE (%s)", schema_name)
+            with self._lock:
+                if not self._scheduled.get(schema_name):
+                    self._scheduled.pop(schema_name, None)
+                    return
+                self._scheduled[schema_name] = False
+
+    def _poll_loop(self) -> None:
+        from app.database import engine
+
+        while not self._stop.wait(self.poll_interval):
+            try:
+                with engine.connect() as conn:
+                    schemas = schemas_with_pending_jobs(conn)
+            except Exception:
+                logger.exception("Error revisando colas de DTE de los inquilinos")
+                continue
+            for schema_name in schemas:
+                self.notify(schema_name)
+
+    def stats(self) -> dict:
+        """Estado del pool en este proceso."""
+        with self._lock:
+            scheduled = len(self._scheduled)
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "scheduled_schemas": scheduled,
+            "processed": self.processed,
+            "failures": self.failures,
+        }
+
+
+dte_pipeline = DTEPipeline()
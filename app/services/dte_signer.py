@@ -1,15 +1,416 @@
-"""
-Servicio de Firma Digital de DTEs.
+"""Servicio de Firma Digital de DTEs y Timbre Electrónico (TED).
+
+Flujo por documento (`sign_dte`):
+1. Se arma el TED con los datos del propio XML (RE, TD, F, FE, RR, RSR,
+   MNT, IT1), el nodo CAF tal como lo entregó el SII y `TSTED`; el DD
+   aplanado se firma con la llave privada del CAF (`RSASK`, SHA1withRSA).
+2. El TED y `TmstFirma` se insertan al final de `Documento`.
+3. `Documento` se firma con XML-DSig (C14N inclusivo, SHA1 / RSA-SHA1) usando
+   el certificado del contribuyente; la firma queda como hermana de
+   `Documento` dentro de `DTE`, con `KeyValue` y `X509Certificate`.
+
+Material de llaves:
+    El certificado de cada inquilino se lee desde `TORN_DTE_CERT_DIR`
+    (`<schema>.pfx` y su clave en `<schema>.pass`), fuera de la base de datos
+    y de sus respaldos. Certificados y llaves de CAF se parsean una vez por
+    proceso y quedan en `key_cache` (`TORN_DTE_KEY_CACHE_TTL` segundos);
+    `invalidate_keys` los descarta al rotar un certificado o cargar un CAF.
 
-Aquí se implementará la lógica de firma XML usando lxml y signxml,
-conforme a los requerimientos del SII de Chile.
+Pool de firma:
+    `signing_pool` reparte los documentos en un pool de procesos
+    (`TORN_DTE_SIGN_PROCESSES`, 0 = en el proceso actual). Cada proceso
+    mantiene su propia `key_cache`, de modo que sólo el primer lote de un
+    inquilino paga el parseo del PKCS#12. Desde código async se usa
+    `sign_async`, que no bloquea el loop de eventos.
 
-Dependencias futuras:
-    - lxml
-    - signxml
-    - cryptography (para manejo de certificados .pfx / .p12)
+Dependencias: lxml (C14N) y cryptography (PKCS#12 y RSA).
 """
 
-# TODO: Implementar carga de certificado digital (.pfx)
-# TODO: Implementar firma XML según esquema SII
-# TODO: Implementar generación de Timbre Electrónico (TED)
+import asyncio
+import base64
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+from xml.sax.saxutils import escape
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.serialization import pkcs12
+from lxml import etree
+
+from app.utils.cache import TTLCache
+from app.utils.dates import get_now
+
+CERT_DIR = Path(os.getenv("TORN_DTE_CERT_DIR", "certs"))
+KEY_CACHE_TTL = float(os.getenv("TORN_DTE_KEY_CACHE_TTL", "3600"))
+SIGN_PROCESSES = int(os.getenv("TORN_DTE_SIGN_PROCESSES", str(os.cpu_count() or 1)))
+SIGN_CHUNK_SIZE = 25
+
+SII_NS = "http://www.sii.cl/SiiDte"
+DSIG_NS = "http://www.w3.org/2000/09/xmldsig#"
+C14N_ALG = "http://www.w3.org/TR/2001/REC-xml-c14n-20010315"
+RUT_SIN_RECEPTOR = "66666666-6"
+ENCODING = "ISO-8859-1"
+
+# {(schema, 'cert'): certificado} y {(schema, 'caf', caf_id): CAF parseado}
+key_cache = TTLCache(ttl=KEY_CACHE_TTL, max_entries=5000)
+
+_parser = etree.XMLParser(remove_blank_text=False, resolve_entities=False)
+
+
+class SignerError(ValueError):
+    """Certificado o CAF inválido, o documento que no se puede timbrar."""
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _int_b64(value: int) -> str:
+    return _b64(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+def _sha1_rsa(key, data: bytes) -> str:
+    return _b64(key.sign(data, padding.PKCS1v15(), hashes.SHA1()))
+
+
+# ── Material de llaves ───────────────────────────────────────────────
+
+
+def load_certificate(pfx: bytes, password: Optional[bytes]) -> SimpleNamespace:
+    """Parsea un certificado PKCS#12 (.pfx / .p12) del contribuyente.
+
+    Returns:
+        SimpleNamespace: key, x509 (DER en base64), modulus y exponent (base64).
+
+    Raises:
+        SignerError: Si el archivo o la clave no son válidos.
+    """
+    try:
+        key, cert, _ = pkcs12.load_key_and_certificates(pfx, password)
+    except ValueError as e:
+        raise SignerError(f"Certificado inválido: {e}") from e
+    if key is None or cert is None:
+        raise SignerError("El archivo PKCS#12 no contiene llave y certificado")
+    numbers = key.public_key().public_numbers()
+    return SimpleNamespace(
+        key=key,
+        x509=_b64(cert.public_bytes(serialization.Encoding.DER)),
+        modulus=_int_b64(numbers.n),
+        exponent=_int_b64(numbers.e),
+        not_after=cert.not_valid_after_utc,
+    )
+
+
+def parse_caf(xml_caf: str) -> SimpleNamespace:
+    """Extrae del XML de un CAF el nodo `<CAF>` (aplanado) y su llave privada.
+
+    Returns:
+        SimpleNamespace: node (texto del nodo CAF), key, rut, tipo, desde, hasta.
+
+    Raises:
+        SignerError: Si faltan el nodo CAF o `RSASK`.
+    """
+    node = re.search(r"<CAF\b.*?</CAF>", xml_caf, re.S)
+    rsask = re.search(r"<RSASK>(.*?)</RSASK>", xml_caf, re.S)
+    if not node or not rsask:
+        raise SignerError("XML de CAF sin nodo CAF o sin llave privada (RSASK)")
+    try:
+        key = serialization.load_pem_private_key(rsask.group(1).strip().encode(), password=None)
+    except ValueError as e:
+        raise SignerError(f"Llave privada del CAF inválida: {e}") from e
+
+    # El nodo se copia tal cual al TED; sólo se elimina el espacio entre etiquetas
+    caf_node = re.sub(r">\s+<", "><", node.group(0).strip())
+    da = etree.fromstring(caf_node.encode(ENCODING), _parser).find("DA")
+
+    def _text(path: str) -> Optional[str]:
+        return da.findtext(path) if da is not None else None
+
+    return SimpleNamespace(
+        node=caf_node,
+        key=key,
+        rut=_text("RE"),
+        tipo=int(_text("TD") or 0),
+        desde=int(_text("RNG/D") or 0),
+        hasta=int(_text("RNG/H") or 0),
+    )
+
+
+def certificate_path(schema: Optional[str]) -> Path:
+    return CERT_DIR / f"{schema or 'public'}.pfx"
+
+
+def has_certificate(schema: Optional[str]) -> bool:
+    """Indica si el inquilino tiene un certificado de firma instalado."""
+    return certificate_path(schema).is_file()
+
+
+def tenant_certificate(schema: Optional[str]) -> SimpleNamespace:
+    """Certificado del inquilino, parseado una vez por proceso y cacheado.
+
+    Raises:
+        SignerError: Si no hay certificado instalado o no se puede leer.
+    """
+    key = (schema, "cert")
+    cert = key_cache.get(key)
+    if cert is None:
+        path = certificate_path(schema)
+        if not path.is_file():
+            raise SignerError(f"Sin certificado digital para {schema} ({path})")
+        pass_path = path.with_suffix(".pass")
+        password = pass_path.read_bytes().strip() if pass_path.is_file() else None
+        cert = load_certificate(path.read_bytes(), password)
+        key_cache.set(key, cert)
+    return cert
+
+
+def caf_key(schema: Optional[str], caf_id: int, xml_caf: str) -> SimpleNamespace:
+    """CAF parseado (con su llave privada), cacheado por inquilino e ID."""
+    key = (schema, "caf", caf_id)
+    caf = key_cache.get(key)
+    if caf is None:
+        caf = parse_caf(xml_caf)
+        key_cache.set(key, caf)
+    return caf
+
+
+def invalidate_keys(schema: Optional[str]) -> int:
+    """Descarta certificado y CAF cacheados de un inquilino (en este proceso)."""
+    return key_cache.invalidate_where(lambda k, _: k[0] == schema)
+
+
+# ── TED y firma XML-DSig ─────────────────────────────────────────────
+
+
+def build_ted(documento, caf: SimpleNamespace, timestamp: str) -> str:
+    """Arma el TED de un `Documento` y lo timbra con la llave del CAF.
+
+    Args:
+        documento: Elemento `Documento` (lxml) del DTE.
+        caf: CAF que autoriza el folio (`parse_caf`).
+        timestamp: Fecha y hora del timbraje (AAAA-MM-DDTHH:MM:SS).
+
+    Returns:
+        str: Nodo `<TED>` serializado (sin espacios entre etiquetas).
+
+    Raises:
+        SignerError: Si el folio o el tipo no corresponden al CAF.
+    """
+    ns = {"s": SII_NS}
+
+    def _field(path: str) -> str:
+        return (documento.findtext(path, namespaces=ns) or "").strip()
+
+    tipo = int(_field("s:Encabezado/s:IdDoc/s:TipoDTE") or 0)
+    folio = int(_field("s:Encabezado/s:IdDoc/s:Folio") or 0)
+    if tipo != caf.tipo or not caf.desde <= folio <= caf.hasta:
+        raise SignerError(f"El folio {folio} (tipo {tipo}) no está autorizado por el CAF")
+
+    dd = (
+        "<DD>"
+        f"<RE>{escape(_field('s:Encabezado/s:Emisor/s:RUTEmisor'))}</RE>"
+        f"<TD>{tipo}</TD>"
+        f"<F>{folio}</F>"
+        f"<FE>{escape(_field('s:Encabezado/s:IdDoc/s:FchEmis'))}</FE>"
+        f"<RR>{escape(_field('s:Encabezado/s:Receptor/s:RUTRecep') or RUT_SIN_RECEPTOR)}</RR>"
+        f"<RSR>{escape(_field('s:Encabezado/s:Receptor/s:RznSocRecep')[:40])}</RSR>"
+        f"<MNT>{_field('s:Encabezado/s:Totales/s:MntTotal') or 0}</MNT>"
+        f"<IT1>{escape(_field('s:Detalle/s:NmbItem')[:40])}</IT1>"
+        f"{caf.node}"
+        f"<TSTED>{timestamp}</TSTED>"
+        "</DD>"
+    )
+    frmt = _sha1_rsa(caf.key, dd.encode(ENCODING, errors="xmlcharrefreplace"))
+    return f'<TED version="1.0">{dd}<FRMT algoritmo="SHA1withRSA">{frmt}</FRMT></TED>'
+
+
+def _dsig(tag: str, parent=None, **attrs):
+    name = f"{{{DSIG_NS}}}{tag}"
+    if parent is None:
+        return etree.Element(name, attrs, nsmap={None: DSIG_NS})
+    return etree.SubElement(parent, name, attrs)
+
+
+def sign_node(target, cert: SimpleNamespace):
+    """Firma (XML-DSig enveloped) el elemento `target` por su atributo ID.
+
+    La firma se agrega como último hijo del padre de `target`.
+
+    Returns:
+        Elemento `Signature` agregado.
+    """
+    digest = hashlib.sha1(etree.tostring(target, method="c14n")).digest()
+
+    signature = _dsig("Signature")
+    signed_info = _dsig("SignedInfo", signature)
+    _dsig("CanonicalizationMethod", signed_info, Algorithm=C14N_ALG)
+    _dsig("SignatureMethod", signed_info, Algorithm=f"{DSIG_NS}rsa-sha1")
+    reference = _dsig("Reference", signed_info, URI=f"#{target.get('ID')}")
+    _dsig("DigestMethod", reference, Algorithm=f"{DSIG_NS}sha1")
+    _dsig("DigestValue", reference).text = _b64(digest)
+    signature_value = _dsig("SignatureValue", signature)
+    key_info = _dsig("KeyInfo", signature)
+    rsa_key = _dsig("RSAKeyValue", _dsig("KeyValue", key_info))
+    _dsig("Modulus", rsa_key).text = cert.modulus
+    _dsig("Exponent", rsa_key).text = cert.exponent
+    _dsig("X509Certificate", _dsig("X509Data", key_info)).text = cert.x509
+
+    # SignedInfo se canoniza ya ubicado en el árbol final (mismo contexto que el verificador)
+    target.getparent().append(signature)
+    signature_value.text = _sha1_rsa(cert.key, etree.tostring(signed_info, method="c14n"))
+    return signature
+
+
+def sign_dte(xml: str, cert: SimpleNamespace, caf: SimpleNamespace, timestamp: Optional[str] = None) -> str:
+    """Timbra (TED) y firma un DTE renderizado por `render_factura_xml`.
+
+    Args:
+        xml: XML del DTE sin firmar.
+        cert: Certificado del contribuyente (`load_certificate`).
+        caf: CAF que autoriza el folio (`parse_caf`).
+        timestamp: Fecha y hora de timbraje y firma (por defecto, ahora).
+
+    Returns:
+        str: XML firmado (ISO-8859-1, con declaración).
+
+    Raises:
+        SignerError: Si el XML no tiene `Documento` o el CAF no cubre el folio.
+    """
+    timestamp = timestamp or get_now().strftime("%Y-%m-%dT%H:%M:%S")
+    try:
+        root = etree.fromstring(xml.encode(ENCODING, errors="xmlcharrefreplace"), _parser)
+    except etree.XMLSyntaxError as e:
+        raise SignerError(f"XML de DTE inválido: {e}") from e
+    documento = root.find(f"{{{SII_NS}}}Documento")
+    if documento is None or not documento.get("ID"):
+        raise SignerError("El DTE no tiene nodo Documento con ID")
+
+    ted = etree.fromstring(
+        build_ted(documento, caf, timestamp).replace("<TED ", f'<TED xmlns="{SII_NS}" ', 1),
+        _parser,
+    )
+    documento.append(ted)
+    etree.SubElement(documento, f"{{{SII_NS}}}TmstFirma").text = timestamp
+
+    sign_node(documento, cert)
+    return etree.tostring(root, encoding=ENCODING, xml_declaration=True).decode(ENCODING)
+
+
+# ── Pool de firma ────────────────────────────────────────────────────
+
+
+def _sign_task(schema: Optional[str], documents: list, cafs: dict) -> list:
+    """Tarea del pool: firma un grupo de documentos con las llaves del inquilino.
+
+    Args:
+        documents: [(doc_id, xml, caf_id)].
+        cafs: {caf_id: xml_caf} de los CAF usados por el grupo.
+
+    Returns:
+        list: [(doc_id, xml firmado o None, error o None)].
+    """
+    try:
+        cert = tenant_certificate(schema)
+    except SignerError as e:
+        return [(doc_id, None, str(e)) for doc_id, _, _ in documents]
+
+    results = []
+    for doc_id, xml, caf_id in documents:
+        try:
+            if caf_id not in cafs:
+                raise SignerError("Sin CAF vigente para el folio")
+            signed = sign_dte(xml, cert, caf_key(schema, caf_id, cafs[caf_id]))
+            results.append((doc_id, signed, None))
+        except SignerError as e:
+            results.append((doc_id, None, str(e)))
+    return results
+
+
+class SigningPool:
+    """Pool de procesos para timbrar y firmar DTE fuera del hilo que los pide.
+
+    El pool se crea con el primer lote (no al importar el módulo) y cada
+    proceso conserva su caché de llaves entre lotes.
+    """
+
+    def __init__(self, processes: int = SIGN_PROCESSES, chunk_size: int = SIGN_CHUNK_SIZE):
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.signed = 0
+        self.failures = 0
+
+    def _pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.processes <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+            return self._executor
+
+    def _count(self, results: list) -> list:
+        with self._lock:
+            self.signed += sum(1 for r in results if r[1] is not None)
+            self.failures += sum(1 for r in results if r[1] is None)
+        return results
+
+    def _chunks(self, documents: list) -> list:
+        return [documents[i:i + self.chunk_size] for i in range(0, len(documents), self.chunk_size)]
+
+    def sign_many(self, schema: Optional[str], documents: list, cafs: dict) -> list:
+        """Firma documentos en el pool y espera el resultado (bloqueante).
+
+        Args:
+            schema: Inquilino (selecciona el certificado).
+            documents: [(doc_id, xml, caf_id)].
+            cafs: {caf_id: xml_caf}.
+
+        Returns:
+            list: [(doc_id, xml firmado o None, error o None)] en el mismo orden.
+        """
+        if not documents:
+            return []
+        executor = self._pool()
+        if executor is None:
+            return self._count(_sign_task(schema, documents, cafs))
+        futures = [executor.submit(_sign_task, schema, chunk, cafs) for chunk in self._chunks(documents)]
+        return self._count([r for future in futures for r in future.result()])
+
+    async def sign_async(self, schema: Optional[str], documents: list, cafs: dict) -> list:
+        """Versión async de `sign_many`: espera el pool sin bloquear el loop."""
+        if not documents:
+            return []
+        executor = self._pool()
+        loop = asyncio.get_running_loop()
+        chunks = self._chunks(documents)
+        results = await asyncio.gather(*(
+            loop.run_in_executor(executor, _sign_task, schema, chunk, cafs) for chunk in chunks
+        ))
+        return self._count([r for chunk in results for r in chunk])
+
+    def stop(self) -> None:
+        """Cierra el pool (espera los lotes en curso)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        """Estado del pool en este proceso."""
+        return {
+            "processes": self.processes,
+            "running": self._executor is not None,
+            "signed": self.signed,
+            "failures": self.failures,
+            "key_cache": key_cache.stats(),
+        }
+
+
+signing_pool = SigningPool()
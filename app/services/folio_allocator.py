@@ -0,0 +1,410 @@
+"""Servicio de Asignación de Folios (CAF).
+
+Centraliza la entrega de folios fiscales para ventas y notas de crédito.
+Opera en dos modos:
+
+- **Directo** (`TORN_FOLIO_BLOCK_SIZE=0`, por defecto): cada folio se obtiene
+  con un único `UPDATE ... RETURNING` dentro de la transacción de la venta.
+  Si la venta hace rollback, el folio vuelve al CAF (sin huecos).
+- **Por bloques** (`TORN_FOLIO_BLOCK_SIZE=N`): cada worker reserva N folios
+  en una transacción corta e independiente y los entrega desde memoria, de
+  modo que las ventas concurrentes no compiten por la fila del CAF. Los
+  bloques quedan registrados en `folio_reservations` para contabilizar los
+  folios no usados y reutilizarlos.
+
+En ambos modos, al agotarse un CAF se continúa con el siguiente rango
+vigente del mismo tipo de DTE.
+"""
+
+import heapq
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import case, func, insert, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.models.dte import CAF, FolioReservation
+from app.models.sale import Sale
+
+FOLIO_BLOCK_SIZE = int(os.getenv("TORN_FOLIO_BLOCK_SIZE", "0"))
+FOLIO_BLOCK_MAX_AGE = float(os.getenv("TORN_FOLIO_BLOCK_MAX_AGE", "900"))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+logger = logging.getLogger(__name__)
+
+# Reintentos al perder la carrera por el último folio de un rango
+_MAX_ROLLOVER_ATTEMPTS = 20
+
+
+def _next_value():
+    """Expresión del siguiente folio de un CAF (tolera `ultimo_folio_usado` sin inicializar)."""
+    return case(
+        (CAF.ultimo_folio_usado < CAF.folio_desde, CAF.folio_desde),
+        else_=CAF.ultimo_folio_usado + 1,
+    )
+
+
+def _vigentes(tipo_dte: int):
+    """Condición de CAFs del tipo indicado con folios disponibles."""
+    return (CAF.tipo_documento == tipo_dte) & (CAF.ultimo_folio_usado < CAF.folio_hasta)
+
+
+def allocate_folio(db: Session, tipo_dte: int) -> Optional[int]:
+    """Asigna un folio de forma atómica con `UPDATE ... RETURNING`.
+
+    El incremento se hace en la base de datos, por lo que dos transacciones
+    concurrentes nunca obtienen el mismo folio. El lock de fila se mantiene
+    hasta el commit de la transacción que llama.
+
+    Args:
+        db: Sesión de la transacción de la venta.
+        tipo_dte: Tipo de documento (33, 39, 61...).
+
+    Returns:
+        int | None: Folio asignado, o None si no quedan CAF vigentes.
+    """
+    for _ in range(_MAX_ROLLOVER_ATTEMPTS):
+        target = (
+            select(CAF.id)
+            .where(_vigentes(tipo_dte))
+            .order_by(CAF.folio_desde, CAF.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        row = db.execute(
+            update(CAF)
+            .where(CAF.id == target, CAF.ultimo_folio_usado < CAF.folio_hasta)
+            .values(ultimo_folio_usado=_next_value())
+            .returning(CAF.ultimo_folio_usado)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row:
+            return row[0]
+
+        # Sin fila: no hay CAF vigente, o el rango se agotó mientras esperábamos el lock
+        if not db.execute(select(func.count(CAF.id)).where(_vigentes(tipo_dte))).scalar():
+            return None
+    return None
+
+
+def allocate_simulated_folio(db: Session, tipo_dte: int) -> int:
+    """Folio correlativo para ambientes sin CAF (modo simulación).
+
+    En PostgreSQL toma un advisory lock de transacción por (esquema, tipo) para
+    que dos ventas concurrentes no lean el mismo máximo.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(current_schema()), :tipo)"),
+            {"tipo": tipo_dte},
+        )
+    last = db.query(func.max(Sale.folio)).filter(Sale.tipo_dte == tipo_dte).scalar()
+    return (last or 0) + 1
+
+
+# ── Reserva de bloques ───────────────────────────────────────────────
+
+
+@dataclass
+class FolioBlock:
+    """Rango de folios reservado en memoria por este worker."""
+    reservation_id: int
+    tipo_dte: int
+    next_folio: int
+    folio_hasta: int
+    worker_id: Optional[str] = None
+    reserved_at: float = field(default_factory=time.monotonic)
+    returned: list = field(default_factory=list)
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.folio_hasta - self.next_folio + 1) + len(self.returned)
+
+    def take(self) -> Optional[int]:
+        """Entrega el siguiente folio (primero los devueltos) o None si se agotó."""
+        if self.returned:
+            return heapq.heappop(self.returned)
+        if self.next_folio > self.folio_hasta:
+            return None
+        folio = self.next_folio
+        self.next_folio += 1
+        return folio
+
+    def give_back(self, folio: int) -> None:
+        """Devuelve un folio no utilizado (p. ej. venta revertida)."""
+        heapq.heappush(self.returned, folio)
+
+
+def reserve_block(conn: Connection, tipo_dte: int, size: int, worker_id: str = WORKER_ID) -> Optional[FolioBlock]:
+    """Reserva un bloque de folios en una transacción propia.
+
+    Primero intenta reutilizar un bloque liberado con folios sin usar; si no
+    hay, recorta un nuevo rango del primer CAF vigente (rollover automático).
+
+    Args:
+        conn: Conexión en transacción (se espera `engine.begin()`).
+        tipo_dte: Tipo de documento.
+        size: Cantidad de folios a reservar.
+        worker_id: Identificador del worker dueño del bloque.
+
+    Returns:
+        FolioBlock | None: Bloque reservado, o None si no quedan folios.
+    """
+    now = datetime.now(timezone.utc)
+
+    released = conn.execute(
+        select(FolioReservation.id, FolioReservation.next_folio, FolioReservation.folio_hasta)
+        .where(
+            FolioReservation.tipo_documento == tipo_dte,
+            FolioReservation.status == "RELEASED",
+            FolioReservation.next_folio <= FolioReservation.folio_hasta,
+        )
+        .order_by(FolioReservation.next_folio)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).first()
+    if released:
+        conn.execute(
+            update(FolioReservation)
+            .where(FolioReservation.id == released.id)
+            .values(status="ACTIVE", worker_id=worker_id, reserved_at=now, released_at=None)
+        )
+        return FolioBlock(released.id, tipo_dte, released.next_folio, released.folio_hasta, worker_id)
+
+    for _ in range(_MAX_ROLLOVER_ATTEMPTS):
+        caf = conn.execute(
+            select(CAF.id, CAF.folio_desde, CAF.folio_hasta, CAF.ultimo_folio_usado)
+            .where(_vigentes(tipo_dte))
+            .order_by(CAF.folio_desde, CAF.id)
+            .limit(1)
+            .with_for_update()
+        ).first()
+        if not caf:
+            return None
+
+        desde = max(caf.ultimo_folio_usado + 1, caf.folio_desde)
+        hasta = min(desde + size - 1, caf.folio_hasta)
+        updated = conn.execute(
+            update(CAF)
+            .where(CAF.id == caf.id, CAF.ultimo_folio_usado == caf.ultimo_folio_usado)
+            .values(ultimo_folio_usado=hasta)
+        ).rowcount
+        if not updated:
+            continue
+
+        reservation_id = conn.execute(
+            insert(FolioReservation)
+            .values(
+                caf_id=caf.id,
+                tipo_documento=tipo_dte,
+                folio_desde=desde,
+                folio_hasta=hasta,
+                next_folio=desde,
+                worker_id=worker_id,
+                status="ACTIVE",
+                reserved_at=now,
+            )
+            .returning(FolioReservation.id)
+        ).scalar_one()
+        return FolioBlock(reservation_id, tipo_dte, desde, hasta, worker_id)
+    return None
+
+
+def release_block(conn: Connection, block: FolioBlock) -> bool:
+    """Registra el avance de un bloque y lo deja disponible para otro worker.
+
+    Los folios devueltos que quedaron por debajo de `next_folio` se registran
+    como bloques liberados de un folio para no dejar huecos.
+
+    Sólo escribe si la reserva sigue ACTIVE a nombre del worker del bloque:
+    si `reclaim_stale_reservations` la recuperó (y quizá otro worker ya la
+    tomó), el bloque se da por perdido y no se toca la fila.
+
+    Returns:
+        bool: False si el bloque ya no pertenecía a este worker.
+    """
+    now = datetime.now(timezone.utc)
+    status = "RELEASED" if block.next_folio <= block.folio_hasta else "EXHAUSTED"
+    updated = conn.execute(
+        update(FolioReservation)
+        .where(
+            FolioReservation.id == block.reservation_id,
+            FolioReservation.status == "ACTIVE",
+            FolioReservation.worker_id == block.worker_id,
+        )
+        .values(next_folio=block.next_folio, status=status, released_at=now)
+    ).rowcount
+    if not updated:
+        block.returned.clear()
+        return False
+    if block.returned:
+        caf_id = conn.execute(
+            select(FolioReservation.caf_id).where(FolioReservation.id == block.reservation_id)
+        ).scalar_one()
+        conn.execute(insert(FolioReservation), [
+            {
+                "caf_id": caf_id,
+                "tipo_documento": block.tipo_dte,
+                "folio_desde": folio,
+                "folio_hasta": folio,
+                "next_folio": folio,
+                "worker_id": None,
+                "status": "RELEASED",
+                "reserved_at": now,
+                "released_at": now,
+            }
+            for folio in sorted(block.returned)
+        ])
+        block.returned.clear()
+    return True
+
+
+def reclaim_stale_reservations(db: Session, older_than: timedelta = timedelta(hours=1)) -> int:
+    """Libera bloques ACTIVE de workers que terminaron sin liberarlos.
+
+    Calcula el avance real de cada bloque a partir de las ventas emitidas en
+    su rango. Solo debe usarse con un umbral mayor a `TORN_FOLIO_BLOCK_MAX_AGE`,
+    ya que los workers vivos renuevan sus bloques antes de ese plazo.
+
+    Returns:
+        int: Cantidad de bloques recuperados.
+    """
+    cutoff = datetime.now(timezone.utc) - older_than
+    stale = db.query(FolioReservation).filter(
+        FolioReservation.status == "ACTIVE",
+        FolioReservation.reserved_at < cutoff,
+    ).with_for_update(skip_locked=True).all()
+
+    for reservation in stale:
+        last_used = db.query(func.max(Sale.folio)).filter(
+            Sale.tipo_dte == reservation.tipo_documento,
+            Sale.folio.between(reservation.folio_desde, reservation.folio_hasta),
+        ).scalar()
+        reservation.next_folio = (last_used + 1) if last_used else reservation.folio_desde
+        reservation.status = "RELEASED" if reservation.unused else "EXHAUSTED"
+        reservation.released_at = datetime.now(timezone.utc)
+        reservation.worker_id = None
+
+    db.commit()
+    return len(stale)
+
+
+class FolioAllocator:
+    """Punto de entrada para asignar folios desde los routers.
+
+    En modo por bloques mantiene un `FolioBlock` por (esquema, tipo de DTE)
+    y por worker. El esquema se toma de `Session.info["schema_name"]`, que
+    completa `get_tenant_db`; sin esquema conocido se usa el modo directo.
+    """
+
+    def __init__(
+        self,
+        block_size: int = FOLIO_BLOCK_SIZE,
+        engine_resolver: Optional[Callable[[str], Engine]] = None,
+        max_block_age: float = FOLIO_BLOCK_MAX_AGE,
+        worker_id: str = WORKER_ID,
+    ):
+        self.block_size = block_size
+        self.max_block_age = max_block_age
+        self.worker_id = worker_id
+        self._engine_resolver = engine_resolver
+        self._blocks: dict[tuple[str, int], FolioBlock] = {}
+        self._locks: dict[tuple[str, int], threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _engine(self, schema_name: str) -> Engine:
+        if self._engine_resolver is None:
+            from app.database import tenant_pools
+            self._engine_resolver = tenant_pools.get_engine
+        return self._engine_resolver(schema_name)
+
+    def _lock_for(self, key: tuple[str, int]) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _schema(self, db: Session) -> Optional[str]:
+        if self.block_size <= 0:
+            return None
+        return db.info.get("schema_name")
+
+    def next_folio(self, db: Session, tipo_dte: int) -> Optional[int]:
+        """Retorna el siguiente folio para el tipo de DTE, o None si no hay CAF."""
+        schema_name = self._schema(db)
+        if schema_name is None:
+            return allocate_folio(db, tipo_dte)
+
+        key = (schema_name, tipo_dte)
+        with self._lock_for(key):
+            block = self._blocks.get(key)
+            if block is not None and time.monotonic() - block.reserved_at > self.max_block_age:
+                self._release(schema_name, block)
+                block = None
+
+            folio = block.take() if block is not None else None
+            while folio is None:
+                if block is not None:
+                    self._release(schema_name, block)
+                with self._engine(schema_name).begin() as conn:
+                    block = reserve_block(conn, tipo_dte, self.block_size, self.worker_id)
+                if block is None:
+                    self._blocks.pop(key, None)
+                    return None
+                folio = block.take()
+
+            self._blocks[key] = block
+            return folio
+
+    def give_back(self, db: Session, tipo_dte: int, folio: Optional[int]) -> None:
+        """Devuelve un folio cuya venta no llegó a confirmarse.
+
+        En modo directo no hace nada: el rollback de la transacción ya revierte
+        el incremento del CAF.
+        """
+        schema_name = self._schema(db)
+        if schema_name is None or folio is None:
+            return
+        key = (schema_name, tipo_dte)
+        with self._lock_for(key):
+            block = self._blocks.get(key)
+            if block is not None:
+                block.give_back(folio)
+
+    def _release(self, schema_name: str, block: FolioBlock) -> None:
+        with self._engine(schema_name).begin() as conn:
+            if not release_block(conn, block):
+                logger.warning(
+                    "Bloque de folios %s (%s/%s) recuperado por otro proceso; se descarta",
+                    block.reservation_id, schema_name, block.tipo_dte,
+                )
+
+    def release_all(self) -> None:
+        """Libera todos los bloques en memoria (apagado ordenado del worker)."""
+        for (schema_name, tipo_dte), block in list(self._blocks.items()):
+            with self._lock_for((schema_name, tipo_dte)):
+                try:
+                    self._release(schema_name, block)
+                except Exception:
+                    logger.exception("Error liberando folios %s/%s", schema_name, tipo_dte)
+                self._blocks.pop((schema_name, tipo_dte), None)
+
+    def stats(self) -> dict:
+        """Bloques en memoria de este worker, por esquema y tipo de DTE."""
+        return {
+            f"{schema}:{tipo}": {
+                "reservation_id": block.reservation_id,
+                "next_folio": block.next_folio,
+                "folio_hasta": block.folio_hasta,
+                "remaining": block.remaining,
+            }
+            for (schema, tipo), block in self._blocks.items()
+        }
+
+
+folio_allocator = FolioAllocator()
@@ -0,0 +1,217 @@
+"""Servicio de Kardex (historial de movimientos de stock).
+
+- `kardex_page`: historial de un producto paginado por keyset (id
+  descendente), con el saldo acumulado de cada movimiento calculado con
+  funciones de ventana. El saldo se ancla al checkpoint más cercano bajo la
+  página (`StockBalanceCheckpoint`) o, si no hay, al `stock_actual` vigente;
+  así una página profunda sólo recorre los movimientos desde su checkpoint.
+- `reconcile`: job de conciliación que completa `balance_after` nulos,
+  reescribe los checkpoints cada `CHECKPOINT_EVERY` movimientos y reporta
+  los productos cuyo saldo de kardex no cuadra con `Product.stock_actual`.
+"""
+
+import os
+from datetime import datetime
+from decimal import Decimal
+from itertools import groupby
+from typing import Iterable, Optional
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.inventory import StockBalanceCheckpoint, StockMovement
+from app.models.product import Product
+
+ZERO = Decimal("0")
+CHECKPOINT_EVERY = int(os.getenv("TORN_KARDEX_CHECKPOINT_EVERY", "500"))
+RECONCILE_BATCH = 200
+
+# Cantidad con signo: ENTRADA suma, SALIDA resta
+SIGNED_QTY = case(
+    (StockMovement.tipo == "ENTRADA", StockMovement.cantidad),
+    else_=-StockMovement.cantidad,
+)
+
+
+def _running_balances(db: Session, product_id: int, lo: int, hi: int) -> dict:
+    """Saldo tras cada movimiento con id en [lo, hi], calculado en SQL.
+
+    Returns:
+        dict: {movement_id: saldo}.
+    """
+    checkpoint = db.query(StockBalanceCheckpoint.movement_id, StockBalanceCheckpoint.balance)\
+        .filter(StockBalanceCheckpoint.product_id == product_id, StockBalanceCheckpoint.movement_id < lo)\
+        .order_by(StockBalanceCheckpoint.movement_id.desc()).first()
+
+    if checkpoint is not None:
+        # Saldo del checkpoint + suma acumulada hacia adelante
+        running = (checkpoint.balance + func.sum(SIGNED_QTY).over(order_by=StockMovement.id)).label("balance")
+        window = select(StockMovement.id, running).where(
+            StockMovement.product_id == product_id,
+            StockMovement.id > checkpoint.movement_id,
+            StockMovement.id <= hi,
+        ).subquery()
+    else:
+        # Stock vigente - movimientos posteriores (suma acumulada hacia atrás)
+        stock = select(func.coalesce(Product.stock_actual, 0)).where(Product.id == product_id).scalar_subquery()
+        running = (stock - func.sum(SIGNED_QTY).over(order_by=StockMovement.id.desc()) + SIGNED_QTY).label("balance")
+        window = select(StockMovement.id, running).where(
+            StockMovement.product_id == product_id,
+            StockMovement.id >= lo,
+        ).subquery()
+
+    rows = db.execute(select(window.c.id, window.c.balance).where(window.c.id.between(lo, hi))).all()
+    return {r.id: Decimal(r.balance) for r in rows}
+
+
+def kardex_page(
+    db: Session,
+    product_id: int,
+    *,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    motivo: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[int] = None,
+) -> tuple:
+    """Página del kardex de un producto, del movimiento más reciente al más antiguo.
+
+    Args:
+        db: Sesión del esquema del inquilino.
+        product_id: Producto.
+        date_from / date_to: Rango de fechas (inclusive).
+        motivo: VENTA, COMPRA, AJUSTE, DEVOLUCION...
+        limit: Tamaño de página.
+        cursor: Último id de la página anterior.
+
+    Returns:
+        tuple: (lista de dicts, siguiente cursor o None).
+    """
+    query = db.query(StockMovement).filter(StockMovement.product_id == product_id)
+    if date_from is not None:
+        query = query.filter(StockMovement.fecha >= date_from)
+    if date_to is not None:
+        query = query.filter(StockMovement.fecha <= date_to)
+    if motivo:
+        query = query.filter(StockMovement.motivo == motivo)
+    if cursor is not None:
+        query = query.filter(StockMovement.id < cursor)
+    rows = query.order_by(StockMovement.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+    if not rows:
+        return [], None
+
+    balances = _running_balances(db, product_id, rows[-1].id, rows[0].id)
+    entries = [
+        {
+            "id": m.id,
+            "fecha": m.fecha,
+            "tipo": m.tipo,
+            "motivo": m.motivo,
+            "cantidad": m.cantidad,
+            "balance": balances.get(m.id),
+            "balance_after": m.balance_after,
+            "description": m.description,
+            "sale_id": m.sale_id,
+            "user_id": m.user_id,
+        }
+        for m in rows
+    ]
+    return entries, next_cursor
+
+
+def _chunks(items: list, size: int) -> Iterable[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _reconcile_product(stock: Decimal, movements: list, every: int):
+    """Recorre los movimientos (id, cantidad con signo, balance_after) de un producto.
+
+    Los `balance_after` registrados se respetan y re-anclan la cadena; los
+    nulos se completan desde el último saldo conocido. Si el producto no tiene
+    ninguno, la cadena se ancla al stock vigente.
+
+    Returns:
+        tuple: (saldo de apertura, backfill [(id, saldo)], checkpoints [(id, saldo)], saldo final)
+    """
+    first_known = next((i for i, m in enumerate(movements) if m[2] is not None), None)
+    if first_known is None:
+        opening = stock - sum((m[1] for m in movements), ZERO)
+    else:
+        opening = movements[first_known][2] - sum((m[1] for m in movements[:first_known + 1]), ZERO)
+
+    running = opening
+    backfill, checkpoints = [], [(0, opening)]
+    for i, (movement_id, signed, stored) in enumerate(movements, start=1):
+        running += signed
+        if stored is None:
+            backfill.append((movement_id, running))
+        else:
+            running = Decimal(stored)
+        if i % every == 0:
+            checkpoints.append((movement_id, running))
+    return opening, backfill, checkpoints, running
+
+
+def reconcile(db: Session, product_ids: Optional[list] = None, checkpoint_every: int = CHECKPOINT_EVERY) -> dict:
+    """Concilia el kardex: backfill de `balance_after`, checkpoints y descuadres.
+
+    Procesa los productos por lotes y hace commit por lote.
+
+    Args:
+        db: Sesión del esquema del inquilino.
+        product_ids: Limitar a estos productos (por defecto, todos con movimientos).
+        checkpoint_every: Movimientos entre checkpoints.
+
+    Returns:
+        dict: products, backfilled, checkpoints y drift (lista de productos
+        cuyo saldo final difiere de `stock_actual`).
+    """
+    ids_query = db.query(StockMovement.product_id).distinct()
+    if product_ids is not None:
+        ids_query = ids_query.filter(StockMovement.product_id.in_(product_ids))
+    all_ids = sorted(r[0] for r in ids_query.all())
+
+    report = {"products": len(all_ids), "backfilled": 0, "checkpoints": 0, "drift": []}
+    for chunk in _chunks(all_ids, RECONCILE_BATCH):
+        stock = dict(
+            db.query(Product.id, func.coalesce(Product.stock_actual, 0)).filter(Product.id.in_(chunk)).all()
+        )
+        result = db.execute(
+            select(StockMovement.product_id, StockMovement.id, SIGNED_QTY, StockMovement.balance_after)
+            .where(StockMovement.product_id.in_(chunk))
+            .order_by(StockMovement.product_id, StockMovement.id)
+            .execution_options(yield_per=5000)
+        )
+        backfill_rows, checkpoint_rows = [], []
+        for product_id, group in groupby(result, key=lambda r: r[0]):
+            movements = [(r[1], Decimal(r[2]), r[3]) for r in group]
+            current = Decimal(stock.get(product_id, ZERO))
+            _, backfill, checkpoints, final = _reconcile_product(current, movements, checkpoint_every)
+            backfill_rows.extend({"id": mid, "balance_after": bal} for mid, bal in backfill)
+            checkpoint_rows.extend(
+                {"product_id": product_id, "movement_id": mid, "balance": bal} for mid, bal in checkpoints
+            )
+            if final != current:
+                report["drift"].append({
+                    "product_id": product_id,
+                    "stock_actual": current,
+                    "kardex_balance": final,
+                    "difference": current - final,
+                })
+
+        if backfill_rows:
+            db.execute(update(StockMovement), backfill_rows)
+        db.execute(delete(StockBalanceCheckpoint).where(StockBalanceCheckpoint.product_id.in_(chunk)))
+        if checkpoint_rows:
+            db.execute(insert(StockBalanceCheckpoint), checkpoint_rows)
+        db.commit()
+        report["backfilled"] += len(backfill_rows)
+        report["checkpoints"] += len(checkpoint_rows)
+
+    return report
@@ -0,0 +1,154 @@
+"""Índice en memoria de Listas de Precios por inquilino.
+
+Mantiene, por esquema, los precios fijos de cada lista
+({price_list_id: {product_id: fixed_price}}) y la lista asignada a cada
+cliente, para resolver precios del POS sin consultar la tabla pivote.
+
+Cada proceso tiene su propia copia, en una `TTLCache` acotada a
+`TORN_PRICE_INDEX_MAX_TENANTS` esquemas (LRU). Cada
+`TORN_PRICE_INDEX_CHECK_INTERVAL` segundos se compara un token barato de
+`price_lists` (cantidad y último `updated_at`); las asignaciones de
+productos y clientes actualizan ese `updated_at`, así que los cambios
+hechos por otro worker fuerzan una recarga. Entre verificaciones la
+entrada se usa sin consultar la base. Además, cada entrada expira tras
+`TORN_PRICE_INDEX_TTL` segundos.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.customer import Customer
+from app.models.price_list import PriceList, PriceListProduct
+from app.utils.cache import TTLCache
+
+PRICE_INDEX_TTL = float(os.getenv("TORN_PRICE_INDEX_TTL", "300"))
+PRICE_INDEX_CHECK_INTERVAL = float(os.getenv("TORN_PRICE_INDEX_CHECK_INTERVAL", "5"))
+PRICE_INDEX_MAX_TENANTS = int(os.getenv("TORN_PRICE_INDEX_MAX_TENANTS", "200"))
+
+
+@dataclass
+class TenantPrices:
+    """Precios fijos y asignaciones de clientes de un inquilino."""
+    token: tuple
+    lists: dict = field(default_factory=dict)      # {price_list_id: {product_id: Decimal}}
+    customers: dict = field(default_factory=dict)  # {customer_id: price_list_id}
+    checked_at: float = field(default_factory=time.monotonic)
+
+    def price_for(self, customer_id: Optional[int], product_id: int) -> tuple[Optional[int], Optional[Decimal]]:
+        """Retorna (lista del cliente, precio fijo o None)."""
+        price_list_id = self.customers.get(customer_id) if customer_id is not None else None
+        if price_list_id is None:
+            return None, None
+        return price_list_id, self.lists.get(price_list_id, {}).get(product_id)
+
+
+class PriceListIndex:
+    """Caché de `TenantPrices` por esquema, thread-safe."""
+
+    def __init__(
+        self,
+        ttl: float = PRICE_INDEX_TTL,
+        check_interval: float = PRICE_INDEX_CHECK_INTERVAL,
+        max_tenants: int = PRICE_INDEX_MAX_TENANTS,
+    ):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._tenants = TTLCache(ttl=ttl, max_entries=max_tenants)
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.checks = 0
+
+    @staticmethod
+    def _schema(db: Session) -> str:
+        return db.info.get("schema_name") or "public"
+
+    def _token(self, db: Session) -> tuple:
+        self.checks += 1
+        count, last = db.query(func.count(PriceList.id), func.max(PriceList.updated_at)).one()
+        return (count, str(last))
+
+    def _load(self, db: Session, token: tuple) -> TenantPrices:
+        lists = defaultdict(dict)
+        for pl_id, product_id, price in db.query(
+            PriceListProduct.price_list_id, PriceListProduct.product_id, PriceListProduct.fixed_price,
+        ):
+            lists[pl_id][product_id] = price
+        customers = dict(
+            db.query(Customer.id, Customer.price_list_id).filter(Customer.price_list_id.isnot(None)).all()
+        )
+        self.loads += 1
+        return TenantPrices(token=token, lists=dict(lists), customers=customers)
+
+    def get(self, db: Session) -> TenantPrices:
+        """Retorna el índice vigente del inquilino de `db`, recargándolo si cambió."""
+        schema = self._schema(db)
+        entry = self._tenants.get(schema)
+        if entry is not None and time.monotonic() - entry.checked_at < self.check_interval:
+            return entry
+        token = self._token(db)
+        if entry is not None and entry.token == token:
+            entry.checked_at = time.monotonic()
+            return entry
+        entry = self._load(db, token)
+        self._tenants.set(schema, entry)
+        return entry
+
+    def patch_list(self, db: Session, price_list_id: int, prices: dict) -> None:
+        """Reemplaza los precios de una lista tras `assign_products` (ya confirmado)."""
+        with self._lock:
+            entry = self._tenants.get(self._schema(db))
+            if entry is None:
+                return
+            entry.lists[price_list_id] = dict(prices)
+        self._refresh_token(db)
+
+    def patch_customers(self, db: Session, price_list_id: int, customer_ids: Iterable[int]) -> None:
+        """Aplica la asignación de clientes de `assign_customers` (ya confirmada)."""
+        customer_ids = set(customer_ids)
+        with self._lock:
+            entry = self._tenants.get(self._schema(db))
+            if entry is None:
+                return
+            entry.customers = {
+                cid: pl_id for cid, pl_id in entry.customers.items()
+                if pl_id != price_list_id and cid not in customer_ids
+            }
+            entry.customers.update({cid: price_list_id for cid in customer_ids})
+        self._refresh_token(db)
+
+    def _refresh_token(self, db: Session) -> None:
+        token = self._token(db)
+        with self._lock:
+            entry = self._tenants.get(self._schema(db))
+            if entry is not None:
+                entry.token, entry.checked_at = token, time.monotonic()
+
+    def invalidate(self, schema: Optional[str] = None) -> None:
+        """Descarta el índice de un esquema (o de todos)."""
+        if schema is None:
+            self._tenants.clear()
+        else:
+            self._tenants.pop(schema)
+
+    def stats(self) -> dict:
+        cache = self._tenants.stats()
+        return {
+            "tenants": cache["entries"],
+            "max_tenants": cache["max_entries"],
+            "evictions": cache["evictions"],
+            "loads": self.loads,
+            "token_checks": self.checks,
+            "ttl_seconds": self.ttl,
+            "check_interval_seconds": self.check_interval,
+        }
+
+
+price_index = PriceListIndex()
@@ -0,0 +1,114 @@
+"""Servicio de Asignación Masiva de Precios a Listas.
+
+Reemplaza los precios fijos de una lista aplicando sólo las diferencias
+contra las filas actuales de la pivote `price_list_product`:
+
+- inserciones y cambios de precio con `INSERT ... ON CONFLICT DO UPDATE`
+  multi-fila, por lotes;
+- eliminaciones con un `DELETE ... WHERE product_id IN (...)` por lote;
+- las filas sin cambios no se tocan (sin tuplas muertas ni locks).
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.models.price_list import PriceListProduct
+from app.utils.db import dialect_insert
+
+CENT = Decimal("0.01")
+CHUNK_SIZE = 1000
+
+
+@dataclass
+class PriceListDiff:
+    """Diferencias entre los precios actuales y los deseados de una lista."""
+    to_insert: dict   # {product_id: precio}
+    to_update: dict   # {product_id: precio}
+    to_delete: list   # [product_id]
+    unchanged: int
+
+    def summary(self) -> dict:
+        return {
+            "inserted": len(self.to_insert),
+            "updated": len(self.to_update),
+            "deleted": len(self.to_delete),
+            "unchanged": self.unchanged,
+        }
+
+
+def normalize_price(value) -> Decimal:
+    """Redondea al centavo, igual que la columna Numeric(15, 2)."""
+    return Decimal(value).quantize(CENT)
+
+
+def diff_prices(current: dict, desired: dict) -> PriceListDiff:
+    """Calcula inserciones, actualizaciones y eliminaciones.
+
+    Args:
+        current: {product_id: fixed_price} vigente en la base.
+        desired: {product_id: fixed_price} solicitado.
+    """
+    to_insert, to_update, unchanged = {}, {}, 0
+    for product_id, price in desired.items():
+        price = normalize_price(price)
+        if product_id not in current:
+            to_insert[product_id] = price
+        elif normalize_price(current[product_id]) != price:
+            to_update[product_id] = price
+        else:
+            unchanged += 1
+    to_delete = sorted(set(current) - set(desired))
+    return PriceListDiff(to_insert, to_update, to_delete, unchanged)
+
+
+def _chunks(items: list, size: int) -> Iterable[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def apply_prices(db: Session, price_list_id: int, desired: dict, chunk_size: int = CHUNK_SIZE) -> PriceListDiff:
+    """Deja la lista con exactamente los precios de `desired` (no hace commit).
+
+    Args:
+        db: Sesión del esquema del inquilino.
+        price_list_id: Lista a sincronizar.
+        desired: {product_id: fixed_price}; los productos deben existir.
+        chunk_size: Filas por sentencia.
+
+    Returns:
+        PriceListDiff: Cambios aplicados.
+    """
+    current = dict(
+        db.query(PriceListProduct.product_id, PriceListProduct.fixed_price)
+        .filter(PriceListProduct.price_list_id == price_list_id)
+        .all()
+    )
+    diff = diff_prices(current, desired)
+
+    upserts = sorted({**diff.to_insert, **diff.to_update}.items())
+    if upserts:
+        insert = dialect_insert(db)
+        for chunk in _chunks(upserts, chunk_size):
+            stmt = insert(PriceListProduct).values([
+                {"price_list_id": price_list_id, "product_id": product_id, "fixed_price": price}
+                for product_id, price in chunk
+            ])
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["price_list_id", "product_id"],
+                set_={"fixed_price": stmt.excluded.fixed_price},
+            ))
+
+    for chunk in _chunks(diff.to_delete, chunk_size):
+        db.execute(
+            delete(PriceListProduct)
+            .where(PriceListProduct.price_list_id == price_list_id, PriceListProduct.product_id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+
+    # Las filas cambiaron por SQL directo: descartar copias ORM en la sesión
+    db.expire_all()
+    return diff
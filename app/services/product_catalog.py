@@ -0,0 +1,125 @@
+"""Servicio de Consulta del Catálogo de Productos.
+
+Arma las consultas de listado de productos e inventario con filtros,
+paginación por keyset (cursor = último `id` entregado, orden descendente)
+y carga anticipada por lotes de las relaciones que usa la serialización
+(`parent` para `full_name`, `tax` para `precio_bruto`, `brand` y
+`variants`), de modo que cada página cuesta un número fijo de consultas
+sin importar el tamaño del catálogo.
+"""
+
+from typing import Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Query, Session, load_only, selectinload
+
+from app.models.product import Product
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Valores aceptados para el filtro `kind`
+KIND_PARENTS = "parents"
+KIND_VARIANTS = "variants"
+
+
+def full_options() -> list:
+    """Opciones de carga para serializar `ProductOut` (con variantes anidadas)."""
+    return [
+        selectinload(Product.parent).load_only(Product.id, Product.nombre),
+        selectinload(Product.tax),
+        selectinload(Product.brand),
+        selectinload(Product.variants).options(
+            selectinload(Product.tax),
+            selectinload(Product.brand),
+            selectinload(Product.variants),
+        ),
+    ]
+
+
+def pos_options() -> list:
+    """Opciones de carga para la proyección liviana del POS."""
+    return [
+        load_only(
+            Product.id, Product.codigo_interno, Product.codigo_barras, Product.nombre,
+            Product.precio_neto, Product.stock_actual, Product.controla_stock,
+            Product.is_active, Product.parent_id, Product.tax_id, Product.unidad_medida,
+        ),
+        selectinload(Product.parent).load_only(Product.id, Product.nombre),
+        selectinload(Product.tax),
+    ]
+
+
+def catalog_query(
+    db: Session,
+    *,
+    brand_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    low_stock: bool = False,
+    parent_id: Optional[int] = None,
+    kind: Optional[str] = None,
+    q: Optional[str] = None,
+) -> Query:
+    """Consulta base del catálogo (productos no eliminados) con filtros.
+
+    Args:
+        db: Sesión del esquema del inquilino.
+        brand_id: Sólo productos de la marca.
+        is_active: Filtra por estado activo/inactivo.
+        low_stock: Sólo productos con control de stock bajo su mínimo.
+        parent_id: Sólo variantes del producto padre indicado.
+        kind: 'parents' (sin padre) o 'variants' (con padre).
+        q: Texto a buscar en nombre, SKU o código de barras.
+
+    Returns:
+        Query: Consulta sin orden ni límite.
+    """
+    query = db.query(Product).filter(Product.is_deleted == False)  # noqa: E712
+
+    if brand_id is not None:
+        query = query.filter(Product.brand_id == brand_id)
+    if is_active is not None:
+        query = query.filter(Product.is_active == is_active)
+    if low_stock:
+        query = query.filter(
+            Product.controla_stock == True,  # noqa: E712
+            Product.stock_actual <= Product.stock_minimo,
+        )
+    if parent_id is not None:
+        query = query.filter(Product.parent_id == parent_id)
+    if kind == KIND_PARENTS:
+        query = query.filter(Product.parent_id.is_(None))
+    elif kind == KIND_VARIANTS:
+        query = query.filter(Product.parent_id.isnot(None))
+    if q:
+        pattern = f"%{q}%"
+        query = query.filter(or_(
+            Product.nombre.ilike(pattern),
+            Product.codigo_interno.ilike(pattern),
+            Product.codigo_barras.ilike(pattern),
+        ))
+    return query
+
+
+def fetch_page(query: Query, limit: int, cursor: Optional[int] = None) -> tuple[list, Optional[int]]:
+    """Obtiene una página por keyset sobre `Product.id` descendente.
+
+    Lee `limit + 1` filas para saber si hay una página siguiente sin
+    ejecutar un COUNT.
+
+    Args:
+        query: Consulta del catálogo (con sus opciones de carga).
+        limit: Tamaño de página (se acota a `MAX_PAGE_SIZE`).
+        cursor: `id` del último producto de la página anterior.
+
+    Returns:
+        tuple: (productos, cursor de la página siguiente o None).
+    """
+    limit = min(max(1, limit), MAX_PAGE_SIZE)
+    if cursor is not None:
+        query = query.filter(Product.id < cursor)
+    rows = query.order_by(Product.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
@@ -0,0 +1,467 @@
+"""Servicio de Importación y Exportación Masiva de Productos.
+
+- `ProductImporter`: recibe filas (CSV o NDJSON ya parseadas) y las
+  procesa por lotes: valida, resuelve padres por SKU, asigna SKUs y
+  EAN-13 en bloque e inserta cientos/miles de productos por transacción,
+  reportando los errores por línea.
+- `iter_csv_records` / `iter_ndjson_records`: parsean el cuerpo de la
+  petición a medida que llegan los bloques.
+- `export_chunks`: genera el catálogo en CSV o NDJSON en bloques, con las
+  mismas columnas que acepta la importación.
+"""
+
+import codecs
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, aliased
+
+from app.models.brand import Brand
+from app.models.product import Product
+from app.models.tax import Tax
+from app.schemas import ProductImportRow
+
+IMPORT_FIELDS = [
+    "codigo_interno", "nombre", "descripcion", "precio_neto", "costo_unitario",
+    "unidad_medida", "codigo_barras", "controla_stock", "stock_actual", "stock_minimo",
+    "is_active", "brand_id", "tax_id", "parent_codigo",
+]
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+# ── Generación de códigos ─────────────────────────────────────────────
+
+
+def generate_sku(db: Session, prefix: str = "PROD") -> str:
+    """Genera un SKU único auto-incremental.
+
+    Formato: PROD-00001, PROD-00002, etc.
+    """
+    # Find highest existing numeric suffix for this prefix
+    like_pattern = f"{prefix}-%"
+    last = (
+        db.query(Product.codigo_interno)
+        .filter(Product.codigo_interno.like(like_pattern))
+        .order_by(Product.id.desc())
+        .first()
+    )
+
+    if last and last[0]:
+        try:
+            num = int(last[0].split("-")[-1]) + 1
+        except (ValueError, IndexError):
+            num = db.query(func.count(Product.id)).scalar() + 1
+    else:
+        num = 1
+
+    return f"{prefix}-{num:05d}"
+
+
+def generate_ean13(product_id: int) -> str:
+    """Genera un código EAN-13 para uso interno.
+
+    Usa el prefijo GS1 '200' (reservado para uso interno/in-store).
+    Formato: 200 + 9 dígitos del ID (con padding) + 1 dígito verificador.
+    """
+    body = f"200{product_id:09d}"  # 12 dígitos
+    # Calcular dígito verificador EAN-13
+    total = 0
+    for i, digit in enumerate(body):
+        weight = 1 if i % 2 == 0 else 3
+        total += int(digit) * weight
+    check = (10 - (total % 10)) % 10
+    return f"{body}{check}"
+
+
+class SkuBlock:
+    """Asigna SKUs `PREFIX-NNNNN` consecutivos consultando la base una sola vez."""
+
+    def __init__(self, db: Session, prefix: str = "PROD"):
+        self.prefix = prefix
+        self._next = int(generate_sku(db, prefix).rsplit("-", 1)[-1])
+
+    def take(self) -> str:
+        sku = f"{self.prefix}-{self._next:05d}"
+        self._next += 1
+        return sku
+
+
+# ── Parseo en streaming ───────────────────────────────────────────────
+
+
+def _clean(record: dict) -> dict:
+    """Descarta columnas vacías para que apliquen los valores por defecto."""
+    return {
+        k.strip(): v.strip() if isinstance(v, str) else v
+        for k, v in record.items()
+        if k and v is not None and not (isinstance(v, str) and not v.strip())
+    }
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, object]]:
+    """Retorna (línea, dict) por fila; la primera línea es el encabezado.
+
+    Los campos con saltos de línea entre comillas no están soportados.
+    """
+    header = None
+    line_no = 0
+    async for line in _lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        if len(values) > len(header):
+            yield line_no, ValueError("más columnas que el encabezado")
+            continue
+        yield line_no, _clean(dict(zip(header, values)))
+
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, object]]:
+    """Retorna (línea, dict) por cada objeto JSON del cuerpo."""
+    line_no = 0
+    async for line in _lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, ValueError(f"JSON inválido: {e.msg}")
+            continue
+        if not isinstance(record, dict):
+            yield line_no, ValueError("se esperaba un objeto JSON")
+            continue
+        yield line_no, _clean(record)
+
+
+# ── Importación ───────────────────────────────────────────────────────
+
+
+@dataclass
+class _Pending:
+    line: int
+    row: ProductImportRow
+    sku: Optional[str] = None
+    generated_sku: bool = False
+    parent_id: Optional[int] = None
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    failed: int = 0
+    batches: int = 0
+    dry_run: bool = False
+    errors: list = field(default_factory=list)
+
+
+class ProductImporter:
+    """Importa productos por lotes sobre una sesión del inquilino.
+
+    Uso:
+        importer = ProductImporter(db)
+        for line, record in rows:
+            importer.add(line, record)
+            if importer.full:
+                importer.flush()
+        result = importer.finish()
+
+    Cada lote se confirma por separado (salvo `dry_run`, que revierte todo
+    al final). Un error de base de datos descarta sólo el lote afectado.
+    """
+
+    def __init__(self, db: Session, batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False):
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.result = ImportResult(dry_run=dry_run)
+        self._batch: list = []
+        self._sku_block: Optional[SkuBlock] = None
+        self._seen_skus: set = set()
+        self._seen_barcodes: set = set()
+        self._sku_ids: dict = {}            # SKU -> id (padres conocidos)
+        self._variant_counts: dict = {}     # parent_id -> variantes existentes
+        self._auto_barcode_parents: set = set()
+        self._parents_with_variants: set = set()
+        self._batch_parents: list = []
+        self._brand_ids = {r[0] for r in db.query(Brand.id).all()}
+        self._tax_ids = {r[0] for r in db.query(Tax.id).all()}
+
+    # ── API ──
+
+    def add(self, line: int, record) -> None:
+        """Agrega una fila (dict) o un error de parseo (Exception) al lote."""
+        self._batch.append((line, record))
+
+    @property
+    def full(self) -> bool:
+        return len(self._batch) >= self.batch_size
+
+    def flush(self) -> None:
+        """Procesa el lote pendiente."""
+        batch, self._batch = self._batch, []
+        if batch:
+            self._process(batch)
+
+    def finish(self) -> ImportResult:
+        """Procesa lo pendiente y cierra la importación."""
+        self.flush()
+        # Padres que recibieron variantes no se escanean: sin código autogenerado
+        orphan_codes = self._auto_barcode_parents & self._parents_with_variants
+        if orphan_codes:
+            self.db.execute(update(Product).where(Product.id.in_(orphan_codes)).values(codigo_barras=None))
+        if self.result.dry_run:
+            self.db.rollback()
+        else:
+            self.db.commit()
+        self.result.errors.sort(key=lambda e: e["line"])
+        return self.result
+
+    # ── Internos ──
+
+    def _error(self, line: int, sku: Optional[str], message: str) -> None:
+        self.result.failed += 1
+        if len(self.result.errors) < MAX_REPORTED_ERRORS:
+            self.result.errors.append({"line": line, "codigo_interno": sku, "error": message})
+
+    def _validate(self, batch: list) -> list:
+        valid = []
+        for line, record in batch:
+            if isinstance(record, Exception):
+                self._error(line, None, str(record))
+                continue
+            try:
+                row = ProductImportRow.model_validate(record)
+            except ValidationError as e:
+                first = e.errors()[0]
+                loc = ".".join(str(p) for p in first["loc"])
+                self._error(line, record.get("codigo_interno"), f"{loc}: {first['msg']}")
+                continue
+            if row.brand_id is not None and row.brand_id not in self._brand_ids:
+                self._error(line, row.codigo_interno, f"Marca {row.brand_id} no existe")
+                continue
+            if row.tax_id is not None and row.tax_id not in self._tax_ids:
+                self._error(line, row.codigo_interno, f"Impuesto {row.tax_id} no existe")
+                continue
+            valid.append(_Pending(line=line, row=row, sku=row.codigo_interno))
+        return valid
+
+    def _existing(self, column, values: Iterable) -> set:
+        values = list(values)
+        if not values:
+            return set()
+        return {r[0] for r in self.db.query(column).filter(column.in_(values)).all()}
+
+    def _resolve_parents(self, pending: list) -> list:
+        """Asigna `parent_id` a las variantes (padres de esta importación o de la base)."""
+        unknown = {p.row.parent_codigo for p in pending
+                   if p.row.parent_codigo and p.row.parent_codigo not in self._sku_ids}
+        if unknown:
+            Variant = aliased(Product)
+            for pid, sku, count in (
+                self.db.query(Product.id, Product.codigo_interno, func.count(Variant.id))
+                .outerjoin(Variant, Variant.parent_id == Product.id)
+                .filter(Product.codigo_interno.in_(unknown), Product.parent_id.is_(None))
+                .group_by(Product.id, Product.codigo_interno)
+                .all()
+            ):
+                self._sku_ids[sku] = pid
+                self._variant_counts[pid] = count
+
+        resolved = []
+        for p in pending:
+            if p.row.parent_codigo:
+                p.parent_id = self._sku_ids.get(p.row.parent_codigo)
+                if p.parent_id is None:
+                    self._error(p.line, p.sku, f"Producto padre {p.row.parent_codigo} no encontrado")
+                    continue
+            resolved.append(p)
+        return resolved
+
+    def _assign_skus(self, pending: list) -> list:
+        """Valida SKUs explícitos y genera los faltantes en bloque."""
+        explicit = {p.sku for p in pending if p.sku}
+        taken = self._existing(Product.codigo_interno, explicit - self._seen_skus)
+
+        accepted = []
+        for p in pending:
+            if p.sku:
+                if p.sku in taken or p.sku in self._seen_skus:
+                    self._error(p.line, p.sku, f"Ya existe un producto con código {p.sku}")
+                    continue
+            else:
+                p.generated_sku = True
+                p.sku = self._generate_sku(p)
+            self._seen_skus.add(p.sku)
+            accepted.append(p)
+
+        # SKUs generados que chocan con códigos existentes: se reasignan
+        generated = [p for p in accepted if p.generated_sku]
+        while generated:
+            clashes = self._existing(Product.codigo_interno, [p.sku for p in generated])
+            generated = [p for p in generated if p.sku in clashes]
+            for p in generated:
+                p.sku = self._generate_sku(p)
+                self._seen_skus.add(p.sku)
+        return accepted
+
+    def _generate_sku(self, p: _Pending) -> str:
+        """PROD-NNNNN para productos simples/padres, PADRE-VNN para variantes."""
+        while True:
+            if p.parent_id is None:
+                if self._sku_block is None:
+                    self._sku_block = SkuBlock(self.db)
+                sku = self._sku_block.take()
+            else:
+                idx = self._variant_counts.get(p.parent_id, 0) + 1
+                self._variant_counts[p.parent_id] = idx
+                sku = f"{p.row.parent_codigo}-V{idx:02d}"
+            if sku not in self._seen_skus:
+                return sku
+
+    def _check_barcodes(self, pending: list) -> list:
+        codes = {p.row.codigo_barras for p in pending if p.row.codigo_barras}
+        taken = self._existing(Product.codigo_barras, codes - self._seen_barcodes)
+        accepted = []
+        for p in pending:
+            code = p.row.codigo_barras
+            if code:
+                if code in taken or code in self._seen_barcodes:
+                    self._error(p.line, p.sku, f"Código de barras {code} ya existe")
+                    continue
+                self._seen_barcodes.add(code)
+            accepted.append(p)
+        return accepted
+
+    def _insert(self, pending: list) -> None:
+        if not pending:
+            return
+        values = []
+        for p in pending:
+            data = p.row.model_dump(exclude={"parent_codigo"})
+            data.update(codigo_interno=p.sku, parent_id=p.parent_id)
+            values.append(data)
+        rows = self.db.execute(
+            insert(Product).returning(Product.id, sort_by_parameter_order=True), values
+        ).all()
+
+        barcodes = []
+        for p, (product_id,) in zip(pending, rows):
+            if p.parent_id is None:
+                self._sku_ids[p.sku] = product_id
+                self._batch_parents.append(p.sku)
+                self._variant_counts.setdefault(product_id, 0)
+            else:
+                self._parents_with_variants.add(p.parent_id)
+            if not p.row.codigo_barras:
+                barcodes.append({"id": product_id, "codigo_barras": generate_ean13(product_id)})
+                if p.parent_id is None:
+                    self._auto_barcode_parents.add(product_id)
+        if barcodes:
+            self.db.execute(update(Product), barcodes)
+        self.result.created += len(pending)
+
+    def _process(self, batch: list) -> None:
+        self.result.batches += 1
+        pending = self._validate(batch)
+        # Padres primero para que las variantes del mismo lote los encuentren
+        parents = [p for p in pending if not p.row.parent_codigo]
+        variants = [p for p in pending if p.row.parent_codigo]
+        created_before = self.result.created
+        self._batch_parents = []
+        # Filas ya reportadas por las validaciones del lote (no se vuelven a contar)
+        rejected = set()
+        # Savepoint por lote: un error revierte sólo este lote (en `dry_run`
+        # los anteriores siguen en la transacción hasta `finish`)
+        savepoint = self.db.begin_nested()
+        try:
+            for group in (parents, variants):
+                accepted = self._check_barcodes(self._assign_skus(self._resolve_parents(group)))
+                rejected.update(id(p) for p in group)
+                rejected.difference_update(id(p) for p in accepted)
+                self._insert(accepted)
+            savepoint.commit()
+            if not self.result.dry_run:
+                self.db.commit()
+        except SQLAlchemyError as e:
+            if savepoint.is_active:
+                savepoint.rollback()
+            self.result.created = created_before
+            for sku in self._batch_parents:
+                self._auto_barcode_parents.discard(self._sku_ids.pop(sku, None))
+            for p in pending:
+                if id(p) not in rejected:
+                    self._error(p.line, p.sku, f"Error de base de datos en el lote: {e.__class__.__name__}")
+
+
+# ── Exportación ───────────────────────────────────────────────────────
+
+
+def _export_query():
+    Parent = aliased(Product)
+    columns = [getattr(Product, f) for f in IMPORT_FIELDS if f != "parent_codigo"]
+    return (
+        select(*columns, Parent.codigo_interno.label("parent_codigo"))
+        .outerjoin(Parent, Product.parent_id == Parent.id)
+        .where(Product.is_deleted == False)  # noqa: E712
+        # Padres antes que sus variantes para que el archivo se pueda reimportar
+        .order_by(Product.parent_id.isnot(None), Product.id)
+    )
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} no serializable")
+
+
+def export_chunks(conn: Connection, fmt: str = "csv", chunk_size: int = 1000) -> Iterator[str]:
+    """Genera el catálogo (no eliminado) en bloques de `chunk_size` filas.
+
+    Args:
+        conn: Conexión al esquema del inquilino (se lee con cursor de servidor).
+        fmt: 'csv' o 'ndjson'.
+        chunk_size: Filas por bloque emitido.
+    """
+    result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(_export_query())
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(IMPORT_FIELDS)
+        for rows in result.partitions():
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        for rows in result.partitions():
+            yield "".join(
+                json.dumps(dict(zip(IMPORT_FIELDS, row)), default=_json_default, ensure_ascii=False) + "\n"
+                for row in rows
+            )
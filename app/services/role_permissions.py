@@ -0,0 +1,77 @@
+"""Proyección de Permisos por Rol en 'public' (`tenant_role_permissions`).
+
+El login lista las empresas del usuario con los permisos de su rol en cada
+una. Leerlos desde `<schema>.roles` costaba una consulta por membresía; la
+proyección permite resolverlos con un JOIN en la misma consulta que trae
+las membresías (`user_tenants_stmt`).
+
+Se mantiene sincronizada en los puntos donde cambian los roles:
+
+- Aprovisionamiento de un Tenant y `scripts/seed_tenant_roles.py`
+  (`sync_tenant`).
+- `PUT /roles/{id}` (`upsert_role`, en la misma transacción que el rol).
+- `scripts/sync_role_permissions.py` reconstruye todos los Tenants
+  (p. ej. tras editar roles directamente en SQL).
+"""
+
+from typing import Optional
+
+from sqlalchemy import and_, delete, insert, select
+from sqlalchemy.orm import contains_eager, joinedload
+
+from app.models.saas import Tenant, TenantRolePermission, TenantUser
+from app.models.user import Role
+
+_table = TenantRolePermission.__table__
+
+
+def sync_tenant(db, tenant_id: int, schema_name: str) -> int:
+    """Reemplaza la proyección de un Tenant con los roles de su esquema (sin commit).
+
+    Args:
+        db: Sesión o conexión con acceso a 'public' y al esquema del Tenant.
+        tenant_id: ID en `public.tenants`.
+        schema_name: Esquema del Tenant.
+
+    Returns:
+        int: Roles proyectados.
+    """
+    roles = db.execute(
+        select(Role.name, Role.permissions).execution_options(schema_translate_map={None: schema_name})
+    ).all()
+    db.execute(delete(_table).where(_table.c.tenant_id == tenant_id))
+    if roles:
+        db.execute(insert(_table), [
+            {"tenant_id": tenant_id, "role_name": name, "permissions": permissions or {}}
+            for name, permissions in roles
+        ])
+    return len(roles)
+
+
+def upsert_role(db, tenant_id: Optional[int], role_name: str, permissions: Optional[dict]) -> None:
+    """Actualiza la proyección de un rol (sin commit; ignorado si no hay Tenant)."""
+    if tenant_id is None:
+        return
+    db.execute(delete(_table).where(_table.c.tenant_id == tenant_id, _table.c.role_name == role_name))
+    db.execute(insert(_table), [{"tenant_id": tenant_id, "role_name": role_name, "permissions": permissions or {}}])
+
+
+def user_tenants_stmt(user_id: int):
+    """Membresías activas del usuario con su Tenant, plan y permisos del rol.
+
+    Retorna filas (TenantUser, permisos | None) en una sola consulta.
+    """
+    return (
+        select(TenantUser, TenantRolePermission.permissions)
+        .join(TenantUser.tenant)
+        .outerjoin(
+            TenantRolePermission,
+            and_(
+                TenantRolePermission.tenant_id == TenantUser.tenant_id,
+                TenantRolePermission.role_name == TenantUser.role_name,
+            ),
+        )
+        .options(contains_eager(TenantUser.tenant).joinedload(Tenant.plan))
+        .where(TenantUser.user_id == user_id, TenantUser.is_active == True)
+        .order_by(Tenant.name)
+    )
@@ -0,0 +1,294 @@
+"""Servicio de Agregados de Ventas (Rollups).
+
+Mantiene los totales por día, hora, producto y medio de pago definidos en
+`app.models.rollup`:
+
+- `record_sale`: suma una venta o devolución a los rollups dentro de la
+  misma transacción (llamar justo antes del commit para acortar el lock de
+  las filas agregadas). Las filas se reparten en `TORN_ROLLUP_SHARDS`
+  shards por vendedor: cajas distintas no esperan el lock de la misma fila
+  del día; las lecturas suman los shards.
+- `rebuild_rollups`: recalcula un rango de fechas desde las ventas
+  (backfill / reparación).
+- `period_totals`: lectura de totales para un rango, en O(días).
+
+El margen se calcula con el costo del producto al momento de la venta; el
+backfill sólo conoce el costo vigente.
+"""
+
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, delete, func, or_
+from sqlalchemy.orm import Session
+
+from app.models.payment import SalePayment
+from app.models.product import Product
+from app.models.rollup import (
+    SalesDailyRollup,
+    SalesHourlyRollup,
+    SalesPaymentDailyRollup,
+    SalesProductDailyRollup,
+)
+from app.models.sale import Sale, SaleDetail
+from app.utils.dates import CHILE_TZ
+from app.utils.db import dialect_insert
+
+ZERO = Decimal("0")
+ROLLUP_SHARDS = max(1, int(os.getenv("TORN_ROLLUP_SHARDS", "8")))
+
+_TOTAL_FIELDS = ("count", "gross", "net", "iva", "margin")
+
+# Claves primarias de cada rollup (en el orden de las tuplas de `_accumulate`)
+DAILY_KEYS = ("fecha", "tipo_dte", "shard")
+HOURLY_KEYS = ("fecha", "hora", "tipo_dte", "shard")
+PRODUCT_KEYS = ("fecha", "tipo_dte", "product_id", "shard")
+PAYMENT_KEYS = ("fecha", "tipo_dte", "payment_method_id", "shard")
+
+
+def _empty_totals() -> dict:
+    return {"count": 0, "gross": ZERO, "net": ZERO, "iva": ZERO, "margin": ZERO}
+
+
+def _local(ts: Optional[datetime]) -> datetime:
+    """Convierte un timestamp a hora local (naive se asume UTC, como en SQLite)."""
+    if ts is None:
+        return datetime.now(CHILE_TZ)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(CHILE_TZ)
+
+
+def shard_for(seller_id: Optional[int]) -> int:
+    """Shard de los rollups para las ventas de un vendedor (una caja abierta por vendedor)."""
+    return (seller_id or 0) % ROLLUP_SHARDS
+
+
+def _accumulate(db: Session, model, keys: tuple, rows: dict) -> None:
+    """Suma `rows` ({clave: {campo: delta}}) a la tabla con un upsert por lote.
+
+    Las filas se envían ordenadas por clave para que transacciones
+    concurrentes tomen los locks en el mismo orden.
+    """
+    if not rows:
+        return
+    values = [
+        {**dict(zip(keys, key)), **deltas}
+        for key, deltas in sorted(rows.items())
+    ]
+    insert = dialect_insert(db)
+    stmt = insert(model).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={
+            field: getattr(model, field) + getattr(stmt.excluded, field)
+            for field in values[0] if field not in keys
+        },
+    )
+    db.execute(stmt)
+
+
+def record_sale(
+    db: Session,
+    sale: Sale,
+    payments: Iterable[SalePayment] = (),
+    costs: Optional[dict] = None,
+) -> None:
+    """Suma una venta (o nota de crédito) a los rollups.
+
+    Args:
+        db: Sesión de la transacción de la venta (no hace commit).
+        sale: Venta ya persistida, con `details` en memoria.
+        payments: Pagos registrados para la venta.
+        costs: Costo unitario por `product_id` al momento de la venta.
+    """
+    costs = costs or {}
+    local = _local(sale.fecha_emision)
+    fecha, hora, tipo = local.date(), local.hour, sale.tipo_dte
+    shard = shard_for(sale.seller_id or sale.user_id)
+
+    margin = ZERO
+    products = defaultdict(lambda: {"quantity": ZERO, "net": ZERO, "margin": ZERO})
+    for detail in sale.details:
+        line_margin = Decimal(detail.cantidad) * (
+            Decimal(detail.precio_unitario) - Decimal(costs.get(detail.product_id) or 0)
+        )
+        margin += line_margin
+        acc = products[(fecha, tipo, detail.product_id, shard)]
+        acc["quantity"] += Decimal(detail.cantidad)
+        acc["net"] += Decimal(detail.subtotal)
+        acc["margin"] += line_margin
+
+    totals = {
+        "count": 1,
+        "gross": Decimal(sale.monto_total or 0),
+        "net": Decimal(sale.monto_neto or 0),
+        "iva": Decimal(sale.iva or 0),
+        "margin": margin,
+    }
+
+    pays = defaultdict(lambda: {"count": 0, "amount": ZERO})
+    for payment in payments:
+        acc = pays[(fecha, tipo, payment.payment_method_id, shard)]
+        acc["count"] += 1
+        acc["amount"] += Decimal(payment.amount)
+
+    _accumulate(db, SalesDailyRollup, DAILY_KEYS, {(fecha, tipo, shard): totals})
+    _accumulate(db, SalesHourlyRollup, HOURLY_KEYS, {(fecha, hora, tipo, shard): dict(totals)})
+    _accumulate(db, SalesProductDailyRollup, PRODUCT_KEYS, dict(products))
+    _accumulate(db, SalesPaymentDailyRollup, PAYMENT_KEYS, dict(pays))
+
+
+def _bounds(start: date, end: date) -> tuple[datetime, datetime]:
+    """Rango [inicio, fin) en hora local para filtrar `fecha_emision`."""
+    return (
+        datetime.combine(start, time.min, tzinfo=CHILE_TZ),
+        datetime.combine(end + timedelta(days=1), time.min, tzinfo=CHILE_TZ),
+    )
+
+
+def rebuild_rollups(db: Session, start: Optional[date] = None, end: Optional[date] = None,
+                    chunk_size: int = 5000) -> int:
+    """Recalcula los rollups de un rango de días desde las ventas.
+
+    Borra los agregados del rango y los vuelve a construir leyendo ventas,
+    detalles y pagos en modo streaming. Hace commit al terminar.
+
+    Args:
+        db: Sesión del esquema del inquilino.
+        start: Primer día (inclusive, hora local). Por defecto, el de la primera venta.
+        end: Último día (inclusive, hora local). Por defecto, hoy.
+        chunk_size: Filas por lote de lectura.
+
+    Returns:
+        int: Cantidad de ventas procesadas.
+    """
+    if start is None:
+        first = db.query(func.min(Sale.fecha_emision)).scalar()
+        if first is None:
+            return 0
+        start = _local(first).date()
+    end = end or datetime.now(CHILE_TZ).date()
+
+    since, until = _bounds(start, end)
+    in_range = and_(Sale.fecha_emision >= since, Sale.fecha_emision < until)
+
+    daily = defaultdict(_empty_totals)
+    hourly = defaultdict(_empty_totals)
+    products = defaultdict(lambda: {"quantity": ZERO, "net": ZERO, "margin": ZERO})
+    pays = defaultdict(lambda: {"count": 0, "amount": ZERO})
+    sale_keys = {}
+
+    for row in db.query(
+        Sale.id, Sale.fecha_emision, Sale.tipo_dte, Sale.monto_total, Sale.monto_neto, Sale.iva,
+        Sale.seller_id, Sale.user_id,
+    ).filter(in_range).yield_per(chunk_size):
+        local = _local(row.fecha_emision)
+        key = (local.date(), local.hour, row.tipo_dte, shard_for(row.seller_id or row.user_id))
+        sale_keys[row.id] = key
+        for acc in (daily[(key[0], key[2], key[3])], hourly[key]):
+            acc["count"] += 1
+            acc["gross"] += row.monto_total or ZERO
+            acc["net"] += row.monto_neto or ZERO
+            acc["iva"] += row.iva or ZERO
+
+    for row in db.query(
+        SaleDetail.sale_id, SaleDetail.product_id, SaleDetail.cantidad,
+        SaleDetail.precio_unitario, SaleDetail.subtotal, Product.costo_unitario,
+    ).join(Sale, Sale.id == SaleDetail.sale_id)\
+     .outerjoin(Product, Product.id == SaleDetail.product_id)\
+     .filter(in_range).yield_per(chunk_size):
+        fecha, hora, tipo, shard = sale_keys[row.sale_id]
+        line_margin = row.cantidad * (row.precio_unitario - (row.costo_unitario or ZERO))
+        daily[(fecha, tipo, shard)]["margin"] += line_margin
+        hourly[(fecha, hora, tipo, shard)]["margin"] += line_margin
+        acc = products[(fecha, tipo, row.product_id, shard)]
+        acc["quantity"] += row.cantidad
+        acc["net"] += row.subtotal
+        acc["margin"] += line_margin
+
+    for row in db.query(SalePayment.sale_id, SalePayment.payment_method_id, SalePayment.amount)\
+            .join(Sale, Sale.id == SalePayment.sale_id)\
+            .filter(in_range).yield_per(chunk_size):
+        fecha, _, tipo, shard = sale_keys[row.sale_id]
+        acc = pays[(fecha, tipo, row.payment_method_id, shard)]
+        acc["count"] += 1
+        acc["amount"] += row.amount
+
+    for model in (SalesDailyRollup, SalesHourlyRollup, SalesProductDailyRollup, SalesPaymentDailyRollup):
+        db.execute(delete(model).where(model.fecha.between(start, end)))
+
+    for model, keys, rows in (
+        (SalesDailyRollup, DAILY_KEYS, daily),
+        (SalesHourlyRollup, HOURLY_KEYS, hourly),
+        (SalesProductDailyRollup, PRODUCT_KEYS, products),
+        (SalesPaymentDailyRollup, PAYMENT_KEYS, pays),
+    ):
+        items = sorted(rows.items())
+        for i in range(0, len(items), chunk_size):
+            _accumulate(db, model, keys, dict(items[i:i + chunk_size]))
+
+    db.commit()
+    return len(sale_keys)
+
+
+def period_totals(
+    db: Session,
+    start: datetime,
+    end: Optional[datetime] = None,
+    tipos: Optional[list] = None,
+) -> dict:
+    """Totales de venta entre `start` y `end` (inclusive) leyendo los rollups.
+
+    Los días completos se leen del rollup diario y los días parciales de
+    los extremos del rollup por hora, con precisión de hora.
+
+    Args:
+        db: Sesión del esquema del inquilino.
+        start: Inicio del periodo.
+        end: Fin del periodo (por defecto, ahora).
+        tipos: Tipos de DTE a considerar (por defecto, todos).
+
+    Returns:
+        dict: count, gross, net, iva y margin del periodo.
+    """
+    start = _local(start)
+    end = _local(end)
+    first_day, last_day = start.date(), end.date()
+
+    def _sum(model, *criteria):
+        query = db.query(*(func.coalesce(func.sum(getattr(model, f)), 0) for f in _TOTAL_FIELDS))
+        if tipos:
+            query = query.filter(model.tipo_dte.in_(tipos))
+        return query.filter(*criteria).one()
+
+    # Días intermedios completos desde el rollup diario
+    full_from = first_day if start.hour == 0 else first_day + timedelta(days=1)
+    full_to = last_day if end.hour == 23 else last_day - timedelta(days=1)
+    parts = []
+    if full_from <= full_to:
+        parts.append(_sum(SalesDailyRollup, SalesDailyRollup.fecha.between(full_from, full_to)))
+
+    # Extremos parciales desde el rollup por hora
+    hourly_ranges = []
+    if first_day == last_day and full_from > full_to:
+        hourly_ranges.append(and_(SalesHourlyRollup.fecha == first_day,
+                                  SalesHourlyRollup.hora.between(start.hour, end.hour)))
+    else:
+        if full_from != first_day:
+            hourly_ranges.append(and_(SalesHourlyRollup.fecha == first_day,
+                                      SalesHourlyRollup.hora >= start.hour))
+        if full_to != last_day:
+            hourly_ranges.append(and_(SalesHourlyRollup.fecha == last_day,
+                                      SalesHourlyRollup.hora <= end.hour))
+    if hourly_ranges:
+        parts.append(_sum(SalesHourlyRollup, or_(*hourly_ranges)))
+
+    totals = _empty_totals()
+    for part in parts:
+        for field, value in zip(_TOTAL_FIELDS, part):
+            totals[field] += int(value) if field == "count" else Decimal(value)
+    return totals
@@ -0,0 +1,234 @@
+"""Servicio de Toma de Inventario (conteo físico masivo).
+
+Flujo:
+1. `open_stock_take`: crea la toma y fotografía `stock_actual` de los
+   productos incluidos con un único `INSERT ... SELECT`.
+2. `record_counts`: registra cantidades contadas por lotes (upsert).
+3. `apply_stock_take`: calcula `counted - expected` en SQL, escribe los
+   movimientos `AJUSTE` con su `balance_after` (`INSERT ... SELECT`) y
+   actualiza el stock con un único `UPDATE ... FROM`, en una transacción.
+
+Las funciones no hacen commit; el router confirma la transacción.
+"""
+
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import Integer, String, and_, case, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.models.inventory import StockMovement, StockTake, StockTakeLine
+from app.models.product import Product
+from app.utils.dates import get_now
+from app.utils.db import dialect_insert
+
+ZERO = Decimal("0")
+
+
+class StockTakeError(ValueError):
+    """Operación inválida sobre una toma de inventario (estado o solapamiento)."""
+
+
+def _open_lines(db: Session, product_ids: Optional[Iterable[int]] = None, locked_only: bool = False):
+    query = db.query(StockTakeLine.product_id).join(StockTake).filter(StockTake.status == "OPEN")
+    if locked_only:
+        query = query.filter(StockTake.lock_sales == True)  # noqa: E712
+    if product_ids is not None:
+        query = query.filter(StockTakeLine.product_id.in_(list(product_ids)))
+    return query
+
+
+def locked_products(db: Session, product_ids: Iterable[int]) -> set:
+    """Productos (de `product_ids`) bloqueados por una toma abierta con `lock_sales`."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return set()
+    return {r[0] for r in _open_lines(db, product_ids, locked_only=True).all()}
+
+
+def ensure_unlocked(db: Session, product_ids: Iterable[int]) -> None:
+    """Valida que ningún producto esté bloqueado por una toma en curso.
+
+    Raises:
+        StockTakeError: Si alguno está bloqueado.
+    """
+    locked = locked_products(db, product_ids)
+    if locked:
+        ids = ", ".join(str(pid) for pid in sorted(locked)[:5])
+        raise StockTakeError(f"Productos bloqueados por toma de inventario en curso: {ids}")
+
+
+def open_stock_take(
+    db: Session,
+    user_id: Optional[int] = None,
+    description: Optional[str] = None,
+    lock_sales: bool = False,
+    brand_id: Optional[int] = None,
+    product_ids: Optional[list] = None,
+) -> StockTake:
+    """Abre una toma con la foto del stock de los productos con control de stock.
+
+    Args:
+        db: Sesión del esquema del inquilino.
+        user_id: Usuario que abre la toma.
+        description: Glosa (bodega, pasillo...).
+        lock_sales: Bloquear movimientos de los productos incluidos.
+        brand_id: Limitar a una marca.
+        product_ids: Limitar a estos productos.
+
+    Raises:
+        StockTakeError: Si algún producto ya está en otra toma abierta.
+    """
+    scope = [Product.controla_stock == True, Product.is_deleted == False]  # noqa: E712
+    if brand_id is not None:
+        scope.append(Product.brand_id == brand_id)
+    if product_ids is not None:
+        scope.append(Product.id.in_(product_ids))
+
+    overlap = _open_lines(db).join(Product, Product.id == StockTakeLine.product_id)\
+        .filter(*scope).limit(5).all()
+    if overlap:
+        ids = ", ".join(str(r[0]) for r in overlap)
+        raise StockTakeError(f"Productos ya incluidos en otra toma abierta: {ids}")
+
+    take = StockTake(user_id=user_id, description=description, lock_sales=lock_sales, status="OPEN")
+    db.add(take)
+    db.flush()
+
+    db.execute(insert(StockTakeLine).from_select(
+        ["stock_take_id", "product_id", "expected"],
+        select(literal(take.id), Product.id, func.coalesce(Product.stock_actual, 0)).where(*scope),
+    ))
+    return take
+
+
+def _require_open(take: StockTake) -> None:
+    if take.status != "OPEN":
+        raise StockTakeError(f"La toma {take.id} está {take.status}")
+
+
+def record_counts(db: Session, take: StockTake, counts: dict, accumulate: bool = False) -> dict:
+    """Registra cantidades contadas ({product_id: cantidad}) con un upsert por lote.
+
+    Los productos que no estaban en la foto se agregan con su stock actual
+    como `expected`. Con `accumulate`, la cantidad se suma a lo ya contado
+    (conteo por zonas).
+
+    Returns:
+        dict: updated (ya incluidos) y added (agregados a la toma).
+    """
+    _require_open(take)
+    if not counts:
+        return {"updated": 0, "added": 0}
+
+    existing = {
+        r[0] for r in db.query(StockTakeLine.product_id).filter(
+            StockTakeLine.stock_take_id == take.id, StockTakeLine.product_id.in_(list(counts))
+        ).all()
+    }
+    new_ids = [pid for pid in counts if pid not in existing]
+    if new_ids:
+        overlap = _open_lines(db, new_ids).filter(StockTake.id != take.id).all()
+        if overlap:
+            raise StockTakeError(f"Producto {overlap[0][0]} ya incluido en otra toma abierta")
+    current = dict(
+        db.query(Product.id, func.coalesce(Product.stock_actual, 0)).filter(Product.id.in_(new_ids)).all()
+    ) if new_ids else {}
+
+    upsert = dialect_insert(db)
+    rows = [
+        {"stock_take_id": take.id, "product_id": pid, "expected": current.get(pid, ZERO), "counted": qty}
+        for pid, qty in sorted(counts.items())
+    ]
+    for i in range(0, len(rows), 1000):
+        stmt = upsert(StockTakeLine).values(rows[i:i + 1000])
+        counted = stmt.excluded.counted
+        if accumulate:
+            counted = func.coalesce(StockTakeLine.counted, 0) + stmt.excluded.counted
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["stock_take_id", "product_id"],
+            set_={"counted": counted},
+        ))
+    return {"updated": len(existing), "added": len(new_ids)}
+
+
+def summary(db: Session, take_id: int) -> dict:
+    """Avance y diferencias de una toma, calculados en SQL."""
+    delta = StockTakeLine.counted - StockTakeLine.expected
+    row = db.query(
+        func.count(StockTakeLine.product_id),
+        func.count(StockTakeLine.counted),
+        func.sum(case((and_(StockTakeLine.counted.isnot(None), delta != 0), 1), else_=0)),
+        func.coalesce(func.sum(case((delta > 0, delta), else_=0)), 0),
+        func.coalesce(func.sum(case((delta < 0, -delta), else_=0)), 0),
+        func.coalesce(func.sum(delta * func.coalesce(Product.costo_unitario, 0)), 0),
+    ).join(Product, Product.id == StockTakeLine.product_id)\
+     .filter(StockTakeLine.stock_take_id == take_id).one()
+    return {
+        "products": row[0],
+        "counted": row[1],
+        "with_difference": int(row[2] or 0),
+        "surplus_qty": Decimal(row[3]),
+        "shortage_qty": Decimal(row[4]),
+        "difference_value": Decimal(row[5]),
+    }
+
+
+def apply_stock_take(db: Session, take: StockTake, user_id: Optional[int] = None,
+                     zero_uncounted: bool = False) -> int:
+    """Ajusta el stock por `counted - expected` y registra los movimientos.
+
+    Las ventas y compras ocurridas después de abrir la toma se conservan:
+    el ajuste se suma al stock vigente. Los productos no contados se omiten
+    salvo `zero_uncounted` (se asumen en 0).
+
+    Returns:
+        int: Cantidad de productos ajustados.
+    """
+    _require_open(take)
+    line = StockTakeLine
+    if zero_uncounted:
+        db.execute(update(line).where(line.stock_take_id == take.id, line.counted.is_(None))
+                   .values(counted=0).execution_options(synchronize_session=False))
+
+    delta = line.counted - line.expected
+    in_take = and_(line.stock_take_id == take.id, line.product_id == Product.id,
+                   line.counted.isnot(None), delta != 0)
+
+    # Mismo orden de locks que las ventas (por ID) para evitar deadlocks
+    adjusted = [
+        r[0] for r in db.query(Product.id).filter(in_take).order_by(Product.id).with_for_update(of=Product).all()
+    ]
+    if adjusted:
+        label = f"Toma de inventario #{take.id}"
+        db.execute(insert(StockMovement).from_select(
+            ["product_id", "user_id", "tipo", "motivo", "cantidad", "balance_after", "description"],
+            select(
+                Product.id,
+                literal(user_id, Integer),
+                case((delta > 0, "ENTRADA"), else_="SALIDA"),
+                literal("AJUSTE"),
+                func.abs(delta),
+                func.coalesce(Product.stock_actual, 0) + delta,
+                literal(label, String),
+            ).where(in_take).order_by(Product.id),
+        ))
+        db.execute(
+            update(Product)
+            .where(in_take)
+            .values(stock_actual=func.coalesce(Product.stock_actual, 0) + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+    # Stock cambiado por SQL directo: descartar copias ORM antes de cerrar la toma
+    db.expire_all()
+    take.status = "APPLIED"
+    take.closed_at = get_now()
+    return len(adjusted)
+
+
+def cancel_stock_take(take: StockTake) -> None:
+    """Cancela una toma abierta (libera el bloqueo sin ajustar stock)."""
+    _require_open(take)
+    take.status = "CANCELLED"
+    take.closed_at = get_now()
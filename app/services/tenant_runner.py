@@ -0,0 +1,219 @@
+"""Ejecutor de Tareas de Mantenimiento sobre Todos los Inquilinos.
+
+Reemplaza los bucles ad-hoc de los scripts de mantenimiento (un esquema a
+la vez, detenidos o con resultados mezclados ante el primer error):
+
+- Cada Inquilino corre en su propia conexión y transacción: un fallo hace
+  rollback sólo de ese esquema. La conexión trae `schema_translate_map`
+  y, en PostgreSQL, `SET LOCAL search_path` sólo al esquema del Inquilino
+  (sin `public`, que guarda copias de las tablas operativas).
+- `parallelism` Inquilinos a la vez (`TORN_TENANT_RUNNER_PARALLELISM`); el
+  trabajo es de base de datos, así que basta un pool de hilos.
+- Reintentos por Inquilino con espera exponencial (`retries`).
+- Checkpoint JSON Lines: cada resultado se agrega al terminar; con
+  `resume=True` se omiten los esquemas ya completados y sólo se reintentan
+  los fallidos o pendientes.
+- `RunReport` resume ok / fallidos / omitidos y tiempos.
+
+Una tarea es `fn(conn, tenant) -> resultado` (serializable a JSON). Las
+tareas registradas están en `app.services.tenant_tasks`.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.database import DATABASE_URL
+from app.models.saas import Tenant
+
+PARALLELISM = int(os.getenv("TORN_TENANT_RUNNER_PARALLELISM", "8"))
+RETRIES = int(os.getenv("TORN_TENANT_RUNNER_RETRIES", "2"))
+RETRY_DELAY = 0.5
+CHECKPOINT_DIR = Path(os.getenv("TORN_TENANT_RUNNER_DIR", "runs"))
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class TenantTarget:
+    """Inquilino sobre el que corre una tarea."""
+    tenant_id: Optional[int]
+    schema_name: str
+    name: Optional[str] = None
+
+
+@dataclass
+class TenantResult:
+    schema_name: str
+    status: str  # ok | error | skipped
+    result: Any = None
+    error: Optional[str] = None
+    attempts: int = 0
+    seconds: float = 0.0
+    tenant_id: Optional[int] = None
+    name: Optional[str] = None
+
+
+@dataclass
+class RunReport:
+    """Resultado de una corrida sobre la flota de Inquilinos."""
+    task: str
+    results: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    def by_status(self, status: str) -> list:
+        return [r for r in self.results if r.status == status]
+
+    @property
+    def failed(self) -> list:
+        return self.by_status("error")
+
+    def summary(self) -> dict:
+        return {
+            "task": self.task,
+            "tenants": len(self.results),
+            "ok": len(self.by_status("ok")),
+            "failed": len(self.failed),
+            "skipped": len(self.by_status("skipped")),
+            "retried": sum(1 for r in self.results if r.attempts > 1),
+            "seconds": round(self.seconds, 2),
+        }
+
+
+def runner_engine() -> Engine:
+    """Engine propio del ejecutor (sin pool: la concurrencia la limita `parallelism`)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(DATABASE_URL, poolclass=NullPool)
+        return _engine
+
+
+def list_tenants(global_db: Session, schemas: Optional[Iterable[str]] = None, include_inactive: bool = False) -> list:
+    """Inquilinos registrados en `public.tenants`, en orden de ID."""
+    query = global_db.query(Tenant.id, Tenant.schema_name, Tenant.name)
+    if not include_inactive:
+        query = query.filter(Tenant.is_active == True)
+    if schemas is not None:
+        query = query.filter(Tenant.schema_name.in_(list(schemas)))
+    return [TenantTarget(*row) for row in query.order_by(Tenant.id).all()]
+
+
+def load_checkpoint(path: Path) -> dict:
+    """Último resultado registrado por esquema ({schema: dict})."""
+    done = {}
+    if path.exists():
+        with path.open(encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    entry = json.loads(line)
+                    done[entry["schema_name"]] = entry
+    return done
+
+
+def _run_one(engine: Engine, task: Callable, tenant: TenantTarget, retries: int) -> TenantResult:
+    start = time.perf_counter()
+    outcome = TenantResult(tenant.schema_name, "error", tenant_id=tenant.tenant_id, name=tenant.name)
+    for attempt in range(1, retries + 2):
+        outcome.attempts = attempt
+        try:
+            with engine.connect() as conn:
+                conn = conn.execution_options(schema_translate_map={None: tenant.schema_name})
+                with conn.begin():
+                    if conn.dialect.name == "postgresql":
+                        conn.execute(text(f'SET LOCAL search_path TO "{tenant.schema_name}"'))
+                    outcome.result = task(conn, tenant)
+            outcome.status, outcome.error = "ok", None
+            break
+        except Exception as e:
+            outcome.error = f"{type(e).__name__}: {e}"
+            if attempt <= retries:
+                time.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+    outcome.seconds = time.perf_counter() - start
+    return outcome
+
+
+def run_tenants(
+    task: Callable[[Connection, TenantTarget], Any],
+    tenants: Iterable[TenantTarget],
+    parallelism: int = PARALLELISM,
+    retries: int = RETRIES,
+    checkpoint: Optional[Path] = None,
+    resume: bool = True,
+    engine: Optional[Engine] = None,
+    on_result: Optional[Callable[[TenantResult], None]] = None,
+    task_name: Optional[str] = None,
+) -> RunReport:
+    """Ejecuta `task` en cada Inquilino.
+
+    Args:
+        task: `fn(conn, tenant)`; corre dentro de una transacción por Inquilino.
+        tenants: Inquilinos objetivo (ver `list_tenants`).
+        parallelism: Inquilinos procesados a la vez.
+        retries: Reintentos por Inquilino tras el primer intento fallido.
+        checkpoint: Archivo JSON Lines de progreso (None = sin checkpoint).
+        resume: Omitir los esquemas que el checkpoint ya registra como ok;
+            con False el archivo se reinicia.
+        engine: Engine a usar (por defecto, `runner_engine()`).
+        on_result: Callback por Inquilino terminado (p. ej. imprimir avance).
+
+    Returns:
+        RunReport: Un resultado por Inquilino, en el orden de `tenants`.
+    """
+    engine = engine or runner_engine()
+    tenants = list(tenants)
+    report = RunReport(task=task_name or getattr(task, "__name__", "task"))
+    start = time.perf_counter()
+
+    done = {}
+    if checkpoint is not None:
+        checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        if resume:
+            done = {schema: entry for schema, entry in load_checkpoint(checkpoint).items() if entry["status"] == "ok"}
+        else:
+            checkpoint.write_text("", encoding="utf-8")
+    write_lock = threading.Lock()
+
+    def record(outcome: TenantResult) -> TenantResult:
+        if checkpoint is not None and outcome.status != "skipped":
+            line = json.dumps(asdict(outcome), default=str, ensure_ascii=False)
+            with write_lock, checkpoint.open("a", encoding="utf-8") as fh:
+                fh.write(line + "\n")
+        if on_result is not None:
+            on_result(outcome)
+        return outcome
+
+    pending = []
+    results = {}
+    for tenant in tenants:
+        if tenant.schema_name in done:
+            results[tenant.schema_name] = record(TenantResult(
+                tenant.schema_name, "skipped", result=done[tenant.schema_name].get("result"),
+                tenant_id=tenant.tenant_id, name=tenant.name,
+            ))
+        else:
+            pending.append(tenant)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, parallelism), thread_name_prefix="tenant-runner") as pool:
+            for outcome in pool.map(lambda t: record(_run_one(engine, task, t, retries)), pending):
+                results[outcome.schema_name] = outcome
+
+    report.results = [results[t.schema_name] for t in tenants]
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def checkpoint_path(task_name: str) -> Path:
+    return CHECKPOINT_DIR / f"{task_name}.jsonl"
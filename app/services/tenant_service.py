@@ -14,6 +14,7 @@ from alembic.config import Config
 
 from app.models.saas import Tenant, TenantUser
 from app.database import engine, Base
+from app.services import role_permissions
 # Importar todos los modelos para que estén registrados en Base.metadata
 import app.models.user
 import app.models.brand
@@ -28,6 +29,7 @@ import app.models.cash
 import app.models.dte
 import app.models.issuer
 import app.models.payment
+import app.models.rollup
 
 def _generate_schema_name(rut: str) -> str:
     """Genera un nombre de esquema seguro basado en el RUT para PostgreSQL."""
@@ -169,6 +171,10 @@ def provision_new_tenant(
         
         connection.commit()
 
+        # Permisos de los roles por defecto en la proyección de 'public' (login)
+        role_permissions.sync_tenant(global_db, new_tenant.id, schema_name)
+        global_db.commit()
+
         # D. Registrar el esquema en Alembic como actualizado ("stamp head")
         alembic_cfg = Config("alembic.ini")
         alembic_cfg.attributes['connection'] = connection
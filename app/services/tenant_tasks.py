@@ -0,0 +1,144 @@
+"""Tareas de Mantenimiento por Inquilino (para `tenant_runner`).
+
+Cada tarea recibe la conexión (ya dentro de la transacción del Inquilino)
+y el `TenantTarget`, y retorna un resultado serializable. Las tablas del
+Inquilino se califican con su esquema, así que las tareas también sirven
+con una conexión a `public` (endpoints de un solo Inquilino).
+
+Uso: `python scripts/run_tenant_task.py <tarea>` (ver `TASKS`).
+"""
+
+import json
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.services import role_permissions
+from app.services.tenant_runner import TenantTarget
+
+DEFAULT_ROLES = [
+    {"id": 1, "name": "ADMINISTRADOR", "description": "Acceso total al sistema",
+     "permissions": json.dumps({"all": True})},
+    {"id": 2, "name": "VENDEDOR", "description": "Rol para generar ventas y administrar caja",
+     "permissions": json.dumps({"sales": True, "cash": True})},
+]
+
+
+def sync_price_lists(conn: Connection, tenant: TenantTarget) -> dict:
+    """Tablas de listas de precios y `customers.price_list_id` (idempotente)."""
+    schema = tenant.schema_name
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS "{schema}".price_lists (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            description VARCHAR(500),
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP WITH TIME ZONE
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS "{schema}".price_list_product (
+            price_list_id INTEGER NOT NULL REFERENCES "{schema}".price_lists(id) ON DELETE CASCADE,
+            product_id INTEGER NOT NULL REFERENCES "{schema}".products(id) ON DELETE CASCADE,
+            fixed_price NUMERIC(15, 2) NOT NULL,
+            PRIMARY KEY (price_list_id, product_id)
+        )
+    """))
+    has_column = conn.execute(text("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = :schema AND table_name = 'customers' AND column_name = 'price_list_id'
+    """), {"schema": schema}).first()
+    if has_column:
+        return {"customers_column": "exists"}
+    conn.execute(text(f'ALTER TABLE "{schema}".customers ADD COLUMN price_list_id INTEGER'))
+    conn.execute(text(f"""
+        ALTER TABLE "{schema}".customers
+        ADD CONSTRAINT fk_customers_price_list_id
+        FOREIGN KEY (price_list_id) REFERENCES "{schema}".price_lists(id) ON DELETE SET NULL
+    """))
+    return {"customers_column": "added"}
+
+
+def seed_roles(conn: Connection, tenant: TenantTarget) -> dict:
+    """Roles por defecto faltantes y proyección de permisos del login."""
+    schema = tenant.schema_name
+    existing = {row[0] for row in conn.execute(text(f'SELECT id FROM "{schema}".roles'))}
+    missing = [role for role in DEFAULT_ROLES if role["id"] not in existing]
+    for role in missing:
+        conn.execute(text(f"""
+            INSERT INTO "{schema}".roles (id, name, description, permissions)
+            VALUES (:id, :name, :description, :permissions)
+        """), role)
+    if missing:
+        conn.execute(text(f"SELECT setval('\"{schema}\".roles_id_seq', (SELECT MAX(id) FROM \"{schema}\".roles))"))
+    projected = role_permissions.sync_tenant(conn, tenant.tenant_id, schema) if tenant.tenant_id is not None else 0
+    return {"inserted": [role["name"] for role in missing], "projected": projected}
+
+
+def sync_user_roles(conn: Connection, tenant: TenantTarget) -> dict:
+    """Copia el rol local de cada usuario a su membresía en `public.tenant_users`."""
+    schema = tenant.schema_name
+    changed = conn.execute(text(f"""
+        UPDATE public.tenant_users tu
+        SET role_name = r.name
+        FROM "{schema}".users u
+        JOIN "{schema}".roles r ON r.id = u.role_id
+        JOIN public.saas_users su ON su.email = u.email
+        WHERE tu.tenant_id = :tenant_id AND tu.user_id = su.id AND tu.role_name IS DISTINCT FROM r.name
+        RETURNING tu.user_id
+    """), {"tenant_id": tenant.tenant_id}).scalars().all()
+    if changed:
+        # Los tokens con claims llevan el rol anterior: revocarlos
+        conn.execute(text("""
+            UPDATE public.saas_users SET token_version = COALESCE(token_version, 0) + 1
+            WHERE id = ANY(:ids)
+        """), {"ids": list(changed)})
+    return {"updated": len(changed)}
+
+
+def inject_system_user(conn: Connection, tenant: TenantTarget) -> str:
+    """Usuario de sistema (Soporte Torn) si el Inquilino no lo tiene."""
+    schema = tenant.schema_name
+    existing = conn.execute(
+        text(f'SELECT id FROM "{schema}".users WHERE is_system_user = true LIMIT 1')
+    ).first()
+    if existing:
+        return "already_exists"
+
+    role_res = conn.execute(
+        text(f"SELECT id FROM \"{schema}\".roles WHERE name = 'ADMINISTRADOR' LIMIT 1")
+    ).first()
+    admin_role_id = role_res[0] if role_res else 1
+    conn.execute(text(f"""
+        INSERT INTO "{schema}".users
+        (rut, razon_social, email, full_name, is_system_user, is_active, role_id, role, password_hash)
+        VALUES
+        ('0-0', 'Soporte Torn', 'soporte@torn.cl', 'Soporte Sistema', true, true, :role_id, 'ADMIN', 'INVALID_HASH')
+    """), {"role_id": admin_role_id})
+    return "injected"
+
+
+def sync_role_permissions(conn: Connection, tenant: TenantTarget) -> dict:
+    """Reconstruye la proyección `public.tenant_role_permissions` del Inquilino."""
+    return {"roles": role_permissions.sync_tenant(conn, tenant.tenant_id, tenant.schema_name)}
+
+
+def sql_task(sql: str):
+    """Tarea que ejecuta un script SQL (DDL de migración) en cada Inquilino.
+
+    El script corre con `search_path` en el esquema del Inquilino, así que
+    puede usar nombres de tabla sin calificar.
+    """
+    def run_sql(conn: Connection, tenant: TenantTarget) -> str:
+        conn.exec_driver_sql(sql)
+        return "applied"
+    return run_sql
+
+
+TASKS = {
+    "sync_price_lists": sync_price_lists,
+    "seed_roles": seed_roles,
+    "sync_user_roles": sync_user_roles,
+    "inject_system_user": inject_system_user,
+    "sync_role_permissions": sync_role_permissions,
+}
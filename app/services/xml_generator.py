@@ -11,7 +11,7 @@ _TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates" / "xml"
 
 _env = Environment(
     loader=FileSystemLoader(str(_TEMPLATES_DIR)),
-    autoescape=False,  # XML, no HTML
+    autoescape=True,  # Razones sociales con '&' o '<' deben quedar como XML válido
     trim_blocks=True,
     lstrip_blocks=True,
 )
@@ -0,0 +1,96 @@
+"""Caché en memoria con expiración (TTL) y desalojo LRU.
+
+Pensado para datos de lectura frecuente y cambio esporádico (membresías,
+configuración por inquilino, etc.). Cada proceso de uvicorn mantiene su
+propia instancia; el TTL acota la ventana de datos obsoletos entre workers.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """Caché clave/valor thread-safe con TTL y capacidad máxima.
+
+    Las entradas expiran `ttl` segundos después de escritas. Cuando se supera
+    `max_entries` se desaloja la entrada usada hace más tiempo (LRU).
+
+    Attributes:
+        ttl (float): Segundos de vida de cada entrada.
+        max_entries (int): Cantidad máxima de entradas retenidas.
+        hits (int): Lecturas resueltas desde la caché.
+        misses (int): Lecturas que no encontraron entrada vigente.
+        evictions (int): Entradas desalojadas por capacidad.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retorna el valor vigente para `key` o None si no existe o expiró."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Guarda `value` bajo `key`, desalojando por LRU si es necesario."""
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        """Elimina la entrada `key` si existe."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Elimina todas las entradas que cumplan `predicate(key, value)`.
+
+        Returns:
+            int: Cantidad de entradas eliminadas.
+        """
+        with self._lock:
+            doomed = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+            for k in doomed:
+                del self._data[k]
+            return len(doomed)
+
+    def clear(self) -> None:
+        """Vacía la caché (los contadores se conservan)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Retorna contadores de uso para monitoreo."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
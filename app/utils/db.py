@@ -0,0 +1,19 @@
+"""Utilidades de SQLAlchemy compartidas por los servicios."""
+
+from sqlalchemy.orm import Session
+
+
+def dialect_insert(db: Session):
+    """Retorna el `insert` del dialecto de la sesión (con `on_conflict_do_update`).
+
+    Los upserts de rollups, totales de caja, listas de precios y tomas de
+    inventario se ejecutan en PostgreSQL y, en los tests, en SQLite.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upsert no soportado para el dialecto {dialect}")
+    return insert
@@ -1,8 +1,35 @@
+"""Contraseñas (bcrypt) y tokens JWT.
+
+bcrypt es deliberadamente lento (~250 ms con costo 12), así que hashear y
+verificar nunca ocurre en el event loop ni en hilos sin límite:
+
+- Todo pasa por `password_pool`, un pool de `TORN_PASSWORD_WORKERS` hilos
+  (bcrypt libera el GIL) con una cola acotada a `TORN_PASSWORD_QUEUE_MAX`
+  tareas; sobre ese límite se rechaza con `PasswordPoolBusy` en vez de
+  acumular latencia. `password_pool.stats()` expone la profundidad de cola.
+- Las rutas async usan `verify_and_update_async` / `get_password_hash_async`;
+  las rutas sync (ya en el threadpool) esperan al pool con las versiones sync.
+- El costo se configura con `TORN_BCRYPT_ROUNDS`. Un hash con otro costo
+  queda desactualizado y `verify_and_update` retorna el nuevo hash para
+  guardarlo al iniciar sesión.
+
+Tokens con claims (opcional, `TORN_AUTH_CLAIMS=true`): el access token
+lleva id, superusuario, versión de token y el mapa Inquilino -> [rol,
+esquema], de modo que autorizar un request no consulta `public`. Duran
+`TORN_CLAIMS_TOKEN_MINUTES` y se renuevan con el refresh token
+(`TORN_REFRESH_TOKEN_DAYS`); incrementar `SaaSUser.token_version` los
+revoca todos. Sin la opción se emiten los tokens históricos (`sub` + `exp`).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Any, Union
 from jose import jwt
 from passlib.context import CryptContext
-import os
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,13 +39,137 @@ SECRET_KEY = os.getenv("SECRET_KEY", "super_secret_key_change_in_prod")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 12 # 12 hours
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+AUTH_CLAIMS = os.getenv("TORN_AUTH_CLAIMS", "false").lower() in ("1", "true", "yes")
+CLAIMS_TOKEN_EXPIRE_MINUTES = int(os.getenv("TORN_CLAIMS_TOKEN_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("TORN_REFRESH_TOKEN_DAYS", "7"))
+# Sobre este número de empresas el mapa no viaja en el token (cabeceras < 8 KB)
+CLAIMS_MAX_TENANTS = int(os.getenv("TORN_CLAIMS_MAX_TENANTS", "50"))
+
+BCRYPT_ROUNDS = int(os.getenv("TORN_BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("TORN_PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_QUEUE_MAX = int(os.getenv("TORN_PASSWORD_QUEUE_MAX", "200"))
+
+# min = max = default: cualquier hash con otro costo "necesita actualización"
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+class PasswordPoolBusy(RuntimeError):
+    """La cola de hashing está llena (p. ej. avalancha de inicios de sesión)."""
+
+
+class PasswordPool:
+    """Pool acotado de hilos para bcrypt, con métricas de cola.
+
+    Args:
+        workers: Hilos del pool (0 = en el hilo que llama, sin cola).
+        max_queue: Tareas en espera admitidas además de las en ejecución.
+    """
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, max_queue: int = PASSWORD_QUEUE_MAX):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak = 0
+        self._completed = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._completed += 1
+                self._busy_seconds += elapsed
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def submit(self, fn, *args) -> Future:
+        """Encola `fn(*args)` en el pool.
+
+        Raises:
+            PasswordPoolBusy: Si ya hay `workers + max_queue` tareas pendientes.
+        """
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise PasswordPoolBusy("Demasiadas operaciones de contraseña en curso")
+            self._in_flight += 1
+            self._peak = max(self._peak, self._in_flight)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        try:
+            future = self._executor.submit(self._timed, fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, fn, *args):
+        """Ejecuta `fn(*args)` en el pool y espera el resultado (llamadores sync)."""
+        if self.workers <= 0:
+            return self._timed(fn, *args)
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn, *args):
+        """Ejecuta `fn(*args)` en el pool sin bloquear el event loop."""
+        if self.workers <= 0:
+            return self._timed(fn, *args)
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = min(self._in_flight, self.workers)
+            return {
+                "rounds": BCRYPT_ROUNDS,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": running,
+                "queued": self._in_flight - running,
+                "peak": self._peak,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_ms": round(self._busy_seconds / self._completed * 1000, 1) if self._completed else 0.0,
+            }
+
+
+password_pool = PasswordPool()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_pool.run(pwd_context.verify, plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_pool.run(pwd_context.hash, password)
+
+def verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verifica y, si el hash usa otro costo, retorna (True, hash_nuevo); si no, (valido, None)."""
+    return password_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    return await password_pool.run_async(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_pool.run_async(pwd_context.hash, password)
 
 def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
     if expires_delta:
@@ -29,3 +180,34 @@ def create_access_token(subject: Union[str, Any], expires_delta: timedelta = Non
     to_encode = {"exp": expire, "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+def _encode(claims: dict, expires_delta: timedelta) -> str:
+    claims["exp"] = datetime.now(timezone.utc) + expires_delta
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_claims_token(user, tenants: dict) -> str:
+    """Access token de corta duración con los claims de autorización.
+
+    Args:
+        user: `SaaSUser` autenticado.
+        tenants: {tenant_id: (role_name, schema_name)} de sus membresías activas.
+            Si supera `CLAIMS_MAX_TENANTS` se omite y las membresías se
+            resuelven en `public` como con los tokens históricos.
+    """
+    claims = {
+        "sub": user.email,
+        "typ": "access",
+        "uid": user.id,
+        "name": user.full_name,
+        "su": bool(user.is_superuser),
+        "ver": user.token_version or 0,
+    }
+    if len(tenants) <= CLAIMS_MAX_TENANTS:
+        claims["tnt"] = {str(tenant_id): list(entry) for tenant_id, entry in tenants.items()}
+    return _encode(claims, timedelta(minutes=CLAIMS_TOKEN_EXPIRE_MINUTES))
+
+def create_refresh_token(user) -> str:
+    """Refresh token: sólo identifica al usuario y su versión de token."""
+    claims = {"sub": user.email, "typ": "refresh", "uid": user.id, "ver": user.token_version or 0}
+    return _encode(claims, timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
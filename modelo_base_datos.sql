@@ -1156,14 +1156,6 @@ ALTER TABLE ONLY public.cafs
     ADD CONSTRAINT cafs_pkey PRIMARY KEY (id);
 
 
---
--- Name: cafs cafs_tipo_documento_key; Type: CONSTRAINT; Schema: public; Owner: torn
---
-
-ALTER TABLE ONLY public.cafs
-    ADD CONSTRAINT cafs_tipo_documento_key UNIQUE (tipo_documento);
-
-
 --
 -- Name: cash_sessions cash_sessions_pkey; Type: CONSTRAINT; Schema: public; Owner: torn
 --
@@ -1321,6 +1313,13 @@ CREATE UNIQUE INDEX ix_brands_name ON public.brands USING btree (name);
 CREATE INDEX ix_cafs_id ON public.cafs USING btree (id);
 
 
+--
+-- Name: ix_cafs_tipo_documento; Type: INDEX; Schema: public; Owner: torn
+--
+
+CREATE INDEX ix_cafs_tipo_documento ON public.cafs USING btree (tipo_documento);
+
+
 --
 -- Name: ix_cash_sessions_id; Type: INDEX; Schema: public; Owner: torn
 --
@@ -1335,6 +1334,13 @@ CREATE INDEX ix_cash_sessions_id ON public.cash_sessions USING btree (id);
 CREATE INDEX ix_cash_sessions_status ON public.cash_sessions USING btree (status);
 
 
+--
+-- Name: ix_cash_sessions_user_id_status; Type: INDEX; Schema: public; Owner: torn
+--
+
+CREATE INDEX ix_cash_sessions_user_id_status ON public.cash_sessions USING btree (user_id, status);
+
+
 --
 -- Name: ix_customers_id; Type: INDEX; Schema: public; Owner: torn
 --
@@ -1384,6 +1390,13 @@ CREATE UNIQUE INDEX ix_payment_methods_code ON public.payment_methods USING btre
 CREATE INDEX ix_payment_methods_id ON public.payment_methods USING btree (id);
 
 
+--
+-- Name: ix_products_brand_id; Type: INDEX; Schema: public; Owner: torn
+--
+
+CREATE INDEX ix_products_brand_id ON public.products USING btree (brand_id);
+
+
 --
 -- Name: ix_products_codigo_barras; Type: INDEX; Schema: public; Owner: torn
 --
@@ -1461,6 +1474,20 @@ CREATE UNIQUE INDEX ix_roles_name ON public.roles USING btree (name);
 CREATE INDEX ix_sale_details_id ON public.sale_details USING btree (id);
 
 
+--
+-- Name: ix_sale_details_product_id; Type: INDEX; Schema: public; Owner: torn
+--
+
+CREATE INDEX ix_sale_details_product_id ON public.sale_details USING btree (product_id);
+
+
+--
+-- Name: ix_sale_details_sale_id; Type: INDEX; Schema: public; Owner: torn
+--
+
+CREATE INDEX ix_sale_details_sale_id ON public.sale_details USING btree (sale_id);
+
+
 --
 -- Name: ix_sale_payments_id; Type: INDEX; Schema: public; Owner: torn
 --
@@ -1468,6 +1495,20 @@ CREATE INDEX ix_sale_details_id ON public.sale_details USING btree (id);
 CREATE INDEX ix_sale_payments_id ON public.sale_payments USING btree (id);
 
 
+--
+-- Name: ix_sale_payments_sale_id; Type: INDEX; Schema: public; Owner: torn
+--
+
+CREATE INDEX ix_sale_payments_sale_id ON public.sale_payments USING btree (sale_id);
+
+
+--
+-- Name: ix_sales_fecha_emision; Type: INDEX; Schema: public; Owner: torn
+--
+
+CREATE INDEX ix_sales_fecha_emision ON public.sales USING btree (fecha_emision);
+
+
 --
 -- Name: ix_sales_id; Type: INDEX; Schema: public; Owner: torn
 --
@@ -1475,6 +1516,20 @@ CREATE INDEX ix_sale_payments_id ON public.sale_payments USING btree (id);
 CREATE INDEX ix_sales_id ON public.sales USING btree (id);
 
 
+--
+-- Name: ix_sales_seller_id_created_at; Type: INDEX; Schema: public; Owner: torn
+--
+
+CREATE INDEX ix_sales_seller_id_created_at ON public.sales USING btree (seller_id, created_at);
+
+
+--
+-- Name: ix_sales_tipo_dte_folio; Type: INDEX; Schema: public; Owner: torn
+--
+
+CREATE INDEX ix_sales_tipo_dte_folio ON public.sales USING btree (tipo_dte, folio);
+
+
 --
 -- Name: ix_stock_movements_id; Type: INDEX; Schema: public; Owner: torn
 --
@@ -1482,6 +1537,20 @@ CREATE INDEX ix_sales_id ON public.sales USING btree (id);
 CREATE INDEX ix_stock_movements_id ON public.stock_movements USING btree (id);
 
 
+--
+-- Name: ix_stock_movements_product_id_fecha; Type: INDEX; Schema: public; Owner: torn
+--
+
+CREATE INDEX ix_stock_movements_product_id_fecha ON public.stock_movements USING btree (product_id, fecha);
+
+
+--
+-- Name: ix_stock_movements_product_id_id; Type: INDEX; Schema: public; Owner: torn
+--
+
+CREATE INDEX ix_stock_movements_product_id_id ON public.stock_movements USING btree (product_id, id);
+
+
 --
 -- Name: ix_system_settings_id; Type: INDEX; Schema: public; Owner: torn
 --
@@ -1699,5 +1768,276 @@ ALTER TABLE ONLY public.folio_request_logs ALTER COLUMN id SET DEFAULT nextval('
 ALTER TABLE ONLY public.folio_request_logs
     ADD CONSTRAINT folio_request_logs_pkey PRIMARY KEY (id);
 
+--
+-- Name: folio_reservations; Type: TABLE; Schema: public; Owner: torn
+--
+
+CREATE TABLE public.folio_reservations (
+    id integer NOT NULL,
+    caf_id integer NOT NULL,
+    tipo_documento integer NOT NULL,
+    folio_desde integer NOT NULL,
+    folio_hasta integer NOT NULL,
+    next_folio integer NOT NULL,
+    worker_id character varying(100),
+    status character varying(20) NOT NULL,
+    reserved_at timestamp with time zone DEFAULT now(),
+    released_at timestamp with time zone
+);
+
+ALTER TABLE public.folio_reservations OWNER TO torn;
+
+COMMENT ON COLUMN public.folio_reservations.status IS 'ACTIVE | RELEASED | EXHAUSTED';
+
+CREATE SEQUENCE public.folio_reservations_id_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE public.folio_reservations_id_seq OWNER TO torn;
+
+ALTER SEQUENCE public.folio_reservations_id_seq OWNED BY public.folio_reservations.id;
+
+ALTER TABLE ONLY public.folio_reservations ALTER COLUMN id SET DEFAULT nextval('public.folio_reservations_id_seq'::regclass);
+
+ALTER TABLE ONLY public.folio_reservations
+    ADD CONSTRAINT folio_reservations_pkey PRIMARY KEY (id);
+
+ALTER TABLE ONLY public.folio_reservations
+    ADD CONSTRAINT folio_reservations_caf_id_fkey FOREIGN KEY (caf_id) REFERENCES public.cafs(id);
+
+CREATE INDEX ix_folio_reservations_id ON public.folio_reservations USING btree (id);
+
+CREATE INDEX ix_folio_reservations_tipo_status ON public.folio_reservations USING btree (tipo_documento, status);
+
+--
+-- Name: dte_jobs; Type: TABLE; Schema: public; Owner: torn
+--
+
+CREATE TABLE public.dte_jobs (
+    id integer NOT NULL,
+    dte_id integer NOT NULL,
+    sale_id integer NOT NULL,
+    status character varying(20) NOT NULL,
+    attempts integer DEFAULT 0 NOT NULL,
+    last_error text,
+    worker_id character varying(100),
+    created_at timestamp with time zone DEFAULT now(),
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+ALTER TABLE public.dte_jobs OWNER TO torn;
+
+COMMENT ON COLUMN public.dte_jobs.status IS 'PENDING | PROCESSING | DONE | ERROR';
+
+CREATE SEQUENCE public.dte_jobs_id_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE public.dte_jobs_id_seq OWNER TO torn;
+
+ALTER SEQUENCE public.dte_jobs_id_seq OWNED BY public.dte_jobs.id;
+
+ALTER TABLE ONLY public.dte_jobs ALTER COLUMN id SET DEFAULT nextval('public.dte_jobs_id_seq'::regclass);
+
+ALTER TABLE ONLY public.dte_jobs
+    ADD CONSTRAINT dte_jobs_pkey PRIMARY KEY (id);
+
+ALTER TABLE ONLY public.dte_jobs
+    ADD CONSTRAINT dte_jobs_dte_id_fkey FOREIGN KEY (dte_id) REFERENCES public.dtes(id);
+
+ALTER TABLE ONLY public.dte_jobs
+    ADD CONSTRAINT dte_jobs_sale_id_fkey FOREIGN KEY (sale_id) REFERENCES public.sales(id);
+
+CREATE INDEX ix_dte_jobs_id ON public.dte_jobs USING btree (id);
+
+CREATE INDEX ix_dte_jobs_status_id ON public.dte_jobs USING btree (status, id);
+
+--
+-- Name: sales_daily_rollup; Type: TABLE; Schema: public; Owner: torn
+--
+
+CREATE TABLE public.sales_daily_rollup (
+    fecha date NOT NULL,
+    tipo_dte integer NOT NULL,
+    count integer DEFAULT 0 NOT NULL,
+    gross numeric(15,2) DEFAULT 0 NOT NULL,
+    net numeric(15,2) DEFAULT 0 NOT NULL,
+    iva numeric(15,2) DEFAULT 0 NOT NULL,
+    margin numeric(15,2) DEFAULT 0 NOT NULL
+);
+
+ALTER TABLE public.sales_daily_rollup OWNER TO torn;
+
+ALTER TABLE ONLY public.sales_daily_rollup
+    ADD CONSTRAINT sales_daily_rollup_pkey PRIMARY KEY (fecha, tipo_dte);
+
+--
+-- Name: sales_hourly_rollup; Type: TABLE; Schema: public; Owner: torn
+--
+
+CREATE TABLE public.sales_hourly_rollup (
+    fecha date NOT NULL,
+    hora integer NOT NULL,
+    tipo_dte integer NOT NULL,
+    count integer DEFAULT 0 NOT NULL,
+    gross numeric(15,2) DEFAULT 0 NOT NULL,
+    net numeric(15,2) DEFAULT 0 NOT NULL,
+    iva numeric(15,2) DEFAULT 0 NOT NULL,
+    margin numeric(15,2) DEFAULT 0 NOT NULL
+);
+
+ALTER TABLE public.sales_hourly_rollup OWNER TO torn;
+
+ALTER TABLE ONLY public.sales_hourly_rollup
+    ADD CONSTRAINT sales_hourly_rollup_pkey PRIMARY KEY (fecha, hora, tipo_dte);
+
+--
+-- Name: sales_product_daily_rollup; Type: TABLE; Schema: public; Owner: torn
+--
+
+CREATE TABLE public.sales_product_daily_rollup (
+    fecha date NOT NULL,
+    tipo_dte integer NOT NULL,
+    product_id integer NOT NULL,
+    quantity numeric(15,4) DEFAULT 0 NOT NULL,
+    net numeric(15,2) DEFAULT 0 NOT NULL,
+    margin numeric(15,2) DEFAULT 0 NOT NULL
+);
+
+ALTER TABLE public.sales_product_daily_rollup OWNER TO torn;
+
+ALTER TABLE ONLY public.sales_product_daily_rollup
+    ADD CONSTRAINT sales_product_daily_rollup_pkey PRIMARY KEY (fecha, tipo_dte, product_id);
+
+--
+-- Name: sales_payment_daily_rollup; Type: TABLE; Schema: public; Owner: torn
+--
+
+CREATE TABLE public.sales_payment_daily_rollup (
+    fecha date NOT NULL,
+    tipo_dte integer NOT NULL,
+    payment_method_id integer NOT NULL,
+    count integer DEFAULT 0 NOT NULL,
+    amount numeric(15,2) DEFAULT 0 NOT NULL
+);
+
+ALTER TABLE public.sales_payment_daily_rollup OWNER TO torn;
+
+ALTER TABLE ONLY public.sales_payment_daily_rollup
+    ADD CONSTRAINT sales_payment_daily_rollup_pkey PRIMARY KEY (fecha, tipo_dte, payment_method_id);
+
+--
+-- Name: stock_takes; Type: TABLE; Schema: public; Owner: torn
+--
+
+CREATE TABLE public.stock_takes (
+    id integer NOT NULL,
+    status character varying(20) NOT NULL,
+    description character varying(255),
+    lock_sales boolean NOT NULL,
+    user_id integer,
+    created_at timestamp with time zone DEFAULT now(),
+    closed_at timestamp with time zone
+);
+
+ALTER TABLE public.stock_takes OWNER TO torn;
+
+COMMENT ON COLUMN public.stock_takes.status IS 'OPEN | APPLIED | CANCELLED';
+
+CREATE SEQUENCE public.stock_takes_id_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE public.stock_takes_id_seq OWNER TO torn;
+
+ALTER SEQUENCE public.stock_takes_id_seq OWNED BY public.stock_takes.id;
+
+ALTER TABLE ONLY public.stock_takes ALTER COLUMN id SET DEFAULT nextval('public.stock_takes_id_seq'::regclass);
+
+ALTER TABLE ONLY public.stock_takes
+    ADD CONSTRAINT stock_takes_pkey PRIMARY KEY (id);
+
+ALTER TABLE ONLY public.stock_takes
+    ADD CONSTRAINT stock_takes_user_id_fkey FOREIGN KEY (user_id) REFERENCES public.users(id);
+
+CREATE INDEX ix_stock_takes_id ON public.stock_takes USING btree (id);
+
+--
+-- Name: stock_take_lines; Type: TABLE; Schema: public; Owner: torn
+--
+
+CREATE TABLE public.stock_take_lines (
+    stock_take_id integer NOT NULL,
+    product_id integer NOT NULL,
+    expected numeric(15,4) NOT NULL,
+    counted numeric(15,4)
+);
+
+ALTER TABLE public.stock_take_lines OWNER TO torn;
+
+ALTER TABLE ONLY public.stock_take_lines
+    ADD CONSTRAINT stock_take_lines_pkey PRIMARY KEY (stock_take_id, product_id);
+
+ALTER TABLE ONLY public.stock_take_lines
+    ADD CONSTRAINT stock_take_lines_stock_take_id_fkey FOREIGN KEY (stock_take_id) REFERENCES public.stock_takes(id) ON DELETE CASCADE;
+
+ALTER TABLE ONLY public.stock_take_lines
+    ADD CONSTRAINT stock_take_lines_product_id_fkey FOREIGN KEY (product_id) REFERENCES public.products(id);
+
+CREATE INDEX ix_stock_take_lines_product_id ON public.stock_take_lines USING btree (product_id);
+
+--
+-- Name: stock_balance_checkpoints; Type: TABLE; Schema: public; Owner: torn
+--
+
+CREATE TABLE public.stock_balance_checkpoints (
+    product_id integer NOT NULL,
+    movement_id integer NOT NULL,
+    balance numeric(15,4) NOT NULL,
+    created_at timestamp with time zone DEFAULT now()
+);
+
+ALTER TABLE public.stock_balance_checkpoints OWNER TO torn;
+
+ALTER TABLE ONLY public.stock_balance_checkpoints
+    ADD CONSTRAINT stock_balance_checkpoints_pkey PRIMARY KEY (product_id, movement_id);
+
+ALTER TABLE ONLY public.stock_balance_checkpoints
+    ADD CONSTRAINT stock_balance_checkpoints_product_id_fkey FOREIGN KEY (product_id) REFERENCES public.products(id);
+
+--
+-- Name: cash_session_totals; Type: TABLE; Schema: public; Owner: torn
+--
+
+CREATE TABLE public.cash_session_totals (
+    cash_session_id integer NOT NULL,
+    payment_method_id integer NOT NULL,
+    count integer NOT NULL,
+    amount numeric(15,2) NOT NULL
+);
+
+ALTER TABLE public.cash_session_totals OWNER TO torn;
+
+ALTER TABLE ONLY public.cash_session_totals
+    ADD CONSTRAINT cash_session_totals_pkey PRIMARY KEY (cash_session_id, payment_method_id);
+
+ALTER TABLE ONLY public.cash_session_totals
+    ADD CONSTRAINT cash_session_totals_cash_session_id_fkey FOREIGN KEY (cash_session_id) REFERENCES public.cash_sessions(id) ON DELETE CASCADE;
+
+ALTER TABLE ONLY public.cash_session_totals
+    ADD CONSTRAINT cash_session_totals_payment_method_id_fkey FOREIGN KEY (payment_method_id) REFERENCES public.payment_methods(id);
+
 \unrestrict Q2hNdhh7rBmsMcAOegrTi6Ml8hggY41qP4WSmwsGfpA1KKVKAa0XlX1e1abRBnG
 
@@ -0,0 +1,51 @@
+"""Reconstruye los agregados de ventas (rollups) desde las ventas.
+
+Uso:
+    python scripts/backfill_sales_rollups.py                       # todos los inquilinos, todo el historial
+    python scripts/backfill_sales_rollups.py --schema tenant_76123456
+    python scripts/backfill_sales_rollups.py --desde 2026-01-01 --hasta 2026-01-31
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal, tenant_pools
+from app.models.saas import Tenant
+from app.services.sales_rollup import rebuild_rollups
+
+
+def backfill_schema(schema: str, desde: date = None, hasta: date = None) -> int:
+    db = SessionLocal(bind=tenant_pools.get_engine(schema))
+    try:
+        return rebuild_rollups(db, desde, hasta)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill de agregados de ventas")
+    parser.add_argument("--schema", help="Esquema del inquilino (por defecto, todos los activos)")
+    parser.add_argument("--desde", type=lambda v: datetime.strptime(v, "%Y-%m-%d").date())
+    parser.add_argument("--hasta", type=lambda v: datetime.strptime(v, "%Y-%m-%d").date())
+    args = parser.parse_args()
+
+    if args.schema:
+        schemas = [args.schema]
+    else:
+        with SessionLocal() as global_db:
+            schemas = [row[0] for row in global_db.query(Tenant.schema_name).filter(Tenant.is_active == True).all()]
+
+    for schema in schemas:
+        try:
+            processed = backfill_schema(schema, args.desde, args.hasta)
+            print(f"  [+] {schema}: {processed} ventas agregadas")
+        except Exception as e:
+            print(f"  [!] {schema}: {e}")
+
+
+if __name__ == "__main__":
+    main()
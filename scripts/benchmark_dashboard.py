@@ -0,0 +1,122 @@
+"""Benchmark del dashboard: agregación en Python vs SQL vs rollups.
+
+Compara la latencia de los KPIs de /reports/dashboard calculados:
+    legacy:  cargando las ventas del día como ORM y sumando floats en Python.
+    sql:     con agregación condicional (CASE) sobre `sales` en una consulta.
+    rollup:  `build_dashboard` completo sobre los agregados precalculados.
+
+Con --seed se insertan ventas sintéticas repartidas en los últimos --days
+días (sólo desarrollo) y se reconstruyen los rollups.
+
+Uso:
+    python scripts/benchmark_dashboard.py tenant_76123456 --seed 1000000 --days 365
+    python scripts/benchmark_dashboard.py tenant_76123456 --runs 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import case, func, text
+
+from app.database import SessionLocal, tenant_pools
+from app.models.sale import Sale
+from app.routers.reports import build_dashboard
+from app.services.sales_rollup import rebuild_rollups
+from app.utils.dates import get_now, get_today
+
+
+def seed(db, total: int, days: int) -> None:
+    """Inserta ventas sintéticas (boletas y ~2% de NC) para el cliente/usuario 1."""
+    print(f"Insertando {total} ventas sintéticas en {days} días...")
+    db.execute(text("""
+        INSERT INTO sales (user_id, customer_id, folio, tipo_dte, fecha_emision, monto_neto, iva, monto_total)
+        SELECT 1, 1, 900000000 + g,
+               CASE WHEN g % 50 = 0 THEN 61 ELSE 39 END,
+               now() - (random() * :days || ' days')::interval,
+               n, round(n * 0.19, 2), round(n * 1.19, 2)
+        FROM generate_series(1, :total) AS g,
+             LATERAL (SELECT round((random() * 50000)::numeric, 2) AS n) AS r
+    """), {"total": total, "days": days})
+    db.commit()
+    print("Reconstruyendo rollups...")
+    rebuild_rollups(db)
+
+
+def legacy_kpis(db, start, end) -> dict:
+    sales = db.query(Sale).filter(
+        Sale.fecha_emision >= start, Sale.fecha_emision <= end, Sale.tipo_dte.in_([33, 39])
+    ).all()
+    nc = db.query(Sale).filter(
+        Sale.fecha_emision >= start, Sale.fecha_emision <= end, Sale.tipo_dte == 61
+    )
+    return {
+        "total_ventas": sum(float(s.monto_total) for s in sales),
+        "num_ventas": len(sales),
+        "num_nc": nc.count(),
+        "total_nc": sum(float(s.monto_total) for s in nc.all()),
+    }
+
+
+def sql_kpis(db, start, end) -> dict:
+    is_sale = Sale.tipo_dte.in_([33, 39])
+    is_nc = Sale.tipo_dte == 61
+    row = db.query(
+        func.coalesce(func.sum(case((is_sale, Sale.monto_total), else_=0)), 0),
+        func.count(case((is_sale, Sale.id))),
+        func.count(case((is_nc, Sale.id))),
+        func.coalesce(func.sum(case((is_nc, Sale.monto_total), else_=0)), 0),
+    ).filter(Sale.fecha_emision >= start, Sale.fecha_emision <= end).one()
+    return {"total_ventas": Decimal(row[0]), "num_ventas": row[1], "num_nc": row[2], "total_nc": Decimal(row[3])}
+
+
+def measure(label: str, fn, runs: int) -> None:
+    fn()  # calentamiento
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<8} p50={statistics.median(samples):9.2f} ms   p95={p95:9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de /reports/dashboard")
+    parser.add_argument("schema")
+    parser.add_argument("--seed", type=int, default=0, help="Ventas sintéticas a insertar")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--fecha", type=lambda v: datetime.strptime(v, "%Y-%m-%d").date())
+    args = parser.parse_args()
+
+    db = SessionLocal(bind=tenant_pools.get_engine(args.schema))
+    try:
+        if args.seed:
+            seed(db, args.seed, args.days)
+
+        target = args.fecha or get_today().date()
+        tz = get_now().tzinfo
+        start = datetime.combine(target, datetime.min.time(), tzinfo=tz)
+        end = start + timedelta(days=1) - timedelta(microseconds=1)
+
+        print(f"Ventas en el esquema: {db.query(func.count(Sale.id)).scalar()} | fecha: {target}")
+        print(f"legacy: {legacy_kpis(db, start, end)}")
+        print(f"sql:    {sql_kpis(db, start, end)}")
+        print(f"rollup: {build_dashboard(db, target)['kpis']}")
+        measure("legacy", lambda: legacy_kpis(db, start, end), args.runs)
+        measure("sql", lambda: sql_kpis(db, start, end), args.runs)
+        measure("rollup", lambda: build_dashboard(db, target), args.runs)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
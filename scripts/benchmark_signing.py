@@ -0,0 +1,148 @@
+"""Benchmark de timbraje (TED) y firma XML-DSig de DTE.
+
+Mide, sobre DTE sintéticos:
+    parse:  costo de parsear el PKCS#12 y el CAF sin caché vs. con `key_cache`.
+    1 core: firmas por segundo en el proceso actual.
+    pool:   firmas por segundo con `SigningPool` de --processes procesos, y
+            su equivalente por core.
+
+Sin --pfx se genera un certificado autofirmado y un CAF de prueba
+(sólo desarrollo; el XML resultante no es válido ante el SII).
+
+Uso:
+    python scripts/benchmark_signing.py --docs 2000 --processes 4
+    python scripts/benchmark_signing.py --pfx firma.pfx --password secreto --caf caf33.xml
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SCHEMA = "benchmark"
+
+
+def dev_material(cert_dir: Path, docs: int) -> tuple:
+    """Certificado autofirmado en `cert_dir` y CAF de prueba para `docs` folios."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives.serialization import pkcs12
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Benchmark Torn")])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name)
+        .public_key(key.public_key()).serial_number(1)
+        .not_valid_before(now).not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    pfx = pkcs12.serialize_key_and_certificates(
+        b"benchmark", key, cert, None, serialization.BestAvailableEncryption(b"benchmark")
+    )
+    (cert_dir / f"{SCHEMA}.pfx").write_bytes(pfx)
+    (cert_dir / f"{SCHEMA}.pass").write_bytes(b"benchmark")
+
+    caf_key = rsa.generate_private_key(public_exponent=65537, key_size=1024)
+    pem = caf_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL, serialization.NoEncryption()
+    ).decode()
+    caf = (
+        '<AUTORIZACION><CAF version="1.0"><DA><RE>76123456-K</RE><RS>BENCHMARK</RS><TD>33</TD>'
+        f'<RNG><D>1</D><H>{docs}</H></RNG><FA>2026-01-01</FA><RSAPK><M>AA==</M><E>Aw==</E></RSAPK>'
+        f'<IDK>100</IDK></DA><FRMA algoritmo="SHA1withRSA">AA==</FRMA></CAF><RSASK>{pem}</RSASK></AUTORIZACION>'
+    )
+    return pfx, b"benchmark", caf
+
+
+def synthetic_xml(folio: int, lines: int) -> str:
+    from app.services.xml_generator import render_factura_xml
+
+    details = [
+        SimpleNamespace(cantidad=2, precio_unitario=Decimal("990"), subtotal=Decimal("1980"),
+                        product=SimpleNamespace(nombre=f"Producto {i}", unidad_medida="un"))
+        for i in range(lines)
+    ]
+    sale = SimpleNamespace(folio=folio, tipo_dte=33, fecha_emision=datetime(2026, 3, 2),
+                           monto_neto=Decimal(1980 * lines), iva=Decimal(376 * lines),
+                           monto_total=Decimal(2356 * lines), details=details)
+    issuer = SimpleNamespace(rut="76123456-K", razon_social="Emisora", giro="Comercio", acteco="1",
+                             direccion="Calle 1", comuna="Santiago", ciudad="Santiago", telefono="", email="")
+    customer = SimpleNamespace(rut="12345678-5", razon_social="Cliente", giro="Giro", direccion="Calle 2",
+                               comuna="Santiago", ciudad="Santiago")
+    return render_factura_xml(sale, issuer, customer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de firma de DTE")
+    parser.add_argument("--docs", type=int, default=1000, help="DTE a firmar por medición")
+    parser.add_argument("--lines", type=int, default=5, help="Líneas de detalle por DTE")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--pfx", help="Certificado .pfx real (por defecto, autofirmado)")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--caf", help="XML de CAF real (tipo 33)")
+    args = parser.parse_args()
+
+    cert_dir = Path(tempfile.mkdtemp(prefix="torn-sign-"))
+    # Antes de importar el servicio: los procesos del pool leen el certificado desde aquí
+    os.environ["TORN_DTE_CERT_DIR"] = str(cert_dir)
+    from app.services import dte_signer
+
+    if args.pfx:
+        pfx, password = Path(args.pfx).read_bytes(), args.password.encode() or None
+        (cert_dir / f"{SCHEMA}.pfx").write_bytes(pfx)
+        (cert_dir / f"{SCHEMA}.pass").write_bytes(password or b"")
+        caf_xml = Path(args.caf).read_text(encoding="iso-8859-1")
+    else:
+        pfx, password, caf_xml = dev_material(cert_dir, args.docs)
+    caf = dte_signer.parse_caf(caf_xml)
+    folios = [caf.desde + i % (caf.hasta - caf.desde + 1) for i in range(args.docs)]
+    documents = [(i, synthetic_xml(folio, args.lines), 1) for i, folio in enumerate(folios)]
+    print(f"DTE: {args.docs} x {args.lines} líneas | procesos: {args.processes} | cpu: {os.cpu_count()}")
+
+    t0 = time.perf_counter()
+    for _ in range(20):
+        dte_signer.load_certificate(pfx, password)
+        dte_signer.parse_caf(caf_xml)
+    uncached = (time.perf_counter() - t0) / 20 * 1000
+    dte_signer.tenant_certificate(SCHEMA)
+    t0 = time.perf_counter()
+    for _ in range(20):
+        dte_signer.tenant_certificate(SCHEMA)
+        dte_signer.caf_key(SCHEMA, 1, caf_xml)
+    cached = (time.perf_counter() - t0) / 20 * 1000
+    print(f"parse    sin caché={uncached:8.3f} ms   con caché={cached:8.4f} ms")
+
+    local = dte_signer.SigningPool(processes=0)
+    local.sign_many(SCHEMA, documents[:10], {1: caf_xml})  # calentamiento
+    t0 = time.perf_counter()
+    results = local.sign_many(SCHEMA, documents, {1: caf_xml})
+    elapsed = time.perf_counter() - t0
+    failed = [r for r in results if r[1] is None]
+    if failed:
+        print(f"  [!] {len(failed)} documentos sin firmar: {failed[0][2]}")
+    print(f"1 core   {len(documents) / elapsed:9.1f} firmas/s")
+
+    pool = dte_signer.SigningPool(processes=args.processes)
+    try:
+        pool.sign_many(SCHEMA, documents[:pool.chunk_size * args.processes], {1: caf_xml})  # arranca procesos
+        t0 = time.perf_counter()
+        pool.sign_many(SCHEMA, documents, {1: caf_xml})
+        elapsed = time.perf_counter() - t0
+    finally:
+        pool.stop()
+    rate = len(documents) / elapsed
+    print(f"pool     {rate:9.1f} firmas/s   ({rate / args.processes:.1f} firmas/s por core)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Asesor de índices para los esquemas de inquilinos.
+
+Ejecuta EXPLAIN sobre las consultas conocidas de los routers (stats,
+reportes, caja, kardex, folios) en cada esquema y reporta los Seq Scan
+sobre tablas con más de --min-rows filas estimadas, que normalmente
+indican un índice faltante. Las lecturas de stats, reportes y caja se
+toman de los propios servicios (`period_totals`, `build_dashboard`,
+`session_totals`, `expected_cash`), que leen los rollups y
+`cash_session_totals`: el asesor revisa el SQL que realmente se ejecuta.
+
+Uso:
+    python scripts/index_advisor.py                          # todos los inquilinos activos
+    python scripts/index_advisor.py --schema tenant_76123456 --min-rows 5000
+    python scripts/index_advisor.py --analyze                # EXPLAIN ANALYZE (ejecuta las consultas)
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import desc, event, func, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, tenant_pools
+from app.models.cash import CashSession
+from app.models.inventory import StockMovement
+from app.models.payment import SalePayment
+from app.models.saas import Tenant
+from app.models.sale import Sale, SaleDetail
+from app.routers.reports import build_dashboard
+from app.services.cash_totals import expected_cash, session_totals
+from app.services.sales_rollup import period_totals
+from app.utils.dates import get_now
+
+
+def known_queries() -> dict:
+    """Consultas puntuales de los hot paths (mismos filtros que los routers)."""
+    return {
+        "reports: detalle de una venta": select(SaleDetail).where(SaleDetail.sale_id == 1),
+        "sales: último folio por tipo": select(func.max(Sale.folio)).where(Sale.tipo_dte == 39),
+        "cash: sesión abierta del cajero": select(CashSession)
+            .where(CashSession.user_id == 1, CashSession.status == "OPEN"),
+        "cash: pagos de una venta": select(SalePayment).where(SalePayment.sale_id == 1),
+        "kardex: movimientos de un producto": select(StockMovement)
+            .where(StockMovement.product_id == 1)
+            .order_by(desc(StockMovement.fecha)).limit(50),
+    }
+
+
+def service_calls() -> dict:
+    """Lecturas de stats, reportes y caja: se ejecutan los mismos servicios que los routers."""
+    now = get_now()
+    return {
+        "stats: totales del periodo": lambda db: period_totals(db, now - timedelta(days=30), now),
+        "reports: dashboard del día": lambda db: build_dashboard(db, now.date()),
+        "cash: totales del turno": lambda db: session_totals(db, 1),
+        "cash: efectivo esperado": lambda db: expected_cash(db, CashSession(id=1, start_amount=0)),
+    }
+
+
+def captured_statements(conn) -> list:
+    """[(nombre, sql, parámetros)] de las consultas que emiten `service_calls`."""
+    captured = []
+    current = None
+
+    def capture(_conn, _cursor, statement, parameters, _context, _executemany):
+        if current and statement.lstrip().upper().startswith("SELECT"):
+            captured.append((current, statement, parameters))
+
+    event.listen(conn, "before_cursor_execute", capture)
+    try:
+        with Session(bind=conn) as db:
+            for name, call in service_calls().items():
+                current = name
+                call(db)
+    finally:
+        event.remove(conn, "before_cursor_execute", capture)
+    counts = {}
+    for name, _, _ in captured:
+        counts[name] = counts.get(name, 0) + 1
+    seen = {}
+    named = []
+    for name, statement, parameters in captured:
+        seen[name] = seen.get(name, 0) + 1
+        label = f"{name} #{seen[name]}" if counts[name] > 1 else name
+        named.append((label, statement, parameters))
+    return named
+
+
+def _seq_scans(plan: dict):
+    """Recorre el plan y retorna las relaciones leídas con Seq Scan."""
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan.get("Relation Name"), plan.get("Plan Rows", 0)
+    for child in plan.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+def advise_schema(schema: str, min_rows: int, analyze: bool) -> list:
+    """Retorna hallazgos (consulta, tabla, filas estimadas) para un esquema."""
+    findings = []
+    dialect = postgresql.dialect()
+    with tenant_pools.get_engine(schema).connect() as conn:
+        table_rows = dict(conn.exec_driver_sql(
+            "SELECT c.relname, c.reltuples::bigint FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = %(schema)s AND c.relkind = 'r'",
+            {"schema": schema},
+        ).all())
+
+        statements = [
+            (name, str(compiled), compiled.params)
+            for name, compiled in (
+                (name, stmt.compile(dialect=dialect)) for name, stmt in known_queries().items()
+            )
+        ] + captured_statements(conn)
+
+        explain = "EXPLAIN (ANALYZE, FORMAT JSON) " if analyze else "EXPLAIN (FORMAT JSON) "
+        for name, sql, params in statements:
+            raw = conn.exec_driver_sql(explain + sql, params).scalar()
+            plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+            for table, _ in _seq_scans(plan):
+                rows = table_rows.get(table, 0)
+                if rows >= min_rows:
+                    findings.append((name, table, rows))
+        if analyze:
+            conn.rollback()
+    return findings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asesor de índices faltantes por inquilino")
+    parser.add_argument("--schema", help="Esquema del inquilino (por defecto, todos los activos)")
+    parser.add_argument("--min-rows", type=int, default=10000,
+                        help="Sólo reportar Seq Scan en tablas con al menos N filas estimadas")
+    parser.add_argument("--analyze", action="store_true", help="Usar EXPLAIN ANALYZE")
+    args = parser.parse_args()
+
+    if args.schema:
+        schemas = [args.schema]
+    else:
+        with SessionLocal() as global_db:
+            schemas = [row[0] for row in global_db.query(Tenant.schema_name).filter(Tenant.is_active == True).all()]
+
+    flagged = 0
+    for schema in schemas:
+        try:
+            findings = advise_schema(schema, args.min_rows, args.analyze)
+        except Exception as e:
+            print(f"  [!] {schema}: {e}")
+            continue
+        if not findings:
+            print(f"  [ok] {schema}")
+            continue
+        flagged += 1
+        for query_name, table, rows in findings:
+            print(f"  [seq scan] {schema}.{table} (~{rows} filas) en '{query_name}'")
+
+    print(f"\n{flagged} de {len(schemas)} esquemas con posibles índices faltantes.")
+    print("Aplique la migración de índices con: alembic upgrade head")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
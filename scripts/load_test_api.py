@@ -0,0 +1,99 @@
+"""Prueba de carga HTTP de los endpoints calientes del POS.
+
+Lanza --concurrency clientes concurrentes (asyncio + httpx) contra un
+servidor en marcha y reporta requests por segundo, p50 / p95 y errores
+por endpoint. Para medir el rendimiento por worker, levantar el servidor
+con un único proceso y correr la prueba antes y después del cambio:
+
+    uvicorn app.main:app --workers 1 --port 8000
+
+Uso:
+    python scripts/load_test_api.py --email caja@torn.cl --password secreto --tenant-id 1
+    python scripts/load_test_api.py --token <JWT> --tenant-id 1 --concurrency 64 --requests 5000 \\
+        --endpoint /products/pos?limit=100 --endpoint /price-lists/resolve-price/1?customer_id=1
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_ENDPOINTS = [
+    "/products/pos?limit=100",
+    "/price-lists/resolve-price/1",
+    "/sales/payment-methods/",
+    "/auth/validate",
+]
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post("/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_endpoint(client: httpx.AsyncClient, path: str, headers: dict, total: int, concurrency: int) -> dict:
+    """Ejecuta `total` GET sobre `path` con `concurrency` clientes en paralelo."""
+    latencies, errors = [], 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            t0 = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "errors": errors,
+    }
+
+
+async def main_async(args) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        token = args.token or await login(client, args.email, args.password)
+        headers = {"Authorization": f"Bearer {token}", "X-Tenant-Id": str(args.tenant_id)}
+        endpoints = args.endpoint or DEFAULT_ENDPOINTS
+
+        print(f"Servidor: {args.base_url} | concurrencia: {args.concurrency} | requests por endpoint: {args.requests}")
+        for path in endpoints:
+            await run_endpoint(client, path, headers, min(args.requests, args.concurrency * 2), args.concurrency)
+            result = await run_endpoint(client, path, headers, args.requests, args.concurrency)
+            flag = "  [!]" if result["errors"] else "  [+]"
+            print(f"{flag} {path:<45} {result['rps']:8.1f} req/s   p50={result['p50']:7.1f} ms   "
+                  f"p95={result['p95']:7.1f} ms   errores={result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de endpoints del POS")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", help="JWT ya emitido (si no, se usa --email / --password)")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--tenant-id", type=int, required=True)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests por endpoint")
+    parser.add_argument("--endpoint", action="append", help="Ruta GET a medir (repetible)")
+    args = parser.parse_args()
+    if not args.token and not (args.email and args.password):
+        parser.error("Indique --token o --email y --password")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
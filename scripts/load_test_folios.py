@@ -0,0 +1,67 @@
+"""Prueba de carga del asignador de folios sobre un esquema de inquilino.
+
+Lanza N hilos que piden folios en paralelo (cada uno en su propia
+transacción, como una venta) y verifica que no haya folios duplicados ni
+huecos en el rango entregado. Consume folios reales del CAF: usar sólo en
+ambientes de desarrollo.
+
+Uso:
+    python scripts/load_test_folios.py tenant_76123456 --tipo 39 --threads 16 --folios 2000
+    python scripts/load_test_folios.py tenant_76123456 --block-size 50
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal, tenant_pools
+from app.services.folio_allocator import FolioAllocator
+
+
+def run(schema: str, tipo: int, threads: int, total: int, block_size: int) -> int:
+    engine = tenant_pools.get_engine(schema)
+    allocator = FolioAllocator(block_size=block_size, engine_resolver=tenant_pools.get_engine)
+
+    def one(_):
+        db = SessionLocal(bind=engine)
+        db.info["schema_name"] = schema
+        try:
+            folio = allocator.next_folio(db, tipo)
+            db.commit()
+            return folio
+        finally:
+            db.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        folios = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    allocator.release_all()
+
+    issued = [f for f in folios if f is not None]
+    duplicates = len(issued) - len(set(issued))
+    print(f"Modo: {'bloques de ' + str(block_size) if block_size else 'directo'} | hilos: {threads}")
+    print(f"Folios entregados: {len(issued)} / {total} en {elapsed:.2f}s ({len(issued) / elapsed:.0f} folios/s)")
+    print(f"Duplicados: {duplicates}")
+    if issued:
+        # Con varios CAF el rango puede tener saltos legítimos entre CAFs: se informan, no fallan
+        gaps = sorted(set(range(min(issued), max(issued) + 1)) - set(issued))
+        print(f"Huecos dentro del rango entregado: {len(gaps)}{' ' + str(gaps[:20]) if gaps else ''}")
+    if len(issued) < total:
+        print("Advertencia: se agotaron los CAF antes de completar la prueba.")
+    return 1 if duplicates else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de asignación de folios")
+    parser.add_argument("schema", help="Esquema del inquilino (ej: tenant_76123456)")
+    parser.add_argument("--tipo", type=int, default=39)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--folios", type=int, default=1000)
+    parser.add_argument("--block-size", type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(run(args.schema, args.tipo, args.threads, args.folios, args.block_size))
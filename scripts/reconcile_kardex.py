@@ -0,0 +1,53 @@
+"""Concilia el kardex: backfill de balance_after, checkpoints y descuadres.
+
+Uso:
+    python scripts/reconcile_kardex.py                       # todos los inquilinos activos
+    python scripts/reconcile_kardex.py --schema tenant_76123456
+    python scripts/reconcile_kardex.py --every 1000
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal, tenant_pools
+from app.models.saas import Tenant
+from app.services.kardex import CHECKPOINT_EVERY, reconcile
+
+
+def reconcile_schema(schema: str, every: int) -> dict:
+    db = SessionLocal(bind=tenant_pools.get_engine(schema))
+    try:
+        return reconcile(db, checkpoint_every=every)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conciliación de kardex")
+    parser.add_argument("--schema", help="Esquema del inquilino (por defecto, todos los activos)")
+    parser.add_argument("--every", type=int, default=CHECKPOINT_EVERY, help="Movimientos entre checkpoints")
+    args = parser.parse_args()
+
+    if args.schema:
+        schemas = [args.schema]
+    else:
+        with SessionLocal() as global_db:
+            schemas = [row[0] for row in global_db.query(Tenant.schema_name).filter(Tenant.is_active == True).all()]
+
+    for schema in schemas:
+        try:
+            report = reconcile_schema(schema, args.every)
+            print(f"  [+] {schema}: {report['products']} productos, {report['backfilled']} saldos completados, "
+                  f"{report['checkpoints']} checkpoints")
+            for drift in report["drift"]:
+                print(f"  [!] {schema}: producto {drift['product_id']} stock {drift['stock_actual']} "
+                      f"vs kardex {drift['kardex_balance']} (dif. {drift['difference']})")
+        except Exception as e:
+            print(f"  [!] {schema}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Regenera el XML de los DTE de un período y arma los sobres de envío.
+
+Uso:
+    python scripts/regenerate_dtes.py --schema tenant_76123456 --desde 2026-01-01 --hasta 2026-01-31 --out envios/
+    python scripts/regenerate_dtes.py --schema tenant_76123456 --ids 10 11 12 --persist
+    python scripts/regenerate_dtes.py --desde 2026-01-01 --hasta 2026-01-31 --processes 8 --tipo 33
+
+Con certificado del inquilino (`TORN_DTE_CERT_DIR`) los documentos se timbran
+y firman antes de guardarlos o ensobrarlos; sin certificado, `--persist`
+no reemplaza los DTE que ya tienen XML firmado.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal, tenant_pools
+from app.models.issuer import Issuer
+from app.models.saas import Tenant
+from app.services import dte_signer
+from app.services.dte_batch import (
+    MAX_DOCS_PER_ENVIO,
+    RENDER_PROCESSES,
+    build_envio,
+    issuer_payload,
+    iter_envios,
+    persist_xml,
+    render_batch,
+    select_sale_ids,
+    sign_documents,
+)
+
+
+def regenerate_schema(schema: str, args) -> tuple:
+    db = SessionLocal(bind=tenant_pools.get_engine(schema))
+    db.info["schema_name"] = schema
+    try:
+        sale_ids = select_sale_ids(db, args.ids, args.desde, args.hasta, args.tipo)
+        issuer = db.query(Issuer).first()
+        if not issuer:
+            raise ValueError("Emisor no configurado")
+        issuer_data = issuer_payload(issuer)
+
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+
+        # Sobre a sobre: memoria acotada a `max_docs` documentos por familia
+        sign = dte_signer.has_certificate(schema)
+        rendered, persisted, envios = 0, 0, 0
+        documents = render_batch(db, sale_ids, processes=args.processes)
+        for n, (kind, docs) in enumerate(iter_envios(documents, args.max_docs), start=1):
+            rendered += len(docs)
+            if sign:
+                docs, errors = sign_documents(db, schema, docs)
+                for sale_id, error in errors.items():
+                    print(f"  [!] {schema}: venta {sale_id} sin firmar: {error}")
+                if not docs:
+                    continue
+            if args.persist:
+                persisted += persist_xml(db, docs)
+            if args.out:
+                path = os.path.join(args.out, f"{schema}_{kind}_{n:04d}.xml")
+                with open(path, "w", encoding="iso-8859-1", errors="xmlcharrefreplace") as f:
+                    f.write(build_envio(docs, issuer_data, rut_envia=args.rut_envia))
+                envios += 1
+        return rendered, persisted, envios
+    finally:
+        db.close()
+
+
+def main():
+    parse_date = lambda v: datetime.strptime(v, "%Y-%m-%d").date()  # noqa: E731
+    parser = argparse.ArgumentParser(description="Regeneración masiva de XML DTE")
+    parser.add_argument("--schema", help="Esquema del inquilino (por defecto, todos los activos)")
+    parser.add_argument("--desde", type=parse_date)
+    parser.add_argument("--hasta", type=parse_date)
+    parser.add_argument("--ids", type=int, nargs="*", help="IDs de venta")
+    parser.add_argument("--tipo", type=int, help="Tipo de DTE (33, 39, 61...)")
+    parser.add_argument("--processes", type=int, default=RENDER_PROCESSES)
+    parser.add_argument("--persist", action="store_true", help="Guardar el XML en dtes.xml_content (sin pisar XML firmado)")
+    parser.add_argument("--out", help="Directorio donde escribir los sobres EnvioDTE/EnvioBOLETA")
+    parser.add_argument("--max-docs", type=int, default=MAX_DOCS_PER_ENVIO, help="Documentos por sobre")
+    parser.add_argument("--rut-envia", help="RUT del titular del certificado (por defecto, el emisor)")
+    args = parser.parse_args()
+
+    if args.schema:
+        schemas = [args.schema]
+    else:
+        with SessionLocal() as global_db:
+            schemas = [row[0] for row in global_db.query(Tenant.schema_name).filter(Tenant.is_active == True).all()]
+
+    for schema in schemas:
+        started = time.perf_counter()
+        try:
+            rendered, persisted, envios = regenerate_schema(schema, args)
+            print(f"  [+] {schema}: {rendered} XML, {persisted} guardados, {envios} sobres "
+                  f"({time.perf_counter() - started:.1f}s)")
+        except Exception as e:
+            print(f"  [!] {schema}: {e}")
+
+
+if __name__ == "__main__":
+    main()
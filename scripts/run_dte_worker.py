@@ -0,0 +1,58 @@
+"""Worker dedicado del pipeline de DTE.
+
+Permite correr la generación de XML en un proceso separado de la API
+(útil con `TORN_DTE_WORKERS=0` en los workers de uvicorn).
+
+Uso:
+    python scripts/run_dte_worker.py              # barrido continuo
+    python scripts/run_dte_worker.py --once       # vacía las colas y termina
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import engine
+from app.services.dte_pipeline import DTE_POLL_INTERVAL, drain_schema, schemas_with_pending_jobs
+
+
+def pending_schemas() -> list:
+    """Inquilinos activos con trabajos por tomar (sin abrir sus pools)."""
+    with engine.connect() as conn:
+        return schemas_with_pending_jobs(conn)
+
+
+def run_once() -> int:
+    total = 0
+    for schema in pending_schemas():
+        try:
+            processed = drain_schema(schema)
+        except Exception as e:
+            print(f"  [!] {schema}: {e}")
+            continue
+        if processed:
+            print(f"  [+] {schema}: {processed} DTE procesados")
+        total += processed
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker del pipeline de DTE")
+    parser.add_argument("--once", action="store_true", help="Procesar las colas una vez y salir")
+    parser.add_argument("--interval", type=float, default=DTE_POLL_INTERVAL or 5)
+    args = parser.parse_args()
+
+    if args.once:
+        print(f"Total: {run_once()} DTE procesados")
+        sys.exit(0)
+
+    print("Worker DTE iniciado. Ctrl+C para detener.")
+    try:
+        while True:
+            if not run_once():
+                time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("Worker DTE detenido.")
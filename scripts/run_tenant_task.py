@@ -0,0 +1,88 @@
+"""Ejecuta una tarea de mantenimiento en todos los inquilinos (en paralelo y reanudable).
+
+El progreso queda en runs/<tarea>.jsonl (`TORN_TENANT_RUNNER_DIR`): si la
+corrida se interrumpe o hay fallos, volver a ejecutar el mismo comando
+omite los inquilinos ya completados y reintenta el resto.
+
+Uso:
+    python scripts/run_tenant_task.py --list
+    python scripts/run_tenant_task.py seed_roles --parallel 16
+    python scripts/run_tenant_task.py sync_price_lists --schema tenant_76123456k
+    python scripts/run_tenant_task.py --sql migracion.sql --name add_columna_x
+    python scripts/run_tenant_task.py sync_user_roles --fresh   # ignora el checkpoint
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from app.services import tenant_runner
+from app.services.tenant_tasks import TASKS, sql_task
+
+
+def print_result(outcome) -> None:
+    if outcome.status == "error":
+        print(f"  [!] {outcome.schema_name}: {outcome.error} ({outcome.attempts} intentos)", flush=True)
+    elif outcome.status == "ok":
+        retried = f" ({outcome.attempts} intentos)" if outcome.attempts > 1 else ""
+        print(f"  [+] {outcome.schema_name}: {outcome.result} {outcome.seconds:.2f}s{retried}", flush=True)
+
+
+def cli(task_name: str = None) -> int:
+    """Punto de entrada común (también lo usan los scripts de una sola tarea)."""
+    parser = argparse.ArgumentParser(description="Tarea de mantenimiento sobre todos los inquilinos")
+    if task_name is None:
+        parser.add_argument("task", nargs="?", choices=sorted(TASKS), help="Tarea registrada")
+        parser.add_argument("--sql", help="Script SQL a aplicar en cada esquema (en vez de una tarea)")
+        parser.add_argument("--name", help="Nombre de la corrida --sql (archivo de checkpoint)")
+        parser.add_argument("--list", action="store_true", help="Listar tareas disponibles")
+    parser.add_argument("--schema", action="append", help="Limitar a estos esquemas (repetible)")
+    parser.add_argument("--all", action="store_true", help="Incluir inquilinos inactivos")
+    parser.add_argument("--parallel", type=int, default=tenant_runner.PARALLELISM)
+    parser.add_argument("--retries", type=int, default=tenant_runner.RETRIES)
+    parser.add_argument("--fresh", action="store_true", help="Ignorar el checkpoint y procesar todo")
+    args = parser.parse_args()
+
+    if task_name is None:
+        if args.list:
+            for name, fn in sorted(TASKS.items()):
+                print(f"  {name:<24} {(fn.__doc__ or '').strip()}")
+            return 0
+        if args.sql:
+            task_name = args.name or f"sql_{Path(args.sql).stem}"
+            task = sql_task(Path(args.sql).read_text(encoding="utf-8"))
+        elif args.task:
+            task_name, task = args.task, TASKS[args.task]
+        else:
+            parser.error("Indique una tarea o --sql")
+    else:
+        task = TASKS[task_name]
+
+    with SessionLocal() as global_db:
+        tenants = tenant_runner.list_tenants(global_db, args.schema, include_inactive=args.all)
+    checkpoint = tenant_runner.checkpoint_path(task_name)
+    print(f"Tarea: {task_name} | inquilinos: {len(tenants)} | paralelismo: {args.parallel} | checkpoint: {checkpoint}")
+
+    report = tenant_runner.run_tenants(
+        task, tenants,
+        parallelism=args.parallel,
+        retries=args.retries,
+        checkpoint=checkpoint,
+        resume=not args.fresh,
+        on_result=print_result,
+        task_name=task_name,
+    )
+    summary = report.summary()
+    print(f"\nok={summary['ok']} fallidos={summary['failed']} omitidos={summary['skipped']} "
+          f"reintentados={summary['retried']} en {summary['seconds']}s")
+    if report.failed:
+        print("  [!] Volver a ejecutar el mismo comando reintenta sólo los fallidos/pendientes.")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
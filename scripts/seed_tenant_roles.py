@@ -1,53 +1,19 @@
-import os
-import sys
-import json
-from sqlalchemy import create_engine, text
+"""Inserta los roles por defecto faltantes en cada inquilino (y su proyección de permisos).
+
+Corre sobre todos los inquilinos con `tenant_runner` (en paralelo, con
+reintentos y checkpoint en runs/seed_roles.jsonl). Acepta las mismas opciones
+que `scripts/run_tenant_task.py` (--parallel, --schema, --fresh...).
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+Uso:
+    python scripts/seed_tenant_roles.py --parallel 16
+"""
 
-from app.database import engine
+import os
+import sys
 
-DEFAULT_ROLES = [
-    {
-        "id": 1,
-        "name": "ADMINISTRADOR",
-        "description": "Acceso total al sistema",
-        "permissions": json.dumps({"all": True})
-    },
-    {
-        "id": 2,
-        "name": "VENDEDOR",
-        "description": "Rol para generar ventas y administrar caja",
-        "permissions": json.dumps({"sales": True, "cash": True})
-    }
-]
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-def seed_roles():
-    with engine.connect() as conn:
-        result = conn.execute(text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE 'tenant_%'"))
-        schemas = [row[0] for row in result.fetchall()]
-        
-        for schema in schemas:
-            print(f"Checking roles in {schema}...")
-            # Set search path to tenant
-            conn.execute(text(f'SET search_path TO "{schema}"'))
-            
-            # Check if roles exist
-            existing = conn.execute(text("SELECT id, name FROM roles")).fetchall()
-            existing_ids = [row[0] for row in existing]
-            
-            for role in DEFAULT_ROLES:
-                if role["id"] not in existing_ids:
-                    print(f"  Inserting role {role['name']} ({role['id']}) into {schema}.roles")
-                    conn.execute(text("""
-                        INSERT INTO roles (id, name, description, permissions)
-                        VALUES (:id, :name, :description, :permissions)
-                    """), role)
-                    # Update sequence if necessary
-                    conn.execute(text("SELECT setval('roles_id_seq', (SELECT MAX(id) FROM roles))"))
-            
-            conn.commit()
+from run_tenant_task import cli
 
 if __name__ == "__main__":
-    seed_roles()
-    print("Roles seeded successfully.")
+    sys.exit(cli("seed_roles"))
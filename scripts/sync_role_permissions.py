@@ -0,0 +1,22 @@
+"""Reconstruye la proyección public.tenant_role_permissions desde los roles de cada inquilino.
+
+Necesario sólo si los roles se editaron fuera de la API (SQL directo,
+restauraciones); el aprovisionamiento y `PUT /roles/{id}` la mantienen al día.
+
+Corre sobre todos los inquilinos con `tenant_runner` (en paralelo, con
+reintentos y checkpoint en runs/sync_role_permissions.jsonl). Acepta las mismas opciones
+que `scripts/run_tenant_task.py` (--parallel, --schema, --fresh...).
+
+Uso:
+    python scripts/sync_role_permissions.py --parallel 16
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from run_tenant_task import cli
+
+if __name__ == "__main__":
+    sys.exit(cli("sync_role_permissions"))
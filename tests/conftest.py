@@ -2,10 +2,11 @@
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+import app.models  # noqa: F401  (registra todos los modelos)
 from app.database import Base, get_db
 from app.main import app
 
@@ -35,6 +36,34 @@ def db_session():
         Base.metadata.drop_all(bind=engine_test)
 
 
+@pytest.fixture
+def tenant_engine():
+    """SQLite en memoria con las tablas del esquema de un inquilino (sin las de `public`)."""
+    engine = create_engine("sqlite://")
+
+    # pysqlite no emite BEGIN por sí mismo: sin esto los SAVEPOINT
+    # (`begin_nested`) abren y confirman su propia transacción
+    @event.listens_for(engine, "connect")
+    def _autocommit_driver(dbapi_conn, _):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.connection.driver_connection.execute("BEGIN")
+
+    Base.metadata.create_all(engine, tables=[t for t in Base.metadata.sorted_tables if t.schema is None])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def tenant_db(tenant_engine):
+    """Sesión sobre `tenant_engine`."""
+    session = sessionmaker(bind=tenant_engine)()
+    yield session
+    session.close()
+
+
 @pytest.fixture(scope="function")
 def client(db_session):
     """TestClient de FastAPI que usa la BD de prueba."""
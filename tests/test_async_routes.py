@@ -0,0 +1,97 @@
+"""Tests de los endpoints migrados a sesión async (catálogo POS, precios, estado DTE)."""
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.database import AsyncSessionLocal, Base
+from app.dependencies import tenant as dep
+from app.main import app
+from app.models.customer import Customer
+from app.models.dte import DTE, DteJob
+from app.models.price_list import PriceList, PriceListProduct
+from app.models.product import Product
+from app.models.saas import SaaSUser, TenantUser
+from app.models.sale import Sale
+from app.models.user import User
+
+
+@pytest.fixture
+def client(tmp_path):
+    url = f"sqlite:///{tmp_path / 'tenant.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine, tables=[t for t in Base.metadata.sorted_tables if t.schema is None])
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        User(id=1, rut="11111111-1", razon_social="Caja", email="caja@torn.cl"),
+        PriceList(id=1, name="Mayorista"),
+        Customer(id=1, rut="12345678-5", razon_social="Cliente", price_list_id=1),
+    ])
+    db.flush()
+    db.add_all([
+        Product(id=i, codigo_interno=f"P{i}", nombre=f"Producto {i}", precio_neto=1000 + i, codigo_barras=f"780{i}")
+        for i in range(1, 6)
+    ])
+    db.flush()
+    db.add(PriceListProduct(price_list_id=1, product_id=2, fixed_price=500))
+    db.add(Sale(id=1, user_id=1, customer_id=1, folio=10, tipo_dte=39, monto_neto=1, iva=0, monto_total=1))
+    db.flush()
+    db.add(DTE(id=1, sale_id=1, tipo_dte=39, folio=10, estado_sii="PENDIENTE"))
+    db.flush()
+    db.add(DteJob(dte_id=1, sale_id=1, status="PENDING", attempts=1))
+    db.commit()
+    db.close()
+
+    async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+
+    async def tenant_async_db():
+        async with AsyncSessionLocal(bind=async_engine) as session:
+            session.info["schema_name"] = "tenant_test"
+            yield session
+
+    user = SaaSUser(id=1, email="caja@torn.cl", is_active=True, is_superuser=False)
+    app.dependency_overrides[dep.get_tenant_async_db] = tenant_async_db
+    app.dependency_overrides[dep.get_current_global_user] = lambda: user
+    app.dependency_overrides[dep.get_current_tenant_user] = lambda: TenantUser(tenant_id=1, user_id=1, role_name="CAJERO")
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+
+def test_pos_catalog_pages_with_cursor(client):
+    response = client.get("/products/pos?limit=2")
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json()] == [5, 4]
+    assert response.headers["X-Next-Cursor"] == "4"
+
+    response = client.get("/products/pos?limit=5&cursor=4")
+    assert [p["id"] for p in response.json()] == [3, 2, 1]
+    assert "X-Next-Cursor" not in response.headers
+
+    assert client.get("/products/P3").json()["full_name"] == "Producto 3"
+    assert client.get("/products/NOPE").status_code == 404
+
+
+def test_price_resolution_uses_customer_list(client):
+    resolved = client.get("/price-lists/resolve-price/2?customer_id=1").json()
+    assert (resolved["source"], resolved["resolved_price"]) == ("price_list", "500.00")
+    assert client.get("/price-lists/resolve-price/3").json()["source"] == "base_price"
+    assert client.get("/price-lists/resolve-price/99").status_code == 404
+
+    batch = client.post("/price-lists/resolve-prices", json={
+        "customer_id": 1, "product_ids": [2, 99], "barcodes": ["7804"],
+    }).json()
+    assert [(i["product_id"], i["source"]) for i in batch["items"]] == [(2, "price_list"), (4, "base_price")]
+    assert batch["missing_product_ids"] == [99]
+
+
+def test_dte_status_with_async_local_user(client):
+    status = client.get("/sales/1/dte").json()
+    assert (status["estado_sii"], status["job_status"], status["attempts"]) == ("PENDIENTE", "PENDING", 1)
+    assert client.get("/sales/2/dte").status_code == 404
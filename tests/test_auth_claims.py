@@ -0,0 +1,171 @@
+"""Tests de los tokens con claims: autorización sin consultas, refresh y revocación."""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.database import AsyncSessionLocal, Base
+from app.dependencies import tenant as dep
+from app.models.saas import SaaSPlan, SaaSUser, Tenant, TenantRolePermission, TenantUser
+from app.utils.security import PasswordPoolBusy, create_access_token, create_claims_token, create_refresh_token
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_sqlite(element, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    for cache in (dep.token_versions, dep.tenant_states, dep.membership_cache):
+        cache.clear()
+    yield
+    for cache in (dep.token_versions, dep.tenant_states, dep.membership_cache):
+        cache.clear()
+
+
+def _user(**overrides) -> SaaSUser:
+    fields = dict(id=7, email="caja@torn.cl", full_name="Caja", is_active=True, is_superuser=False, token_version=2)
+    fields.update(overrides)
+    return SaaSUser(**fields)
+
+
+def _resolve(token: str, tenant_id: int):
+    """Usuario y membresía sin sesión global: cualquier consulta fallaría."""
+    async def scenario():
+        claims = await dep.get_token_claims(token)
+        user = await dep.get_current_global_user(claims, global_db=None)
+        return user, await dep.get_current_tenant_user(tenant_id, user, claims, global_db=None)
+    return asyncio.run(scenario())
+
+
+def test_claims_authorize_without_global_queries():
+    token = create_claims_token(_user(), {3: ("VENDEDOR", "tenant_76123456k")})
+    dep.token_versions.set(7, (2, True))
+    dep.tenant_states.set(3, True)
+
+    user, membership = _resolve(token, 3)
+    assert (user.id, user.email, user.is_superuser) == (7, "caja@torn.cl", False)
+    assert (membership.role_name, membership.tenant.schema_name, membership.user_id) == ("VENDEDOR", "tenant_76123456k", 7)
+    assert membership.is_active and membership.tenant.is_active
+
+    with pytest.raises(HTTPException) as exc:
+        _resolve(token, 4)
+    assert exc.value.status_code == 403
+
+
+@pytest.mark.parametrize("cached", [(3, True), (2, False)])
+def test_revoked_or_inactive_user_is_rejected(cached):
+    token = create_claims_token(_user(), {3: ("VENDEDOR", "tenant_x")})
+    dep.token_versions.set(7, cached)
+    with pytest.raises(HTTPException) as exc:
+        _resolve(token, 3)
+    assert exc.value.status_code == 401
+
+
+def test_claims_membership_reflects_tenant_state():
+    token = create_claims_token(_user(), {3: ("VENDEDOR", "tenant_x")})
+    dep.token_versions.set(7, (2, True))
+    dep.tenant_states.set(3, False)
+    _, membership = _resolve(token, 3)
+    assert membership.tenant.is_active is False
+
+    dep.invalidate_membership_cache(tenant_id=3)
+    assert dep.tenant_states.get(3) is None
+
+
+def test_refresh_token_is_not_an_access_token():
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(dep.get_token_claims(create_refresh_token(_user())))
+    assert exc.value.status_code == 401
+    # Los tokens históricos (sin `typ`) siguen siendo válidos
+    assert asyncio.run(dep.get_token_claims(create_access_token("caja@torn.cl")))["sub"] == "caja@torn.cl"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.main import app
+    from app.routers import auth
+
+    def attach(dbapi_conn, _):
+        dbapi_conn.execute(f"ATTACH DATABASE '{tmp_path / 'public.db'}' AS public")
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'main.db'}")
+    event.listen(engine, "connect", attach)
+    tables = [SaaSPlan.__table__, Tenant.__table__, SaaSUser.__table__, TenantUser.__table__, TenantRolePermission.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        Tenant(id=3, name="Demo", schema_name="tenant_demo", is_active=True),
+        Tenant(id=4, name="Suspendida", schema_name="tenant_old", is_active=False),
+        SaaSUser(id=7, email="caja@torn.cl", full_name="Caja", is_active=True, is_superuser=False,
+                 hashed_password=CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("pw")),
+    ])
+    db.flush()
+    db.add_all([
+        TenantUser(tenant_id=3, user_id=7, role_name="VENDEDOR", is_active=True),
+        TenantUser(tenant_id=4, user_id=7, role_name="VENDEDOR", is_active=True),
+        TenantRolePermission(tenant_id=3, role_name="VENDEDOR", permissions={"pos": True}),
+    ])
+    db.commit()
+    db.close()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'main.db'}")
+    event.listen(async_engine.sync_engine, "connect", attach)
+
+    async def global_async_db():
+        async with AsyncSessionLocal(bind=async_engine) as session:
+            yield session
+
+    monkeypatch.setattr(auth, "AUTH_CLAIMS", True)
+    app.dependency_overrides[dep.get_global_async_db] = global_async_db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_login_refresh_and_logout_all(client):
+    r = client.post("/auth/login", json={"email": "caja@torn.cl", "password": "pw"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["refresh_token"] and body["expires_in"] == 15 * 60
+    assert body["available_tenants"][0]["permissions"] == {"pos": True}
+
+    claims = asyncio.run(dep.get_token_claims(body["access_token"]))
+    assert claims["uid"] == 7 and claims["tnt"] == {"3": ["VENDEDOR", "tenant_demo"]}  # sin la suspendida
+
+    headers = {"Authorization": f"Bearer {body['access_token']}"}
+    assert client.get("/auth/users/me", headers=headers).json()["email"] == "caja@torn.cl"
+
+    r = client.post("/auth/refresh", json={"refresh_token": body["refresh_token"]})
+    assert r.status_code == 200
+    refreshed = r.json()
+    assert client.post("/auth/refresh", json={"refresh_token": body["access_token"]}).status_code == 401
+
+    assert client.post("/auth/logout-all", headers=headers).status_code == 204
+    assert client.get("/auth/users/me", headers=headers).status_code == 401
+    assert client.get("/auth/users/me", headers={"Authorization": f"Bearer {refreshed['access_token']}"}).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": refreshed["refresh_token"]}).status_code == 401
+
+
+def test_busy_password_pool_returns_503(client, monkeypatch):
+    from app.routers import auth
+
+    async def busy(*args):
+        raise PasswordPoolBusy("Demasiadas operaciones de contraseña en curso")
+
+    monkeypatch.setattr(auth, "verify_and_update_async", busy)
+    r = client.post("/auth/login", json={"email": "caja@torn.cl", "password": "pw"})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "2"
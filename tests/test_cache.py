@@ -0,0 +1,65 @@
+"""Tests unitarios de la caché TTL y la caché de membresías."""
+
+import time
+
+from app.utils.cache import TTLCache
+from app.dependencies.tenant import (
+    CachedMembership,
+    invalidate_membership_cache,
+    membership_cache,
+)
+
+
+class TestTTLCache:
+    def test_hit_miss_counters(self):
+        cache = TTLCache(ttl=60, max_entries=10)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_entries_expire(self):
+        cache = TTLCache(ttl=0.01, max_entries=10)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction(self):
+        cache = TTLCache(ttl=60, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" pasa a ser el menos usado
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+
+
+class TestMembershipCacheInvalidation:
+    def _membership(self, tenant_id: int) -> CachedMembership:
+        return CachedMembership(
+            membership_id=1, user_id=1, tenant_id=tenant_id, role_name="VENDEDOR",
+            is_active=True, schema_name=f"tenant_{tenant_id}", tenant_is_active=True,
+        )
+
+    def test_invalidate_by_tenant_and_subject(self):
+        membership_cache.clear()
+        membership_cache.set(("a@torn.cl", 1), self._membership(1))
+        membership_cache.set(("a@torn.cl", 2), self._membership(2))
+        membership_cache.set(("b@torn.cl", 1), self._membership(1))
+
+        assert invalidate_membership_cache(tenant_id=2) == 1
+        assert membership_cache.get(("a@torn.cl", 2)) is None
+
+        assert invalidate_membership_cache(subject="b@torn.cl") == 1
+        assert membership_cache.get(("b@torn.cl", 1)) is None
+        assert membership_cache.get(("a@torn.cl", 1)) is not None
+
+        membership_cache.clear()
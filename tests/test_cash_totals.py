@@ -0,0 +1,84 @@
+"""Tests unitarios de los totales acumulados de caja."""
+
+from decimal import Decimal
+
+import pytest
+
+from app.models.cash import CashSession, CashSessionTotal
+from app.models.customer import Customer
+from app.models.payment import PaymentMethod, SalePayment
+from app.models.sale import Sale
+from app.models.user import User
+from app.services.cash_totals import (
+    cashier_summary,
+    check_consistency,
+    expected_cash,
+    record_payments,
+    session_totals,
+)
+
+
+@pytest.fixture
+def db(tenant_db):
+    tenant_db.add_all([
+        User(id=1, rut="11111111-1", razon_social="Cajero", email="caja@torn.cl"),
+        Customer(id=1, rut="12345678-5", razon_social="Cliente"),
+        PaymentMethod(id=1, code="EFECTIVO", name="Efectivo"),
+        PaymentMethod(id=2, code="DEBITO", name="Débito"),
+    ])
+    tenant_db.flush()
+    tenant_db.add(CashSession(id=1, user_id=1, start_amount=1000, status="OPEN"))
+    tenant_db.commit()
+    return tenant_db
+
+
+def _sale(db, payments, related_sale_id=None) -> list:
+    sale = Sale(customer_id=1, user_id=1, seller_id=1, folio=1, tipo_dte=39 if related_sale_id is None else 61,
+                monto_neto=0, iva=0, monto_total=0, related_sale_id=related_sale_id)
+    db.add(sale)
+    db.flush()
+    rows = [SalePayment(sale_id=sale.id, payment_method_id=m, amount=Decimal(a)) for m, a in payments]
+    db.add_all(rows)
+    db.flush()
+    return rows
+
+
+def test_running_totals_and_expected_cash(db):
+    record_payments(db, 1, _sale(db, [(1, 500), (2, 300)]))
+    record_payments(db, 1, _sale(db, [(1, 200)]))
+    record_payments(db, 1, _sale(db, [(1, 100)], related_sale_id=1), sign=-1)
+    db.commit()
+
+    assert session_totals(db, 1) == {1: (3, Decimal("600")), 2: (1, Decimal("300"))}
+    assert expected_cash(db, db.get(CashSession, 1)) == Decimal("1600")
+    assert check_consistency(db) == []
+
+
+def test_check_consistency_detects_and_repairs(db):
+    record_payments(db, 1, _sale(db, [(1, 500)]))
+    _sale(db, [(2, 700)])  # venta sin acumular
+    db.commit()
+
+    report = check_consistency(db, session_ids=[1], repair=True)
+    assert report == [{"cash_session_id": 1, "differences": [
+        {"payment_method_id": 2, "running": Decimal("0"), "recomputed": Decimal("700")},
+    ]}]
+    assert db.query(CashSessionTotal).count() == 2
+    assert check_consistency(db, session_ids=[1]) == []
+
+
+def test_cashier_summary(db):
+    db.add_all([
+        CashSession(user_id=1, start_amount=0, final_cash_system=1000, difference=-300, status="CLOSED"),
+        CashSession(user_id=1, start_amount=0, final_cash_system=2000, difference=100, status="CLOSED"),
+        CashSession(user_id=1, start_amount=0, final_cash_system=500, difference=-50, status="CLOSED_SYSTEM"),
+    ])
+    db.commit()
+
+    [row] = cashier_summary(db)
+    assert row["sessions"] == 3  # la sesión abierta no cuenta
+    assert (row["shortage_sessions"], row["surplus_sessions"]) == (2, 1)
+    assert row["shortage_total"] == Decimal("350")
+    assert row["max_shortage"] == Decimal("300")
+    assert row["net_difference"] == Decimal("-250")
+    assert cashier_summary(db, user_id=99) == []
@@ -0,0 +1,74 @@
+"""Tests unitarios del volcado y deltas del catálogo POS."""
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.models.price_list import PriceList, PriceListProduct
+from app.models.product import Product
+from app.models.tax import Tax
+from app.services.catalog_sync import PRODUCT_FIELDS, build_delta, build_snapshot
+
+LONG_AGO = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db(tenant_db):
+    tenant_db.add_all([
+        Tax(id=1, name="IVA", rate=Decimal("0.19")),
+        Product(id=1, codigo_interno="POL", nombre="Polera", precio_neto=1000, tax_id=1,
+                created_at=LONG_AGO, updated_at=LONG_AGO),
+        Product(id=2, codigo_interno="POL-S", nombre="S", precio_neto=1000, parent_id=1,
+                codigo_barras="2000000000022", created_at=LONG_AGO, updated_at=LONG_AGO),
+        Product(id=3, codigo_interno="OLD", nombre="Inactivo", precio_neto=1, is_active=False,
+                created_at=LONG_AGO, updated_at=LONG_AGO),
+        PriceList(id=1, name="Mayorista", created_at=LONG_AGO, updated_at=LONG_AGO),
+        PriceListProduct(price_list_id=1, product_id=2, fixed_price=Decimal("800")),
+    ])
+    tenant_db.commit()
+    return tenant_db
+
+
+def _rows(payload):
+    return {row[0]: dict(zip(PRODUCT_FIELDS, row)) for row in payload["products"]}
+
+
+def test_snapshot_contains_sellable_catalog(db):
+    snap = build_snapshot(db)
+    rows = _rows(snap)
+    assert set(rows) == {1, 2}
+    assert rows[2]["full_name"] == "Polera S"
+    assert rows[2]["codigo_barras"] == "2000000000022"
+    assert snap["taxes"] == {1: Decimal("0.19")}
+    assert snap["price_lists"] == {1: [[2, Decimal("800")]]}
+
+
+def test_delta_only_returns_changes(db):
+    version = build_snapshot(db)["version"]
+    assert build_delta(db, version)["products"] == []
+
+    now = datetime.now(timezone.utc)
+    parent = db.get(Product, 1)
+    parent.nombre, parent.updated_at = "Camiseta", now
+    db.get(Product, 2).updated_at = LONG_AGO
+    retired = db.get(Product, 3)
+    retired.is_deleted, retired.updated_at = True, now
+    pl = db.get(PriceList, 1)
+    pl.updated_at = now
+    db.commit()
+
+    delta = build_delta(db, version)
+    rows = _rows(delta)
+    # La variante viaja porque cambió el nombre del padre
+    assert set(rows) == {1, 2}
+    assert rows[2]["full_name"] == "Camiseta S"
+    assert delta["removed"] == [3]
+    assert delta["price_lists"] == {1: [[2, Decimal("800")]]}
+    assert delta["price_list_ids"] == [1]
+
+
+def test_delta_ignores_changes_before_overlap(db):
+    version = int((datetime.now(timezone.utc) + timedelta(hours=1)).timestamp() * 1000)
+    delta = build_delta(db, version)
+    assert delta["products"] == [] and delta["removed"] == [] and delta["price_lists"] == {}
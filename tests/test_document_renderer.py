@@ -0,0 +1,84 @@
+"""Tests unitarios del renderizado y caché de documentos HTML."""
+
+from datetime import date, datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.customer import Customer
+from app.models.issuer import Issuer
+from app.models.product import Product
+from app.models.sale import Sale, SaleDetail
+from app.models.user import User
+from app.services import document_renderer
+from app.services.document_renderer import BatchTooLargeError, DocumentError
+
+@pytest.fixture
+def db(tenant_db):
+    tenant_db.info["schema_name"] = "tenant_test"
+    tenant_db.add_all([
+        User(id=1, rut="11111111-1", razon_social="Cajero", email="caja@torn.cl"),
+        Customer(id=1, rut="12345678-5", razon_social="Cliente"),
+        Issuer(rut="76123456-K", razon_social="Emisora", giro="Comercio", acteco="1"),
+        Product(id=1, codigo_interno="A", nombre="Producto A", precio_neto=1000),
+    ])
+    tenant_db.flush()
+    for folio in (1, 2):
+        tenant_db.add(Sale(id=folio, customer_id=1, user_id=1, folio=folio, tipo_dte=39, monto_neto=1000,
+                         iva=190, monto_total=1190, details=[
+                             SaleDetail(product_id=1, cantidad=1, precio_unitario=1000, subtotal=1000),
+                         ]))
+    tenant_db.commit()
+    document_renderer.invalidate_tenant("tenant_test")
+    return tenant_db
+
+def test_warm_up_compiles_templates():
+    assert document_renderer.warm_up() >= 3
+
+def test_reprint_served_from_cache(db):
+    html = document_renderer.render_sale(db, 1)
+    assert "Emisora" in html and "Producto A" in html
+
+    # Sin la venta en la base, la reimpresión sigue saliendo de la caché
+    db.query(SaleDetail).delete()
+    db.query(Sale).filter(Sale.id == 1).delete()
+    db.commit()
+    assert document_renderer.render_sale(db, 1) == html
+    with pytest.raises(DocumentError):
+        document_renderer.render_sale(db, 1, fmt="carta")
+
+def test_invalidate_tenant_refreshes_issuer(db):
+    document_renderer.render_sale(db, 1)
+    db.query(Issuer).update({"razon_social": "Nueva Razón"})
+    db.commit()
+    assert "Nueva Razón" not in document_renderer.render_sale(db, 1)
+
+    document_renderer.invalidate_tenant("tenant_test")
+    assert "Nueva Razón" in document_renderer.render_sale(db, 1)
+
+def test_batch_joins_documents(db):
+    html = document_renderer.render_sales_batch(db, [1, 2, 2, 99])
+    assert html.count("<body") == 1 and html.count("</html>") == 1
+    assert html.count("page-break-after") == 1
+    with pytest.raises(DocumentError):
+        document_renderer.render_sales_batch(db, [99])
+
+def test_batch_limit_and_day_pages(db, monkeypatch):
+    from app.routers import sales
+
+    monkeypatch.setattr(document_renderer, "MAX_BATCH", 1)
+    monkeypatch.setattr(sales, "MAX_BATCH", 1)
+    with pytest.raises(BatchTooLargeError):
+        document_renderer.render_sales_batch(db, [1, 2])
+
+    batch = dict(ids=None, fecha=None, tipo_dte=None, seller_id=None, cursor=None, format=None, db=db)
+    with pytest.raises(HTTPException) as exc:
+        sales.get_sales_pdf_batch(**{**batch, "ids": [1, 2]})
+    assert exc.value.status_code == 413
+
+    db.query(Sale).update({"fecha_emision": datetime(2026, 3, 10, 15, 0, tzinfo=timezone.utc)})
+    db.commit()
+    first = sales.get_sales_pdf_batch(**{**batch, "fecha": date(2026, 3, 10)})
+    assert first.headers["X-Next-Cursor"] == "1"
+    last = sales.get_sales_pdf_batch(**{**batch, "fecha": date(2026, 3, 10), "cursor": 1})
+    assert "X-Next-Cursor" not in last.headers
@@ -0,0 +1,86 @@
+"""Tests unitarios de la generación masiva de XML DTE y sobres de envío."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models.customer import Customer
+from app.models.dte import DTE
+from app.models.issuer import Issuer
+from app.models.product import Product
+from app.models.sale import Sale, SaleDetail
+from app.models.user import User
+from app.services.dte_batch import build_envio, issuer_payload, iter_envios, is_signed, persist_xml, render_batch, select_sale_ids
+from app.services.xml_generator import render_factura_xml
+
+EMITTED = datetime(2026, 3, 2, 15, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db(tenant_db):
+    tenant_db.add_all([
+        User(id=1, rut="11111111-1", razon_social="Cajero", email="caja@torn.cl"),
+        Customer(id=1, rut="12345678-5", razon_social="Cliente & Cía"),
+        Issuer(rut="76123456-K", razon_social="Emisora", giro="Comercio", acteco="1"),
+        Product(id=1, codigo_interno="A", nombre="Producto A", precio_neto=1000),
+        Product(id=2, codigo_interno="B", nombre="Producto B", precio_neto=500, unidad_medida="kg"),
+    ])
+    tenant_db.flush()
+    for i in range(1, 121):
+        tenant_db.add(Sale(
+            id=i, customer_id=1, user_id=1, folio=i, tipo_dte=39 if i % 3 else 33, fecha_emision=EMITTED,
+            monto_neto=1500, iva=285, monto_total=1785, details=[
+                SaleDetail(product_id=1, cantidad=1, precio_unitario=1000, subtotal=1000),
+                SaleDetail(product_id=2, cantidad=1, precio_unitario=500, subtotal=500),
+            ],
+        ))
+        tenant_db.add(DTE(sale_id=i, tipo_dte=39 if i % 3 else 33, folio=i, estado_sii="GENERADO"))
+    tenant_db.commit()
+    return tenant_db
+
+
+def test_batch_matches_single_render(db):
+    sale_ids = select_sale_ids(db, date_from=EMITTED.date(), date_to=EMITTED.date())
+    assert len(sale_ids) == 120
+
+    sale = db.get(Sale, 7)
+    expected = render_factura_xml(sale, db.query(Issuer).first(), sale.customer)
+    docs = list(render_batch(db, sale_ids, processes=1, chunk_size=40))
+    assert [d[0] for d in docs] == sale_ids
+    assert docs[6][3] == expected
+
+
+def test_process_pool_render(db):
+    sequential = list(render_batch(db, list(range(1, 121)), processes=1))
+    parallel = list(render_batch(db, list(range(1, 121)), processes=2))
+    assert parallel == sequential
+
+
+def test_envios_and_persist(db):
+    docs = list(render_batch(db, select_sale_ids(db, tipo_dte=33), processes=1))
+    envios = list(iter_envios(docs, max_docs=30))
+    assert [(kind, len(batch)) for kind, batch in envios] == [("EnvioDTE", 30), ("EnvioDTE", 10)]
+
+    issuer = issuer_payload(db.query(Issuer).first())
+    xml = build_envio(envios[1][1], issuer)
+    assert xml.count("<?xml") == 1
+    assert "<SubTotDTE><TpoDTE>33</TpoDTE><NroDTE>10</NroDTE></SubTotDTE>" in xml
+    assert xml.count("<DTE ") == 10 and xml.rstrip().endswith("</EnvioDTE>")
+
+    assert persist_xml(db, docs) == 40
+    assert db.query(DTE).filter(DTE.xml_content.isnot(None)).count() == 40
+
+
+def test_persist_keeps_signed_xml(db):
+    signed = '<DTE><Documento ID="F3T33"><TED version="1.0"/></Documento><Signature><SignatureValue>x</SignatureValue></Signature></DTE>'
+    db.query(DTE).filter(DTE.sale_id == 3).update({"xml_content": signed})
+    db.commit()
+
+    docs = list(render_batch(db, [3, 6], processes=1))
+    assert not any(is_signed(d[3]) for d in docs)
+    assert persist_xml(db, docs) == 1
+    assert db.query(DTE).filter(DTE.sale_id == 3).one().xml_content == signed
+
+    resigned = [(3, 33, 3, signed.replace(">x<", ">y<"))]
+    assert persist_xml(db, resigned) == 1
+    assert ">y<" in db.query(DTE).filter(DTE.sale_id == 3).one().xml_content
@@ -0,0 +1,103 @@
+"""Tests unitarios del pipeline asíncrono de DTE."""
+
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.models.customer import Customer
+from app.models.dte import DTE, DteJob
+from app.models.issuer import Issuer
+from app.models.product import Product
+from app.models.sale import Sale, SaleDetail
+from app.services import dte_pipeline
+from app.services.dte_pipeline import enqueue_dte, process_batch, queue_stats
+
+
+@pytest.fixture
+def db(tenant_db):
+    tenant_db.add_all([
+        Customer(id=1, rut="12345678-5", razon_social="Cliente"),
+        Product(id=1, codigo_interno="A", nombre="Producto A", precio_neto=1000),
+        Issuer(rut="76123456-K", razon_social="Emisor", giro="Comercio", acteco="1"),
+    ])
+    tenant_db.commit()
+    return tenant_db
+
+
+def _sale(db, folio: int) -> Sale:
+    sale = Sale(
+        user_id=1, customer_id=1, folio=folio, tipo_dte=33,
+        monto_neto=Decimal("1000"), iva=Decimal("190"), monto_total=Decimal("1190"),
+        details=[SaleDetail(product_id=1, cantidad=1, precio_unitario=Decimal("1000"), subtotal=Decimal("1000"))],
+    )
+    db.add(sale)
+    db.flush()
+    enqueue_dte(db, sale)
+    db.commit()
+    return sale
+
+
+def test_sale_commits_pending_and_batch_generates_xml(db):
+    sales = [_sale(db, folio) for folio in (1, 2, 3)]
+    assert {d.estado_sii for d in db.query(DTE).all()} == {"PENDIENTE"}
+    assert queue_stats(db)["pending"] == 3
+
+    assert process_batch(db, batch_size=2) == 2
+    assert process_batch(db, batch_size=2) == 1
+    assert process_batch(db, batch_size=2) == 0
+
+    db.expire_all()
+    for sale in sales:
+        dte = db.query(DTE).filter(DTE.sale_id == sale.id).one()
+        assert dte.estado_sii == "GENERADO"
+        assert f"<Folio>{sale.folio}</Folio>" in dte.xml_content
+    assert queue_stats(db)["done"] == 3
+
+
+def test_failed_job_retries_then_errors(db, monkeypatch):
+    _sale(db, 1)
+
+    def boom(*args):
+        raise ValueError("plantilla inválida")
+
+    monkeypatch.setattr(dte_pipeline, "render_factura_xml", boom)
+    monkeypatch.setattr(dte_pipeline, "DTE_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(dte_pipeline, "DTE_RETRY_BASE", timedelta(0))
+
+    process_batch(db)
+    job = db.query(DteJob).one()
+    assert (job.status, job.attempts) == ("PENDING", 1)
+
+    process_batch(db)
+    db.expire_all()
+    job = db.query(DteJob).one()
+    assert (job.status, job.attempts) == ("ERROR", 2)
+    assert job.dte.estado_sii == "ERROR"
+    assert "plantilla inválida" in job.last_error
+
+
+def test_failed_job_waits_backoff_before_retry(db, monkeypatch):
+    _sale(db, 1)
+
+    def boom(*args):
+        raise ValueError("plantilla inválida")
+
+    monkeypatch.setattr(dte_pipeline, "render_factura_xml", boom)
+    monkeypatch.setattr(dte_pipeline, "DTE_RETRY_BASE", timedelta(minutes=1))
+
+    assert process_batch(db) == 1
+    job = db.query(DteJob).one()
+    first_wait = job.available_at
+    assert (job.status, job.attempts) == ("PENDING", 1)
+    # En espera: el drenado no lo vuelve a tomar de inmediato
+    assert process_batch(db) == 0
+
+    job.available_at -= timedelta(minutes=2)
+    db.commit()
+    assert process_batch(db) == 1
+    db.expire_all()
+    job = db.query(DteJob).one()
+    assert job.attempts == 2
+    # La espera se duplica: ~2 minutos desde ahora contra ~1 del primer intento
+    assert job.available_at - first_wait > timedelta(seconds=50)
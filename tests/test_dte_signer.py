@@ -0,0 +1,186 @@
+"""Tests unitarios de la firma de DTE (XML-DSig) y del timbre electrónico (TED)."""
+
+import base64
+import hashlib
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("cryptography")
+pytest.importorskip("lxml")
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.hazmat.primitives.serialization import pkcs12
+from cryptography.x509.oid import NameOID
+from lxml import etree
+
+from app.models.customer import Customer
+from app.models.dte import CAF, DTE
+from app.models.issuer import Issuer
+from app.models.product import Product
+from app.models.sale import Sale, SaleDetail
+from app.services import dte_signer
+from app.services.dte_pipeline import enqueue_dte, process_batch
+from app.services.dte_signer import SignerError, load_certificate, parse_caf, sign_dte
+from app.services.xml_generator import render_factura_xml
+
+DSIG = {"ds": dte_signer.DSIG_NS, "s": dte_signer.SII_NS}
+
+
+def _pfx(password: bytes = b"secreto") -> bytes:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Firmante Prueba")])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name)
+        .public_key(key.public_key()).serial_number(1)
+        .not_valid_before(now).not_valid_after(now + timedelta(days=30))
+        .sign(key, hashes.SHA256())
+    )
+    return pkcs12.serialize_key_and_certificates(
+        b"firma", key, cert, None, serialization.BestAvailableEncryption(password)
+    )
+
+
+def _caf_xml(tipo: int = 33, desde: int = 1, hasta: int = 100) -> str:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=1024)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL, serialization.NoEncryption()
+    ).decode()
+    return f"""<?xml version="1.0"?>
+<AUTORIZACION>
+<CAF version="1.0">
+<DA>
+<RE>76123456-K</RE>
+<RS>EMISORA</RS>
+<TD>{tipo}</TD>
+<RNG><D>{desde}</D><H>{hasta}</H></RNG>
+<FA>2026-01-05</FA>
+<RSAPK><M>AA==</M><E>Aw==</E></RSAPK>
+<IDK>100</IDK>
+</DA>
+<FRMA algoritmo="SHA1withRSA">AA==</FRMA>
+</CAF>
+<RSASK>{pem}</RSASK>
+</AUTORIZACION>
+"""
+
+
+def _xml(folio: int = 7, razon_social: str = "Cliente & Cía") -> str:
+    sale = SimpleNamespace(
+        folio=folio, tipo_dte=33, fecha_emision=datetime(2026, 3, 2, 15, 0),
+        monto_neto=Decimal("1500"), iva=Decimal("285"), monto_total=Decimal("1785"),
+        details=[SimpleNamespace(
+            cantidad=1, precio_unitario=Decimal("1500"), subtotal=Decimal("1500"),
+            product=SimpleNamespace(nombre="Producto con nombre bastante largo para el TED", unidad_medida="un"),
+        )],
+    )
+    issuer = SimpleNamespace(rut="76123456-K", razon_social="Emisora", giro="Comercio", acteco="1",
+                             direccion="", comuna="", ciudad="", telefono="", email="")
+    customer = SimpleNamespace(rut="12345678-5", razon_social=razon_social, giro="", direccion="",
+                               comuna="", ciudad="")
+    return render_factura_xml(sale, issuer, customer)
+
+
+def _verify_rsa(public_key, signature_b64: str, data: bytes) -> None:
+    public_key.verify(base64.b64decode(signature_b64), data, padding.PKCS1v15(), hashes.SHA1())
+
+
+def test_signed_dte_has_valid_ted_and_signature():
+    cert = load_certificate(_pfx(), b"secreto")
+    caf = parse_caf(_caf_xml())
+    signed = sign_dte(_xml(), cert, caf, timestamp="2026-03-02T15:00:00")
+
+    root = etree.fromstring(signed.encode(dte_signer.ENCODING))
+    documento = root.find("s:Documento", DSIG)
+    ted = documento.find("s:TED", DSIG)
+    assert documento.findtext("s:TmstFirma", namespaces=DSIG) == "2026-03-02T15:00:00"
+    assert ted.findtext("s:DD/s:RSR", namespaces=DSIG) == "Cliente & Cía"
+    assert len(ted.findtext("s:DD/s:IT1", namespaces=DSIG)) == 40
+    assert ted.find("s:DD/s:CAF/s:DA/s:RNG/s:H", DSIG).text == "100"
+
+    # FRMT: SHA1withRSA del DD aplanado con la llave pública del CAF
+    dd = signed[signed.index("<DD>"):signed.index("</DD>") + 5]
+    _verify_rsa(caf.key.public_key(), ted.findtext("s:FRMT", namespaces=DSIG), dd.encode(dte_signer.ENCODING))
+
+    # XML-DSig: digest de Documento y firma de SignedInfo con el certificado
+    signature = root.find("ds:Signature", DSIG)
+    assert signature.find("ds:SignedInfo/ds:Reference", DSIG).get("URI") == "#F7T33"
+    documento_c14n = etree.tostring(documento, method="c14n")
+    digest = base64.b64encode(hashlib.sha1(documento_c14n).digest()).decode()
+    assert signature.findtext("ds:SignedInfo/ds:Reference/ds:DigestValue", namespaces=DSIG) == digest
+    x509_der = base64.b64decode(signature.findtext("ds:KeyInfo/ds:X509Data/ds:X509Certificate", namespaces=DSIG))
+    public_key = x509.load_der_x509_certificate(x509_der).public_key()
+    signed_info = etree.tostring(signature.find("ds:SignedInfo", DSIG), method="c14n")
+    _verify_rsa(public_key, signature.findtext("ds:SignatureValue", namespaces=DSIG), signed_info)
+
+
+def test_folio_outside_caf_is_rejected():
+    cert = load_certificate(_pfx(), b"secreto")
+    with pytest.raises(SignerError):
+        sign_dte(_xml(folio=101), cert, parse_caf(_caf_xml()))
+    with pytest.raises(SignerError):
+        parse_caf("<CAF_DUMMY_AUTOINJECTED></CAF_DUMMY_AUTOINJECTED>")
+    with pytest.raises(SignerError):
+        load_certificate(_pfx(), b"otra")
+
+
+def test_pool_task_caches_keys_per_tenant(tmp_path, monkeypatch):
+    monkeypatch.setattr(dte_signer, "CERT_DIR", tmp_path)
+    (tmp_path / "tenant_demo.pfx").write_bytes(_pfx())
+    (tmp_path / "tenant_demo.pass").write_bytes(b"secreto\n")
+    dte_signer.key_cache.clear()
+
+    pool = dte_signer.SigningPool(processes=0, chunk_size=2)
+    cafs = {1: _caf_xml()}
+    documents = [(i, _xml(folio=i), 1) for i in (1, 2, 3)] + [(4, _xml(folio=4), None)]
+    results = pool.sign_many("tenant_demo", documents, cafs)
+
+    assert [r[0] for r in results] == [1, 2, 3, 4]
+    assert all(r[1] and "<TED" in r[1] for r in results[:3])
+    assert results[3][1] is None and "CAF" in results[3][2]
+    assert pool.stats()["signed"] == 3 and pool.stats()["failures"] == 1
+    # Certificado y CAF parseados una sola vez
+    assert dte_signer.key_cache.stats()["entries"] == 2
+
+    results = pool.sign_many("tenant_sin_certificado", documents[:1], cafs)
+    assert results[0][1] is None and "certificado" in results[0][2]
+    assert dte_signer.invalidate_keys("tenant_demo") == 2
+
+
+def test_pipeline_signs_when_tenant_has_certificate(tenant_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(dte_signer, "CERT_DIR", tmp_path)
+    monkeypatch.setattr(dte_signer, "signing_pool", dte_signer.SigningPool(processes=0))
+    (tmp_path / "public.pfx").write_bytes(_pfx())
+    (tmp_path / "public.pass").write_bytes(b"secreto")
+    dte_signer.key_cache.clear()
+
+    db = tenant_db
+    db.add_all([
+        Customer(id=1, rut="12345678-5", razon_social="Cliente"),
+        Product(id=1, codigo_interno="A", nombre="Producto A", precio_neto=1000),
+        Issuer(rut="76123456-K", razon_social="Emisor", giro="Comercio", acteco="1"),
+        CAF(id=1, tipo_documento=33, folio_desde=1, folio_hasta=1, xml_caf=_caf_xml(33, 1, 1)),
+    ])
+    for folio in (1, 2):
+        sale = Sale(
+            user_id=1, customer_id=1, folio=folio, tipo_dte=33,
+            monto_neto=Decimal("1000"), iva=Decimal("190"), monto_total=Decimal("1190"),
+            details=[SaleDetail(product_id=1, cantidad=1, precio_unitario=Decimal("1000"), subtotal=Decimal("1000"))],
+        )
+        db.add(sale)
+        db.flush()
+        enqueue_dte(db, sale)
+    db.commit()
+
+    assert process_batch(db) == 2
+    db.expire_all()
+    signed, unsigned = db.query(DTE).order_by(DTE.folio).all()
+    assert signed.estado_sii == "GENERADO" and "<TED" in signed.xml_content and "SignatureValue" in signed.xml_content
+    # Folio 2 sin CAF: el trabajo queda para reintento
+    assert unsigned.estado_sii == "PENDIENTE"
+    db.close()
@@ -0,0 +1,99 @@
+"""Tests unitarios del asignador de folios (rollover y bloques)."""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from app.models.dte import CAF, FolioReservation
+from app.models.sale import Sale
+from app.services.folio_allocator import FolioAllocator, FolioBlock, allocate_folio, reclaim_stale_reservations
+
+
+def _engine_with_cafs(*ranges):
+    engine = create_engine("sqlite://")
+    CAF.__table__.create(engine)
+    FolioReservation.__table__.create(engine)
+    Sale.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        for desde, hasta in ranges:
+            db.add(CAF(tipo_documento=39, folio_desde=desde, folio_hasta=hasta,
+                       ultimo_folio_usado=0, xml_caf="<CAF/>"))
+        db.commit()
+    return engine, Session
+
+
+class TestAllocateFolio:
+    def test_rollover_to_next_caf(self):
+        _, Session = _engine_with_cafs((1, 2), (100, 101))
+        with Session() as db:
+            folios = [allocate_folio(db, 39) for _ in range(5)]
+            db.commit()
+        assert folios == [1, 2, 100, 101, None]
+
+    def test_rollback_returns_folio(self):
+        _, Session = _engine_with_cafs((1, 10))
+        with Session() as db:
+            assert allocate_folio(db, 39) == 1
+            db.rollback()
+            assert allocate_folio(db, 39) == 1
+
+
+class TestFolioBlock:
+    def test_returned_folios_are_reused_first(self):
+        block = FolioBlock(reservation_id=1, tipo_dte=39, next_folio=10, folio_hasta=12)
+        assert block.take() == 10
+        assert block.take() == 11
+        block.give_back(10)
+        assert block.take() == 10
+        assert block.take() == 12
+        assert block.take() is None
+
+
+class TestBlockAllocator:
+    def test_blocks_cover_range_without_duplicates(self):
+        engine, Session = _engine_with_cafs((1, 5), (50, 52))
+        allocator = FolioAllocator(block_size=2, engine_resolver=lambda _: engine)
+        with Session() as db:
+            db.info["schema_name"] = "tenant_test"
+            folios = [allocator.next_folio(db, 39) for _ in range(9)]
+        assert folios == [1, 2, 3, 4, 5, 50, 51, 52, None]
+
+    def test_release_keeps_unused_folios(self):
+        engine, Session = _engine_with_cafs((1, 10))
+        allocator = FolioAllocator(block_size=5, engine_resolver=lambda _: engine)
+        with Session() as db:
+            db.info["schema_name"] = "tenant_test"
+            assert allocator.next_folio(db, 39) == 1
+            assert allocator.next_folio(db, 39) == 2
+            allocator.give_back(db, 39, 1)
+            allocator.release_all()
+
+            released = db.query(FolioReservation).filter(FolioReservation.status == "RELEASED").all()
+            assert sorted((r.next_folio, r.folio_hasta) for r in released) == [(1, 1), (3, 5)]
+
+            # Un nuevo worker reutiliza primero los folios liberados
+            other = FolioAllocator(block_size=5, engine_resolver=lambda _: engine)
+            assert other.next_folio(db, 39) == 1
+
+    def test_late_release_of_reclaimed_block_is_discarded(self):
+        engine, Session = _engine_with_cafs((1, 10))
+        idle = FolioAllocator(block_size=5, engine_resolver=lambda _: engine, worker_id="idle")
+        live = FolioAllocator(block_size=5, engine_resolver=lambda _: engine, worker_id="live")
+        with Session() as db:
+            db.info["schema_name"] = "tenant_test"
+            assert idle.next_folio(db, 39) == 1
+
+            # El worker inactivo supera el umbral: su bloque se recupera y lo toma otro
+            db.execute(update(FolioReservation).values(reserved_at=datetime.now(timezone.utc) - timedelta(hours=2)))
+            db.commit()
+            assert reclaim_stale_reservations(db, timedelta(hours=1)) == 1
+            assert [live.next_folio(db, 39) for _ in range(3)] == [1, 2, 3]
+
+            # La liberación tardía del bloque vencido no pisa al nuevo dueño
+            idle._blocks[("tenant_test", 39)].reserved_at -= 10_000
+            assert idle.next_folio(db, 39) == 6
+            db.expire_all()
+            first = db.get(FolioReservation, 1)
+            assert (first.status, first.worker_id) == ("ACTIVE", "live")
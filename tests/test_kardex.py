@@ -0,0 +1,69 @@
+"""Tests unitarios del kardex (saldos acumulados, checkpoints y conciliación)."""
+
+from decimal import Decimal
+
+import pytest
+
+from app.models.inventory import StockBalanceCheckpoint, StockMovement
+from app.models.product import Product
+from app.services.kardex import kardex_page, reconcile
+
+# (tipo, cantidad, balance_after registrado)
+MOVES = [
+    ("ENTRADA", 10, 15), ("SALIDA", 3, None), ("SALIDA", 2, 10),
+    ("ENTRADA", 4, None), ("SALIDA", 1, None), ("ENTRADA", 6, 19),
+]
+
+
+@pytest.fixture
+def db(tenant_db):
+    tenant_db.add_all([
+        Product(id=1, codigo_interno="A", nombre="A", precio_neto=1000, controla_stock=True, stock_actual=19),
+        Product(id=2, codigo_interno="B", nombre="B", precio_neto=1000, controla_stock=True, stock_actual=3),
+    ])
+    tenant_db.add_all(
+        StockMovement(product_id=1, tipo=tipo, motivo="AJUSTE", cantidad=qty, balance_after=bal)
+        for tipo, qty, bal in MOVES
+    )
+    tenant_db.add(StockMovement(product_id=2, tipo="ENTRADA", motivo="COMPRA", cantidad=5))
+    tenant_db.commit()
+    return tenant_db
+
+
+def _balances(entries):
+    return [e["balance"] for e in entries]
+
+
+def test_kardex_anchored_to_current_stock(db):
+    page, cursor = kardex_page(db, 1, limit=4)
+    assert _balances(page) == [Decimal("19"), Decimal("13"), Decimal("14"), Decimal("10")]
+    assert cursor == page[-1]["id"]
+
+    page, cursor = kardex_page(db, 1, limit=4, cursor=cursor)
+    assert _balances(page) == [Decimal("12"), Decimal("15")]
+    assert cursor is None
+
+
+def test_reconcile_backfills_checkpoints_and_drift(db):
+    report = reconcile(db, checkpoint_every=2)
+    assert report["products"] == 2
+    assert report["backfilled"] == 4
+    stored = [m.balance_after for m in db.query(StockMovement).filter_by(product_id=1).order_by(StockMovement.id)]
+    assert stored == [Decimal(v) for v in (15, 12, 10, 14, 13, 19)]
+
+    # Producto 2: sin saldos registrados, se ancla al stock vigente (apertura -2)
+    assert report["drift"] == []
+    checkpoints = db.query(StockBalanceCheckpoint).filter_by(product_id=1).count()
+    assert checkpoints == 4  # apertura + cada 2 movimientos
+
+    # Las páginas profundas se calculan desde el checkpoint y coinciden
+    page, cursor = kardex_page(db, 1, limit=3)
+    deep, _ = kardex_page(db, 1, limit=3, cursor=cursor)
+    assert _balances(page + deep) == [Decimal(v) for v in (19, 13, 14, 10, 12, 15)]
+
+    # Cambio de stock sin movimiento: descuadre reportado
+    db.query(Product).filter(Product.id == 1).update({"stock_actual": 25})
+    db.commit()
+    drift = reconcile(db, product_ids=[1])["drift"]
+    assert drift == [{"product_id": 1, "stock_actual": Decimal("25"), "kardex_balance": Decimal("19"),
+                      "difference": Decimal("6")}]
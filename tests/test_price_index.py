@@ -0,0 +1,73 @@
+"""Tests unitarios del índice en memoria de listas de precios."""
+
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.models.customer import Customer
+from app.models.price_list import PriceList, PriceListProduct
+from app.models.product import Product
+from app.services.price_index import PriceListIndex
+
+
+@pytest.fixture
+def db(tenant_db):
+    tenant_db.info["schema_name"] = "tenant_test"
+    tenant_db.add_all([
+        Product(id=1, codigo_interno="A", nombre="A", precio_neto=1000),
+        Product(id=2, codigo_interno="B", nombre="B", precio_neto=500),
+        PriceList(id=1, name="Mayorista"),
+        Customer(id=1, rut="11111111-1", razon_social="Mayorista SpA", price_list_id=1),
+        Customer(id=2, rut="22222222-2", razon_social="Cliente"),
+        PriceListProduct(price_list_id=1, product_id=1, fixed_price=Decimal("800")),
+    ])
+    tenant_db.commit()
+    return tenant_db
+
+
+def test_lookup_and_reuse(db):
+    index = PriceListIndex()
+    prices = index.get(db)
+    assert prices.price_for(1, 1) == (1, Decimal("800"))
+    assert prices.price_for(1, 2) == (1, None)
+    assert prices.price_for(2, 1) == (None, None)
+    assert index.get(db) is prices
+    assert index.loads == 1
+
+
+def test_reloads_when_another_worker_changes_lists(db):
+    index = PriceListIndex(check_interval=0)
+    index.get(db)
+    db.add(PriceListProduct(price_list_id=1, product_id=2, fixed_price=Decimal("450")))
+    db.get(PriceList, 1).updated_at = datetime(2099, 1, 1, tzinfo=timezone.utc)
+    db.commit()
+    assert index.get(db).price_for(1, 2) == (1, Decimal("450"))
+    assert index.loads == 2
+
+
+def test_patches_keep_index_warm(db):
+    index = PriceListIndex()
+    index.get(db)
+
+    db.get(PriceList, 1).updated_at = datetime(2099, 1, 1, tzinfo=timezone.utc)
+    db.get(Customer, 2).price_list_id = 1
+    db.commit()
+    index.patch_list(db, 1, {2: Decimal("400")})
+    index.patch_customers(db, 1, [2])
+
+    prices = index.get(db)
+    assert index.loads == 1
+    assert prices.price_for(2, 2) == (1, Decimal("400"))
+    assert prices.price_for(1, 1) == (None, None)
+
+
+def test_fresh_entries_skip_token_query_and_tenants_are_bounded(db):
+    index = PriceListIndex(check_interval=60, max_tenants=1)
+    prices = index.get(db)
+    assert index.get(db) is prices and index.get(db) is prices
+    assert (index.loads, index.checks) == (1, 1)
+
+    db.info["schema_name"] = "tenant_otro"
+    index.get(db)
+    assert index.stats()["tenants"] == 1 and index.stats()["evictions"] == 1
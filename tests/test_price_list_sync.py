@@ -0,0 +1,49 @@
+"""Tests unitarios de la asignación masiva (diff) de precios a listas."""
+
+from decimal import Decimal
+
+import pytest
+
+from app.models.price_list import PriceList, PriceListProduct
+from app.models.product import Product
+from app.services.price_list_sync import apply_prices, diff_prices
+
+
+@pytest.fixture
+def db(tenant_db):
+    tenant_db.add(PriceList(id=1, name="Mayorista"))
+    tenant_db.add_all(Product(id=i, codigo_interno=f"P{i}", nombre=f"P{i}", precio_neto=1000) for i in range(1, 6))
+    tenant_db.add_all([
+        PriceListProduct(price_list_id=1, product_id=1, fixed_price=Decimal("100")),
+        PriceListProduct(price_list_id=1, product_id=2, fixed_price=Decimal("200")),
+        PriceListProduct(price_list_id=1, product_id=3, fixed_price=Decimal("300")),
+    ])
+    tenant_db.commit()
+    return tenant_db
+
+
+def test_diff_prices():
+    diff = diff_prices(
+        {1: Decimal("100.00"), 2: Decimal("200.00"), 3: Decimal("300.00")},
+        {1: 100, 2: Decimal("250"), 4: "400.004"},
+    )
+    assert diff.to_insert == {4: Decimal("400.00")}
+    assert diff.to_update == {2: Decimal("250.00")}
+    assert diff.to_delete == [3]
+    assert diff.summary() == {"inserted": 1, "updated": 1, "deleted": 1, "unchanged": 1}
+
+
+def test_apply_prices_touches_only_changed_rows(db):
+    diff = apply_prices(db, 1, {1: Decimal("100"), 2: Decimal("250"), 4: Decimal("400"), 5: Decimal("500")},
+                        chunk_size=1)
+    db.commit()
+    rows = dict(db.query(PriceListProduct.product_id, PriceListProduct.fixed_price).all())
+    assert rows == {1: Decimal("100"), 2: Decimal("250"), 4: Decimal("400"), 5: Decimal("500")}
+    assert diff.summary() == {"inserted": 2, "updated": 1, "deleted": 1, "unchanged": 1}
+
+
+def test_apply_empty_clears_list(db):
+    diff = apply_prices(db, 1, {})
+    db.commit()
+    assert db.query(PriceListProduct).count() == 0
+    assert diff.summary()["deleted"] == 3
@@ -0,0 +1,95 @@
+"""Tests unitarios del listado paginado del catálogo de productos."""
+
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from app.models.brand import Brand
+from app.models.product import Product
+from app.models.tax import Tax
+from app.schemas import ProductOut, ProductPOSOut
+from app.services.product_catalog import (
+    catalog_query,
+    fetch_page,
+    full_options,
+    pos_options,
+)
+
+
+@pytest.fixture
+def engine(tenant_engine):
+    return tenant_engine
+
+
+@pytest.fixture
+def db(tenant_db):
+    session = tenant_db
+    session.add_all([
+        Tax(id=1, name="IVA", rate=Decimal("0.19"), is_default=True),
+        Brand(id=1, name="Marca A"),
+        Brand(id=2, name="Marca B"),
+    ])
+    for i in range(1, 11):
+        session.add(Product(
+            id=i, codigo_interno=f"P{i}", nombre=f"Producto {i}", precio_neto=1000,
+            brand_id=1 if i % 2 else 2, tax_id=1, controla_stock=True,
+            stock_actual=i, stock_minimo=5, is_active=i != 10,
+        ))
+    session.add_all([
+        Product(id=11, codigo_interno="P1-S", nombre="S", precio_neto=1000, parent_id=1, tax_id=1),
+        Product(id=12, codigo_interno="P1-M", nombre="M", precio_neto=1000, parent_id=1, tax_id=1),
+        Product(id=13, codigo_interno="DEL", nombre="Borrado", precio_neto=1, is_deleted=True),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def _count_queries(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_keyset_pages_cover_catalog_once(db):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = fetch_page(catalog_query(db), 5, cursor)
+        seen.extend(p.id for p in rows)
+        if cursor is None:
+            break
+    assert seen == sorted(range(1, 13), reverse=True)
+
+
+def test_filters(db):
+    ids = lambda q: {p.id for p in q.all()}  # noqa: E731
+    assert ids(catalog_query(db, brand_id=2)) == {2, 4, 6, 8, 10}
+    assert 10 not in ids(catalog_query(db, is_active=True))
+    assert ids(catalog_query(db, low_stock=True)) == {1, 2, 3, 4, 5}
+    assert ids(catalog_query(db, parent_id=1)) == {11, 12}
+    assert ids(catalog_query(db, kind="variants")) == {11, 12}
+    assert 11 not in ids(catalog_query(db, kind="parents"))
+    assert ids(catalog_query(db, q="p1-")) == {11, 12}
+
+
+def test_serialization_uses_fixed_number_of_queries(db, engine):
+    statements = _count_queries(engine)
+    rows, _ = fetch_page(catalog_query(db).options(*full_options()), 20)
+    out = [ProductOut.model_validate(p) for p in rows]
+    # productos + parent + tax + brand + variants + (tax, brand, variants) de variantes
+    assert len(statements) <= 8
+    variant = next(p for p in out if p.id == 11)
+    assert variant.full_name == "Producto 1 S"
+    assert variant.precio_bruto == 1190
+    assert [v.id for v in next(p for p in out if p.id == 1).variants] == [11, 12]
+
+
+def test_pos_projection(db, engine):
+    statements = _count_queries(engine)
+    rows, cursor = fetch_page(catalog_query(db, is_active=True).options(*pos_options()), 3)
+    out = [ProductPOSOut.model_validate(p) for p in rows]
+    assert len(statements) <= 3
+    assert [p.id for p in out] == [12, 11, 9]
+    assert out[0].full_name == "Producto 1 M"
+    assert cursor == 9
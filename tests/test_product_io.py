@@ -0,0 +1,157 @@
+"""Tests unitarios de la importación/exportación masiva de productos."""
+
+import asyncio
+import csv
+import io
+
+import pytest
+
+from app.models.product import Product
+from app.services.product_io import (
+    IMPORT_FIELDS,
+    ProductImporter,
+    export_chunks,
+    generate_ean13,
+    iter_csv_records,
+)
+
+
+@pytest.fixture
+def engine(tenant_engine):
+    return tenant_engine
+
+
+@pytest.fixture
+def db(tenant_db):
+    session = tenant_db
+    session.add(Product(id=1, codigo_interno="PROD-00001", nombre="Existente", precio_neto=1))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _records(body: bytes, chunk: int = 7):
+    async def _chunks():
+        for i in range(0, len(body), chunk):
+            yield body[i:i + chunk]
+
+    async def _collect():
+        return [r async for r in iter_csv_records(_chunks())]
+
+    return asyncio.run(_collect())
+
+
+def _import(db, body: bytes, batch_size: int = 2, dry_run: bool = False):
+    importer = ProductImporter(db, batch_size=batch_size, dry_run=dry_run)
+    for line, record in _records(body):
+        importer.add(line, record)
+        if importer.full:
+            importer.flush()
+    return importer.finish()
+
+
+def test_csv_parsing_across_chunk_boundaries():
+    records = _records("nombre,precio_neto\nÑandú,10\n\nB,\n".encode())
+    assert records == [(2, {"nombre": "Ñandú", "precio_neto": "10"}), (4, {"nombre": "B"})]
+
+
+def test_import_generates_codes_in_blocks_and_reports_errors(db):
+    body = (
+        "codigo_interno,nombre,precio_neto,parent_codigo\n"
+        ",Simple,100,\n"
+        "POL,Polera,5000,\n"
+        ",S,5000,POL\n"
+        ",M,5000,POL\n"
+        "PROD-00001,Duplicado,1,\n"
+        ",Huerfana,1,NOPE\n"
+        ",Mala,abc,\n"
+    ).encode()
+    result = _import(db, body)
+
+    assert result.created == 4
+    assert [e["line"] for e in result.errors] == [6, 7, 8]
+    simple = db.query(Product).filter_by(nombre="Simple").one()
+    assert simple.codigo_interno == "PROD-00002"
+    assert simple.codigo_barras == generate_ean13(simple.id)
+    polera = db.query(Product).filter_by(codigo_interno="POL").one()
+    assert sorted(v.codigo_interno for v in polera.variants) == ["POL-V01", "POL-V02"]
+    # El padre con variantes no conserva un EAN autogenerado
+    assert polera.codigo_barras is None
+
+
+def test_database_error_counts_each_row_once(db, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    insert = ProductImporter._insert
+
+    def fail_on_variants(self, pending):
+        if any(p.parent_id for p in pending):
+            raise OperationalError("INSERT", {}, Exception("conexión perdida"))
+        insert(self, pending)
+
+    monkeypatch.setattr(ProductImporter, "_insert", fail_on_variants)
+    body = (
+        "codigo_interno,nombre,precio_neto,parent_codigo\n"
+        "PROD-00001,Duplicado,1,\n"
+        "POL,Polera,5000,\n"
+        ",Huerfana,1,NOPE\n"
+        ",S,5000,POL\n"
+    ).encode()
+    result = _import(db, body, batch_size=10)
+
+    # El lote completo se revierte; las filas ya rechazadas no se cuentan dos veces
+    assert result.created == 0 and result.failed == 4
+    assert [(e["line"], e["error"].split(" ")[0]) for e in result.errors] == [
+        (2, "Ya"), (3, "Error"), (4, "Producto"), (5, "Error"),
+    ]
+    assert db.query(Product).count() == 1
+
+
+def test_dry_run_failed_batch_keeps_earlier_batches(db, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    insert = ProductImporter._insert
+
+    def fail_second_batch(self, pending):
+        if self.result.batches == 2 and pending:
+            raise OperationalError("INSERT", {}, Exception("conexión perdida"))
+        insert(self, pending)
+
+    monkeypatch.setattr(ProductImporter, "_insert", fail_second_batch)
+    body = (
+        "codigo_interno,nombre,precio_neto,parent_codigo\n"
+        "POL,Polera,5000,\n"
+        ",S,5000,POL\n"
+        ",Otra,1,\n"
+        ",M,5000,POL\n"
+        ",L,5000,POL\n"
+    ).encode()
+    importer = ProductImporter(db, batch_size=2, dry_run=True)
+    for line, record in _records(body):
+        importer.add(line, record)
+        if importer.full:
+            importer.flush()
+            # El lote 1 sigue visible para los siguientes aunque falle el 2
+            assert db.query(Product).filter_by(codigo_interno="POL").count() == 1
+    result = importer.finish()
+
+    assert result.created == 3 and result.failed == 2
+    assert [e["line"] for e in result.errors] == [4, 5]
+    assert db.query(Product).count() == 1
+
+
+def test_dry_run_does_not_persist(db):
+    result = _import(db, b"nombre,precio_neto\nA,1\nB,2\nC,3\n", dry_run=True)
+    assert result.created == 3 and result.batches == 2
+    assert db.query(Product).count() == 1
+
+
+def test_export_round_trip(db, engine):
+    _import(db, b"codigo_interno,nombre,precio_neto,parent_codigo\nPOL,Polera,5000,\nPOL-S,S,5000,POL\n")
+    with engine.connect() as conn:
+        text = "".join(export_chunks(conn, "csv", chunk_size=1))
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert list(rows[0]) == IMPORT_FIELDS
+    assert [(r["codigo_interno"], r["parent_codigo"]) for r in rows] == [
+        ("PROD-00001", ""), ("POL", ""), ("POL-S", "POL"),
+    ]
@@ -0,0 +1,104 @@
+"""Tests de la proyección de permisos por rol usada por el login."""
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.saas import SaaSPlan, SaaSUser, Tenant, TenantRolePermission, TenantUser
+from app.models.user import Role
+from app.services import role_permissions
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_sqlite(element, compiler, **kw):
+    return "JSON"
+
+
+SCHEMAS = ("tenant_a", "tenant_b")
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def attach(dbapi_conn, _):
+        for schema in ("public",) + SCHEMAS:
+            dbapi_conn.execute(f"ATTACH DATABASE ':memory:' AS {schema}")
+
+    public = [SaaSPlan.__table__, Tenant.__table__, SaaSUser.__table__, TenantUser.__table__, TenantRolePermission.__table__]
+    Base.metadata.create_all(engine, tables=public)
+    for schema in SCHEMAS:
+        tenant_engine = engine.execution_options(schema_translate_map={None: schema})
+        Base.metadata.create_all(tenant_engine, tables=[Role.__table__])
+        with tenant_engine.begin() as conn:
+            conn.execute(Role.__table__.insert(), [
+                {"name": "ADMINISTRADOR", "permissions": {"all": True}},
+                {"name": "VENDEDOR", "permissions": {"sales": True, "cash": True}},
+            ])
+
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        SaaSPlan(id=1, name="Pyme", max_users=5),
+        SaaSUser(id=1, email="contador@torn.cl", hashed_password="x"),
+    ])
+    session.add_all([
+        Tenant(id=i, name=f"Empresa {schema[-1].upper()}", schema_name=schema, plan_id=1)
+        for i, schema in enumerate(SCHEMAS, start=1)
+    ])
+    session.add_all([
+        TenantUser(tenant_id=1, user_id=1, role_name="ADMINISTRADOR"),
+        TenantUser(tenant_id=2, user_id=1, role_name="VENDEDOR"),
+    ])
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _user_tenants(db) -> dict:
+    return {tu.tenant.name: (tu.role_name, permissions, tu.tenant.plan_max_users)
+            for tu, permissions in db.execute(role_permissions.user_tenants_stmt(1)).all()}
+
+
+def test_sync_tenant_projects_roles(db):
+    assert role_permissions.sync_tenant(db, 1, "tenant_a") == 2
+    assert role_permissions.sync_tenant(db, 1, "tenant_a") == 2  # idempotente
+    db.commit()
+
+    rows = {r.role_name: r.permissions for r in db.query(TenantRolePermission).filter_by(tenant_id=1)}
+    assert rows == {"ADMINISTRADOR": {"all": True}, "VENDEDOR": {"sales": True, "cash": True}}
+
+
+def test_user_tenants_in_one_query(db):
+    for tenant_id, schema in enumerate(SCHEMAS, start=1):
+        role_permissions.sync_tenant(db, tenant_id, schema)
+    db.commit()
+    db.expunge_all()
+
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    result = _user_tenants(db)
+
+    assert len(statements) == 1
+    assert result == {
+        "Empresa A": ("ADMINISTRADOR", {"all": True}, 5),
+        "Empresa B": ("VENDEDOR", {"sales": True, "cash": True}, 5),
+    }
+
+
+def test_upsert_role_keeps_projection_in_sync(db):
+    role_permissions.sync_tenant(db, 2, "tenant_b")
+    role_permissions.upsert_role(db, 2, "VENDEDOR", {"sales": True})
+    role_permissions.upsert_role(db, None, "VENDEDOR", {"nada": True})  # sesión sin Tenant: no-op
+    db.commit()
+
+    result = _user_tenants(db)
+    assert result["Empresa B"][1] == {"sales": True}
+    # Sin fila proyectada (Tenant sin sincronizar) el login recibe permisos vacíos
+    assert result["Empresa A"][1] is None
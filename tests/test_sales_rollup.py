@@ -0,0 +1,124 @@
+"""Tests unitarios de los agregados de ventas (rollups)."""
+
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.models.customer import Customer
+from app.models.payment import PaymentMethod, SalePayment
+from app.models.product import Product
+from app.models.rollup import SalesDailyRollup, SalesHourlyRollup, SalesPaymentDailyRollup, SalesProductDailyRollup
+from app.models.sale import Sale, SaleDetail
+from app.services.sales_rollup import period_totals, rebuild_rollups, record_sale
+from app.utils.dates import CHILE_TZ
+
+
+@pytest.fixture
+def db(tenant_db):
+    tenant_db.add_all([
+        Customer(id=1, rut="12345678-5", razon_social="Cliente"),
+        Product(id=1, codigo_interno="A", nombre="A", precio_neto=1000, costo_unitario=600),
+        Product(id=2, codigo_interno="B", nombre="B", precio_neto=500, costo_unitario=100),
+        PaymentMethod(id=1, code="EFECTIVO", name="Efectivo"),
+    ])
+    tenant_db.commit()
+    return tenant_db
+
+
+def _sale(db, when: datetime, tipo: int = 39, lines=((1, 2), (2, 1)), seller: int = 1) -> Sale:
+    details = [
+        SaleDetail(product_id=pid, cantidad=Decimal(qty), precio_unitario=Decimal(price),
+                   subtotal=Decimal(price) * qty)
+        for pid, qty in lines
+        for price in [{1: 1000, 2: 500}[pid]]
+    ]
+    neto = sum(d.subtotal for d in details)
+    sale = Sale(user_id=seller, seller_id=seller, customer_id=1, folio=1, tipo_dte=tipo, fecha_emision=when,
+                monto_neto=neto, iva=neto * Decimal("0.19"), monto_total=neto * Decimal("1.19"),
+                details=details)
+    db.add(sale)
+    db.flush()
+    payment = SalePayment(sale_id=sale.id, payment_method_id=1, amount=sale.monto_total)
+    db.add(payment)
+    record_sale(db, sale, [payment], {1: Decimal(600), 2: Decimal(100)})
+    db.commit()
+    return sale
+
+
+def _snapshot(db):
+    return {
+        model.__tablename__: sorted(
+            tuple(getattr(row, c.name) for c in model.__table__.columns)
+            for row in db.query(model).all()
+        )
+        for model in (SalesDailyRollup, SalesHourlyRollup, SalesProductDailyRollup, SalesPaymentDailyRollup)
+    }
+
+
+def test_incremental_matches_backfill(db):
+    noon = datetime(2026, 3, 10, 15, 30, tzinfo=timezone.utc)  # 12:30 en Chile
+    _sale(db, noon)
+    _sale(db, noon.replace(hour=16))
+    _sale(db, noon, tipo=61, lines=((1, 1),))
+
+    daily = db.query(SalesDailyRollup).filter(SalesDailyRollup.tipo_dte == 39).one()
+    assert daily.count == 2
+    assert daily.net == Decimal("5000.00")
+    # 2 x (1000 - 600) + 1 x (500 - 100) por venta
+    assert daily.margin == Decimal("2400.00")
+
+    incremental = _snapshot(db)
+    assert rebuild_rollups(db) == 3
+    assert _snapshot(db) == incremental
+
+
+def test_sellers_write_separate_shards(db):
+    from app.services.sales_rollup import ROLLUP_SHARDS, shard_for
+
+    assert ROLLUP_SHARDS > 1
+    noon = datetime(2026, 3, 10, 15, 30, tzinfo=timezone.utc)
+    _sale(db, noon, seller=1)
+    _sale(db, noon, seller=2)
+    _sale(db, noon, seller=1 + ROLLUP_SHARDS)
+
+    rows = db.query(SalesDailyRollup).order_by(SalesDailyRollup.shard).all()
+    assert [(r.shard, r.count) for r in rows] == [(shard_for(1), 2), (shard_for(2), 1)]
+    assert period_totals(db, noon.replace(hour=0), noon.replace(hour=23))["count"] == 3
+
+    incremental = _snapshot(db)
+    rebuild_rollups(db)
+    assert _snapshot(db) == incremental
+
+
+def test_period_totals_uses_hour_precision(db):
+    _sale(db, datetime(2026, 3, 10, 12, 0, tzinfo=CHILE_TZ))
+    _sale(db, datetime(2026, 3, 11, 9, 0, tzinfo=CHILE_TZ))
+    _sale(db, datetime(2026, 3, 11, 18, 0, tzinfo=CHILE_TZ))
+
+    whole = period_totals(db, datetime(2026, 3, 10, tzinfo=CHILE_TZ),
+                          datetime(2026, 3, 11, 23, 59, tzinfo=CHILE_TZ))
+    assert whole["count"] == 3
+
+    partial = period_totals(db, datetime(2026, 3, 10, 13, 0, tzinfo=CHILE_TZ),
+                            datetime(2026, 3, 11, 10, 0, tzinfo=CHILE_TZ))
+    assert partial["count"] == 1
+    assert partial["gross"] == Decimal("2975.00")
+    assert period_totals(db, datetime(2026, 3, 11, 9, 0, tzinfo=CHILE_TZ),
+                         datetime(2026, 3, 11, 9, 30, tzinfo=CHILE_TZ), tipos=[61])["count"] == 0
+
+
+def test_dashboard_kpis_conditional_aggregation(db):
+    from app.routers.reports import build_dashboard
+
+    when = datetime(2026, 3, 10, 12, 0, tzinfo=CHILE_TZ)
+    _sale(db, when)
+    _sale(db, when)
+    _sale(db, when, tipo=61, lines=((1, 1),))
+
+    kpis = build_dashboard(db, when.date())["kpis"]
+    assert kpis["num_ventas"] == 2
+    assert kpis["total_ventas"] == Decimal("5950.00")
+    assert kpis["ticket_promedio"] == 2975
+    assert kpis["num_notas_credito"] == 1
+    assert kpis["total_notas_credito"] == Decimal("1190.00")
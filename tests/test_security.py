@@ -0,0 +1,65 @@
+"""Tests del pool acotado de bcrypt y del rehash por cambio de costo."""
+
+import asyncio
+import threading
+
+import pytest
+from passlib.context import CryptContext
+
+from app.utils import security
+from app.utils.security import PasswordPool, PasswordPoolBusy
+
+
+def test_pool_bounds_queue_and_reports_depth():
+    pool = PasswordPool(workers=1, max_queue=1)
+    gate = threading.Event()
+    try:
+        running = pool.submit(gate.wait)
+        queued = pool.submit(lambda: "ok")
+        with pytest.raises(PasswordPoolBusy):
+            pool.submit(lambda: "rechazada")
+
+        stats = pool.stats()
+        assert (stats["running"], stats["queued"], stats["rejected"], stats["peak"]) == (1, 1, 1, 2)
+
+        gate.set()
+        assert running.result(timeout=5) is True
+        assert queued.result(timeout=5) == "ok"
+        assert pool.stats()["completed"] == 2
+        assert pool.stats()["queued"] == 0
+    finally:
+        gate.set()
+        pool.stop()
+
+
+def test_async_hash_does_not_block_event_loop():
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        hashed = await security.get_password_hash_async("secreto")
+        task.cancel()
+        return hashed, ticks
+
+    hashed, ticks = asyncio.run(scenario())
+    assert hashed.startswith(f"$2b${security.BCRYPT_ROUNDS:02d}$")
+    assert ticks > 1
+    assert security.verify_password("secreto", hashed)
+    assert not security.verify_password("otra", hashed)
+
+
+def test_verify_and_update_rehashes_when_cost_changes():
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("secreto")
+
+    valid, new_hash = security.verify_and_update("secreto", old_hash)
+    assert valid
+    assert new_hash.startswith(f"$2b${security.BCRYPT_ROUNDS:02d}$")
+
+    assert security.verify_and_update("secreto", new_hash) == (True, None)
+    assert security.verify_and_update("otra", old_hash) == (False, None)
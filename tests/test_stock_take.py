@@ -0,0 +1,92 @@
+"""Tests unitarios de la toma de inventario masiva."""
+
+from decimal import Decimal
+
+import pytest
+
+from app.models.inventory import StockMovement, StockTakeLine
+from app.models.product import Product
+from app.services import stock_take
+from app.services.stock_take import StockTakeError
+
+
+@pytest.fixture
+def db(tenant_db):
+    tenant_db.add_all([
+        Product(id=1, codigo_interno="A", nombre="A", precio_neto=1000, costo_unitario=100,
+                controla_stock=True, stock_actual=10),
+        Product(id=2, codigo_interno="B", nombre="B", precio_neto=1000, costo_unitario=50,
+                controla_stock=True, stock_actual=5),
+        Product(id=3, codigo_interno="C", nombre="C", precio_neto=1000, controla_stock=True, stock_actual=7),
+        Product(id=4, codigo_interno="S", nombre="Servicio", precio_neto=1000, controla_stock=False),
+    ])
+    tenant_db.commit()
+    return tenant_db
+
+
+def _stock(db, product_id):
+    return db.query(Product.stock_actual).filter(Product.id == product_id).scalar()
+
+
+def test_open_snapshots_stock_controlled_products(db):
+    take = stock_take.open_stock_take(db, user_id=None)
+    db.commit()
+    lines = dict(db.query(StockTakeLine.product_id, StockTakeLine.expected).all())
+    assert lines == {1: Decimal("10"), 2: Decimal("5"), 3: Decimal("7")}
+    assert take.status == "OPEN"
+
+    with pytest.raises(StockTakeError):
+        stock_take.open_stock_take(db, product_ids=[2])
+
+
+def test_apply_preserves_movements_during_count(db):
+    take = stock_take.open_stock_take(db)
+    stock_take.record_counts(db, take, {1: Decimal("8"), 2: Decimal("5")})
+    stock_take.record_counts(db, take, {2: Decimal("1")}, accumulate=True)
+    db.commit()
+
+    # Venta de 3 unidades de A mientras se cuenta
+    db.query(Product).filter(Product.id == 1).update({"stock_actual": Product.stock_actual - 3})
+    db.commit()
+
+    summary = stock_take.summary(db, take.id)
+    assert summary["counted"] == 2 and summary["with_difference"] == 2
+    assert summary["difference_value"] == Decimal("-150")
+
+    adjusted = stock_take.apply_stock_take(db, take)
+    db.commit()
+    assert adjusted == 2
+    assert take.status == "APPLIED" and take.closed_at is not None
+    assert _stock(db, 1) == Decimal("5")   # 10 - 3 vendidas - 2 faltantes
+    assert _stock(db, 2) == Decimal("6")
+    assert _stock(db, 3) == Decimal("7")   # no contado: se omite
+
+    movements = {m.product_id: m for m in db.query(StockMovement).all()}
+    assert movements[1].tipo == "SALIDA" and movements[1].cantidad == Decimal("2")
+    assert movements[1].balance_after == Decimal("5")
+    assert movements[2].tipo == "ENTRADA" and movements[2].balance_after == Decimal("6")
+
+    with pytest.raises(StockTakeError):
+        stock_take.apply_stock_take(db, take)
+
+
+def test_zero_uncounted(db):
+    take = stock_take.open_stock_take(db, product_ids=[1, 3])
+    stock_take.record_counts(db, take, {1: Decimal("10")})
+    stock_take.apply_stock_take(db, take, zero_uncounted=True)
+    db.commit()
+    assert _stock(db, 1) == Decimal("10")
+    assert _stock(db, 3) == Decimal("0")
+
+
+def test_lock_and_cancel(db):
+    take = stock_take.open_stock_take(db, product_ids=[1], lock_sales=True)
+    db.commit()
+    assert stock_take.locked_products(db, [1, 2]) == {1}
+    with pytest.raises(StockTakeError):
+        stock_take.ensure_unlocked(db, [1])
+
+    stock_take.cancel_stock_take(take)
+    db.commit()
+    assert stock_take.locked_products(db, [1, 2]) == set()
+    assert _stock(db, 1) == Decimal("10")
@@ -0,0 +1,45 @@
+"""Tests unitarios del administrador de pools por Inquilino."""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from app.database import TenantPoolManager
+
+
+class _SQLitePoolManager(TenantPoolManager):
+    """Variante que usa SQLite en memoria para no depender de PostgreSQL."""
+
+    def _create_engine(self, schema_name):
+        return create_engine(
+            "sqlite://", poolclass=QueuePool,
+            pool_size=self.pool_size, max_overflow=self.max_overflow,
+        )
+
+
+class TestTenantPoolManager:
+    def test_reuses_engine_per_schema(self):
+        manager = _SQLitePoolManager("sqlite://", max_tenants=5)
+        assert manager.get_engine("tenant_a") is manager.get_engine("tenant_a")
+        assert manager.get_engine("tenant_a") is not manager.get_engine("tenant_b")
+
+    def test_rejects_invalid_schema(self):
+        manager = _SQLitePoolManager("sqlite://")
+        with pytest.raises(ValueError):
+            manager.get_engine('tenant_x"; DROP SCHEMA public; --')
+
+    def test_lru_eviction_skips_busy_pools(self):
+        manager = _SQLitePoolManager("sqlite://", max_tenants=2)
+        busy = manager.get_engine("tenant_a").connect()
+        busy.execute(text("SELECT 1"))
+        manager.get_engine("tenant_b")
+        manager.get_engine("tenant_c")
+
+        stats = manager.stats()
+        # tenant_a es el más antiguo pero tiene una conexión en uso
+        assert set(stats["tenants"]) == {"tenant_a", "tenant_c"}
+        assert stats["tenants"]["tenant_a"]["checked_out"] == 1
+        assert stats["evictions"] == 1
+        busy.close()
+        manager.dispose()
+        assert manager.stats()["tenants_pooled"] == 0
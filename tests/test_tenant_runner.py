@@ -0,0 +1,97 @@
+"""Tests del ejecutor de tareas sobre todos los inquilinos."""
+
+import threading
+
+import pytest
+from sqlalchemy import create_engine, event, text
+
+from app.services import tenant_runner
+from app.services.tenant_runner import TenantTarget, load_checkpoint, run_tenants
+
+SCHEMAS = ("tenant_a", "tenant_b", "tenant_c", "tenant_d")
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(tenant_runner, "RETRY_DELAY", 0)
+    engine = create_engine(f"sqlite:///{tmp_path / 'main.db'}")
+
+    @event.listens_for(engine, "connect")
+    def attach(dbapi_conn, _):
+        for schema in SCHEMAS:
+            dbapi_conn.execute(f"ATTACH DATABASE '{tmp_path / schema}.db' AS {schema}")
+
+    with engine.begin() as conn:
+        for schema in SCHEMAS:
+            conn.execute(text(f"CREATE TABLE {schema}.marks (note TEXT)"))
+    return engine
+
+
+TENANTS = [TenantTarget(i, schema, schema.upper()) for i, schema in enumerate(SCHEMAS, start=1)]
+
+
+def _marks(engine, schema):
+    with engine.connect() as conn:
+        return [r[0] for r in conn.execute(text(f"SELECT note FROM {schema}.marks"))]
+
+
+def test_failures_roll_back_and_are_retried(engine):
+    calls = {}
+
+    def task(conn, tenant):
+        calls[tenant.schema_name] = calls.get(tenant.schema_name, 0) + 1
+        conn.execute(text(f"INSERT INTO {tenant.schema_name}.marks VALUES ('x')"))
+        if tenant.schema_name == "tenant_b" and calls["tenant_b"] == 1:
+            raise RuntimeError("conexión perdida")
+        if tenant.schema_name == "tenant_c":
+            raise ValueError("columna inexistente")
+        return calls[tenant.schema_name]
+
+    report = run_tenants(task, TENANTS, parallelism=1, retries=2, engine=engine)
+
+    assert report.summary() | {"seconds": 0} == {
+        "task": "task", "tenants": 4, "ok": 3, "failed": 1, "skipped": 0, "retried": 2, "seconds": 0,
+    }
+    failed = report.failed[0]
+    assert (failed.schema_name, failed.attempts, failed.error) == ("tenant_c", 3, "ValueError: columna inexistente")
+    # Cada intento es una transacción: sólo queda el intento exitoso
+    assert _marks(engine, "tenant_b") == ["x"]
+    assert _marks(engine, "tenant_c") == []
+
+
+def test_runs_tenants_in_parallel(engine):
+    barrier = threading.Barrier(len(TENANTS), timeout=5)
+
+    def task(conn, tenant):
+        barrier.wait()  # sólo pasa si todos corren a la vez
+        return threading.current_thread().name
+
+    report = run_tenants(task, TENANTS, parallelism=len(TENANTS), retries=0, engine=engine)
+    assert len(report.by_status("ok")) == len(TENANTS)
+    assert len({r.result for r in report.results}) == len(TENANTS)
+
+
+def test_checkpoint_resume_only_reruns_pending(engine, tmp_path):
+    checkpoint = tmp_path / "runs" / "task.jsonl"
+    broken = {"tenant_d"}
+    seen = []
+
+    def task(conn, tenant):
+        seen.append(tenant.schema_name)
+        if tenant.schema_name in broken:
+            raise RuntimeError("falla")
+        return {"schema": tenant.schema_name}
+
+    first = run_tenants(task, TENANTS, retries=0, checkpoint=checkpoint, engine=engine)
+    assert [r.schema_name for r in first.failed] == ["tenant_d"]
+    assert load_checkpoint(checkpoint)["tenant_a"]["result"] == {"schema": "tenant_a"}
+
+    broken.clear()
+    seen.clear()
+    second = run_tenants(task, TENANTS, retries=0, checkpoint=checkpoint, engine=engine)
+    assert seen == ["tenant_d"]
+    assert second.summary()["skipped"] == 3 and second.summary()["ok"] == 1
+
+    seen.clear()
+    run_tenants(task, TENANTS, retries=0, checkpoint=checkpoint, resume=False, engine=engine)
+    assert sorted(seen) == list(SCHEMAS)